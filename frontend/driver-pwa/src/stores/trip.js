@@ -1,6 +1,8 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
 import { frappeClient } from '@shared'
+import { useCommunicationStore } from './communication'
+import { useVehicleStore } from './vehicle'
 
 export const useTripStore = defineStore('trip', () => {
   const trips = ref([])
@@ -23,10 +25,7 @@ export const useTripStore = defineStore('trip', () => {
     try {
       const data = await frappeClient.call('tems.api.pwa.driver.get_driver_dashboard')
       
-      trips.value = [
-        ...data.journey_plans.map(jp => ({ ...jp, type: 'journey' })),
-        ...data.operation_plans.map(op => ({ ...op, type: 'operation' }))
-      ]
+      setTrips(data)
       
       return data
     } catch (err) {
@@ -37,6 +36,39 @@ export const useTripStore = defineStore('trip', () => {
     }
   }
 
+  function setTrips(dashboard) {
+    trips.value = [
+      ...dashboard.journey_plans.map(jp => ({ ...jp, type: 'journey' })),
+      ...dashboard.operation_plans.map(op => ({ ...op, type: 'operation' }))
+    ]
+  }
+
+  // One round trip on app launch: dashboard, vehicles, messages, notifications
+  async function bootstrap() {
+    loading.value = true
+    error.value = null
+
+    try {
+      const data = await frappeClient.call('tems.api.pwa.driver.get_driver_bootstrap')
+      setTrips(data.dashboard)
+
+      const commStore = useCommunicationStore()
+      commStore.messages = data.messages || []
+      commStore.notifications = data.notifications || []
+      commStore.unreadCount = commStore.unreadNotifications.length
+
+      const vehicleStore = useVehicleStore()
+      vehicleStore.vehicles = Object.values(data.vehicles || {}).map(v => v.vehicle)
+
+      return data.dashboard
+    } catch (err) {
+      error.value = err.message
+      throw err
+    } finally {
+      loading.value = false
+    }
+  }
+
   async function fetchTripDetails(tripId) {
     loading.value = true
     
@@ -99,6 +131,7 @@ export const useTripStore = defineStore('trip', () => {
     upcomingTrips,
     inProgressTrips,
     fetchDashboard,
+    bootstrap,
     fetchTripDetails,
     startTrip,
     completeTrip
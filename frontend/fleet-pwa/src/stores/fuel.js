@@ -10,7 +10,7 @@ export const useFuelStore = defineStore('fuel', () => {
 
     // Computed
     const totalFuelConsumed = computed(() => {
-        return fuelLogs.value.reduce((sum, log) => sum + (log.quantity || 0), 0)
+        return fuelLogs.value.reduce((sum, log) => sum + (log.liters || 0), 0)
     })
 
     const averageFuelEfficiency = computed(() => {
@@ -1,6 +1,6 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
-import { frappeClient } from '@shared'
+import { frappeClient, useRealtimeTopics } from '@shared'
 
 export const useFleetStore = defineStore('fleet', () => {
     const vehicles = ref([])
@@ -93,6 +93,29 @@ export const useFleetStore = defineStore('fleet', () => {
         }
     }
 
+    // Realtime: vehicle_state deltas instead of re-fetching the fleet
+    let realtime = null
+
+    async function subscribeRealtime(socket, areas = []) {
+        unsubscribeRealtime()
+        realtime = useRealtimeTopics(socket)
+        const topics = ['role:Operations Manager', 'role:Operations Officer', ...areas.map(a => `area:${a}`)]
+        await realtime.subscribe(topics, {
+            vehicle_state: (message) => {
+                realtime.applyDeltas(vehicles.value, message.deltas)
+                // Only vehicles already on an active operation are merged into that list
+                const active = new Set(activeVehicles.value.map(v => v.name))
+                realtime.applyDeltas(activeVehicles.value, message.deltas.filter(d => active.has(d.name)))
+                lastUpdate.value = new Date()
+            }
+        })
+    }
+
+    function unsubscribeRealtime() {
+        realtime?.unsubscribe()
+        realtime = null
+    }
+
     function clearError() {
         error.value = null
     }
@@ -115,6 +138,8 @@ export const useFleetStore = defineStore('fleet', () => {
         fetchActiveVehicles,
         getVehicleLocation,
         updateVehicleStatus,
+        subscribeRealtime,
+        unsubscribeRealtime,
         clearError
     }
 })
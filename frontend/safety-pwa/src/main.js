@@ -1,5 +1,6 @@
 import { createApp } from 'vue'
 import { createPinia } from 'pinia'
+import { connectRealtime } from '@shared'
 import router from './router'
 import App from './App.vue'
 import './assets/main.css'
@@ -9,4 +10,6 @@ const pinia = createPinia()
 
 app.use(pinia)
 app.use(router)
+// Resolves to the Frappe socket client (or null) for realtime topic subscriptions
+app.provide('socket', connectRealtime())
 app.mount('#app')
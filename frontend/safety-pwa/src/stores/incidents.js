@@ -1,10 +1,11 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
-import { frappeClient } from '@shared'
+import { frappeClient, useRealtimeTopics } from '@shared'
 
 export const useIncidentStore = defineStore('incident', () => {
     const incidents = ref([])
     const criticalIncidents = ref([])
+    const sosEvents = ref([])
     const loading = ref(false)
     const error = ref(null)
 
@@ -127,6 +128,27 @@ export const useIncidentStore = defineStore('incident', () => {
         }
     }
 
+    // Realtime: critical incident and SOS alerts on the safety role topics
+    let realtime = null
+
+    async function subscribeRealtime(socket, areas = []) {
+        unsubscribeRealtime()
+        realtime = useRealtimeTopics(socket)
+        const topics = ['role:Safety Manager', 'role:Safety Officer', ...areas.map(a => `area:${a}`)]
+        await realtime.subscribe(topics, {
+            safety_incident_alert: (message) => {
+                realtime.applyDeltas(criticalIncidents.value, message.deltas)
+                realtime.applyDeltas(incidents.value, message.deltas)
+            },
+            sos_event: (message) => realtime.applyDeltas(sosEvents.value, message.deltas)
+        })
+    }
+
+    function unsubscribeRealtime() {
+        realtime?.unsubscribe()
+        realtime = null
+    }
+
     function clearError() {
         error.value = null
     }
@@ -135,6 +157,7 @@ export const useIncidentStore = defineStore('incident', () => {
         // State
         incidents,
         criticalIncidents,
+        sosEvents,
         loading,
         error,
 
@@ -149,6 +172,8 @@ export const useIncidentStore = defineStore('incident', () => {
         reportIncident,
         updateIncidentStatus,
         assignInvestigator,
+        subscribeRealtime,
+        unsubscribeRealtime,
         clearError
     }
 })
@@ -0,0 +1,82 @@
+import { getCurrentInstance, onUnmounted } from 'vue'
+import frappeClient from '../utils/frappeClient.js'
+
+/**
+ * Topic realtime subscriptions with delta payloads
+ * Joins vehicle/area topics via the Frappe socket and applies compact deltas
+ * instead of re-fetching whole dashboards. Role topics arrive on the user room.
+ * Inside a component the subscription ends on unmount; stores call unsubscribe().
+ *
+ * @param {object} socket - Connected socket.io client (e.g. frappe.realtime.socket)
+ * @returns {object} subscribe / unsubscribe / applyDeltas helpers
+ *
+ * @example
+ * ```javascript
+ * import { useRealtimeTopics } from '@shared/composables/useRealtimeTopics'
+ *
+ * const { subscribe, applyDeltas } = useRealtimeTopics(socket)
+ * await subscribe(['vehicle:V-001', 'role:Operations Manager'], {
+ *   vehicle_state: (msg) => applyDeltas(vehicles.value, msg.deltas)
+ * })
+ * ```
+ */
+export function useRealtimeTopics(socket) {
+    const joined = []
+    const listeners = []
+
+    /**
+     * Join topics and register event handlers
+     * @param {string[]} topics - e.g. ['vehicle:V-001', 'area:Lagos', 'role:Safety Manager']
+     * @param {object} handlers - Map of event name to handler(message)
+     */
+    async function subscribe(topics, handlers = {}) {
+        const rooms = await frappeClient.call('tems.tems_main.realtime.get_topic_rooms', {
+            topics: JSON.stringify(topics)
+        })
+        for (const room of rooms || []) {
+            if (room.doctype) {
+                socket.emit('doc_subscribe', room.doctype, room.name)
+                joined.push(room)
+            }
+        }
+        const wanted = new Set(topics)
+        for (const [event, handler] of Object.entries(handlers)) {
+            const listener = (message) => {
+                if (!message?.topic || wanted.has(message.topic)) handler(message)
+            }
+            socket.on(event, listener)
+            listeners.push([event, listener])
+        }
+    }
+
+    function unsubscribe() {
+        for (const room of joined.splice(0)) {
+            socket.emit('doc_unsubscribe', room.doctype, room.name)
+        }
+        for (const [event, listener] of listeners.splice(0)) {
+            socket.off(event, listener)
+        }
+    }
+
+    /**
+     * Merge deltas into a list of records keyed by `name`
+     * @param {object[]} records - Reactive array of records
+     * @param {object[]} deltas - Deltas from a realtime message
+     * @param {string} key - Identity field
+     */
+    function applyDeltas(records, deltas, key = 'name') {
+        for (const delta of deltas || []) {
+            const index = records.findIndex((r) => r[key] === delta[key])
+            if (index === -1) {
+                records.push({ ...delta })
+            } else {
+                records[index] = { ...records[index], ...delta }
+            }
+        }
+        return records
+    }
+
+    if (getCurrentInstance()) onUnmounted(unsubscribe)
+
+    return { subscribe, unsubscribe, applyDeltas }
+}
@@ -1,5 +1,6 @@
 // Shared exports
 export { default as frappeClient } from './utils/frappeClient.js'
+export { connectRealtime } from './utils/realtimeSocket.js'
 export * from './utils/helpers.js'
 export * from './utils/validators.js'
 export * from './utils/formatters.js'
@@ -11,6 +12,7 @@ export { useGeolocation } from './composables/useGeolocation.js'
 export { useCamera } from './composables/useCamera.js'
 export { useNotifications } from './composables/useNotifications.js'
 export { useToast } from './composables/useToast.js'
+export { useRealtimeTopics } from './composables/useRealtimeTopics.js'
 
 // Stores
 export { useAuthStore } from './stores/auth.js'
@@ -0,0 +1,57 @@
+import frappeClient from './frappeClient.js'
+
+let clientScript = null
+
+/**
+ * Load the socket.io client served by the Frappe socket server
+ * @param {string} host - Socket server origin
+ * @returns {Promise<Function>} The global `io` factory
+ */
+function loadClient(host) {
+    if (window.io) return Promise.resolve(window.io)
+    clientScript ??= new Promise((resolve, reject) => {
+        const script = document.createElement('script')
+        script.src = `${host}/socket.io/socket.io.js`
+        script.async = true
+        script.onload = () => resolve(window.io)
+        script.onerror = () => {
+            clientScript = null
+            reject(new Error('Socket.io client could not be loaded'))
+        }
+        document.head.appendChild(script)
+    })
+    return clientScript
+}
+
+/**
+ * Connect to the site's namespace on the Frappe socket server
+ * Apps provide the result as `socket` so views can subscribe to realtime topics:
+ * `app.provide('socket', connectRealtime())`. Resolves to null when the socket
+ * server is unreachable; views then keep their fetch-based refresh.
+ *
+ * @returns {Promise<object|null>} Connected socket.io client, or null
+ *
+ * @example
+ * ```javascript
+ * const socket = await inject('socket', null)
+ * if (socket) await store.subscribeRealtime(socket)
+ * ```
+ */
+export async function connectRealtime() {
+    try {
+        const config = await frappeClient.call('tems.tems_main.realtime.get_socket_config')
+        let host = window.location.origin
+        if (config.port) {
+            // Development: the socket server listens on its own port
+            host = `${window.location.protocol}//${window.location.hostname}:${config.port}`
+        }
+        const io = await loadClient(host)
+        return io(`${host}${config.namespace}`, {
+            withCredentials: true,
+            reconnectionAttempts: 3
+        })
+    } catch (err) {
+        console.warn('Realtime unavailable:', err)
+        return null
+    }
+}
@@ -1,96 +1,39 @@
 import frappe
 from frappe import _
-from frappe.utils import now_datetime, get_datetime, getdate
+from frappe.utils import flt, now_datetime, get_datetime, getdate
 import json
 
+from tems.tems_people.driver_view import (
+    build_notifications,
+    build_vehicle_info,
+    employee_for_user,
+    get_view,
+)
+
 @frappe.whitelist()
 def get_driver_dashboard(driver_email=None):
     """Get driver dashboard data - today's trips, pending tasks, alerts"""
-    if not driver_email:
-        driver_email = frappe.session.user
-    
-    employee = frappe.db.get_value("Employee", {"user_id": driver_email}, "name")
-    if not employee:
+    view = get_view(driver_email or frappe.session.user)
+    if not view:
         frappe.throw(_("No employee record found for this user"))
     
-    today = getdate()
-    
-    # Get today's journey plans
-    journey_plans = frappe.get_all(
-        "Journey Plan",
-        filters={
-            "driver": employee,
-            "start_time": [">=", today]
-        },
-        fields=["name", "route", "vehicle", "start_time", "end_time", "risk_score", "sos_contact"],
-        order_by="start_time asc"
-    )
-    
-    # Get active operation plans
-    operation_plans = frappe.get_all(
-        "Operation Plan",
-        filters={
-            "driver": employee,
-            "status": ["in", ["Assigned", "Active"]],
-            "start_time": [">=", today]
-        },
-        fields=["name", "title", "vehicle", "operation_mode", "start_time", "status"],
-        order_by="start_time asc"
-    )
-    
-    # Get pending spot checks (if any assigned)
-    pending_checks = frappe.get_all(
-        "Spot Check",
-        filters={
-            "driver": employee,
-            "date": today,
-            "docstatus": 0
-        },
-        fields=["name", "vehicle", "location"],
-        limit=5
-    )
-    
-    # Get recent incidents involving driver via Incident Participant child table
-    incident_participants = frappe.get_all(
-        "Incident Participant",
-        filters={
-            "employee": employee,
-            "parenttype": "Safety Incident"
-        },
-        fields=["parent"],
-        distinct=True
-    )
-    
-    incident_names = [p.parent for p in incident_participants]
-    
-    recent_incidents = []
-    if incident_names:
-        recent_incidents = frappe.get_all(
-            "Safety Incident",
-            filters={
-                "name": ["in", incident_names],
-                "incident_date": [">=", frappe.utils.add_days(today, -7)]
-            },
-            fields=["name", "title", "incident_date", "severity", "status"],
-            order_by="incident_date desc",
-            limit=5
-        )
-    
-    # Get driver qualification status
-    qualification = frappe.db.get_value(
-        "Driver Qualification",
-        {"employee": employee, "status": "Active"},
-        ["license_no", "expiry_date", "status"],
-        as_dict=True
-    )
+    return view["dashboard"]
+
+
+@frappe.whitelist()
+def get_driver_bootstrap():
+    """Everything the driver app needs on launch in one round trip: dashboard,
+    assigned vehicles, messages and unread notifications (cached per driver)"""
+    view = get_view()
+    if not view:
+        frappe.throw(_("No employee record found for this user"))
     
     return {
-        "employee": employee,
-        "journey_plans": journey_plans,
-        "operation_plans": operation_plans,
-        "pending_checks": pending_checks,
-        "recent_incidents": recent_incidents,
-        "qualification": qualification,
+        "employee": view["employee"],
+        "dashboard": view["dashboard"],
+        "vehicles": view["vehicles"],
+        "messages": view["messages"],
+        "notifications": view["notifications"],
         "timestamp": now_datetime()
     }
 
@@ -175,7 +118,7 @@ def complete_trip(journey_plan_name, odometer_reading=None, location_data=None,
 @frappe.whitelist()
 def submit_spot_check(vehicle, location=None, notes=None, photos=None):
     """Submit vehicle spot check"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     spot_check = frappe.get_doc({
         "doctype": "Spot Check",
@@ -205,7 +148,7 @@ def submit_spot_check(vehicle, location=None, notes=None, photos=None):
 @frappe.whitelist()
 def report_incident(data):
     """Create safety incident report"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     incident = frappe.get_doc({
         "doctype": "Safety Incident",
@@ -244,7 +187,7 @@ def log_fuel(vehicle, liters, price_per_liter, odometer, station=None, location_
         "odometer": odometer,
         "liters": liters,
         "price_per_liter": price_per_liter,
-        "total_cost": liters * price_per_liter,
+        "total_cost": flt(liters) * flt(price_per_liter),
         "station": station,
         "geohash": location_data.get("geohash") if location_data else None,
         "date": getdate()
@@ -256,42 +199,24 @@ def log_fuel(vehicle, liters, price_per_liter, odometer, station=None, location_
         "success": True,
         "fuel_log": fuel_log.name,
         "total_cost": fuel_log.total_cost,
+        "fuel_anomaly": fuel_log.flags.fuel_anomaly,
         "message": _("Fuel logged successfully")
     }
 
 
 def get_vehicle_info(vehicle_name):
     """Get vehicle details"""
-    vehicle = frappe.get_doc("Vehicle", vehicle_name)
-    
-    # Get last fuel log
-    last_fuel = None
-    try:
-        last_fuel = frappe.get_last_doc("Fuel Log", filters={"vehicle": vehicle_name})
-    except:
-        pass
-    
-    # Get pending maintenance
-    pending_maintenance = frappe.get_all(
-        "Maintenance Work Order",
-        filters={
-            "vehicle": vehicle_name,
-            "status": ["in", ["Open", "In Progress"]]
-        },
-        fields=["name", "status", "planned_date", "cost"]
-    )
+    view = get_view()
+    if view and vehicle_name in view["vehicles"]:
+        return view["vehicles"][vehicle_name]
     
-    return {
-        "vehicle": vehicle.as_dict(),
-        "last_fuel": last_fuel.as_dict() if last_fuel else None,
-        "pending_maintenance": pending_maintenance
-    }
+    return build_vehicle_info(vehicle_name)
 
 
 @frappe.whitelist()
 def get_offline_sync_data(last_sync=None):
     """Get essential data for offline operation"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     # Get upcoming trips (next 7 days)
     upcoming_trips = frappe.get_all(
@@ -340,7 +265,7 @@ def send_sos_alert(location_data, notes=''):
         import json
         location_data = json.loads(location_data)
     
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     # Get current journey if any
     current_journey = frappe.db.get_value(
@@ -380,28 +305,14 @@ def send_sos_alert(location_data, notes=''):
 @frappe.whitelist()
 def get_messages():
     """Get driver messages/communications"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
-    
-    # Get messages from Communication doctype
-    messages = frappe.get_all(
-        "Communication",
-        filters={
-            "reference_doctype": "Employee",
-            "reference_name": employee,
-            "communication_type": ["in", ["Communication", "Chat"]]
-        },
-        fields=["name", "subject", "content", "sender", "creation", "sent_or_received"],
-        order_by="creation desc",
-        limit=50
-    )
-    
-    return messages
+    view = get_view()
+    return view["messages"] if view else []
 
 
 @frappe.whitelist()
 def send_message(recipient_type, recipient_id, message, timestamp=None):
     """Send message to operations control"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     comm = frappe.get_doc({
         "doctype": "Communication",
@@ -425,20 +336,8 @@ def send_message(recipient_type, recipient_id, message, timestamp=None):
 @frappe.whitelist()
 def get_notifications():
     """Get driver notifications"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
-    
-    notifications = frappe.get_all(
-        "Notification Log",
-        filters={
-            "for_user": frappe.session.user,
-            "read": 0
-        },
-        fields=["name", "subject", "email_content", "document_type", "document_name", "creation"],
-        order_by="creation desc",
-        limit=20
-    )
-    
-    return notifications
+    view = get_view()
+    return view["notifications"] if view else build_notifications(frappe.session.user)
 
 
 @frappe.whitelist()
@@ -454,7 +353,7 @@ def mark_notification_read(notification_id):
 @frappe.whitelist()
 def get_driver_incidents():
     """Get incidents involving driver"""
-    employee = frappe.db.get_value("Employee", {"user_id": frappe.session.user}, "name")
+    employee = employee_for_user()
     
     incidents = frappe.get_all(
         "Safety Incident",
@@ -341,8 +341,8 @@ def get_fuel_logs(filters=None):
             filters = json.loads(filters) if filters else {}
         
         fuel_logs = frappe.get_all(
-            "Fuel Log Entry",
-            fields=["name", "vehicle", "date", "quantity", "cost", "odometer", "fuel_type"],
+            "Fuel Log",
+            fields=["name", "vehicle", "date", "liters", "price_per_liter", "total_cost", "odometer", "station"],
             filters=filters or {},
             order_by="date DESC",
             limit=100
@@ -376,27 +376,31 @@ def get_fuel_stats(period='month'):
         stats = frappe.db.sql("""
             SELECT 
                 COUNT(*) as total_entries,
-                SUM(quantity) as total_fuel,
-                SUM(cost) as total_cost,
-                AVG(quantity) as avg_quantity,
-                AVG(cost) as avg_cost
-            FROM `tabFuel Log Entry`
+                SUM(liters) as total_fuel,
+                SUM(total_cost) as total_cost,
+                AVG(liters) as avg_quantity,
+                AVG(total_cost) as avg_cost
+            FROM `tabFuel Log`
             WHERE date >= %(from_date)s
         """, {"from_date": from_date}, as_dict=True)
         
-        # Calculate efficiency if odometer data available
+        # km/L per fill-up: distance since the vehicle's previous fill-up over the liters filled
         efficiency = frappe.db.sql("""
             SELECT 
-                AVG((odometer_end - odometer_start) / NULLIF(quantity, 0)) as avg_efficiency
-            FROM `tabFuel Log Entry`
+                AVG((odometer - prev_odometer) / liters) as avg_efficiency
+            FROM (
+                SELECT date, odometer, liters,
+                    LAG(odometer) OVER (PARTITION BY vehicle ORDER BY date, odometer) as prev_odometer
+                FROM `tabFuel Log`
+                WHERE odometer > 0
+            ) fills
             WHERE date >= %(from_date)s
-            AND odometer_start IS NOT NULL
-            AND odometer_end IS NOT NULL
-            AND quantity > 0
+            AND odometer > prev_odometer
+            AND liters > 0
         """, {"from_date": from_date}, as_dict=True)
         
         result = stats[0] if stats else {}
-        result['average_efficiency'] = efficiency[0].get('avg_efficiency', 0) if efficiency else 0
+        result['average_efficiency'] = (efficiency[0].get('avg_efficiency') or 0) if efficiency else 0
         result['period'] = period
         
         return {
@@ -424,15 +428,15 @@ def log_fuel_entry(fuel_data):
             if not fuel_data.get(field):
                 frappe.throw(_(f"{field} is required"))
         
-        # Create fuel log entry
+        # Create fuel log entry (scored against the vehicle's fuel baseline on insert)
+        quantity = flt(fuel_data['quantity'])
         fuel_log = frappe.get_doc({
-            "doctype": "Fuel Log Entry",
+            "doctype": "Fuel Log",
             "vehicle": fuel_data['vehicle'],
             "date": fuel_data['date'],
-            "quantity": fuel_data['quantity'],
-            "cost": fuel_data['cost'],
+            "liters": quantity,
+            "price_per_liter": flt(fuel_data['cost']) / quantity if quantity else 0,
             "odometer": fuel_data.get('odometer'),
-            "fuel_type": fuel_data.get('fuel_type', 'Diesel'),
             "station": fuel_data.get('station', '')
         })
         
@@ -441,7 +445,8 @@ def log_fuel_entry(fuel_data):
         return {
             "success": True,
             "message": _("Fuel entry logged successfully"),
-            "data": fuel_log.as_dict()
+            "data": fuel_log.as_dict(),
+            "fuel_anomaly": fuel_log.flags.fuel_anomaly
         }
         
     except Exception as e:
@@ -468,10 +473,10 @@ def get_fuel_trends(asset_id, period='month'):
         trends = frappe.db.sql("""
             SELECT 
                 DATE(date) as log_date,
-                SUM(quantity) as total_quantity,
-                SUM(cost) as total_cost,
-                AVG(quantity) as avg_quantity
-            FROM `tabFuel Log Entry`
+                SUM(liters) as total_quantity,
+                SUM(total_cost) as total_cost,
+                AVG(liters) as avg_quantity
+            FROM `tabFuel Log`
             WHERE vehicle = %(vehicle)s
             AND date >= %(from_date)s
             GROUP BY DATE(date)
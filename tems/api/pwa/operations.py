@@ -4,83 +4,14 @@ from frappe.utils import now_datetime, getdate, add_days, nowdate
 import json
 
 @frappe.whitelist()
-def get_operations_dashboard():
-    """Get operations dashboard - real-time fleet status"""
-    today = getdate()
-    
-    # Active trips
-    active_operations = frappe.get_all(
-        "Operation Plan",
-        filters={
-            "status": ["in", ["Assigned", "Active"]],
-            "start_time": [">=", today]
-        },
-        fields=["name", "title", "vehicle", "driver", "operation_mode", "start_time", "status"],
-        order_by="start_time asc"
-    )
-    
-    # Get real-time vehicle positions (last movement log per vehicle)
-    vehicle_positions = frappe.db.sql("""
-        SELECT 
-            ml.vehicle,
-            ml.state,
-            ml.event_time,
-            ml.location_lat,
-            ml.location_lng,
-            ml.geohash,
-            v.license_plate
-        FROM `tabMovement Log` ml
-        INNER JOIN `tabVehicle` v ON v.name = ml.vehicle
-        WHERE ml.event_time >= %s
-        AND ml.name IN (
-            SELECT MAX(name) 
-            FROM `tabMovement Log` 
-            GROUP BY vehicle
-        )
-        ORDER BY ml.event_time DESC
-    """, (add_days(today, -1),), as_dict=True)
-    
-    # Exception alerts
-    exceptions = frappe.get_all(
-        "Control Exception",
-        filters={
-            "status": ["in", ["Open", "Acknowledged"]],
-            "occurred_at": [">=", add_days(today, -1)]
-        },
-        fields=["name", "type", "severity", "occurred_at", "vehicle", "status"],
-        order_by="occurred_at desc",
-        limit=20
-    )
-    
-    # SOS events
-    sos_events = frappe.get_all(
-        "SOS Event",
-        filters={
-            "status": ["in", ["Open", "Acknowledged"]],
-            "created_at": [">=", add_days(today, -1)]
-        },
-        fields=["name", "created_at", "reporter_employee", "vehicle", "lat", "lng", "status"],
-        order_by="created_at desc"
-    )
-    
-    # Fleet utilization summary (use custom_vehicle_state instead of disabled)
-    total_vehicles = frappe.db.count("Vehicle", {
-        "custom_vehicle_state": ["in", ["Active", "Available"]]
-    })
-    active_vehicles = len(set([op.vehicle for op in active_operations if op.vehicle]))
-    
-    return {
-        "active_operations": active_operations,
-        "vehicle_positions": vehicle_positions,
-        "exceptions": exceptions,
-        "sos_events": sos_events,
-        "fleet_summary": {
-            "total_vehicles": total_vehicles,
-            "active_vehicles": active_vehicles,
-            "utilization_rate": (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0
-        },
-        "timestamp": now_datetime()
-    }
+def get_operations_dashboard(depot=None, etag=None):
+    """Get operations dashboard - real-time fleet status.
+    Served from a shared snapshot refreshed every few seconds; pass the last `etag`
+    (or send If-None-Match) to get a not-modified answer when nothing changed.
+    Only sections whose doctype the user can read are included."""
+    from tems.tems_operations.dashboard import dashboard_snapshot, respond
+
+    return respond(dashboard_snapshot(depot), etag)
 
 
 @frappe.whitelist()
@@ -113,9 +44,28 @@ def create_dispatch_schedule(data):
     }
 
 
+@frappe.whitelist()
+def check_driver_hours(driver, start_time, end_time):
+    """Can `driver` take a trip from `start_time` to `end_time` (hours of service)?"""
+    from tems.tems_safety.hours_of_service import check_trip
+
+    return check_trip(driver, start_time, end_time)
+
+
 @frappe.whitelist()
 def assign_trip(journey_plan, vehicle, driver, assistant=None):
     """Assign driver and vehicle to journey"""
+    from tems.tems_safety.hours_of_service import check_trip
+
+    plan = frappe.db.get_value("Journey Plan", journey_plan, ["start_time", "end_time"], as_dict=True)
+    if not plan:
+        frappe.throw(_("Journey Plan not found: {0}").format(journey_plan), frappe.DoesNotExistError)
+    hours = None
+    if plan.start_time and plan.end_time and plan.end_time > plan.start_time:
+        hours = check_trip(driver, plan.start_time, plan.end_time)
+    if hours and not hours["allowed"] and frappe.conf.get("tems_hos_enforce"):
+        frappe.throw(_("Driver {0} would exceed hours-of-service limits").format(driver))
+
     trip_allocation = frappe.get_doc({
         "doctype": "Trip Allocation",
         "journey_plan": journey_plan,
@@ -137,6 +87,7 @@ def assign_trip(journey_plan, vehicle, driver, assistant=None):
     return {
         "success": True,
         "allocation": trip_allocation.name,
+        "hours_of_service": hours,
         "message": _("Trip assigned successfully")
     }
 
@@ -198,39 +149,58 @@ def get_vehicles(filters=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching vehicles: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching vehicles: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
 @frappe.whitelist()
-def get_vehicle_locations():
+def get_vehicle_locations(min_lat=None, min_lng=None, max_lat=None, max_lng=None):
     """
-    Get real-time vehicle locations from latest movement logs
+    Get real-time vehicle locations from the latest-position index.
+    Pass min_lat/min_lng/max_lat/max_lng to restrict to the map viewport.
     """
     try:
-        # Get latest location for each vehicle from last 24 hours
-        locations = frappe.db.sql("""
-            SELECT 
-                ml.vehicle,
-                ml.location_lat as lat,
-                ml.location_lng as lng,
-                ml.geohash,
-                ml.state,
-                ml.event_time as last_update,
-                v.license_plate,
-                v.make,
-                v.model
-            FROM `tabMovement Log` ml
-            INNER JOIN `tabVehicle` v ON v.name = ml.vehicle
-            WHERE ml.event_time >= %(start_time)s
-            AND ml.name IN (
-                SELECT MAX(name) 
-                FROM `tabMovement Log` 
-                GROUP BY vehicle
+        from tems.tems_operations.spatial import POSITION_TABLE, vehicles_in_bbox
+
+        if None not in (min_lat, min_lng, max_lat, max_lng):
+            positions = vehicles_in_bbox(min_lat, min_lng, max_lat, max_lng)
+        else:
+            positions = frappe.db.sql(
+                f"""
+                SELECT vehicle, lat, lng, geohash, state, event_time
+                FROM `{POSITION_TABLE}`
+                WHERE event_time >= %(start_time)s
+                """,
+                {"start_time": add_days(nowdate(), -1)},
+                as_dict=True,
             )
-            ORDER BY ml.event_time DESC
-        """, {"start_time": add_days(nowdate(), -1)}, as_dict=True)
-        
+
+        vehicles = {
+            v.name: v
+            for v in frappe.get_all(
+                "Vehicle",
+                filters={"name": ["in", [p.vehicle for p in positions]]},
+                fields=["name", "license_plate", "make", "model"],
+            )
+        } if positions else {}
+        locations = []
+        for p in positions:
+            vehicle = vehicles.get(p.vehicle)
+            if not vehicle:
+                continue
+            locations.append({
+                "vehicle": p.vehicle,
+                "lat": p.lat,
+                "lng": p.lng,
+                "geohash": p.geohash,
+                "state": p.state,
+                "last_update": p.event_time,
+                "license_plate": vehicle.license_plate,
+                "make": vehicle.make,
+                "model": vehicle.model,
+            })
+        locations.sort(key=lambda row: str(row["last_update"] or ""), reverse=True)
+
         return {
             "success": True,
             "data": locations,
@@ -239,7 +209,7 @@ def get_vehicle_locations():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching vehicle locations: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching vehicle locations: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -278,7 +248,7 @@ def get_dispatch_queue():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching dispatch queue: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching dispatch queue: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -313,34 +283,61 @@ def get_active_trips():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching active trips: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching active trips: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
 @frappe.whitelist()
-def get_route_optimization(origin=None, destination=None, waypoints=None):
+def get_route_optimization(origin=None, destination=None, waypoints=None, route=None, consignments=None,
+                           vehicles=None, capacity=None, operating_area=None, depart_at=None, time_limit=5):
     """
-    Get route optimization suggestions (placeholder for future implementation)
+    Optimize a multi-drop run offline (capacities from cargo weights, time windows from Way Points).
+    origin/destination: Location name or "lat,lng"; waypoints, consignments, vehicles: JSON lists
     """
     try:
-        # This is a placeholder - actual implementation would integrate with
-        # Google Maps API, OpenRouteService, or similar routing service
-        
+        from tems.tems_operations.route_optimizer import plan_routes
+
+        def _as_list(value):
+            if isinstance(value, str):
+                return json.loads(value) if value.strip().startswith("[") else [v.strip() for v in value.split(",") if v.strip()]
+            return value or []
+
+        if not origin:
+            return {
+                "success": True,
+                "data": {"optimized_route": [], "total_distance": 0, "estimated_time": 0,
+                         "message": _("Provide an origin and stops to optimize")}
+            }
+        plan = plan_routes(
+            origin,
+            destination=destination,
+            stops=_as_list(waypoints),
+            route=route,
+            consignments=_as_list(consignments),
+            vehicles=_as_list(vehicles),
+            capacity=float(capacity) if capacity else None,
+            operating_area=operating_area,
+            depart_at=depart_at,
+            time_limit=min(float(time_limit or 5), 30),
+        )
         return {
             "success": True,
             "data": {
                 "origin": origin,
-                "destination": destination,
+                "destination": destination or origin,
                 "waypoints": waypoints,
-                "optimized_route": [],
-                "total_distance": 0,
-                "estimated_time": 0,
-                "message": "Route optimization feature coming soon"
+                "optimized_route": plan["routes"],
+                "unassigned": plan["unassigned"],
+                "unlocated": plan["unlocated"],
+                "total_distance": plan["total_distance_km"],
+                "estimated_time": max((r["duration_minutes"] for r in plan["routes"]), default=0),
+                "vehicles_used": plan["vehicles_used"],
+                "solve_ms": plan["solve_ms"]
             }
         }
         
     except Exception as e:
-        frappe.log_error(f"Error in route optimization: {str(e)}", "Operations API")
+        frappe.log_error(f"Error in route optimization: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -379,6 +376,19 @@ def get_driver_availability(date=None):
             if d.name not in assigned_driver_ids
         ]
         
+        # Attach rolling hours-of-service totals (maintained on duty/movement events)
+        from tems.tems_safety.hours_of_service import get_summaries
+        
+        hours = get_summaries([d.name for d in available_drivers])
+        for d in available_drivers:
+            summary = hours.get(d.name)
+            d["hours_of_service"] = {
+                "status": summary.status,
+                "driving_24h": summary.driving_24h,
+                "driving_7d": summary.driving_7d,
+                "computed_at": summary.computed_at,
+            } if summary else None
+        
         return {
             "success": True,
             "data": {
@@ -391,97 +401,30 @@ def get_driver_availability(date=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching driver availability: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching driver availability: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
 @frappe.whitelist()
-def get_operations_statistics(period='today'):
+def get_operations_statistics(period='today', etag=None):
     """
-    Get operations dashboard statistics
+    Get operations dashboard statistics (shared snapshot, see get_operations_dashboard)
     """
+    from tems.tems_operations.dashboard import respond, statistics_snapshot
+
+    # Outside the try: a permission error must not turn into a success=False payload
+    snapshot = statistics_snapshot(period)
     try:
-        if period == 'today':
-            start_date = nowdate()
-        elif period == 'week':
-            start_date = add_days(nowdate(), -7)
-        elif period == 'month':
-            start_date = add_days(nowdate(), -30)
-        else:
-            start_date = nowdate()
-        
-        # Total operations
-        total_operations = frappe.db.count(
-            "Operation Plan",
-            {"start_time": [">=", start_date]}
-        )
-        
-        # Completed operations
-        completed_operations = frappe.db.count(
-            "Operation Plan",
-            {
-                "start_time": [">=", start_date],
-                "status": "Completed"
-            }
-        )
-        
-        # Active operations
-        active_operations = frappe.db.count(
-            "Operation Plan",
-            {"status": "Active"}
-        )
-        
-        # Pending operations
-        pending_operations = frappe.db.count(
-            "Operation Plan",
-            {
-                "status": ["in", ["Scheduled", "Pending"]],
-                "start_time": [">=", nowdate()]
-            }
-        )
-        
-        # Fleet utilization (use custom_vehicle_state instead of disabled)
-        # Count vehicles with Active or Available state
-        total_vehicles = frappe.db.count("Vehicle", {
-            "custom_vehicle_state": ["in", ["Active", "Available", "Maintenance"]]
-        })
-        
-        active_vehicles = frappe.db.sql("""
-            SELECT COUNT(DISTINCT vehicle)
-            FROM `tabOperation Plan`
-            WHERE status = 'Active'
-            AND vehicle IS NOT NULL
-        """)[0][0] or 0
-        
-        # Exceptions/alerts
-        open_exceptions = frappe.db.count(
-            "Control Exception",
-            {
-                "status": ["in", ["Open", "Acknowledged"]],
-                "occurred_at": [">=", start_date]
-            }
-        )
-        
+        data = respond(snapshot, etag)
+        if data is None or data.get("not_modified"):
+            return data
         return {
             "success": True,
-            "data": {
-                "total_operations": total_operations,
-                "completed_operations": completed_operations,
-                "active_operations": active_operations,
-                "pending_operations": pending_operations,
-                "completion_rate": (completed_operations / total_operations * 100) if total_operations > 0 else 0,
-                "fleet": {
-                    "total_vehicles": total_vehicles,
-                    "active_vehicles": active_vehicles,
-                    "utilization_rate": (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0
-                },
-                "alerts": {
-                    "open_exceptions": open_exceptions
-                },
-                "period": period
-            }
+            "data": snapshot["payload"],
+            "etag": snapshot["etag"],
+            "version": snapshot["version"]
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching operations statistics: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching operations statistics: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
@@ -55,7 +55,7 @@ def get_vehicles(filters=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching vehicles: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching vehicles: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -96,7 +96,7 @@ def get_vehicle_locations():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching vehicle locations: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching vehicle locations: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -134,7 +134,7 @@ def get_dispatch_queue():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching dispatch queue: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching dispatch queue: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -168,7 +168,7 @@ def get_active_trips():
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching active trips: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching active trips: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -195,7 +195,7 @@ def get_route_optimization(origin=None, destination=None, waypoints=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Error in route optimization: {str(e)}", "Operations API")
+        frappe.log_error(f"Error in route optimization: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
@@ -246,93 +246,15 @@ def get_driver_availability(date=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Error fetching driver availability: {str(e)}", "Operations API")
+        frappe.log_error(f"Error fetching driver availability: {e!s}", "Operations API")
         return {"success": False, "message": str(e)}
 
 
 @frappe.whitelist()
-def get_operations_statistics(period='today'):
+def get_operations_statistics(period='today', etag=None):
     """
     Get operations dashboard statistics
     """
-    try:
-        if period == 'today':
-            start_date = nowdate()
-        elif period == 'week':
-            start_date = add_days(nowdate(), -7)
-        elif period == 'month':
-            start_date = add_days(nowdate(), -30)
-        else:
-            start_date = nowdate()
-        
-        # Total operations
-        total_operations = frappe.db.count(
-            "Operation Plan",
-            {"start_time": [">=", start_date]}
-        )
-        
-        # Completed operations
-        completed_operations = frappe.db.count(
-            "Operation Plan",
-            {
-                "start_time": [">=", start_date],
-                "status": "Completed"
-            }
-        )
-        
-        # Active operations
-        active_operations = frappe.db.count(
-            "Operation Plan",
-            {"status": "Active"}
-        )
-        
-        # Pending operations
-        pending_operations = frappe.db.count(
-            "Operation Plan",
-            {
-                "status": ["in", ["Scheduled", "Pending"]],
-                "start_time": [">=", nowdate()]
-            }
-        )
-        
-        # Fleet utilization
-        total_vehicles = frappe.db.count("Vehicle", {"disabled": 0})
-        active_vehicles = frappe.db.sql("""
-            SELECT COUNT(DISTINCT vehicle)
-            FROM `tabOperation Plan`
-            WHERE status = 'Active'
-            AND vehicle IS NOT NULL
-        """)[0][0]
-        
-        # Exceptions/alerts
-        open_exceptions = frappe.db.count(
-            "Control Exception",
-            {
-                "status": ["in", ["Open", "Acknowledged"]],
-                "occurred_at": [">=", start_date]
-            }
-        )
-        
-        return {
-            "success": True,
-            "data": {
-                "total_operations": total_operations,
-                "completed_operations": completed_operations,
-                "active_operations": active_operations,
-                "pending_operations": pending_operations,
-                "completion_rate": (completed_operations / total_operations * 100) if total_operations > 0 else 0,
-                "fleet": {
-                    "total_vehicles": total_vehicles,
-                    "active_vehicles": active_vehicles,
-                    "utilization_rate": (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0
-                },
-                "alerts": {
-                    "open_exceptions": open_exceptions
-                },
-                "period": period
-            }
-        }
-        
-    except Exception as e:
-        frappe.log_error(f"Error fetching operations statistics: {str(e)}", "Operations API")
-        return {"success": False, "message": str(e)}
+    from tems.api.pwa.operations import get_operations_statistics as _get_operations_statistics
+
+    return _get_operations_statistics(period, etag)
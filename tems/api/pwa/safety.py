@@ -8,6 +8,12 @@ from frappe import _
 from frappe.utils import nowdate, add_days, get_datetime
 import json
 
+from tems.tems_insights.kpi_engine import kpi_value_map
+from tems.tems_main import realtime
+
+# Outstanding compliance items, incident frequency rate, driver risk score
+SAFETY_KPIS = ("KPI-014", "KPI-015", "KPI-016")
+
 
 @frappe.whitelist()
 def get_incidents(filters=None):
@@ -101,10 +107,11 @@ def report_incident(incident_data):
         
         # Notify safety team for critical incidents
         if incident.severity in ["Critical", "High"]:
-            frappe.publish_realtime(
+            realtime.publish(
                 "safety_incident_alert",
-                {"incident": incident.name, "severity": incident.severity},
-                user="safety_team"
+                {"doctype": "Incident Report", "name": incident.name, "incident": incident.name,
+                 "severity": incident.severity},
+                realtime.role_topics(*realtime.SAFETY_ROLES)
             )
         
         return {
@@ -478,6 +485,9 @@ def get_safety_statistics():
         # Pending audits
         stats.pending_audits = frappe.db.count("Safety Audit", {"status": ["in", ["Scheduled", "In Progress"]]})
         
+        # Compliance items, incident rate and driver risk from the KPI store
+        stats.kpis = kpi_value_map(SAFETY_KPIS)
+        
         return {
             "success": True,
             "data": stats
@@ -0,0 +1,33 @@
+"""Spatial PWA endpoints: proximity, nearest available vehicle and map viewport."""
+import frappe
+from frappe import _
+
+from tems.tems_operations import spatial
+
+MAX_RADIUS_KM = 500
+
+
+@frappe.whitelist()
+def get_vehicles_near(lat, lng, radius_km=5, available_only=0):
+    """Vehicles within `radius_km` of a point, nearest first."""
+    radius_km = min(float(radius_km), MAX_RADIUS_KM)
+    vehicles = spatial.vehicles_within(lat, lng, radius_km, available_only=bool(int(available_only)))
+    return {"success": True, "data": vehicles, "count": len(vehicles)}
+
+
+@frappe.whitelist()
+def get_nearest_available_vehicles(lat=None, lng=None, sos_event=None, k=5):
+    """Nearest available vehicles to a point or to an SOS Event's location."""
+    if sos_event:
+        lat, lng = frappe.db.get_value("SOS Event", sos_event, ["lat", "lng"]) or (None, None)
+    if lat is None or lng is None:
+        frappe.throw(_("A location (lat/lng or an SOS Event with coordinates) is required"))
+    vehicles = spatial.nearest_available(float(lat), float(lng), k=min(int(k), 50))
+    return {"success": True, "data": vehicles, "count": len(vehicles)}
+
+
+@frappe.whitelist()
+def get_vehicles_in_viewport(min_lat, min_lng, max_lat, max_lng):
+    """Latest positions inside the live map viewport."""
+    vehicles = spatial.vehicles_in_bbox(min_lat, min_lng, max_lat, max_lng)
+    return {"success": True, "data": vehicles, "count": len(vehicles)}
@@ -0,0 +1,28 @@
+"""Telematics ingestion endpoint for GPS devices and gateways."""
+import json
+
+import frappe
+from frappe import _
+
+from tems.tems_operations.telematics import MAX_BATCH_PINGS, enqueue_pings, normalize_ping
+
+
+@frappe.whitelist(methods=["POST"])
+def ingest(pings):
+    """
+    Accept a batch of pings: [{vehicle, lat, lng, recorded_at, speed_kmh?, heading?, state?}, ...]
+    Pings are queued and persisted asynchronously; invalid pings are counted and dropped.
+    """
+    if not frappe.has_permission("Movement Log", "create"):
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    if isinstance(pings, str):
+        pings = json.loads(pings)
+    if isinstance(pings, dict):
+        pings = [pings]
+    if len(pings) > MAX_BATCH_PINGS:
+        frappe.throw(_("At most {0} pings per request").format(MAX_BATCH_PINGS))
+
+    accepted = [p for p in (normalize_ping(raw) for raw in pings) if p]
+    if accepted:
+        enqueue_pings(accepted)
+    return {"success": True, "accepted": len(accepted), "rejected": len(pings) - len(accepted)}
@@ -0,0 +1,7 @@
+"""Performance benchmark suite for TEMS hot paths.
+
+Run from the bench directory:
+
+    bench --site <site> execute tems.benchmarks.suite.run --kwargs "{'profile': 'scale_smoke'}"
+    bench --site <site> execute tems.benchmarks.suite.compare_latest
+"""
@@ -0,0 +1,105 @@
+"""Timing, query counting and result persistence for the benchmark suite."""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import time
+from typing import Any, Callable
+
+import frappe
+from frappe.utils import now_datetime
+
+from tems.tems_main.profiling import QueryRecorder, percentile
+
+RESULTS_DIR = "benchmarks"
+
+
+def measure(fn: Callable[[], Any], *, iterations: int = 5, warmup: int = 1) -> dict:
+    """Call `fn` repeatedly and return latency percentiles plus per-call query stats.
+
+    Each iteration is rolled back so write paths measure the same work every time.
+    """
+    for _ in range(warmup):
+        fn()
+        frappe.db.rollback()
+
+    timings, query_counts, db_times = [], [], []
+    top_shapes: list[dict] = []
+    for _ in range(iterations):
+        with QueryRecorder() as rec:
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        frappe.db.rollback()
+        query_counts.append(rec.count)
+        db_times.append(rec.db_time * 1000)
+        top_shapes = rec.top_shapes(3)
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "max_ms": round(max(timings), 2) if timings else 0.0,
+        "queries": max(query_counts) if query_counts else 0,
+        "db_ms_p50": round(percentile(db_times, 50), 2),
+        "top_shapes": top_shapes,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=frappe.get_app_path("tems"),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return "unknown"
+
+
+def results_dir() -> str:
+    path = frappe.get_site_path(RESULTS_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_results(payload: dict) -> str:
+    """Persist a run as `<site>/benchmarks/<timestamp>-<rev>.json` and return the path."""
+    stamp = now_datetime().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(results_dir(), f"{stamp}-{payload.get('revision', 'unknown')}.json")
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2, default=str)
+    return path
+
+
+def load_results(path: str) -> dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(baseline: dict, candidate: dict, *, tolerance: float = 0.2) -> list[dict]:
+    """Return cases whose p95 latency or query count regressed beyond `tolerance`.
+
+    Query counts are compared exactly (any increase is reported) because they are
+    deterministic for a given dataset; latency uses the relative tolerance.
+    """
+    regressions = []
+    base_cases = baseline.get("cases", {})
+    for name, cand in candidate.get("cases", {}).items():
+        base = base_cases.get(name)
+        if not base or "error" in base or "error" in cand:
+            continue
+        if cand["queries"] > base["queries"]:
+            regressions.append(
+                {"case": name, "metric": "queries", "baseline": base["queries"], "candidate": cand["queries"]}
+            )
+        if base["p95_ms"] and cand["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                {"case": name, "metric": "p95_ms", "baseline": base["p95_ms"], "candidate": cand["p95_ms"]}
+            )
+    return regressions
@@ -0,0 +1,162 @@
+"""Benchmark cases for the known TEMS hot paths.
+
+`run()` seeds (or reuses) a sized dataset via the demo scale profile, times every
+case with `harness.measure` and writes a JSON result file that `compare_latest`
+diffs against the previous run.
+"""
+from __future__ import annotations
+
+import functools
+import glob
+import importlib
+import os
+from collections.abc import Callable
+from typing import Any
+
+import frappe
+
+from tems.benchmarks import harness
+
+# (case name, dotted path, kwargs) — kwargs may be a callable returning kwargs at run time.
+CaseSpec = tuple[str, str, Any]
+
+
+def _sensor_kwargs() -> dict:
+    row = frappe.db.sql(
+        "select sensor_id, tyre from `tabTyre Sensor Data` where ifnull(sensor_id, '') != '' limit 1",
+        as_dict=True,
+    )
+    sensor = row[0] if row else {"sensor_id": "BENCH-SENSOR", "tyre": None}
+    return {
+        "sensor_id": sensor["sensor_id"],
+        "tyre": sensor["tyre"],
+        "pressure_psi": 105.0,
+        "temperature_c": 48.0,
+        "speed_kmh": 72.0,
+    }
+
+
+CASES: list[CaseSpec] = [
+    # Scheduler jobs
+    ("finance.compute_profitability_for_all", "tems.tems_finance.handlers.compute_profitability_for_all", {}),
+    ("tyre.update_tyre_health_scores", "tems.tems_tyre.tasks.update_tyre_health_scores", {}),
+    ("tyre.monitor_tyre_sensors", "tems.tems_tyre.tasks.monitor_tyre_sensors", {}),
+    # API endpoints
+    ("tyre.ingest_sensor_data", "tems.tems_tyre.api.endpoints.ingest_sensor_data", _sensor_kwargs),
+    ("pwa.operations.get_operations_dashboard", "tems.api.pwa.operations.get_operations_dashboard", {}),
+    ("pwa.operations.get_vehicle_locations", "tems.api.pwa.operations.get_vehicle_locations", {}),
+    ("pwa.driver.get_offline_sync_data", "tems.api.pwa.driver.get_offline_sync_data", {}),
+    ("www.get_platform_metrics", "tems.www.index.get_platform_metrics", {}),
+    # AI nightly tasks
+    ("ai.generate_daily_insights", "tems.tems_ai.tasks.generate_daily_insights", {}),
+    ("ai.calculate_driver_risk_scores", "tems.tems_ai.tasks.calculate_driver_risk_scores", {}),
+    ("ai.generate_fleet_maintenance_predictions", "tems.tems_ai.tasks.generate_fleet_maintenance_predictions", {}),
+    ("ai.forecast_financial_metrics", "tems.tems_ai.tasks.forecast_financial_metrics", {}),
+    ("ai.evaluate_alerts_hourly", "tems.tems_ai.tasks.evaluate_alerts_hourly", {}),
+    # Heavy query reports
+    (
+        "report.vehicle_profitability_summary",
+        "tems.tems_finance.report.vehicle_profitability_summary.vehicle_profitability_summary.execute",
+        {},
+    ),
+    (
+        "report.fuel_efficiency_by_vehicle",
+        "tems.tems_fleet.report.fuel_efficiency_by_vehicle.fuel_efficiency_by_asset.execute",
+        {},
+    ),
+    (
+        "report.emissions_by_vehicle_per_month",
+        "tems.tems_climate.report.emissions_by_vehicle_per_month.emissions_by_vehicle_per_month.execute",
+        {},
+    ),
+    ("report.total_cost_by_type", "tems.tems_finance.report.total_cost_by_type.total_cost_by_type.execute", {}),
+    ("report.tyre_cost_analysis", "tems.tems_tyre.report.tyre_cost_analysis.tyre_cost_analysis.execute", {}),
+    ("report.fleet_tyre_metrics", "tems.tems_tyre.report.fleet_tyre_metrics.fleet_tyre_metrics.execute", {}),
+]
+
+
+def _resolve(path: str) -> Callable:
+    module, _, attr = path.rpartition(".")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _driver_user() -> str | None:
+    """A user linked to an Employee so driver endpoints exercise their real queries."""
+    return frappe.db.get_value("Employee", {"user_id": ["is", "set"], "status": "Active"}, "user_id")
+
+
+def _seed(profile: str) -> None:
+    from tems.tems_demo.orchestrator import run_scale
+
+    run_scale(profile=profile, parallel=0)
+
+
+def run(
+    profile: str = "scale_smoke",
+    seed: int = 1,
+    iterations: int = 5,
+    warmup: int = 1,
+    cases: list[str] | str | None = None,
+) -> dict:
+    """Run the benchmark suite and persist results.
+
+    Args:
+        profile: tems_demo scale profile used to size the dataset.
+        seed: pass 0 to reuse an already seeded site.
+        iterations: measured calls per case.
+        warmup: unmeasured calls per case (caches, imports).
+        cases: optional subset of case names (list or comma separated string).
+    """
+    if int(seed):
+        _seed(profile)
+
+    if isinstance(cases, str):
+        cases = [c.strip() for c in cases.split(",") if c.strip()]
+    selected = [c for c in CASES if not cases or c[0] in cases]
+
+    original_user = frappe.session.user
+    driver_user = _driver_user()
+    results: dict[str, dict] = {}
+    for name, path, kwargs in selected:
+        try:
+            fn = _resolve(path)
+            call_kwargs = kwargs() if callable(kwargs) else dict(kwargs)
+            if name.startswith("pwa.driver.") and driver_user:
+                frappe.set_user(driver_user)
+            results[name] = harness.measure(
+                functools.partial(fn, **call_kwargs), iterations=int(iterations), warmup=int(warmup)
+            )
+        except Exception as exc:
+            frappe.db.rollback()
+            results[name] = {"error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            if frappe.session.user != original_user:
+                frappe.set_user(original_user)
+
+    payload = {
+        "revision": harness.git_revision(),
+        "profile": profile,
+        "site": frappe.local.site,
+        "timestamp": str(frappe.utils.now_datetime()),
+        "dataset": _dataset_size(),
+        "cases": results,
+    }
+    payload["path"] = harness.write_results(payload)
+    return payload
+
+
+def _dataset_size() -> dict[str, int]:
+    doctypes = ("Vehicle", "Employee", "Tyre", "Movement Log", "Tyre Sensor Data", "Fuel Log", "Cost And Revenue Ledger")
+    return {dt: frappe.db.count(dt) for dt in doctypes if frappe.db.table_exists(dt)}
+
+
+def compare_latest(tolerance: float = 0.2) -> dict:
+    """Compare the two most recent result files in `<site>/benchmarks/`."""
+    files = sorted(glob.glob(os.path.join(harness.results_dir(), "*.json")))
+    if len(files) < 2:
+        return {"message": "Need at least two benchmark runs to compare", "files": files}
+    baseline, candidate = files[-2], files[-1]
+    regressions = harness.compare(
+        harness.load_results(baseline), harness.load_results(candidate), tolerance=float(tolerance)
+    )
+    return {"baseline": baseline, "candidate": candidate, "regressions": regressions}
@@ -106,7 +106,8 @@ override_whitelisted_methods = {
 # ------------
 
 # before_install = "tems.install.before_install"
-# after_install = "tems.install.after_install"
+after_install = "tems.install.after_install"
+after_migrate = "tems.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -196,7 +197,9 @@ doc_events = {
     # Core Fleet assets
     "Vehicle": {
         "on_update": ["tems.tems_fleet.handlers.update_vehicle_profitability",
-                      "tems.tems_fleet.api.vehicle.on_vehicle_update"],
+                      "tems.tems_fleet.api.vehicle.on_vehicle_update",
+                      "tems.tems_people.driver_view.invalidate_for_doc",
+                      "tems.tems_operations.handlers.publish_vehicle_update"],
         "on_submit": "tems.tems_fleet.handlers.validate_vehicle_assets"
     },
     "Asset": {
@@ -206,38 +209,137 @@ doc_events = {
     },
     "Maintenance Work Order": {
         "after_insert": "tems.tems_fleet.api.maintenance_work_order.after_insert",
-        "on_update": "tems.tems_fleet.api.maintenance_work_order.on_update"
+        "on_update": [
+            "tems.tems_fleet.api.maintenance_work_order.on_update",
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.journey_risk.on_doc_change"
+        ],
+        "on_trash": "tems.tems_safety.journey_risk.on_doc_change"
+    },
+    "Fuel Log": {
+        "after_insert": "tems.tems_fleet.fuel_efficiency.on_fuel_log_insert",
+        "on_update": "tems.tems_people.driver_view.invalidate_for_doc"
     },
     # Operations
     "Operation Plan": {
-        "validate": "tems.tems_operations.handlers.validate_operation_plan",
+        "validate": [
+            "tems.tems_operations.handlers.validate_operation_plan",
+            "tems.tems_safety.hours_of_service.validate_plan_hours"
+        ],
         "before_submit": "tems.tems_operations.handlers.ensure_vehicle_available",
-        "on_submit": "tems.tems_operations.handlers.log_movement_start"
+        "on_submit": "tems.tems_operations.handlers.log_movement_start",
+        "on_update": [
+            "tems.tems_operations.route_geometry.cache_plan_route",
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.hours_of_service.on_doc_change"
+        ],
+        "on_cancel": [
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.hours_of_service.on_doc_change"
+        ],
+        "on_trash": [
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.hours_of_service.on_doc_change"
+        ]
+    },
+    "Duty Assignment": {
+        "on_update": "tems.tems_safety.hours_of_service.on_doc_change",
+        "on_trash": "tems.tems_safety.hours_of_service.on_doc_change"
+    },
+    "Shift Plan": {
+        "on_update": "tems.tems_safety.hours_of_service.on_doc_change",
+        "on_trash": "tems.tems_safety.hours_of_service.on_doc_change"
+    },
+    "Movement Log": {
+        "validate": "tems.tems_operations.spatial.set_geohash",
+        "on_update": [
+            "tems.tems_operations.handlers.update_vehicle_status",
+            "tems.tems_operations.spatial.record_movement_position",
+            "tems.tems_operations.route_geometry.queue_movement_ping",
+            "tems.tems_operations.handlers.publish_vehicle_state",
+            "tems.tems_safety.hours_of_service.on_doc_change"
+        ]
+    },
+    "Route Planning": {
+        "on_update": [
+            "tems.tems_operations.route_geometry.on_route_update",
+            "tems.tems_safety.hotspots.on_route_change"
+        ],
+        "on_trash": [
+            "tems.tems_operations.route_geometry.on_route_trash",
+            "tems.tems_safety.hotspots.on_route_change"
+        ]
     },
-    "Movement Log": {"on_update": "tems.tems_operations.handlers.update_vehicle_status"},
     "Trip Allocation": {"before_insert": "tems.tems_operations.handlers.ensure_driver_vehicle_valid"},
     "Operations Event": {
         "after_insert": "tems.tems_operations.handlers.publish_operations_event",
         "on_update": "tems.tems_operations.handlers.publish_operations_event"
     },
     "SOS Event": {
+        "validate": "tems.tems_operations.spatial.set_geohash",
         "after_insert": "tems.tems_operations.handlers.publish_sos_event",
-        "on_update": "tems.tems_operations.handlers.publish_sos_event"
+        "on_update": [
+            "tems.tems_operations.handlers.publish_sos_event",
+            "tems.tems_safety.hotspots.on_incident_change"
+        ],
+        "on_trash": "tems.tems_safety.hotspots.on_incident_change"
     },
     # Finance
-    "Cost And Revenue Ledger": {"on_update": "tems.tems_finance.handlers.recalculate_vehicle_profitability"},
+    "Cost And Revenue Ledger": {
+        "after_insert": "tems.tems_finance.cost_anomaly.on_ledger_insert",
+        "on_update": "tems.tems_finance.handlers.recalculate_vehicle_profitability"
+    },
     # Safety
     "Journey Plan": {
         "validate": "tems.tems_safety.api.journey_plan.validate_driver_competence",
-        "after_insert": "tems.tems_safety.api.journey_plan.after_insert"
+        "after_insert": "tems.tems_safety.api.journey_plan.after_insert",
+        "on_update": "tems.tems_people.driver_view.invalidate_for_doc",
+        "on_trash": "tems.tems_people.driver_view.invalidate_for_doc"
     },
     "Incident Report": {
         "after_insert": "tems.tems_safety.api.incident_report.after_insert",
-        "on_submit": "tems.tems_safety.handlers.log_incident_against_vehicle"
+        "on_update": "tems.tems_safety.hotspots.on_incident_change",
+        "on_submit": "tems.tems_safety.handlers.log_incident_against_vehicle",
+        "on_trash": "tems.tems_safety.hotspots.on_incident_change"
     },
     "Risk Assessment": {"before_submit": "tems.tems_safety.handlers.validate_vehicle_risk"},
     # People
-    "Employee": {"on_update": "tems.tems_people.handlers.check_driver_vehicle_assignment"},
+    "Employee": {
+        "on_update": [
+            "tems.tems_people.handlers.check_driver_vehicle_assignment",
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.journey_risk.on_doc_change"
+        ]
+    },
+    "Driver Qualification": {
+        "on_update": "tems.tems_people.driver_view.invalidate_for_doc",
+        "on_submit": "tems.tems_people.driver_view.invalidate_for_doc",
+        "on_cancel": "tems.tems_people.driver_view.invalidate_for_doc"
+    },
+    # AI
+    "AI Insight Log": {
+        "after_insert": [
+            "tems.tems_ai.services.model_metrics.on_insight_insert",
+            "tems.tems_ai.integrations.webhooks.send_insight_webhook"
+        ],
+        "on_update": "tems.tems_ai.services.model_metrics.on_insight_update"
+    },
+    # Driver app launch view
+    "Safety Incident": {
+        "on_update": [
+            "tems.tems_people.driver_view.invalidate_for_doc",
+            "tems.tems_safety.hotspots.on_incident_change",
+            "tems.tems_safety.journey_risk.on_doc_change"
+        ],
+        "on_submit": "tems.tems_people.driver_view.invalidate_for_doc",
+        "on_cancel": ["tems.tems_safety.hotspots.on_incident_change", "tems.tems_safety.journey_risk.on_doc_change"],
+        "on_trash": ["tems.tems_safety.hotspots.on_incident_change", "tems.tems_safety.journey_risk.on_doc_change"]
+    },
+    "Communication": {"on_update": "tems.tems_people.driver_view.invalidate_for_doc"},
+    "Notification Log": {
+        "on_update": "tems.tems_people.driver_view.invalidate_for_doc",
+        "on_trash": "tems.tems_people.driver_view.invalidate_for_doc"
+    },
     # Supply Chain
     "Procurement Order": {"on_submit": "tems.tems_supply_chain.handlers.link_spare_parts_to_asset"},
     # Trade
@@ -250,8 +352,8 @@ doc_events = {
     # Governance
     "Policy": {"on_update": "tems.tems_governance.handlers.apply_policy_to_vehicle"},
     "Spot Check": {
-        "on_update": "tems.tems_governance.handlers.on_spot_check",
-        "on_submit": "tems.tems_governance.handlers.on_spot_check"
+        "on_update": ["tems.tems_governance.handlers.on_spot_check", "tems.tems_people.driver_view.invalidate_for_doc"],
+        "on_submit": ["tems.tems_governance.handlers.on_spot_check", "tems.tems_people.driver_view.invalidate_for_doc"]
     },
     "Compliance Audit": {
         "on_update": "tems.tems_governance.handlers.on_compliance_audit",
@@ -284,19 +386,17 @@ doc_events = {
 
 scheduler_events = {
     "all": [
-        "tems.tems_operations.tasks.sync_vehicle_status",
-        "tems.tems_fleet.tasks.sync_asset_costs",
-        "tems.tems_finance.tasks.update_vehicle_profitability"
+        "tems.tems_finance.tasks.update_vehicle_profitability",
+        "tems.tems_insights.tasks.refresh_kpi_cache"
     ],
 	"daily": [
-		"tems.tems_operations.tasks.daily_sync_checkpoint",
     	"tems.tems_finance.tasks.daily_interest_compute",
     	"tems.tems_governance.api.notify_upcoming_reviews_and_obligations",
 		"tems.tems_governance.tasks.notify_overdue_investigations",
 		"tems.tems_safety.tasks.aggregate_emissions_daily",
+		"tems.tems_safety.tasks.scan_driver_fatigue",
+		"tems.tems_safety.tasks.refresh_incident_hotspots",
         "tems.tems_fleet.tasks.compute_predictive_maintenance",  # new stub daily predictive maintenance rollup
-        "tems.tems_operations.tasks.generate_daily_operations_report",
-        "tems.tems_operations.tasks.validate_driver_vehicle_assignments",
         "tems.tems_finance.tasks.update_fx_rates",
         "tems.tems_people.tasks.remind_expiring_driver_docs",
         "tems.tems_people.tasks.remind_expiring_medical_clearances",
@@ -310,28 +410,35 @@ scheduler_events = {
         "tems.tems_tyre.tasks.sync_tyre_costs_to_finance"
 	],
 	"cron": {
+		"* * * * *": [
+			"tems.tems_operations.tasks.check_route_deviations",  # Operations: batched route deviation check
+			"tems.tems_operations.tasks.drain_telematics_queue",  # Operations: telematics ingestion fallback drain
+			"tems.tems_ai.tasks.drain_alert_queue",  # AI: batched alert queue fallback drain
+			"tems.tems_ai.tasks.deliver_insight_webhooks"  # AI: webhook retries and fallback delivery
+		],
+		"30 2 * * *": ["tems.tems_operations.tasks.purge_telematics_pings"],
 		"0 1 * * *": ["tems.tasks.compute_nightly_jobs"],
+		"*/15 * * * *": ["tems.tems_insights.tasks.build_daily_facts"],  # Insights: incremental daily fact tables
+		"30 6 * * *": ["tems.tems_insights.tasks.deliver_report_subscriptions"],  # Insights: report subscription snapshots
 		"0 1 * * 1": ["tems.tems_ai.tasks.retrain_models_weekly"],  # AI: Monday 01:00 AM
 		"0 2 * * *": ["tems.tasks.update_tariffs", "tems.tems_ai.tasks.generate_daily_insights"],  # AI: 02:00 AM
 		"0 3 * * 1": ["tems.tasks.rotate_rosca"],
 		"0 3 * * 0": ["tems.tems_ai.tasks.cleanup_old_insights"],  # AI: Sunday 03:00 AM
 		"0 5 * * *": ["tems.tems_ai.tasks.calculate_driver_risk_scores"],  # AI: 05:00 AM
 		"0 6 * * *": ["tems.tems_ai.tasks.generate_fleet_maintenance_predictions"],  # AI: 06:00 AM
+		"15 6 * * *": ["tems.tems_ai.tasks.detect_fuel_anomalies"],  # AI: 06:15 AM
 		"0 7 * * *": ["tems.tems_ai.tasks.forecast_financial_metrics"],  # AI: 07:00 AM
         "0 8 * * *": ["tems.tems_ai.tasks.send_daily_ai_summary"], # AI: 08:00 AM
 	},
 	"hourly": [
 		"tems.tems_operations.tasks.hourly_sync_checkpoint",
-        "tems.tems_operations.tasks.check_vehicle_availability",
         "tems.tems_tyre.tasks.monitor_tyre_sensors",
         "tems.tems_ai.tasks.evaluate_alerts_hourly"  # AI: Hourly alert evaluation
 	],
 	"weekly": [
-		"tems.tems_operations.tasks.weekly_sync_checkpoint",
                 "tems.tems_tyre.tasks.analyze_fleet_tyre_performance" # Tyre: Weekly performance analysis
 	],
 	"monthly": [
-		"tems.tems_operations.tasks.monthly_sync_checkpoint",
 		"tems.tems_safety.tasks.aggregate_emissions_monthly",
         "tems.tems_tyre.tasks.cleanup_old_sensor_data" # Tyre: Monthly sensor data cleanup
 	],
@@ -377,13 +484,13 @@ scheduler_events = {
 
 # Request Events
 # ----------------
-# before_request = ["tems.utils.before_request"]
-# after_request = ["tems.utils.after_request"]
+before_request = ["tems.tems_main.instrumentation.before_request"]
+after_request = ["tems.tems_main.instrumentation.after_request"]
 
 # Job Events
 # ----------
-# before_job = ["tems.utils.before_job"]
-# after_job = ["tems.utils.after_job"]
+before_job = ["tems.tems_main.instrumentation.before_job"]
+after_job = ["tems.tems_main.instrumentation.after_job"]
 
 # User Data Protection
 # --------------------
@@ -0,0 +1,36 @@
+"""Install and migrate hooks.
+
+Tables kept outside DocTypes (fact tables, counters, queues) are created by
+their patches, but `bench install-app` marks every patch as done without
+running it. They are therefore also ensured after install and after every
+migrate; each `ensure_*` function is idempotent.
+"""
+from __future__ import annotations
+
+import frappe
+
+TABLE_SETUP = (
+    "tems.tems_insights.facts.ensure_fact_tables",
+    "tems.tems_operations.spatial.ensure_position_table",
+    "tems.tems_operations.telematics.ensure_ping_table",
+    "tems.tems_ai.services.model_metrics.ensure_metrics_table",
+    "tems.tems_fleet.fuel_efficiency.ensure_stats_table",
+    "tems.tems_finance.cost_anomaly.ensure_stats_table",
+    "tems.tems_safety.hours_of_service.ensure_tables",
+    "tems.tems_safety.hotspots.ensure_tables",
+    "tems.tems_safety.journey_risk.ensure_table",
+    "tems.tems_ai.integrations.webhooks.ensure_table",
+)
+
+
+def ensure_tables() -> None:
+    for method in TABLE_SETUP:
+        frappe.get_attr(method)()
+
+
+def after_install():
+    ensure_tables()
+
+
+def after_migrate():
+    ensure_tables()
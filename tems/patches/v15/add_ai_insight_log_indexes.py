@@ -0,0 +1,12 @@
+import frappe
+
+from tems.tems_ai.services.insight_store import INDEXES
+
+
+def execute():
+    # Composite indexes for the alert / recent-insight / archival access paths
+    for fields, index_name in INDEXES:
+        try:
+            frappe.db.add_index("AI Insight Log", fields, index_name=index_name)
+        except Exception:
+            pass
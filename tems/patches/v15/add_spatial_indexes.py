@@ -0,0 +1,18 @@
+import frappe
+
+from tems.tems_operations.spatial import ensure_position_table, rebuild_positions
+
+
+def execute():
+    # Geohash prefix scans on located doctypes and the latest-position table
+    ensure_position_table()
+    for doctype, index_name in (
+        ("Movement Log", "idx_ml_geohash"),
+        ("SOS Event", "idx_sos_geohash"),
+        ("Fuel Log", "idx_fl_geohash"),
+    ):
+        try:
+            frappe.db.add_index(doctype, ["geohash"], index_name=index_name)
+        except Exception:
+            pass
+    rebuild_positions()
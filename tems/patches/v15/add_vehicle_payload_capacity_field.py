@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_field
+
+
+def execute():
+    # Capacity constraint for the route optimizer (Cargo Consignment weights)
+    if frappe.db.exists("Custom Field", {"dt": "Vehicle", "fieldname": "payload_capacity_kg"}):
+        return
+    create_custom_field(
+        "Vehicle",
+        {
+            "fieldname": "payload_capacity_kg",
+            "label": "Payload Capacity (kg)",
+            "fieldtype": "Float",
+            "insert_after": "vehicle_type",
+            "depends_on": "eval:doc.vehicle_type=='Cargo'",
+        },
+    )
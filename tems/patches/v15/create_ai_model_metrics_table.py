@@ -0,0 +1,4 @@
+def execute():
+    from tems.tems_ai.services.model_metrics import rebuild
+
+    rebuild()
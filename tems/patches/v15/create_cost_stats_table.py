@@ -0,0 +1,5 @@
+def execute():
+    from tems.tems_finance.cost_anomaly import rebuild
+
+    # Creates the table and backfills the rolling cost windows from ledger history
+    rebuild()
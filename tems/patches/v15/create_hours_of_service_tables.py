@@ -0,0 +1,5 @@
+def execute():
+    from tems.tems_safety.hours_of_service import rebuild
+
+    # Creates the duty timeline tables and replays the last week of source documents
+    rebuild()
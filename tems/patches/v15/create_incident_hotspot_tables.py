@@ -0,0 +1,5 @@
+def execute():
+    from tems.tems_safety.hotspots import rebuild
+
+    # Creates the point/cell/route tables and backfills them from existing incidents and SOS events
+    rebuild()
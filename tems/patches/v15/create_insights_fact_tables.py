@@ -0,0 +1,19 @@
+import frappe
+
+
+def execute():
+    from tems.tems_insights.facts import ensure_fact_tables
+
+    ensure_fact_tables()
+
+    # Day-range scans used by the fact builder
+    for doctype, columns, index_name in (
+        ("Movement Log", ["event_time", "vehicle"], "idx_ml_event_time_vehicle"),
+        ("Fuel Log", ["date", "vehicle"], "idx_fl_date_vehicle"),
+        ("Cost And Revenue Ledger", ["date", "vehicle"], "idx_crl_date_vehicle"),
+        ("Incident Report", ["incident_date", "vehicle"], "idx_ir_incident_date_vehicle"),
+    ):
+        try:
+            frappe.db.add_index(doctype, columns, index_name=index_name)
+        except Exception:
+            pass
@@ -0,0 +1,5 @@
+def execute():
+    from tems.tems_safety.journey_risk import refresh_all
+
+    # Creates the table and precomputes the driver, vehicle and route risk components
+    refresh_all()
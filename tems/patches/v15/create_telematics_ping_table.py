@@ -0,0 +1,4 @@
+def execute():
+    from tems.tems_operations.telematics import ensure_ping_table
+
+    ensure_ping_table()
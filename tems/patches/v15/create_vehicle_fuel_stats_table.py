@@ -0,0 +1,5 @@
+def execute():
+    from tems.tems_fleet.fuel_efficiency import rebuild
+
+    # Creates the table and backfills the rolling baselines from Fuel Log history
+    rebuild()
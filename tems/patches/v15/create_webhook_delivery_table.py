@@ -0,0 +1,4 @@
+def execute():
+    from tems.tems_ai.integrations.webhooks import ensure_table
+
+    ensure_table()
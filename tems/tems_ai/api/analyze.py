@@ -8,6 +8,7 @@ import frappe
 from typing import Dict, Optional, List
 from tems.tems_ai.services.insights_engine import get_recent_insights, get_insight_summary
 from tems.tems_ai.services.alert_engine import get_active_alerts
+from tems.tems_ai.services.insight_store import window_start
 from tems.tems_ai.utils.metrics import evaluate_model_performance, track_model_drift
 
 
@@ -121,19 +122,20 @@ def get_alerts(domain: Optional[str] = None, limit: int = 20) -> Dict:
 
 
 @frappe.whitelist()
-def model_performance(model_name: str, limit: int = 100) -> Dict:
+def model_performance(model_name: str, window_days: int = 30, limit: Optional[int] = None) -> Dict:
     """
     Get performance metrics for a specific AI model.
     
     Args:
         model_name: Name of the model
-        limit: Number of predictions to analyze
+        window_days: Number of days to analyze
+        limit: Deprecated; metrics are kept per day, not per prediction
     
     Returns:
         Performance metrics
     """
     try:
-        metrics = evaluate_model_performance(model_name, limit)
+        metrics = evaluate_model_performance(model_name, int(window_days))
         
         return {
             "success": True,
@@ -238,10 +240,10 @@ def _analyze_trends(domain: str, days: int) -> Dict:
             COUNT(*) as count
         FROM `tabAI Insight Log`
         WHERE domain = %s
-        AND DATE(creation) >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        AND creation >= %s
         GROUP BY DATE(creation), insight_type
         ORDER BY date
-    """, (domain, days), as_dict=True)
+    """, (domain, window_start(days)), as_dict=True)
     
     return {
         "domain": domain,
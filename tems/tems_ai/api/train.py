@@ -9,36 +9,37 @@ from typing import Dict, Optional
 
 
 @frappe.whitelist()
-def run(model_name: str, training_data: Optional[Dict] = None) -> Dict:
+def run(model_name: str, training_data: Optional[Dict] = None, force: int = 0) -> Dict:
     """
     Trigger model training or retraining.
     
     Args:
         model_name: Name of the model to train
-        training_data: Optional training dataset
+        training_data: Ignored; training sets are extracted from TEMS doctypes
+        force: Promote the new version even if it scores below the active one
     
     Returns:
         Training job status
     
     Note:
-        This is a stub for future implementation.
-        In production, this would trigger background training jobs.
+        Training runs in a background worker (long queue); poll
+        get_training_status for the outcome.
     """
     try:
-        # Validate model exists
+        from tems.tems_ai.services.training import queue_training, training_set_for
+
         model = frappe.get_doc("AI Model Registry", model_name)
+        model.check_permission("write")
+        training_set_for(model.as_dict())
         
-        if not model:
-            frappe.throw(f"Model '{model_name}' not found")
-        
-        # In production, trigger background training job
-        # For now, return success stub
+        job_id = queue_training(model.name, force=bool(int(force or 0)))
         
         return {
             "success": True,
             "model": model_name,
+            "job_id": job_id,
             "status": "training_queued",
-            "message": "Training job has been queued. This is a stub implementation."
+            "message": "Training job has been queued."
         }
     
     except Exception as e:
@@ -106,7 +107,10 @@ def get_training_status(model_name: str) -> Dict:
                 "auto_retrain": model.get("auto_retrain", 0),
                 "retrain_frequency": model.get("retrain_frequency"),
                 "last_trained": model.get("last_trained_date"),
-                "training_status": "idle"  # Stub
+                "training_status": (model.get("training_status") or "idle").lower(),
+                "active_version": model.get("active_version"),
+                "metrics": frappe.parse_json(model.get("training_metrics") or "{}"),
+                "error": model.get("training_error")
             }
         }
     
@@ -13,73 +13,55 @@ def predict_vehicle_profitability(vehicle: str, forecast_days: int = 30) -> Dict
     """
     Predict vehicle profitability using AI.
     
+    Uses the nightly fleet forecast when it covers the horizon, otherwise fits
+    the vehicle's series on the fly (see services.forecasting).
+    
     Args:
         vehicle: Vehicle ID
         forecast_days: Number of days to forecast
     
     Returns:
-        Profitability forecast
+        Profitability forecast with 95% prediction intervals
     """
-    # Get historical cost and revenue data
-    ledger = frappe.get_all(
-        "Cost And Revenue Ledger",
-        filters={"vehicle": vehicle},
-        fields=["cost_amount", "revenue_amount", "transaction_date"],
-        order_by="transaction_date desc",
-        limit=90
-    )
+    from tems.tems_ai.services.forecasting import forecast_vehicle_finance, get_cached_forecast
+
+    payload = get_cached_forecast("vehicle_finance", vehicle, forecast_days)
+    if not payload:
+        payload = forecast_vehicle_finance([vehicle], horizon=forecast_days).get(vehicle)
     
-    if not ledger:
+    if not payload:
         return {
             "vehicle": vehicle,
             "message": "Insufficient financial data",
             "forecast": []
         }
     
-    # Calculate daily averages
-    total_cost = sum(e.get("cost_amount", 0) for e in ledger)
-    total_revenue = sum(e.get("revenue_amount", 0) for e in ledger)
-    days_count = len(set(e.get("transaction_date") for e in ledger if e.get("transaction_date")))
-    
-    avg_daily_cost = total_cost / days_count if days_count > 0 else 0
-    avg_daily_revenue = total_revenue / days_count if days_count > 0 else 0
-    avg_daily_profit = avg_daily_revenue - avg_daily_cost
-    
-    # Generate forecast
-    forecast = []
-    for day in range(forecast_days):
-        forecast_date = datetime.now().date() + timedelta(days=day)
-        # Simple projection with slight variation
-        predicted_revenue = avg_daily_revenue * (1 + (day % 7) * 0.05)
-        predicted_cost = avg_daily_cost * (1 + (day % 5) * 0.03)
-        predicted_profit = predicted_revenue - predicted_cost
-        
-        forecast.append({
-            "date": forecast_date.isoformat(),
-            "predicted_revenue": round(predicted_revenue, 2),
-            "predicted_cost": round(predicted_cost, 2),
-            "predicted_profit": round(predicted_profit, 2),
-            "confidence": 0.75
-        })
-    
-    # Calculate cumulative forecast
-    cumulative_profit = sum(f["predicted_profit"] for f in forecast)
+    revenue, cost, profit = payload["revenue"], payload["cost"], payload["profit"]
+    forecast = [
+        {
+            "date": revenue["dates"][day],
+            "predicted_revenue": revenue["mean"][day],
+            "predicted_cost": cost["mean"][day],
+            "predicted_profit": profit["mean"][day],
+            "profit_lower": profit["lower"][day],
+            "profit_upper": profit["upper"][day],
+        }
+        for day in range(forecast_days)
+    ]
+    total_profit = sum(f["predicted_profit"] for f in forecast)
     
     return {
         "vehicle": vehicle,
         "forecast_period_days": forecast_days,
-        "historical_avg": {
-            "daily_revenue": round(avg_daily_revenue, 2),
-            "daily_cost": round(avg_daily_cost, 2),
-            "daily_profit": round(avg_daily_profit, 2)
-        },
+        "historical_avg": payload["historical_avg"],
         "forecast_summary": {
             "total_predicted_revenue": round(sum(f["predicted_revenue"] for f in forecast), 2),
             "total_predicted_cost": round(sum(f["predicted_cost"] for f in forecast), 2),
-            "total_predicted_profit": round(cumulative_profit, 2)
+            "total_predicted_profit": round(total_profit, 2)
         },
         "daily_forecast": forecast[:7],  # Show first 7 days in detail
-        "profitability_trend": "positive" if avg_daily_profit > 0 else "negative"
+        "interval_level": 0.95,
+        "profitability_trend": "positive" if total_profit > 0 else "negative"
     }
 
 
@@ -87,46 +69,36 @@ def detect_cost_anomaly(vehicle: str, cost_amount: float, cost_type: str) -> Dic
     """
     Detect anomalies in vehicle costs.
     
+    Scores against the rolling median/MAD window of the (vehicle, cost type)
+    pair (one row lookup); ledger inserts are scored by
+    `cost_anomaly.on_ledger_insert`.
+    
     Args:
         vehicle: Vehicle ID
         cost_amount: Cost amount to check
-        cost_type: Type of cost (fuel, maintenance, etc.)
+        cost_type: Type of cost (ledger reference doctype, e.g. Fuel Log)
     
     Returns:
         Anomaly detection result
     """
-    # Get historical costs of this type
-    historical_costs = frappe.db.sql("""
-        SELECT AVG(cost_amount) as avg_cost, STDDEV(cost_amount) as std_cost
-        FROM `tabCost And Revenue Ledger`
-        WHERE vehicle = %s
-        AND cost_type = %s
-        AND transaction_date >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-    """, (vehicle, cost_type), as_dict=True)
-    
-    if not historical_costs or not historical_costs[0].get("avg_cost"):
+    from tems.tems_finance import cost_anomaly
+    
+    stats = cost_anomaly.get_stats(vehicle, cost_type or cost_anomaly.DEFAULT_COST_TYPE)
+    result = cost_anomaly.assess(cost_anomaly.unpack(stats.get("ring") if stats else None), cost_amount)
+    
+    if result["z_score"] is None:
         return {
             "anomaly": False,
-            "reason": "Insufficient historical data"
+            "reason": result["reason"]
         }
     
-    avg_cost = float(historical_costs[0].get("avg_cost", 0))
-    std_cost = float(historical_costs[0].get("std_cost", 1))
-    
-    # Calculate z-score
-    z_score = abs((cost_amount - avg_cost) / std_cost) if std_cost > 0 else 0
-    
-    is_anomaly = z_score > 2.5
-    
     return {
         "vehicle": vehicle,
         "cost_type": cost_type,
-        "anomaly": is_anomaly,
-        "z_score": round(z_score, 2),
         "current_cost": cost_amount,
-        "average_cost": round(avg_cost, 2),
-        "severity": "high" if z_score > 3 else "medium" if z_score > 2 else "low",
-        "recommendation": "Investigate unusual cost" if is_anomaly else "Cost within normal range"
+        "average_cost": round(stats["mean"], 2),
+        **result,
+        "recommendation": "Investigate unusual cost" if result["anomaly"] else "Cost within normal range"
     }
 
 
@@ -191,62 +163,38 @@ def forecast_cash_flow(days: int = 30) -> Dict:
         days: Number of days to forecast
     
     Returns:
-        Cash flow forecast
+        Cash flow forecast with 95% prediction intervals for the daily net
     """
-    # Get recent financial data
-    recent_ledger = frappe.db.sql("""
-        SELECT 
-            DATE(transaction_date) as date,
-            SUM(cost_amount) as daily_cost,
-            SUM(revenue_amount) as daily_revenue
-        FROM `tabCost And Revenue Ledger`
-        WHERE transaction_date >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-        GROUP BY DATE(transaction_date)
-        ORDER BY date
-    """, as_dict=True)
-    
-    if not recent_ledger:
+    from tems.tems_ai.services.forecasting import forecast_cash_flow_series, get_cached_forecast
+
+    payload = get_cached_forecast("cash_flow", "all", days) or forecast_cash_flow_series(horizon=days)
+    
+    if not payload:
         return {
             "message": "Insufficient financial data",
             "forecast": []
         }
     
-    # Calculate averages
-    avg_daily_revenue = sum(r.get("daily_revenue", 0) for r in recent_ledger) / len(recent_ledger)
-    avg_daily_cost = sum(r.get("daily_cost", 0) for r in recent_ledger) / len(recent_ledger)
-    
-    # Generate forecast
+    revenue, cost, net = payload["revenue"], payload["cost"], payload["net"]
     forecast = []
     cumulative_cash = 0
     
     for day in range(days):
-        forecast_date = datetime.now().date() + timedelta(days=day)
-        
-        # Apply weekly patterns (weekends typically lower)
-        day_of_week = forecast_date.weekday()
-        weekend_factor = 0.7 if day_of_week >= 5 else 1.0
-        
-        predicted_revenue = avg_daily_revenue * weekend_factor
-        predicted_cost = avg_daily_cost * weekend_factor
-        predicted_net = predicted_revenue - predicted_cost
-        cumulative_cash += predicted_net
-        
+        cumulative_cash += net["mean"][day]
         forecast.append({
-            "date": forecast_date.isoformat(),
-            "predicted_revenue": round(predicted_revenue, 2),
-            "predicted_cost": round(predicted_cost, 2),
-            "predicted_net_cash": round(predicted_net, 2),
+            "date": net["dates"][day],
+            "predicted_revenue": revenue["mean"][day],
+            "predicted_cost": cost["mean"][day],
+            "predicted_net_cash": net["mean"][day],
+            "net_cash_lower": net["lower"][day],
+            "net_cash_upper": net["upper"][day],
             "cumulative_cash": round(cumulative_cash, 2)
         })
     
     return {
         "forecast_period_days": days,
         "starting_date": datetime.now().date().isoformat(),
-        "historical_avg": {
-            "daily_revenue": round(avg_daily_revenue, 2),
-            "daily_cost": round(avg_daily_cost, 2),
-            "daily_net": round(avg_daily_revenue - avg_daily_cost, 2)
-        },
+        "historical_avg": payload["historical_avg"],
         "forecast_summary": {
             "total_revenue": round(sum(f["predicted_revenue"] for f in forecast), 2),
             "total_cost": round(sum(f["predicted_cost"] for f in forecast), 2),
@@ -254,6 +202,7 @@ def forecast_cash_flow(days: int = 30) -> Dict:
             "ending_cumulative": round(cumulative_cash, 2)
         },
         "daily_forecast": forecast[:7],  # First 7 days detail
+        "interval_level": 0.95,
         "cash_flow_trend": "positive" if cumulative_cash > 0 else "negative"
     }
 
@@ -335,6 +284,11 @@ def identify_cost_savings_opportunities(vehicle: Optional[str] = None) -> Dict:
     if route_opportunity:
         opportunities.append(route_opportunity)
     
+    # Review cost spikes flagged on ledger insert
+    spike_opportunity = _analyze_cost_spikes(vehicle)
+    if spike_opportunity:
+        opportunities.append(spike_opportunity)
+    
     # Calculate total potential savings
     total_savings = sum(o.get("estimated_annual_savings", 0) for o in opportunities)
     
@@ -358,6 +312,26 @@ def _analyze_fuel_efficiency(vehicle: Optional[str]) -> Optional[Dict]:
     }
 
 
+def _analyze_cost_spikes(vehicle: Optional[str]) -> Optional[Dict]:
+    """Recoverable excess of the last 90 days' cost spikes, from the streaming cost stats."""
+    from tems.tems_finance.cost_anomaly import recent_anomalies
+    
+    spikes = recent_anomalies(since=frappe.utils.add_days(None, -90), vehicle=vehicle)
+    if not spikes:
+        return None
+    
+    excess = sum(max(s.get("excess") or 0, 0) for s in spikes)
+    return {
+        "category": "Cost Spike Review",
+        "description": f"Review {len(spikes)} anomalous cost entries "
+                       f"(e.g. {spikes[0]['cost_type']} on {spikes[0]['vehicle']}: {spikes[0]['last_entry']})",
+        "estimated_annual_savings": round(excess, 2),
+        "implementation_cost": 0,
+        "difficulty": "low",
+        "entries": spikes
+    }
+
+
 def _analyze_maintenance_timing(vehicle: Optional[str]) -> Optional[Dict]:
     """Analyze maintenance timing for savings opportunities."""
     return {
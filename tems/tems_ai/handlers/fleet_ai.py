@@ -52,43 +52,51 @@ def detect_fuel_anomaly(vehicle: str, fuel_consumption: float) -> Dict:
     """
     Detect anomalies in fuel consumption for a vehicle.
     
+    Scores against the vehicle's rolling L/100km baseline (one row lookup);
+    Fuel Logs are scored on insert by `fuel_efficiency.on_fuel_log_insert`.
+    
     Args:
         vehicle: Vehicle ID
-        fuel_consumption: Current fuel consumption rate
+        fuel_consumption: Current fuel consumption rate (L/100km)
     
     Returns:
         Anomaly detection result
     """
-    # Get historical fuel data
-    fuel_logs = frappe.db.sql("""
-        SELECT AVG(fuel_consumption) as avg_fuel, 
-               STDDEV(fuel_consumption) as std_fuel
-        FROM `tabVehicle Fuel Log`
-        WHERE vehicle = %s
-        AND creation >= DATE_SUB(NOW(), INTERVAL 90 DAY)
-    """, (vehicle,), as_dict=True)
-    
-    if not fuel_logs or not fuel_logs[0].get("avg_fuel"):
-        return {"anomaly": False, "reason": "Insufficient historical data"}
+    from tems.tems_fleet import fuel_efficiency
     
-    avg_fuel = fuel_logs[0].get("avg_fuel", 0)
-    std_fuel = fuel_logs[0].get("std_fuel", 0)
-    
-    # Calculate z-score
-    z_score = abs((fuel_consumption - avg_fuel) / std_fuel) if std_fuel > 0 else 0
+    stats = fuel_efficiency.get_stats(vehicle)
+    z_score = fuel_efficiency.score(stats, fuel_consumption)
+    if z_score is None:
+        return {"anomaly": False, "reason": "Insufficient historical data"}
     
-    is_anomaly = z_score > 2.5  # More than 2.5 standard deviations
+    is_anomaly = abs(z_score) > fuel_efficiency.Z_THRESHOLD
     
     return {
         "anomaly": is_anomaly,
-        "z_score": z_score,
+        "z_score": round(z_score, 2),
         "current_consumption": fuel_consumption,
-        "average_consumption": avg_fuel,
-        "severity": "high" if z_score > 3 else "medium" if z_score > 2 else "low",
+        "average_consumption": round(stats["mean"], 2),
+        "samples": stats["samples"],
+        "severity": fuel_efficiency.severity(z_score),
         "recommendation": "Inspect vehicle for fuel system issues" if is_anomaly else "Normal operation"
     }
 
 
+def detect_fleet_fuel_anomalies(since: Optional[str] = None) -> Dict:
+    """
+    Fleet-wide fuel anomaly scan (latest fill-ups and per-type outlier vehicles).
+    
+    Args:
+        since: Only report fill-up anomalies logged on or after this date
+    
+    Returns:
+        {"entries": [...], "outliers": [...]}
+    """
+    from tems.tems_fleet.fuel_efficiency import fleet_sweep
+    
+    return fleet_sweep(since)
+
+
 def calculate_vehicle_health_score(vehicle: str) -> Dict:
     """
     Calculate overall health score for a vehicle using AI.
@@ -66,7 +66,7 @@ def predict_trip_eta(trip: str) -> Dict:
 
 def optimize_route(origin: str, destination: str, waypoints: Optional[List[str]] = None) -> Dict:
     """
-    AI-powered route optimization.
+    Route optimization over local coordinates (no external map service).
     
     Args:
         origin: Starting location
@@ -76,27 +76,32 @@ def optimize_route(origin: str, destination: str, waypoints: Optional[List[str]]
     Returns:
         Optimized route recommendations
     """
-    # Stub implementation - would integrate with mapping API
-    # For now, return simple recommendations
-    
+    from tems.tems_operations.route_optimizer import plan_routes
+    from tems.tems_safety.hotspots import point_risk
+
     waypoints = waypoints or []
+    plan = plan_routes(origin, destination=destination, stops=waypoints)
+    best = plan["routes"][0] if plan["routes"] else {"stops": [], "distance_km": 0, "duration_minutes": 0}
+    points = [plan["origin_point"], *((s["lat"], s["lng"]) for s in best["stops"]), plan["destination_point"]]
+    # 100 = no detour over the direct road estimate; fewer recent incidents along the stops = safer
+    detour = best["distance_km"] / plan["direct_distance_km"] if plan["direct_distance_km"] else 1.0
     
     return {
         "origin": origin,
         "destination": destination,
         "waypoints": waypoints,
         "recommended_route": {
-            "path": [origin] + waypoints + [destination],
-            "estimated_distance_km": 100,  # Stub
-            "estimated_duration_minutes": 120,  # Stub
-            "fuel_efficiency_score": 85,
-            "safety_score": 90
+            "path": [origin] + [s["name"] for s in best["stops"]] + [destination],
+            "estimated_distance_km": best["distance_km"],
+            "estimated_duration_minutes": best["duration_minutes"],
+            "fuel_efficiency_score": round(100 / max(detour, 1.0), 1),
+            "safety_score": round(100 / (1 + point_risk(points)), 1),
         },
+        "unassigned": [s.get("name") for s in plan["unassigned"] + plan["unlocated"]],
         "alternative_routes": [],
         "optimization_factors": [
-            "Shortest distance",
-            "Fewer stops",
-            "Better road conditions"
+            "Shortest estimated road distance",
+            "Stop time windows"
         ]
     }
 
@@ -107,25 +112,52 @@ def detect_route_deviation(trip: str, current_location: Dict) -> Dict:
     
     Args:
         trip: Trip Allocation ID
-        current_location: Current GPS coordinates
+        current_location: Current GPS coordinates ({"lat": ..., "lng": ...})
     
     Returns:
         Deviation detection result
     """
+    from tems.tems_operations.route_geometry import SEVERE_FACTOR, corridor_km, get_geometry
+
     trip_doc = frappe.get_doc("Trip Allocation", trip)
-    planned_route = trip_doc.get("route")
-    
-    # Get route waypoints (stub - would use actual GPS data)
-    # For now, return simple deviation check
-    
+    planned_route = frappe.db.get_value("Journey Plan", trip_doc.journey_plan, "route") if trip_doc.journey_plan else None
+    geometry = get_geometry(planned_route)
+    lat = current_location.get("lat", current_location.get("latitude"))
+    lng = current_location.get("lng", current_location.get("longitude"))
+
+    if not geometry or lat is None or lng is None:
+        return {
+            "trip": trip,
+            "deviation_detected": False,
+            "deviation_distance_km": None,
+            "current_location": current_location,
+            "planned_route": planned_route,
+            "alert_level": "unknown",
+            "recommendation": "No located route geometry or position to compare against"
+        }
+
+    distance, along = geometry.distances([float(lat)], [float(lng)])
+    distance_km = round(float(distance[0]), 3)
+    corridor = corridor_km()
+    deviated = distance_km > corridor
+    if not deviated:
+        alert_level, recommendation = "none", "Vehicle is on planned route"
+    elif distance_km >= SEVERE_FACTOR * corridor:
+        alert_level, recommendation = "high", "Contact the driver and confirm the diversion"
+    else:
+        alert_level, recommendation = "medium", "Monitor the vehicle; it is outside the route corridor"
+
     return {
         "trip": trip,
-        "deviation_detected": False,  # Stub
-        "deviation_distance_km": 0,
+        "deviation_detected": deviated,
+        "deviation_distance_km": distance_km,
+        "progress_km": round(float(along[0]), 3),
+        "route_length_km": round(geometry.length_km, 3),
+        "corridor_km": corridor,
         "current_location": current_location,
         "planned_route": planned_route,
-        "alert_level": "none",
-        "recommendation": "Vehicle is on planned route"
+        "alert_level": alert_level,
+        "recommendation": recommendation
     }
 
 
@@ -133,49 +165,45 @@ def predict_vehicle_demand(region: str, date_range: Optional[int] = 7) -> Dict:
     """
     Predict vehicle demand for a region.
     
+    Regions are route start locations; a route-name prefix also matches.
+    
     Args:
         region: Region/area name
         date_range: Number of days to forecast
     
     Returns:
-        Demand forecast
+        Demand forecast with 95% prediction intervals
     """
-    # Get historical trip data for the region
-    historical_trips = frappe.db.sql("""
-        SELECT DATE(creation) as trip_date, COUNT(*) as trip_count
-        FROM `tabTrip Allocation`
-        WHERE route LIKE %s
-        AND DATE(creation) >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-        GROUP BY DATE(creation)
-    """, (f"%{region}%",), as_dict=True)
-    
-    if not historical_trips:
+    from tems.tems_ai.services.forecasting import forecast_demand, get_cached_forecast
+
+    date_range = date_range or 7
+    payload = get_cached_forecast("demand", region, date_range)
+    if not payload:
+        payload = forecast_demand(region, horizon=date_range).get(region)
+    
+    if not payload:
         return {
             "region": region,
             "forecast": [],
             "message": "Insufficient historical data"
         }
     
-    # Calculate average daily demand
-    avg_demand = sum(t.get("trip_count", 0) for t in historical_trips) / len(historical_trips)
-    
-    # Generate forecast (simple trend projection)
-    forecast = []
-    for day in range(date_range):
-        forecast_date = datetime.now().date() + timedelta(days=day)
-        # Add some variation (stub - real implementation would use time series models)
-        predicted_demand = int(avg_demand * (0.9 + (day % 3) * 0.1))
-        
-        forecast.append({
-            "date": forecast_date.isoformat(),
-            "predicted_demand": predicted_demand,
-            "confidence": 0.75
-        })
+    demand = payload["demand"]
+    forecast = [
+        {
+            "date": demand["dates"][day],
+            "predicted_demand": int(round(demand["mean"][day])),
+            "lower": demand["lower"][day],
+            "upper": demand["upper"][day],
+        }
+        for day in range(date_range)
+    ]
     
     return {
         "region": region,
         "date_range_days": date_range,
-        "historical_avg_daily_demand": round(avg_demand, 1),
+        "historical_avg_daily_demand": payload["historical_avg_daily_demand"],
+        "interval_level": 0.95,
         "forecast": forecast
     }
 
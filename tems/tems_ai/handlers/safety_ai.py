@@ -19,110 +19,83 @@ def predict_driver_risk_score(driver: str) -> Dict:
     Returns:
         Risk score (0-100) with breakdown
     """
-    # Get driver's incident history
-    incidents = frappe.get_all(
-        "Incident Report",
-        filters={"driver": driver},
-        fields=["severity", "incident_type", "creation"],
-        order_by="creation desc",
-        limit=50
-    )
-    
-    # Count incidents by severity
-    high_severity = sum(1 for i in incidents if i.get("severity") == "High")
-    medium_severity = sum(1 for i in incidents if i.get("severity") == "Medium")
-    low_severity = sum(1 for i in incidents if i.get("severity") == "Low")
-    
-    # Recent incidents (last 90 days) carry more weight
-    recent_incidents = [i for i in incidents 
-                       if (datetime.now() - i.get("creation")).days <= 90]
-    
-    # Calculate risk components
-    incident_risk = min(100, len(incidents) * 5)  # 5 points per incident
-    severity_risk = (high_severity * 20 + medium_severity * 10 + low_severity * 5)
-    recency_risk = len(recent_incidents) * 10  # Recent incidents are more concerning
+    return predict_driver_risk_scores([driver])[driver]
+
+
+def predict_driver_risk_scores(drivers: List[str]) -> Dict[str, Dict]:
+    """
+    Risk scores for several drivers from the precomputed driver components
+    (see tems_safety.journey_risk), in one lookup.
     
-    # Overall risk score (0-100, higher is worse)
-    total_risk = min(100, incident_risk * 0.4 + severity_risk * 0.4 + recency_risk * 0.2)
+    Args:
+        drivers: Employee/Driver IDs
     
-    # Convert to safety score (higher is better)
-    safety_score = 100 - total_risk
+    Returns:
+        Risk score (0-100) with breakdown, by driver
+    """
+    from tems.tems_safety.journey_risk import lookup
     
+    components = lookup({"driver": set(drivers)})["driver"]
     return {
-        "driver": driver,
-        "risk_score": round(total_risk, 1),
-        "safety_score": round(safety_score, 1),
-        "risk_level": _risk_level(total_risk),
-        "breakdown": {
-            "total_incidents": len(incidents),
-            "recent_incidents": len(recent_incidents),
-            "high_severity": high_severity,
-            "medium_severity": medium_severity,
-            "low_severity": low_severity
-        },
-        "recommendation": _get_driver_recommendation(total_risk)
+        driver: {
+            "driver": driver,
+            "risk_score": components[driver]["score"],
+            "safety_score": round(100 - components[driver]["score"], 1),
+            "risk_level": _risk_level(components[driver]["score"]),
+            "breakdown": components[driver]["detail"],
+            "recommendation": _get_driver_recommendation(components[driver]["score"])
+        }
+        for driver in drivers
+        if driver
     }
 
 
-def predict_journey_risk(journey_plan: str) -> Dict:
+def predict_journey_risk(journey_plan) -> Dict:
     """
     Predict risk level for a planned journey.
     
+    Driver, vehicle and route risk are precomputed components (see
+    tems_safety.journey_risk), so this is one lookup plus weighting.
+    
     Args:
-        journey_plan: Journey Plan ID
+        journey_plan: Journey Plan ID or document
     
     Returns:
         Journey risk assessment
     """
-    journey = frappe.get_doc("Journey Plan", journey_plan)
-    
-    driver = journey.get("driver")
-    route = journey.get("route")
-    vehicle = journey.get("vehicle")
-    
-    # Get driver risk score
-    driver_risk = 0
-    if driver:
-        driver_score = predict_driver_risk_score(driver)
-        driver_risk = driver_score.get("risk_score", 0)
-    
-    # Get vehicle risk (based on maintenance status)
-    vehicle_risk = 0
-    if vehicle:
-        recent_maintenance = frappe.db.count(
-            "Maintenance Work Order",
-            filters={
-                "vehicle": vehicle,
-                "status": ["in", ["Pending", "In Progress"]]
-            }
-        )
-        vehicle_risk = min(50, recent_maintenance * 15)
-    
-    # Route risk (based on historical incidents on this route)
-    route_risk = 0
-    if route:
-        route_incidents = frappe.db.count(
-            "Incident Report",
-            filters={"route": route}
-        )
-        route_risk = min(40, route_incidents * 10)
-    
-    # Weather risk (stub - would integrate with weather API)
-    weather_risk = 10  # Default low risk
-    
-    # Calculate overall journey risk
-    total_risk = (driver_risk * 0.4 + vehicle_risk * 0.3 + 
-                  route_risk * 0.2 + weather_risk * 0.1)
+    from tems.tems_safety.journey_risk import assess_plan
+    
+    return _journey_result(assess_plan(journey_plan))
+
+
+def predict_journey_risks(date: Optional[str] = None, update: bool = True) -> List[Dict]:
+    """
+    Risk assessments for every Journey Plan starting on a day, scored in one batch.
+    
+    Args:
+        date: Day to score (default: today)
+        update: Write changed risk scores back to the plans
+    
+    Returns:
+        Journey risk assessments in start time order
+    """
+    from tems.tems_safety.journey_risk import assess_day
     
+    return [_journey_result(result) for result in assess_day(date, update=update)]
+
+
+def _journey_result(assessment: Dict) -> Dict:
+    total_risk = assessment["total"]
+    components = assessment["components"]
     return {
-        "journey_plan": journey_plan,
+        "journey_plan": assessment["journey_plan"],
         "overall_risk_score": round(total_risk, 1),
         "risk_level": _risk_level(total_risk),
         "risk_components": {
-            "driver_risk": round(driver_risk, 1),
-            "vehicle_risk": round(vehicle_risk, 1),
-            "route_risk": round(route_risk, 1),
-            "weather_risk": round(weather_risk, 1)
+            "driver_risk": round(components["driver"], 1),
+            "vehicle_risk": round(components["vehicle"], 1),
+            "route_risk": round(components["route"], 1),
+            "weather_risk": round(components["weather"], 1)
         },
         "recommendation": _get_journey_recommendation(total_risk),
         "approval_recommended": total_risk < 50
@@ -133,6 +106,10 @@ def detect_fatigue_patterns(driver: str, period_days: int = 30) -> Dict:
     """
     Detect driver fatigue patterns using AI.
     
+    Replays the driver's duty timeline (see tems_safety.hours_of_service) at the
+    end of each day of the period, so totals are actual driving time rather
+    than planned trip durations.
+    
     Args:
         driver: Driver ID
         period_days: Analysis period in days
@@ -140,33 +117,34 @@ def detect_fatigue_patterns(driver: str, period_days: int = 30) -> Dict:
     Returns:
         Fatigue analysis
     """
-    # Get driver's trip history
-    trips = frappe.db.sql("""
-        SELECT 
-            DATE(creation) as trip_date,
-            COUNT(*) as trip_count,
-            SUM(estimated_duration) as total_duration
-        FROM `tabTrip Allocation`
-        WHERE driver = %s
-        AND DATE(creation) >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        GROUP BY DATE(creation)
-        ORDER BY trip_date
-    """, (driver, period_days), as_dict=True)
-    
-    if not trips:
+    from tems.tems_safety import hours_of_service as hos
+    
+    now = frappe.utils.now_datetime()
+    start = now - timedelta(days=period_days)
+    intervals = hos.load_intervals(driver, start - hos.WEEK, now)
+    
+    if not intervals:
         return {
             "driver": driver,
             "fatigue_detected": False,
             "message": "Insufficient trip data"
         }
     
-    # Analyze patterns
-    high_volume_days = sum(1 for t in trips if t.get("trip_count", 0) > 5)
-    long_duration_days = sum(1 for t in trips if t.get("total_duration", 0) > 480)  # > 8 hours
+    # Evaluate the timeline at the end of each day, and now
+    first_midnight = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+    days = [
+        hos.evaluate(intervals, at=min(first_midnight + timedelta(days=d), now), now=now)
+        for d in range(period_days)
+    ]
+    current = hos.evaluate(intervals, at=now, now=now)
+    
+    long_driving_days = sum(1 for d in days if any(v["rule"] == "daily_driving" for v in d["violations"]))
+    short_rest_days = sum(1 for d in days if any(v["rule"] == "daily_rest" for v in d["violations"]))
+    continuous_days = sum(1 for d in days if any(v["rule"] == "continuous_driving" for v in d["violations"]))
     
     # Calculate fatigue risk
-    fatigue_risk = (high_volume_days * 5 + long_duration_days * 10)
-    fatigue_detected = fatigue_risk > 30
+    fatigue_risk = long_driving_days * 10 + short_rest_days * 10 + continuous_days * 5
+    fatigue_detected = fatigue_risk > 30 or current["status"] == "violation"
     
     return {
         "driver": driver,
@@ -174,74 +152,58 @@ def detect_fatigue_patterns(driver: str, period_days: int = 30) -> Dict:
         "fatigue_risk_score": min(100, fatigue_risk),
         "fatigue_detected": fatigue_detected,
         "patterns": {
-            "high_volume_days": high_volume_days,
-            "long_duration_days": long_duration_days,
-            "total_trips": len(trips)
+            "long_driving_days": long_driving_days,
+            "short_rest_days": short_rest_days,
+            "continuous_driving_days": continuous_days,
+            "avg_daily_driving_minutes": round(sum(d["driving_24h"] for d in days) / max(len(days), 1), 1)
         },
+        "current": current,
         "recommendation": "Mandatory rest period recommended" if fatigue_detected else "Normal work pattern"
     }
 
 
 def predict_incident_hotspots(region: Optional[str] = None) -> Dict:
     """
-    Predict incident hotspots using historical data.
+    Predict incident hotspots from the precomputed hotspot surface.
+    
+    Clusters come from the cached grid-DBSCAN snapshot of time-decayed
+    incident density (see tems_safety.hotspots), so this does not touch the
+    incident tables.
     
     Args:
-        region: Optional region filter
+        region: Optional geohash prefix limiting the clusters returned
     
     Returns:
         Hotspot analysis
     """
-    filters = {}
-    if region:
-        filters["region"] = region
+    from tems.tems_safety import hotspots as surface
     
-    # Get incident locations
-    incidents = frappe.get_all(
-        "Incident Report",
-        filters=filters,
-        fields=["route", "location", "severity"],
-        limit=200
-    )
-    
-    # Count incidents by route
-    route_incidents = {}
-    for incident in incidents:
-        route = incident.get("route", "Unknown")
-        if route not in route_incidents:
-            route_incidents[route] = {
-                "count": 0,
-                "high_severity": 0
-            }
-        
-        route_incidents[route]["count"] += 1
-        if incident.get("severity") == "High":
-            route_incidents[route]["high_severity"] += 1
-    
-    # Identify hotspots (routes with > average incidents)
-    avg_incidents = sum(r["count"] for r in route_incidents.values()) / len(route_incidents) if route_incidents else 0
+    snapshot = surface.get_snapshot()
+    clusters = snapshot["hotspots"]
+    if region:
+        clusters = [c for c in clusters if any(cell.startswith(region) for cell in c["cells"])]
     
     hotspots = []
-    for route, data in route_incidents.items():
-        if data["count"] > avg_incidents:
-            risk_score = (data["count"] * 10 + data["high_severity"] * 20)
-            hotspots.append({
-                "route": route,
-                "incident_count": data["count"],
-                "high_severity_count": data["high_severity"],
-                "risk_score": min(100, risk_score),
-                "risk_level": _risk_level(risk_score)
-            })
-    
-    # Sort by risk score
-    hotspots.sort(key=lambda x: x["risk_score"], reverse=True)
+    for cluster in clusters[:10]:
+        risk_score = min(100, cluster["risk"] * 10)
+        hotspots.append({
+            "lat": cluster["lat"],
+            "lng": cluster["lng"],
+            "cells": cluster["cells"],
+            "incident_count": cluster["incidents"],
+            "last_incident": cluster["last_incident"],
+            "decayed_risk": cluster["risk"],
+            "risk_score": round(risk_score, 1),
+            "risk_level": _risk_level(risk_score)
+        })
     
     return {
         "region": region or "All Regions",
-        "total_incidents": len(incidents),
-        "total_routes_analyzed": len(route_incidents),
-        "hotspot_count": len(hotspots),
-        "hotspots": hotspots[:10],  # Top 10 hotspots
+        "computed_at": snapshot["computed_at"],
+        "total_incidents": sum(c["incidents"] for c in clusters),
+        "hotspot_count": len(clusters),
+        "hotspots": hotspots,  # Top 10 hotspots
+        "high_risk_routes": [] if region else surface.top_routes(),
         "recommendations": [
             "Increase monitoring on high-risk routes",
             "Implement additional safety measures",
@@ -1,22 +1,122 @@
+"""
+AI Insight Webhooks
+===================
+Outbound delivery of AI insights to the webhook configured in TEMS Settings
+(``ai_webhook_url`` / ``ai_webhook_secret``; site config ``tems_ai_webhook_url``
+and ``tems_ai_webhook_secret`` take precedence).
+
+Creating an insight only inserts a row into ``tems_webhook_delivery`` inside
+the same transaction, so a rolled-back insight is never sent. After commit a
+deduplicated job sends every due delivery. The every-minute scheduler drain
+picks up retries and anything a worker missed.
+
+- Batching: receivers that accept arrays (``ai_webhook_batch_size`` > 1) get
+  up to that many insights per POST as ``{"event": "ai_insights_generated",
+  "items": [...]}``. Other receivers get one ``ai_insight_generated`` event
+  per POST, as before.
+- Connections: one pooled keep-alive `requests.Session` per worker process.
+- Claiming: due rows are locked with ``for update skip locked`` and marked
+  "sending" (until CLAIM_SECONDS from now) before the POST, so two runners
+  never send the same row. A claim left by a crashed worker expires and the
+  row becomes due again.
+- Retries: a failed POST is retried after RETRY_BASE_SECONDS * 2^(attempt-1)
+  (capped at RETRY_MAX_SECONDS, with jitter). Deliveries are dead-lettered
+  (status "dead") after MAX_ATTEMPTS, or at once on a non-retryable 4xx. A
+  batch rejected with a non-retryable 4xx is split and its items are sent one
+  by one first, so one bad item (or an oversized body) does not dead-letter
+  the rest. `requeue_dead` puts dead deliveries back in the queue.
+- Signing: each body is signed with HMAC-SHA256 of the secret
+  (``X-Webhook-Signature``), and ``X-Webhook-Delivery`` carries the delivery
+  ids so receivers can drop duplicates.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import random
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
 
 import frappe
 import requests
+from frappe.utils import add_days, now_datetime
+from requests.adapters import HTTPAdapter
 
-def send_insight_webhook(insight_doc):
-    """
-    Send AI insight to external webhook.
-    Called after insight is created.
-    """
-    # Get webhook settings
-    webhook_url = frappe.db.get_single_value("TEMS Settings", "ai_webhook_url")
-    webhook_secret = frappe.db.get_single_value("TEMS Settings", "ai_webhook_secret")
-    
-    if not webhook_url:
-        return
-    
-    # Prepare payload
-    payload = {
+DELIVERY_TABLE = "tems_webhook_delivery"
+DELIVER_JOB_ID = "tems-ai-webhook-deliver"
+DELIVER_LOCK = "ai_webhook_deliver"
+
+TIMEOUT = (3.05, 10)
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 3600
+MAX_BATCH_SIZE = 100
+MAX_BATCHES_PER_RUN = 50
+# A claimed row is due again after this long (worst case: one batch split into single POSTs)
+CLAIM_SECONDS = int((MAX_BATCH_SIZE + 1) * sum(TIMEOUT)) + 60
+# Covers a full run of timed-out POSTs, so the lock never expires under a live runner
+DELIVER_LOCK_TTL = int(MAX_BATCHES_PER_RUN * sum(TIMEOUT)) + 60
+DELIVERED_RETENTION_DAYS = 14
+# Client errors worth retrying; any other 4xx is dead-lettered at once
+RETRYABLE_4XX = (408, 409, 425, 429)
+
+_session: Optional[requests.Session] = None
+
+
+def ensure_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{DELIVERY_TABLE}` (
+            id bigint unsigned not null auto_increment primary key,
+            insight varchar(140) not null,
+            payload longtext not null,
+            status varchar(16) not null default 'queued',
+            attempts int not null default 0,
+            next_attempt_at datetime(6) not null,
+            last_status_code int,
+            last_error text,
+            created_at datetime(6) not null,
+            delivered_at datetime(6),
+            index idx_status_due (status, next_attempt_at),
+            index idx_created (created_at)
+        ) engine=InnoDB
+        """
+    )
+
+
+def get_settings() -> Dict:
+    """Webhook settings from site config, then the cached TEMS Settings doc."""
+    from tems.tems_main.api.drive_integration import get_tems_settings
+
+    settings = get_tems_settings()
+    conf = frappe.conf
+    batch_size = conf.get("tems_ai_webhook_batch_size") or getattr(settings, "ai_webhook_batch_size", None)
+    return {
+        "url": conf.get("tems_ai_webhook_url") or getattr(settings, "ai_webhook_url", None),
+        "secret": conf.get("tems_ai_webhook_secret") or getattr(settings, "ai_webhook_secret", None),
+        "batch_size": max(1, min(int(batch_size or 1), MAX_BATCH_SIZE)),
+    }
+
+
+def get_session() -> requests.Session:
+    """Per-process session with a keep-alive connection pool (no transport-level retries)."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Content-Type": "application/json", "User-Agent": "TEMS-AI-Webhook"})
+        _session = session
+    return _session
+
+
+def build_payload(insight_doc) -> Dict:
+    return {
         "event": "ai_insight_generated",
+        "insight": insight_doc.name,
         "timestamp": insight_doc.creation.isoformat(),
         "data": {
             "domain": insight_doc.domain,
@@ -26,23 +126,203 @@ def send_insight_webhook(insight_doc):
             "model": insight_doc.model_used
         }
     }
-    
-    # Send webhook
+
+
+def send_insight_webhook(insight_doc, method=None):
+    """
+    Queue an AI insight for webhook delivery (AI Insight Log after_insert).
+
+    Only a delivery row is written here; the POST happens in a background job
+    after the transaction commits. A failure to queue is logged and never
+    fails the insight insert.
+    """
+    if not get_settings()["url"]:
+        return
+    now = now_datetime()
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "X-Webhook-Secret": webhook_secret
-        }
-        
-        response = requests.post(
-            webhook_url,
-            json=payload,
-            headers=headers,
-            timeout=10
+        frappe.db.sql(
+            f"""
+            insert into `{DELIVERY_TABLE}` (insight, payload, status, next_attempt_at, created_at)
+            values (%s, %s, 'queued', %s, %s)
+            """,
+            (insight_doc.name, json.dumps(build_payload(insight_doc), default=str), now, now),
         )
-        
-        response.raise_for_status()
-        frappe.logger().info(f"Webhook sent successfully for {insight_doc.name}")
-        
-    except Exception as e:
-        frappe.log_error(f"Webhook failed: {str(e)}", "AI Webhook")
\ No newline at end of file
+        frappe.enqueue(
+            "tems.tems_ai.integrations.webhooks.deliver_pending",
+            queue="short",
+            job_id=DELIVER_JOB_ID,
+            deduplicate=True,
+            enqueue_after_commit=True,
+        )
+    except Exception:
+        frappe.log_error(title=f"AI insight webhook not queued: {insight_doc.name}")
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before the next attempt after `attempts` failures, with +-20% jitter."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (max(attempts, 1) - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def is_retryable(status_code: Optional[int]) -> bool:
+    """Connection errors, timeouts, 5xx and throttling are retried; other 4xx are final."""
+    return status_code is None or status_code >= 500 or status_code in RETRYABLE_4XX
+
+
+def batch_body(payloads: List[Dict], batch_size: int) -> Dict:
+    if batch_size == 1:
+        return payloads[0]
+    return {"event": "ai_insights_generated", "count": len(payloads), "items": payloads}
+
+
+def _post(settings: Dict, ids: List[int], body: Dict) -> Tuple[Optional[int], Optional[str]]:
+    """POST one body; returns the HTTP status (None without a response) and an error message or None."""
+    data = json.dumps(body, default=str, separators=(",", ":")).encode()
+    headers = {"X-Webhook-Delivery": ",".join(str(i) for i in ids)}
+    if settings["secret"]:
+        headers["X-Webhook-Secret"] = settings["secret"]
+        signature = hmac.new(settings["secret"].encode(), data, hashlib.sha256).hexdigest()
+        headers["X-Webhook-Signature"] = f"sha256={signature}"
+    try:
+        response = get_session().post(settings["url"], data=data, headers=headers, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        return None, str(e)[:1000]
+    if response.ok:
+        return response.status_code, None
+    return response.status_code, f"HTTP {response.status_code}: {response.text[:500]}"
+
+
+def _claim(limit: int) -> List[Dict]:
+    """Lock up to `limit` due rows, mark them "sending" and commit, so no other runner picks them up."""
+    now = now_datetime()
+    rows = frappe.db.sql(
+        f"""
+        select id, payload, attempts from `{DELIVERY_TABLE}`
+        where status in ('queued', 'retry', 'sending') and next_attempt_at <= %s
+        order by next_attempt_at, id
+        limit {int(limit)}
+        for update skip locked
+        """,
+        (now,),
+        as_dict=True,
+    )
+    if rows:
+        frappe.db.sql(
+            f"update `{DELIVERY_TABLE}` set status = 'sending', next_attempt_at = %s where id in %s",
+            (now + timedelta(seconds=CLAIM_SECONDS), tuple(row.id for row in rows)),
+        )
+    frappe.db.commit()
+    return rows
+
+
+def _mark(rows: List[Dict], status_code: Optional[int], error: Optional[str]) -> str:
+    now = now_datetime()
+    ids = tuple(row.id for row in rows)
+    if error is None:
+        frappe.db.sql(
+            f"""
+            update `{DELIVERY_TABLE}`
+            set status = 'delivered', attempts = attempts + 1, last_status_code = %s, last_error = null,
+                delivered_at = %s
+            where id in %s
+            """,
+            (status_code, now, ids),
+        )
+        return "delivered"
+    attempts = max(row.attempts for row in rows) + 1
+    final = attempts >= MAX_ATTEMPTS or not is_retryable(status_code)
+    frappe.db.sql(
+        f"""
+        update `{DELIVERY_TABLE}`
+        set status = %s, attempts = attempts + 1, last_status_code = %s, last_error = %s,
+            next_attempt_at = %s
+        where id in %s
+        """,
+        (
+            "dead" if final else "retry",
+            status_code,
+            error,
+            now + timedelta(seconds=0 if final else backoff_seconds(attempts)),
+            ids,
+        ),
+    )
+    return "dead" if final else "retry"
+
+
+def _send(settings: Dict, rows: List[Dict], batch_size: int, outcome: Dict) -> Optional[str]:
+    """POST `rows` and record the outcome; returns the error if the receiver looks unavailable."""
+    body = batch_body([json.loads(row.payload) for row in rows], batch_size)
+    status_code, error = _post(settings, [row.id for row in rows], body)
+    if error and len(rows) > 1 and not is_retryable(status_code):
+        # Rejected batch: find the item(s) at fault instead of dead-lettering all of them
+        for row in rows:
+            error = _send(settings, [row], batch_size, outcome)
+            if error:
+                # Unsent rows keep their claim and become due when it expires
+                return error
+        return None
+    outcome[_mark(rows, status_code, error)] += len(rows)
+    return error if is_retryable(status_code) else None
+
+
+def deliver_pending(max_batches: int = MAX_BATCHES_PER_RUN) -> Dict:
+    """
+    Send due deliveries in batches (single consumer; retries are scheduled, never slept on).
+
+    Returns:
+        Count of deliveries per outcome
+    """
+    from tems.tems_main.scheduler import acquire_lock, release_lock
+
+    token = acquire_lock(DELIVER_LOCK, DELIVER_LOCK_TTL)
+    if not token:
+        return {}
+    outcome = {"delivered": 0, "retry": 0, "dead": 0}
+    try:
+        settings = get_settings()
+        if not settings["url"]:
+            return outcome
+        size = settings["batch_size"]
+        for _ in range(max_batches):
+            rows = _claim(size)
+            if not rows:
+                break
+            error = _send(settings, rows, size, outcome)
+            frappe.db.commit()
+            if error:
+                # The receiver is failing; leave the rest for the next run
+                frappe.log_error(f"Webhook delivery failed: {error}", "AI Webhook")
+                break
+    finally:
+        release_lock(DELIVER_LOCK, token)
+    return outcome
+
+
+def requeue_dead(ids: Optional[List[int]] = None) -> int:
+    """Move dead-lettered deliveries (all, or `ids`) back into the queue."""
+    condition = "and id in %(ids)s" if ids else ""
+    frappe.db.sql(
+        f"""
+        update `{DELIVERY_TABLE}`
+        set status = 'queued', attempts = 0, next_attempt_at = %(now)s
+        where status = 'dead' {condition}
+        """,
+        {"now": now_datetime(), "ids": tuple(ids or ())},
+    )
+    count = frappe.db.sql("select row_count()")[0][0]
+    frappe.db.commit()
+    return count
+
+
+def purge_delivered(days: int = DELIVERED_RETENTION_DAYS) -> None:
+    frappe.db.sql(
+        f"delete from `{DELIVERY_TABLE}` where status = 'delivered' and created_at < %s",
+        (add_days(now_datetime(), -int(days)),),
+    )
+
+
+def delivery_stats() -> Dict:
+    rows = frappe.db.sql(
+        f"select status, count(*), min(next_attempt_at) from `{DELIVERY_TABLE}` group by status"
+    )
+    return {status: {"count": count, "next_attempt_at": due} for status, count, due in rows}
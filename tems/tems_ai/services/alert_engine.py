@@ -2,12 +2,26 @@
 Alert Engine
 ============
 Manages AI-generated alerts and notifications.
+
+`trigger_alert` records and notifies one alert synchronously. Hot paths (doc
+event hooks that score every insert) use `queue_alert` instead: alerts are
+buffered per transaction, pushed onto a Redis list only after commit, and
+`drain_alert_queue` (a deduplicated short-queue job, with a per-minute
+scheduler fallback) inserts them in batches with one commit and one digest
+notification per domain. Batches are claimed through tems_main.work_queue and
+only leave Redis once their inserts are committed.
 """
 
 import frappe
 from typing import Dict, List, Optional
 from datetime import datetime
 
+ALERT_QUEUE_KEY = "tems:ai_alert_queue"
+ALERT_DRAIN_JOB_ID = "tems-ai-alert-drain"
+ALERT_DRAIN_LOCK = "tems.ai_alert.drain"
+MAX_QUEUED_ALERT_BATCHES = 5000
+MAX_DIGEST_LINES = 20
+
 
 def trigger_alert(
     domain: str,
@@ -55,6 +69,121 @@ def trigger_alert(
     return alert_doc.name
 
 
+def queue_alert(
+    domain: str,
+    alert_type: str,
+    severity: str,
+    message: str,
+    details: Optional[Dict] = None,
+    value: Optional[float] = None
+) -> None:
+    """
+    Queue an alert for batched recording once the current transaction commits.
+    
+    Args:
+        domain: TEMS domain
+        alert_type: Type of alert (maintenance, risk, anomaly, etc.)
+        severity: high, medium, low
+        message: Alert message
+        details: Additional details
+        value: Optional numeric value stored as the alert value
+    """
+    buffer = getattr(frappe.local, "tems_alert_buffer", None)
+    if buffer is None:
+        buffer = frappe.local.tems_alert_buffer = []
+        frappe.db.after_commit.add(_push_queued_alerts)
+        frappe.db.after_rollback.add(_discard_queued_alerts)
+    buffer.append({
+        "domain": domain,
+        "alert_type": alert_type,
+        "severity": severity,
+        "message": message,
+        "details": details or {},
+        "value": value,
+        "timestamp": str(datetime.now())
+    })
+
+
+def _discard_queued_alerts():
+    frappe.local.tems_alert_buffer = None
+
+
+def _push_queued_alerts():
+    buffer = getattr(frappe.local, "tems_alert_buffer", None)
+    frappe.local.tems_alert_buffer = None
+    if not buffer:
+        return
+    cache = frappe.cache()
+    cache.lpush(ALERT_QUEUE_KEY, frappe.as_json(buffer))
+    cache.ltrim(ALERT_QUEUE_KEY, 0, MAX_QUEUED_ALERT_BATCHES - 1)
+    frappe.enqueue(
+        "tems.tems_ai.services.alert_engine.drain_alert_queue",
+        queue="short",
+        job_id=ALERT_DRAIN_JOB_ID,
+        deduplicate=True
+    )
+
+
+def drain_alert_queue(max_alerts: int = 500) -> int:
+    """
+    Record queued alerts in batches of up to `max_alerts` (single consumer).
+    
+    Returns:
+        Number of alerts recorded
+    """
+    from tems.tems_main import work_queue
+    from tems.tems_main.scheduler import acquire_lock, release_lock
+    
+    token = acquire_lock(ALERT_DRAIN_LOCK, 300)
+    if not token:
+        return 0
+    
+    recorded = 0
+    try:
+        while True:
+            # Claimed batches stay in Redis until the inserts are committed
+            alerts = work_queue.claim(ALERT_QUEUE_KEY, max_alerts)
+            if not alerts:
+                break
+            
+            by_domain = {}
+            try:
+                for alert in alerts:
+                    alert_doc = frappe.get_doc({
+                        "doctype": "AI Insight Log",
+                        "domain": alert["domain"],
+                        "insight_type": alert["alert_type"],
+                        "prediction_value": alert["severity"],
+                        "details": frappe.as_json(alert["details"]),
+                        "status": "Alert",
+                        "alert_message": alert["message"],
+                        "alert_value": alert.get("value"),
+                        "timestamp": alert["timestamp"]
+                    })
+                    alert_doc.insert(ignore_permissions=True)
+                    by_domain.setdefault(alert["domain"], []).append(alert)
+                frappe.db.commit()
+            except Exception:
+                frappe.db.rollback()
+                work_queue.fail(ALERT_QUEUE_KEY)
+                raise
+            work_queue.ack(ALERT_QUEUE_KEY)
+            recorded += len(alerts)
+            
+            # One digest per domain instead of one notification per alert
+            for domain, domain_alerts in by_domain.items():
+                lines = [f"[{a['severity']}] {a['message']}" for a in domain_alerts[:MAX_DIGEST_LINES]]
+                if len(domain_alerts) > MAX_DIGEST_LINES:
+                    lines.append(f"... and {len(domain_alerts) - MAX_DIGEST_LINES} more")
+                _send_notifications_by_role(
+                    domain, f"{len(domain_alerts)} {domain} alert(s)", "<br>".join(lines)
+                )
+    finally:
+        release_lock(ALERT_DRAIN_LOCK, token)
+    
+    return recorded
+
+
 def _send_notifications(alert_id: str, message: str, recipients: List[str]):
     """Send notification to specific users."""
     for user in recipients:
@@ -149,7 +278,7 @@ def evaluate_insights_for_alerts():
             "status": "Generated",
             "creation": [">=", frappe.utils.add_days(None, -1)]
         },
-        fields=["*"]
+        fields=["name", "domain", "insight_type", "confidence_score", "prediction_value"]
     )
     
     for insight in insights:
@@ -230,16 +359,6 @@ def get_active_alerts(domain: Optional[str] = None, limit: int = 20) -> List[Dic
     Returns:
         List of alert records
     """
-    filters = {"status": "Alert"}
-    if domain:
-        filters["domain"] = domain
-    
-    alerts = frappe.get_all(
-        "AI Insight Log",
-        filters=filters,
-        fields=["*"],
-        order_by="creation desc",
-        limit=limit
-    )
-    
-    return alerts
+    from tems.tems_ai.services.insight_store import active_alerts
+
+    return active_alerts(domain, limit)
@@ -0,0 +1,357 @@
+"""
+Forecasting Engine
+==================
+Vectorized multi-series forecasting for finance and operations.
+
+Daily series for every entity (vehicle, region) are loaded as one 2-D NumPy
+matrix (series x days) and fitted together with additive Holt-Winters
+exponential smoothing (ETS(A,Ad,A): damped trend, weekly season). Smoothing
+parameters are chosen per series from a small grid by one-step-ahead SSE;
+every grid combination runs in the same pass over the time axis, so the cost
+is one loop over days regardless of how many series are fitted.
+
+Forecasts carry prediction intervals from the ETS(A,Ad,A) h-step variance
+(Hyndman et al., "Forecasting with Exponential Smoothing", class 1 models).
+
+`run_nightly_forecasts` covers the whole fleet in one run and caches the
+results in Redis, where the finance/operations AI handlers read them.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import frappe
+import numpy as np
+from frappe.utils import add_days, getdate, now_datetime
+
+SEASON = 7
+PHI = 0.95
+HISTORY_DAYS = 180
+HORIZON_DAYS = 30
+CACHE_PREFIX = "tems:forecast"
+CACHE_TTL = 2 * 24 * 3600
+
+ALPHAS = (0.05, 0.15, 0.3, 0.5)
+BETAS = (0.0, 0.02)
+GAMMAS = (0.0, 0.1, 0.25)
+
+# Two-sided normal quantiles for the supported interval levels
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.96, 0.99: 2.5758}
+
+
+class FittedSeries:
+    """Final ETS states and parameters for n series fitted on T days."""
+
+    def __init__(self, level, trend, season, alpha, beta, gamma, sigma, n_days: int, period: int):
+        self.level = level
+        self.trend = trend
+        self.season = season
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.sigma = sigma
+        self.n_days = n_days
+        self.period = period
+
+    def forecast(self, horizon: int, level: float = 0.95, floor: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Point forecasts and prediction intervals for the next `horizon` days.
+
+        Returns:
+            (mean, lower, upper), each of shape (n, horizon)
+        """
+        steps = np.arange(1, horizon + 1)
+        # Cumulative damping: phi + phi^2 + ... + phi^h
+        damp = PHI * (1 - PHI**steps) / (1 - PHI)
+        season_idx = (self.n_days + steps - 1) % self.period
+        mean = self.level[:, None] + damp[None, :] * self.trend[:, None] + self.season[:, season_idx]
+
+        # Var(h) = sigma^2 * (1 + sum_{j<h} c_j^2), c_j = alpha(1 + beta*damp_j) + gamma*[j % m == 0]
+        c = self.alpha[:, None] * (1 + self.beta[:, None] * damp[None, :-1])
+        if self.period > 1:
+            c = c + self.gamma[:, None] * (steps[None, :-1] % self.period == 0)
+        spread = np.concatenate([np.zeros((len(self.level), 1)), np.cumsum(c**2, axis=1)], axis=1)
+        half = Z_SCORES.get(level, 1.96) * self.sigma[:, None] * np.sqrt(1 + spread)
+        lower, upper = mean - half, mean + half
+        if floor is not None:
+            mean, lower, upper = np.maximum(mean, floor), np.maximum(lower, floor), np.maximum(upper, floor)
+        return mean, lower, upper
+
+
+def fit(Y: np.ndarray, period: int = SEASON) -> FittedSeries:
+    """
+    Fit additive damped Holt-Winters to every row of Y at once.
+
+    Args:
+        Y: (n, T) matrix of daily values, one series per row
+        period: Season length in days (falls back to no season when T < 2 * period)
+
+    Returns:
+        FittedSeries with the best grid parameters per series
+    """
+    Y = np.asarray(Y, dtype=float)
+    n, T = Y.shape
+    m = period if T >= 2 * period else 1
+    grid = np.array([(a, b, g if m > 1 else 0.0) for a in ALPHAS for b in BETAS for g in GAMMAS])
+    grid = np.unique(grid, axis=0)
+    k = len(grid)
+    alpha, beta, gamma = (grid[:, i][:, None] for i in range(3))
+
+    # Initial states from the first two seasons, broadcast over the k grid points
+    first = Y[:, :m].mean(axis=1)
+    level = np.tile(first, (k, 1))
+    trend = np.tile((Y[:, m : 2 * m].mean(axis=1) - first) / m if T >= 2 * m else np.zeros(n), (k, 1))
+    season = np.tile(Y[:, :m] - first[:, None], (k, 1, 1)) if m > 1 else np.zeros((k, n, 1))
+    sse = np.zeros((k, n))
+
+    for t in range(T):
+        s = t % m
+        error = Y[:, t][None, :] - (level + PHI * trend + season[:, :, s])
+        if t >= m:
+            sse += error**2
+        level = level + PHI * trend + alpha * error
+        trend = PHI * trend + beta * error
+        season[:, :, s] += gamma * error
+
+    best = np.argmin(sse, axis=0)
+    rows = np.arange(n)
+    dof = max(T - m - 3, 1)
+    return FittedSeries(
+        level=level[best, rows],
+        trend=trend[best, rows],
+        season=season[best, rows],
+        alpha=grid[best, 0],
+        beta=grid[best, 1],
+        gamma=grid[best, 2],
+        sigma=np.sqrt(sse[best, rows] / dof),
+        n_days=T,
+        period=m,
+    )
+
+
+def daily_matrix(rows: Iterable[Tuple], start, days: int, keys: Optional[List] = None) -> Tuple[List, np.ndarray]:
+    """
+    Pivot (key, date, value) rows into a (len(keys), days) matrix starting at `start`.
+
+    Args:
+        rows: Iterable of (key, date, value)
+        start: First day of the matrix
+        days: Number of columns
+        keys: Row order; defaults to the sorted distinct keys found in rows
+
+    Returns:
+        (keys, matrix); days without rows are 0
+    """
+    rows = list(rows)
+    start = getdate(start)
+    if keys is None:
+        keys = sorted({r[0] for r in rows}, key=lambda k: (k is None, k or ""))
+    index = {key: i for i, key in enumerate(keys)}
+    Y = np.zeros((len(keys), days))
+    picked = [(index[r[0]], (getdate(r[1]) - start).days, float(r[2] or 0)) for r in rows if r[0] in index and r[1]]
+    picked = [p for p in picked if 0 <= p[1] < days]
+    if picked:
+        i, j, v = (np.array(col) for col in zip(*picked, strict=True))
+        np.add.at(Y, (i.astype(int), j.astype(int)), v)
+    return keys, Y
+
+
+def _series_payload(dates: List[str], mean, lower, upper) -> Dict:
+    return {
+        "dates": dates,
+        "mean": np.round(mean, 2).tolist(),
+        "lower": np.round(lower, 2).tolist(),
+        "upper": np.round(upper, 2).tolist(),
+    }
+
+
+def _ledger_rows(start, vehicles: Optional[List[str]] = None) -> List[Tuple]:
+    condition = "and vehicle in %(vehicles)s" if vehicles else ""
+    return frappe.db.sql(
+        f"""
+        select vehicle, date,
+            sum(case when type = 'Revenue' then amount else 0 end) as revenue,
+            sum(case when type = 'Cost' then amount else 0 end) as cost
+        from `tabCost And Revenue Ledger`
+        where date >= %(start)s and date < %(today)s and docstatus < 2 {condition}
+        group by vehicle, date
+        """,
+        {"start": start, "today": getdate(), "vehicles": tuple(vehicles or ())},
+    )
+
+
+def forecast_vehicle_finance(
+    vehicles: Optional[List[str]] = None,
+    horizon: int = HORIZON_DAYS,
+    history_days: int = HISTORY_DAYS,
+    level: float = 0.95,
+) -> Dict[str, Dict]:
+    """
+    Revenue, cost and profit forecasts for every vehicle with ledger history.
+
+    Args:
+        vehicles: Restrict to these vehicles (default: all)
+        horizon: Days to forecast
+        history_days: Days of history to fit on
+        level: Prediction interval level
+
+    Returns:
+        {vehicle: {"revenue", "cost", "profit", "historical_avg"}}
+    """
+    start = add_days(getdate(), -history_days)
+    rows = [r for r in _ledger_rows(start, vehicles) if r[0]]
+    keys, revenue = daily_matrix(((r[0], r[1], r[2]) for r in rows), start, history_days)
+    _keys, cost = daily_matrix(((r[0], r[1], r[3]) for r in rows), start, history_days, keys=keys)
+    if not keys:
+        return {}
+
+    n = len(keys)
+    model = fit(np.vstack([revenue, cost, revenue - cost]))
+    mean, lower, upper = model.forecast(horizon, level)
+    # Revenue and cost cannot go negative; profit can
+    for values in (mean, lower, upper):
+        values[: 2 * n] = np.maximum(values[: 2 * n], 0)
+
+    dates = [str(add_days(getdate(), d)) for d in range(horizon)]
+    recent = slice(-min(history_days, 90), None)
+    result = {}
+    for i, vehicle in enumerate(keys):
+        rev_avg, cost_avg = revenue[i, recent].mean(), cost[i, recent].mean()
+        result[vehicle] = {
+            "revenue": _series_payload(dates, mean[i], lower[i], upper[i]),
+            "cost": _series_payload(dates, mean[n + i], lower[n + i], upper[n + i]),
+            "profit": _series_payload(dates, mean[2 * n + i], lower[2 * n + i], upper[2 * n + i]),
+            "historical_avg": {
+                "daily_revenue": round(float(rev_avg), 2),
+                "daily_cost": round(float(cost_avg), 2),
+                "daily_profit": round(float(rev_avg - cost_avg), 2),
+            },
+        }
+    return result
+
+
+def forecast_cash_flow_series(horizon: int = HORIZON_DAYS, history_days: int = HISTORY_DAYS, level: float = 0.95) -> Optional[Dict]:
+    """
+    Organisation-wide revenue, cost and net cash forecasts.
+
+    Returns:
+        {"revenue", "cost", "net", "historical_avg"} or None without history
+    """
+    start = add_days(getdate(), -history_days)
+    rows = _ledger_rows(start)
+    if not rows:
+        return None
+    _keys, revenue = daily_matrix((("all", r[1], r[2]) for r in rows), start, history_days, keys=["all"])
+    _keys, cost = daily_matrix((("all", r[1], r[3]) for r in rows), start, history_days, keys=["all"])
+    mean, lower, upper = fit(np.vstack([revenue, cost, revenue - cost])).forecast(horizon, level)
+    for values in (mean, lower, upper):
+        values[:2] = np.maximum(values[:2], 0)
+    dates = [str(add_days(getdate(), d)) for d in range(horizon)]
+    recent = slice(-min(history_days, 90), None)
+    rev_avg, cost_avg = float(revenue[0, recent].mean()), float(cost[0, recent].mean())
+    return {
+        "revenue": _series_payload(dates, mean[0], lower[0], upper[0]),
+        "cost": _series_payload(dates, mean[1], lower[1], upper[1]),
+        "net": _series_payload(dates, mean[2], lower[2], upper[2]),
+        "historical_avg": {
+            "daily_revenue": round(rev_avg, 2),
+            "daily_cost": round(cost_avg, 2),
+            "daily_net": round(rev_avg - cost_avg, 2),
+        },
+    }
+
+
+def _demand_rows(start, region: Optional[str] = None) -> List[Tuple]:
+    """(region, date, trips) from Trip Allocations; region is the route's start location."""
+    if region:
+        key, condition = "%(region)s", "and (rp.start_location = %(region)s or rp.name like %(prefix)s)"
+    else:
+        key, condition = "rp.start_location", "and rp.start_location is not null"
+    return frappe.db.sql(
+        f"""
+        select {key} as region, date(coalesce(ta.schedule_slot, ta.creation)) as day, count(*) as trips
+        from `tabTrip Allocation` ta
+        inner join `tabJourney Plan` jp on jp.name = ta.journey_plan
+        inner join `tabRoute Planning` rp on rp.name = jp.route
+        where coalesce(ta.schedule_slot, ta.creation) >= %(start)s
+            and coalesce(ta.schedule_slot, ta.creation) < %(today)s
+            and ta.status != 'Cancelled' {condition}
+        group by region, day
+        """,
+        {"start": start, "today": getdate(), "region": region, "prefix": f"{region}%"},
+    )
+
+
+def forecast_demand(
+    region: Optional[str] = None,
+    horizon: int = HORIZON_DAYS,
+    history_days: int = HISTORY_DAYS,
+    level: float = 0.95,
+) -> Dict[str, Dict]:
+    """
+    Daily trip demand forecasts per region (all regions by default).
+
+    Returns:
+        {region: {"demand", "historical_avg_daily_demand"}}
+    """
+    start = add_days(getdate(), -history_days)
+    keys, Y = daily_matrix(_demand_rows(start, region), start, history_days)
+    if not keys:
+        return {}
+    mean, lower, upper = fit(Y).forecast(horizon, level, floor=0.0)
+    dates = [str(add_days(getdate(), d)) for d in range(horizon)]
+    recent = slice(-min(history_days, 90), None)
+    return {
+        key: {
+            "demand": _series_payload(dates, mean[i], lower[i], upper[i]),
+            "historical_avg_daily_demand": round(float(Y[i, recent].mean()), 1),
+        }
+        for i, key in enumerate(keys)
+    }
+
+
+def _cache_key(kind: str) -> str:
+    return f"{CACHE_PREFIX}:{kind}"
+
+
+def _store(kind: str, series: Dict[str, Dict]) -> None:
+    cache = frappe.cache()
+    key = _cache_key(kind)
+    cache.delete_value(key)
+    for name, payload in series.items():
+        cache.hset(key, name, payload)
+    cache.expire(cache.make_key(key), CACHE_TTL)
+
+
+def get_cached_forecast(kind: str, name: str, horizon: int = 1) -> Optional[Dict]:
+    """
+    Cached nightly forecast for one series, or None when absent, too short or from another day.
+
+    Args:
+        kind: "vehicle_finance", "cash_flow" or "demand"
+        name: Series key (vehicle, region, or "all")
+        horizon: Minimum number of forecast days required
+    """
+    payload = frappe.cache().hget(_cache_key(kind), name)
+    if not payload or payload.get("generated_on") != str(getdate()):
+        return None
+    first = next(v for v in payload.values() if isinstance(v, dict) and "dates" in v)
+    return payload if len(first["dates"]) >= horizon else None
+
+
+def run_nightly_forecasts(horizon: int = HORIZON_DAYS) -> Dict[str, int]:
+    """
+    Fit and cache forecasts for the whole fleet, the organisation and every region.
+
+    Returns:
+        Number of series cached per kind
+    """
+    stamp = {"generated_on": str(getdate()), "generated_at": str(now_datetime())}
+    vehicles = {k: {**v, **stamp} for k, v in forecast_vehicle_finance(horizon=horizon).items()}
+    _store("vehicle_finance", vehicles)
+    cash = forecast_cash_flow_series(horizon=horizon)
+    _store("cash_flow", {"all": {**cash, **stamp}} if cash else {})
+    regions = {k: {**v, **stamp} for k, v in forecast_demand(horizon=horizon).items()}
+    _store("demand", regions)
+    return {"vehicle_finance": len(vehicles), "cash_flow": 1 if cash else 0, "demand": len(regions)}
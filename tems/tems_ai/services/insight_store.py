@@ -0,0 +1,158 @@
+"""
+Insight Store
+=============
+Access paths, archival and pruning for `AI Insight Log`.
+
+The log mixes insights, alerts (status "Alert") and predictions in one table,
+so every hot read gets its own composite index and an explicit column list
+(the JSON `details` / `context_data` blobs stay out of list reads):
+
+- active alerts:     (status, creation)           -> `get_active_alerts`
+- recent insights:   (domain, creation)           -> `get_recent_insights`
+- alert evaluation:  (status, creation)           -> "Generated" rows of the last day
+
+Rows older than the retention window are moved to cold storage by
+`archive_insights`: chunks of ARCHIVE_CHUNK rows are read in (creation, name)
+order through the creation index, appended as gzip members of JSON lines to
+one file per month (``private/ai_insight_archive/YYYY-MM.jsonl.gz``), and then
+deleted by primary key in the same chunk. Each chunk commits on its own, so
+locks stay short. Files are written before rows are deleted: after a crash a
+chunk can be archived twice but never lost. Active alerts are never archived.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import frappe
+from frappe.utils import add_days, getdate
+
+RETENTION_DAYS = 90
+ARCHIVE_CHUNK = 2000
+MAX_ARCHIVE_CHUNKS = 500
+
+LIST_FIELDS = [
+    "name",
+    "domain",
+    "insight_type",
+    "model_used",
+    "prediction_value",
+    "confidence_score",
+    "status",
+    "alert_message",
+    "alert_value",
+    "timestamp",
+    "creation",
+]
+
+INDEXES = (
+    (["status", "creation"], "idx_ai_insight_status_creation"),
+    (["domain", "creation"], "idx_ai_insight_domain_creation"),
+    (["domain", "status", "creation"], "idx_ai_insight_domain_status_creation"),
+)
+
+
+def recent_insights(domain: Optional[str] = None, limit: int = 10) -> List[Dict]:
+    filters = {"domain": domain} if domain else {}
+    return frappe.get_all("AI Insight Log", filters=filters, fields=LIST_FIELDS, order_by="creation desc", limit=limit)
+
+
+def active_alerts(domain: Optional[str] = None, limit: int = 20) -> List[Dict]:
+    filters = {"status": "Alert"}
+    if domain:
+        filters["domain"] = domain
+    return frappe.get_all("AI Insight Log", filters=filters, fields=LIST_FIELDS, order_by="creation desc", limit=limit)
+
+
+def archive_dir() -> str:
+    path = frappe.get_site_path("private", "ai_insight_archive")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _cold_chunks(cutoff, chunk: int) -> Iterator[List[Dict]]:
+    after_creation, after_name = None, ""
+    while True:
+        keyset = "and (creation > %(creation)s or (creation = %(creation)s and name > %(name)s))" if after_creation else ""
+        rows = frappe.db.sql(
+            f"""
+            select * from `tabAI Insight Log`
+            where creation < %(cutoff)s and status != 'Alert' {keyset}
+            order by creation, name
+            limit {int(chunk)}
+            """,
+            {"cutoff": cutoff, "creation": after_creation, "name": after_name},
+            as_dict=True,
+        )
+        if not rows:
+            return
+        after_creation, after_name = rows[-1].creation, rows[-1].name
+        yield rows
+        if len(rows) < chunk:
+            return
+
+
+def _append(bucket: str, rows: List[Dict]) -> None:
+    path = os.path.join(archive_dir(), f"{bucket}.jsonl.gz")
+    payload = "".join(json.dumps(row, default=str, separators=(",", ":")) + "\n" for row in rows)
+    with gzip.open(path, "ab") as f:
+        f.write(payload.encode())
+    # gzip.open closes the underlying file; make sure the member reached disk before deleting rows
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def archive_insights(days: Optional[int] = None, chunk: int = ARCHIVE_CHUNK, max_chunks: int = MAX_ARCHIVE_CHUNKS) -> int:
+    """
+    Move insights older than `days` (default: site config or RETENTION_DAYS) to
+    monthly gzip archives and delete them in chunks.
+
+    Returns:
+        Number of rows archived
+    """
+    days = int(days or frappe.conf.get("tems_ai_insight_retention_days") or RETENTION_DAYS)
+    cutoff = add_days(getdate(), -days)
+    archived = 0
+    for chunks, rows in enumerate(_cold_chunks(cutoff, chunk), start=1):
+        buckets: Dict[str, List[Dict]] = defaultdict(list)
+        for row in rows:
+            buckets[f"{row.creation:%Y-%m}"].append(row)
+        for bucket, bucket_rows in buckets.items():
+            _append(bucket, bucket_rows)
+        frappe.db.sql(
+            "delete from `tabAI Insight Log` where name in %(names)s",
+            {"names": tuple(row.name for row in rows)},
+        )
+        frappe.db.commit()
+        archived += len(rows)
+        if chunks >= max_chunks:
+            break
+    return archived
+
+
+def read_archive(bucket: str) -> Iterator[Dict]:
+    """Iterate archived rows of one month bucket ("YYYY-MM")."""
+    path = os.path.join(archive_dir(), f"{bucket}.jsonl.gz")
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def list_archives() -> List[Dict]:
+    directory = archive_dir()
+    return [
+        {"bucket": name[: -len(".jsonl.gz")], "size": os.path.getsize(os.path.join(directory, name))}
+        for name in sorted(os.listdir(directory))
+        if name.endswith(".jsonl.gz")
+    ]
+
+
+def window_start(days: int):
+    """Sargable lower bound for "last `days` days" filters on creation."""
+    return add_days(getdate(), -int(days))
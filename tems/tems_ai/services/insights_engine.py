@@ -9,6 +9,7 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 from tems.tems_ai.services.model_manager import ModelManager
 from tems.tems_ai.services.model_registry import get_models_by_task
+from tems.tems_ai.services.insight_store import recent_insights, window_start
 
 
 def generate_insight(domain: str, mode: str, context: Optional[Dict] = None) -> Dict:
@@ -226,19 +227,7 @@ def get_recent_insights(domain: Optional[str] = None, limit: int = 10) -> List[D
     Returns:
         List of insight records
     """
-    filters = {}
-    if domain:
-        filters["domain"] = domain
-    
-    insights = frappe.get_all(
-        "AI Insight Log",
-        filters=filters,
-        fields=["*"],
-        order_by="creation desc",
-        limit=limit
-    )
-    
-    return insights
+    return recent_insights(domain, limit)
 
 
 def get_insight_summary(domain: str, days: int = 7) -> Dict:
@@ -260,9 +249,9 @@ def get_insight_summary(domain: str, days: int = 7) -> Dict:
             COUNT(*) as count_by_type
         FROM `tabAI Insight Log`
         WHERE domain = %s
-        AND DATE(creation) >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        AND creation >= %s
         GROUP BY insight_type
-    """, (domain, days), as_dict=True)
+    """, (domain, window_start(days)), as_dict=True)
     
     return {
         "domain": domain,
@@ -95,11 +95,19 @@ class ModelManager:
     
     def _predict_local(self, input_data: Dict) -> Dict:
         """
-        Run prediction using locally stored model.
-        For now, returns a stub - implement model loading logic based on framework.
+        Run prediction using the promoted local artifact (services.training),
+        falling back to rule-based estimates for models never trained.
         """
-        # Placeholder for local model prediction
-        # In production, load model using joblib, pickle, or TensorFlow
+        from tems.tems_ai.services.training import predict
+
+        result = predict(self.model_name, input_data)
+        if result is not None:
+            return {
+                **result,
+                "details": {"method": "local_artifact", "version": self.model_config.get("active_version")},
+                "timestamp": datetime.now(),
+                "model": self.model_name
+            }
         
         model_type = self.model_config.get("model_type")
         
@@ -0,0 +1,288 @@
+"""
+Model Metrics Accumulators
+==========================
+Streaming per-model performance counters over `AI Insight Log`.
+
+Each model gets one row per day in ``tems_ai_model_metrics_daily`` holding:
+
+- prediction count and confidence sum,
+- a 10-bin confidence histogram (bin i covers (i/10, (i+1)/10], 0 in bin 0),
+- validation counters once `actual_value` is filled in: validated, correct
+  (exact match), and absolute/squared error sums for numeric predictions.
+
+Insight hooks add to a per-transaction buffer that is written as one
+multi-row upsert just before commit, so rolled-back inserts never count and
+concurrent writers only touch their (model, day) rows once per transaction.
+
+Performance and drift reads aggregate at most `window_days` rows per model.
+Drift is the population stability index (PSI) between the confidence
+histogram of the last DRIFT_RECENT_DAYS and the rest of the window.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import frappe
+from frappe.utils import add_days, getdate
+
+METRICS_TABLE = "tems_ai_model_metrics_daily"
+BINS = 10
+DRIFT_RECENT_DAYS = 7
+PSI_EPSILON = 1e-4
+
+_BIN_COLUMNS = [f"b{i}" for i in range(BINS)]
+_COUNTERS = ["predictions", "confidence_sum", *_BIN_COLUMNS, "validated", "correct", "numeric_validated", "abs_error_sum", "sq_error_sum"]
+
+
+def ensure_metrics_table() -> None:
+    bins = ",\n            ".join(f"{c} int unsigned not null default 0" for c in _BIN_COLUMNS)
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{METRICS_TABLE}` (
+            model varchar(140) not null,
+            day date not null,
+            predictions int unsigned not null default 0,
+            confidence_sum double not null default 0,
+            {bins},
+            validated int unsigned not null default 0,
+            correct int unsigned not null default 0,
+            numeric_validated int unsigned not null default 0,
+            abs_error_sum double not null default 0,
+            sq_error_sum double not null default 0,
+            primary key (model, day)
+        ) engine=InnoDB
+        """
+    )
+
+
+def confidence_bin(confidence: Optional[float]) -> int:
+    value = min(max(float(confidence or 0), 0.0), 1.0)
+    return max(math.ceil(value * BINS) - 1, 0)
+
+
+def _buffer() -> Dict:
+    buffer = getattr(frappe.local, "tems_model_metrics_buffer", None)
+    if buffer is None:
+        buffer = frappe.local.tems_model_metrics_buffer = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+        frappe.db.before_commit.add(flush)
+        frappe.db.after_rollback.add(_discard)
+    return buffer
+
+
+def _discard() -> None:
+    frappe.local.tems_model_metrics_buffer = None
+
+
+def _as_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def add_prediction(model: str, day, confidence: Optional[float]) -> None:
+    row = _buffer()[(model, str(getdate(day)))]
+    row["predictions"] += 1
+    row["confidence_sum"] += float(confidence or 0)
+    row[f"b{confidence_bin(confidence)}"] += 1
+
+
+def add_validation(model: str, day, prediction, actual) -> None:
+    row = _buffer()[(model, str(getdate(day)))]
+    row["validated"] += 1
+    if str(prediction).strip().lower() == str(actual).strip().lower():
+        row["correct"] += 1
+    predicted, observed = _as_float(prediction), _as_float(actual)
+    if predicted is not None and observed is not None:
+        error = predicted - observed
+        row["numeric_validated"] += 1
+        row["abs_error_sum"] += abs(error)
+        row["sq_error_sum"] += error * error
+
+
+def flush() -> int:
+    """Write the buffered counters; returns the number of (model, day) rows touched."""
+    buffer = getattr(frappe.local, "tems_model_metrics_buffer", None)
+    frappe.local.tems_model_metrics_buffer = None
+    if not buffer:
+        return 0
+    columns = ["model", "day", *_COUNTERS]
+    values = []
+    for (model, day), counters in buffer.items():
+        values.extend([model, day, *(counters[c] for c in _COUNTERS)])
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(buffer))
+    updates = ", ".join(f"{c} = {c} + values({c})" for c in _COUNTERS)
+    try:
+        frappe.db.sql(
+            f"insert into `{METRICS_TABLE}` ({', '.join(columns)}) values {placeholders} on duplicate key update {updates}",
+            values,
+        )
+    except Exception:
+        # Metrics are derived data (see `rebuild`); never abort the insight's commit over them
+        frappe.log_error(title="AI model metrics flush failed")
+        return 0
+    return len(buffer)
+
+
+def on_insight_insert(doc, method=None):
+    """AI Insight Log after_insert: count the prediction (and its outcome if already known)."""
+    if not doc.model_used:
+        return
+    add_prediction(doc.model_used, doc.creation, doc.confidence_score)
+    if doc.get("actual_value") not in (None, ""):
+        add_validation(doc.model_used, doc.creation, doc.prediction_value, doc.actual_value)
+
+
+def on_insight_update(doc, method=None):
+    """AI Insight Log on_update: count the outcome the first time `actual_value` is set."""
+    if not doc.model_used or doc.get("actual_value") in (None, ""):
+        return
+    before = doc.get_doc_before_save()
+    if before is None or before.get("actual_value") not in (None, ""):
+        return
+    add_validation(doc.model_used, doc.creation, doc.prediction_value, doc.actual_value)
+
+
+def rebuild(model: Optional[str] = None) -> None:
+    """Recompute the daily rows from AI Insight Log (backfill / repair)."""
+    ensure_metrics_table()
+    condition = "and model_used = %(model)s" if model else ""
+    frappe.db.sql(f"delete from `{METRICS_TABLE}`" + (" where model = %(model)s" if model else ""), {"model": model})
+    bin_expr = "greatest(ceil(least(greatest(ifnull(confidence_score, 0), 0), 1) * {bins}) - 1, 0)".format(bins=BINS)
+    bins = ", ".join(f"sum({bin_expr} = {i})" for i in range(BINS))
+    validated = "ifnull(actual_value, '') != ''"
+    numeric = f"{validated} and prediction_value regexp '^-?[0-9.]+$' and actual_value regexp '^-?[0-9.]+$'"
+    frappe.db.sql(
+        f"""
+        insert into `{METRICS_TABLE}` (model, day, {', '.join(_COUNTERS)})
+        select model_used, date(creation), count(*), sum(ifnull(confidence_score, 0)), {bins},
+            sum({validated}),
+            sum({validated} and lower(trim(prediction_value)) = lower(trim(actual_value))),
+            sum({numeric}),
+            sum(if({numeric}, abs(prediction_value - actual_value), 0)),
+            sum(if({numeric}, pow(prediction_value - actual_value, 2), 0))
+        from `tabAI Insight Log`
+        where model_used is not null {condition}
+        group by model_used, date(creation)
+        """,
+        {"model": model},
+    )
+
+
+def daily_rows(model: str, window_days: int) -> List[Dict]:
+    return frappe.db.sql(
+        f"""
+        select * from `{METRICS_TABLE}`
+        where model = %(model)s and day >= %(since)s
+        order by day
+        """,
+        {"model": model, "since": add_days(getdate(), -window_days)},
+        as_dict=True,
+    )
+
+
+def _totals(rows: List[Dict]) -> Dict:
+    return {c: sum(r[c] or 0 for r in rows) for c in _COUNTERS}
+
+
+def summarize(model: str, window_days: int = 30) -> Dict:
+    """Performance summary over the window from the daily rows."""
+    totals = _totals(daily_rows(model, window_days))
+    count = totals["predictions"]
+    if not count:
+        return {"error": "No insights found for this model"}
+    high = totals["b8"] + totals["b9"]
+    medium = totals["b5"] + totals["b6"] + totals["b7"]
+    low = count - high - medium
+    summary = {
+        "model_name": model,
+        "window_days": window_days,
+        "total_predictions": count,
+        "avg_confidence": round(totals["confidence_sum"] / count, 3),
+        "high_confidence_count": high,
+        "medium_confidence_count": medium,
+        "low_confidence_count": low,
+        "confidence_distribution": {
+            "high": round(high / count * 100, 1),
+            "medium": round(medium / count * 100, 1),
+            "low": round(low / count * 100, 1),
+        },
+        "confidence_histogram": [totals[c] for c in _BIN_COLUMNS],
+    }
+    if totals["validated"]:
+        summary["validated_predictions"] = totals["validated"]
+        summary["accuracy"] = round(totals["correct"] / totals["validated"], 4)
+    if totals["numeric_validated"]:
+        summary["mae"] = round(totals["abs_error_sum"] / totals["numeric_validated"], 4)
+        summary["rmse"] = round(math.sqrt(totals["sq_error_sum"] / totals["numeric_validated"]), 4)
+    return summary
+
+
+def psi(expected: List[float], actual: List[float]) -> float:
+    """Population stability index between two histograms (counts or shares)."""
+    e_total, a_total = sum(expected), sum(actual)
+    if not e_total or not a_total:
+        return 0.0
+    value = 0.0
+    for e, a in zip(expected, actual, strict=True):
+        p, q = max(e / e_total, PSI_EPSILON), max(a / a_total, PSI_EPSILON)
+        value += (q - p) * math.log(q / p)
+    return value
+
+
+def drift(model: str, window_days: int = 30) -> Dict:
+    """Confidence trend and PSI drift over the window from the daily rows."""
+    rows = daily_rows(model, window_days)
+    if len(rows) < 2:
+        return {"error": "Insufficient data for drift analysis"}
+
+    daily = [
+        {"prediction_date": r.day, "prediction_count": r.predictions, "avg_confidence": round(r.confidence_sum / r.predictions, 4)}
+        for r in rows
+        if r.predictions
+    ]
+    confidences = [d["avg_confidence"] for d in daily]
+    trend = "stable"
+    if len(confidences) >= 5:
+        recent_avg = sum(confidences[-5:]) / 5
+        earlier_avg = sum(confidences[:-5]) / (len(confidences) - 5) if len(confidences) > 5 else confidences[0]
+        if recent_avg < earlier_avg - 0.1:
+            trend = "declining"
+        elif recent_avg > earlier_avg + 0.1:
+            trend = "improving"
+
+    cutoff = getdate(add_days(getdate(), -DRIFT_RECENT_DAYS))
+    baseline = _totals([r for r in rows if r.day < cutoff])
+    recent = _totals([r for r in rows if r.day >= cutoff])
+    stability = psi([baseline[c] for c in _BIN_COLUMNS], [recent[c] for c in _BIN_COLUMNS])
+    return {
+        "model_name": model,
+        "window_days": window_days,
+        "data_points": len(daily),
+        "confidence_trend": trend,
+        "latest_confidence": confidences[-1] if confidences else 0,
+        "earliest_confidence": confidences[0] if confidences else 0,
+        "psi": round(stability, 4),
+        "drift_level": "none" if stability < 0.1 else "moderate" if stability < 0.25 else "significant",
+        "daily_data": daily,
+    }
+
+
+def lifetime_totals() -> Dict[str, Dict]:
+    """{model: {"predictions", "avg_confidence"}} over all days, one grouped query."""
+    return {
+        row.model: {
+            "predictions": int(row.predictions or 0),
+            "avg_confidence": (row.confidence_sum / row.predictions) if row.predictions else 0,
+        }
+        for row in frappe.db.sql(
+            f"""
+            select model, sum(predictions) as predictions, sum(confidence_sum) as confidence_sum
+            from `{METRICS_TABLE}` group by model
+            """,
+            as_dict=True,
+        )
+    }
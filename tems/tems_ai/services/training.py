@@ -0,0 +1,383 @@
+"""
+Model Training Pipeline
+=======================
+Background training, versioned artifacts and hot-swapped serving for
+`AI Model Registry` models with source "Local".
+
+- `queue_training` enqueues one deduplicated job per model on the long queue,
+  so training runs in an RQ worker process, never in a web worker.
+- Training sets are extracted per domain (TRAINING_SETS) with keyset-paginated
+  reads: each chunk is CHUNK_SIZE rows whose features are computed in SQL and
+  converted straight to a float32 block.
+- Models are scikit-learn HistGradientBoosting estimators (NaN-tolerant, so
+  missing fields need no imputation), validated on a held-out split.
+- Artifacts are joblib files named ``<timestamp>-<sha256[:12]>.joblib`` under the
+  site's private ``ai_models/<model>/`` folder, written to a temp file and
+  renamed into place.
+- Promotion is one registry UPDATE (model_path, version, hash, metrics) followed
+  by a version bump in Redis. `load_model` compares the process-local version
+  with Redis on every call and reloads when it moved, so serving workers pick
+  up a new version without a restart.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from typing import Dict, Iterator, Optional
+
+import frappe
+import numpy as np
+from frappe.utils import now_datetime
+
+CHUNK_SIZE = 5000
+MAX_TRAINING_ROWS = 500_000
+MIN_TRAINING_ROWS = 50
+KEEP_ARTIFACTS = 5
+VERSION_KEY = "tems:ai_model_version"
+# A retrained model is promoted unless it scores worse than this below the active one
+PROMOTION_TOLERANCE = 0.02
+
+# domain -> training set definition. `sql` selects the keyset column `key` first,
+# then the features in `features` order, then the target `y`; it must contain
+# the `{after}` condition and end ordered by `key`.
+TRAINING_SETS = {
+    "fleet": {
+        "key": "wo.name",
+        "task": "regression",
+        "description": "Maintenance work order cost",
+        "features": [
+            "odometer_reading",
+            "vehicle_age_days",
+            "preventive",
+            "corrective",
+            "predictive",
+            "month",
+        ],
+        "sql": """
+            select wo.name as k, wo.odometer_reading,
+                datediff(coalesce(wo.work_order_date, wo.planned_date), v.acquisition_date),
+                wo.maintenance_type = 'Preventive', wo.maintenance_type = 'Corrective',
+                wo.maintenance_type = 'Predictive',
+                month(coalesce(wo.work_order_date, wo.planned_date)),
+                wo.cost as y
+            from `tabMaintenance Work Order` wo
+            left join `tabVehicle` v on v.name = wo.vehicle
+            where wo.status = 'Completed' and wo.cost > 0 {after}
+            order by wo.name
+        """,
+    },
+    "safety": {
+        "key": "jp.name",
+        "task": "classification",
+        "description": "Safety incident during a journey",
+        "features": ["risk_score", "start_hour", "weekday", "duration_hours"],
+        "sql": """
+            select jp.name as k, jp.risk_score, hour(jp.start_time), weekday(jp.start_time),
+                timestampdiff(minute, jp.start_time, jp.end_time) / 60,
+                exists(
+                    select 1 from `tabSafety Incident` si
+                    where si.vehicle = jp.vehicle
+                        and si.incident_date between jp.start_time and jp.end_time
+                ) as y
+            from `tabJourney Plan` jp
+            where jp.start_time is not null and jp.end_time > jp.start_time
+                and jp.end_time < now() {after}
+            order by jp.name
+        """,
+    },
+    "operations": {
+        "key": "jp.name",
+        "task": "regression",
+        "description": "Journey duration in hours",
+        "features": ["risk_score", "start_hour", "weekday", "waypoints"],
+        "sql": """
+            select jp.name as k, jp.risk_score, hour(jp.start_time), weekday(jp.start_time),
+                (select count(*) from `tabWay Points` wp
+                    where wp.parent = jp.route and wp.parenttype = 'Route Planning'),
+                timestampdiff(minute, jp.start_time, jp.end_time) / 60 as y
+            from `tabJourney Plan` jp
+            where jp.start_time is not null and jp.end_time > jp.start_time
+                and jp.end_time < now() {after}
+            order by jp.name
+        """,
+    },
+    "finance": {
+        "key": "f.name",
+        "task": "regression",
+        "description": "Fuel efficiency (km per litre) per fill",
+        "features": ["liters", "price_per_liter", "month", "weekday", "vehicle_age_days"],
+        "sql": """
+            select f.name as k, f.liters, f.price_per_liter, month(f.date), weekday(f.date),
+                datediff(f.date, v.acquisition_date),
+                (f.odometer - (
+                    select max(p.odometer) from `tabFuel Log` p
+                    where p.vehicle = f.vehicle and p.odometer < f.odometer
+                )) / f.liters as y
+            from `tabFuel Log` f
+            left join `tabVehicle` v on v.name = f.vehicle
+            where f.liters > 0 and f.odometer > 0 {after}
+            order by f.name
+        """,
+    },
+}
+
+# process-local serving cache: model -> {"version", "artifact"}
+_loaded: Dict[str, Dict] = {}
+
+
+def _artifact_dir(model_name: str) -> str:
+    path = frappe.get_site_path("private", "ai_models", frappe.scrub(model_name))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def training_set_for(model: Dict) -> Dict:
+    spec = TRAINING_SETS.get(model.get("domain"))
+    if not spec:
+        frappe.throw(f"No training set is defined for domain '{model.get('domain')}'")
+    return spec
+
+
+def stream_training_rows(spec: Dict, chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yield float32 blocks of [features..., target] using keyset pagination.
+
+    Rows whose target is NULL are dropped; feature NULLs become NaN.
+    """
+    after = ""
+    while True:
+        rows = frappe.db.sql(
+            spec["sql"].format(after=f"and {spec['key']} > %(after)s" if after else "") + f" limit {int(chunk_size)}",
+            {"after": after},
+        )
+        if not rows:
+            return
+        after = rows[-1][0]
+        block = np.array([row[1:] for row in rows], dtype=np.float32)
+        yield block[~np.isnan(block[:, -1])]
+        if len(rows) < chunk_size:
+            return
+
+
+def extract_training_set(spec: Dict, max_rows: int = MAX_TRAINING_ROWS):
+    blocks, total = [], 0
+    for block in stream_training_rows(spec):
+        blocks.append(block)
+        total += len(block)
+        if total >= max_rows:
+            break
+    if not blocks:
+        return np.empty((0, len(spec["features"])), dtype=np.float32), np.empty(0, dtype=np.float32)
+    data = np.concatenate(blocks)[:max_rows]
+    return data[:, :-1], data[:, -1]
+
+
+def fit_estimator(spec: Dict, X: np.ndarray, y: np.ndarray):
+    """
+    Train and validate on a held-out split.
+
+    Returns:
+        (estimator, metrics); metrics["score"] is the promotion score (higher is better)
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+    from sklearn.metrics import accuracy_score, mean_absolute_error, r2_score, roc_auc_score
+    from sklearn.model_selection import train_test_split
+
+    classify = spec["task"] == "classification"
+    if classify:
+        y = (y > 0).astype(int)
+    stratify = y if classify and len(np.unique(y)) > 1 and np.bincount(y).min() >= 2 else None
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=0, stratify=stratify)
+
+    if classify:
+        estimator = HistGradientBoostingClassifier(max_iter=200, random_state=0)
+    else:
+        estimator = HistGradientBoostingRegressor(max_iter=200, random_state=0)
+    estimator.fit(X_train, y_train)
+
+    metrics = {"rows": int(len(y)), "validation_rows": int(len(y_val))}
+    if classify:
+        predicted = estimator.predict(X_val)
+        metrics["accuracy"] = float(accuracy_score(y_val, predicted))
+        metrics["positive_rate"] = float(y.mean())
+        if len(np.unique(y_val)) > 1:
+            metrics["roc_auc"] = float(roc_auc_score(y_val, estimator.predict_proba(X_val)[:, 1]))
+        metrics["score"] = metrics.get("roc_auc", metrics["accuracy"])
+    else:
+        predicted = estimator.predict(X_val)
+        metrics["mae"] = float(mean_absolute_error(y_val, predicted))
+        metrics["rmse"] = float(np.sqrt(np.mean((y_val - predicted) ** 2)))
+        metrics["r2"] = float(r2_score(y_val, predicted))
+        metrics["score"] = metrics["r2"]
+    return estimator, metrics
+
+
+def write_artifact(model_name: str, artifact: Dict) -> Dict:
+    """Persist `artifact` under a content-hashed name; returns {"path", "hash", "version"}."""
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(artifact, buffer)
+    payload = buffer.getvalue()
+    digest = hashlib.sha256(payload).hexdigest()
+    version = f"{now_datetime():%Y%m%d%H%M%S}-{digest[:12]}"
+
+    directory = _artifact_dir(model_name)
+    path = os.path.join(directory, f"{version}.joblib")
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return {"path": path, "hash": digest, "version": version}
+
+
+def _prune_artifacts(model_name: str, keep_path: str) -> None:
+    directory = _artifact_dir(model_name)
+    files = sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".joblib")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in files[KEEP_ARTIFACTS:]:
+        if path != keep_path:
+            os.remove(path)
+
+
+def promote(model_name: str, written: Dict, metrics: Dict) -> None:
+    """Make `written` the serving version: one registry update, then the Redis version bump."""
+    frappe.db.set_value(
+        "AI Model Registry",
+        model_name,
+        {
+            "model_path": written["path"],
+            "active_version": written["version"],
+            "artifact_hash": written["hash"],
+            "training_metrics": json.dumps(metrics, indent=1),
+            "training_rows": metrics["rows"],
+            "training_status": "Completed",
+            "training_error": None,
+            "last_trained_date": now_datetime(),
+        },
+    )
+    frappe.db.commit()
+    frappe.cache().hset(VERSION_KEY, model_name, written["version"])
+
+
+def _set_status(model_name: str, status: str, error: Optional[str] = None) -> None:
+    frappe.db.set_value("AI Model Registry", model_name, {"training_status": status, "training_error": error})
+    frappe.db.commit()
+
+
+def train_model(model_name: str, force: bool = False) -> Dict:
+    """
+    Worker entry point: extract, train, write artifact and promote.
+
+    Args:
+        model_name: AI Model Registry name
+        force: Promote even when the new version scores worse than the active one
+
+    Returns:
+        {"promoted", "version", "metrics"}
+    """
+    model = frappe.db.get_value(
+        "AI Model Registry", model_name, ["name", "domain", "active_version", "training_metrics"], as_dict=True
+    )
+    if not model:
+        frappe.throw(f"Model '{model_name}' not found")
+    _set_status(model_name, "Training")
+    try:
+        spec = training_set_for(model)
+        X, y = extract_training_set(spec)
+        if len(y) < MIN_TRAINING_ROWS:
+            frappe.throw(f"Only {len(y)} training rows available (minimum {MIN_TRAINING_ROWS})")
+        estimator, metrics = fit_estimator(spec, X, y)
+
+        current = json.loads(model.training_metrics or "{}").get("score")
+        if not force and current is not None and metrics["score"] < current - PROMOTION_TOLERANCE:
+            _set_status(model_name, "Completed", f"Not promoted: score {metrics['score']:.4f} < active {current:.4f}")
+            return {"promoted": False, "version": model.active_version, "metrics": metrics}
+
+        written = write_artifact(
+            model_name,
+            {
+                "estimator": estimator,
+                "features": spec["features"],
+                "task": spec["task"],
+                "metrics": metrics,
+                "trained_at": str(now_datetime()),
+            },
+        )
+        promote(model_name, written, metrics)
+        _prune_artifacts(model_name, written["path"])
+        return {"promoted": True, "version": written["version"], "metrics": metrics}
+    except Exception as e:
+        frappe.db.rollback()
+        _set_status(model_name, "Failed", str(e)[:1000])
+        frappe.log_error(f"Training failed for {model_name}: {e!s}", "AI Model Training")
+        raise
+
+
+def queue_training(model_name: str, force: bool = False) -> str:
+    """Enqueue `train_model` on the long queue (one pending job per model); returns the job id."""
+    job_id = f"tems-train-{model_name}"
+    frappe.db.set_value("AI Model Registry", model_name, "training_status", "Queued")
+    frappe.enqueue(
+        "tems.tems_ai.services.training.train_model",
+        queue="long",
+        timeout=3600,
+        job_id=job_id,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        model_name=model_name,
+        force=force,
+    )
+    return job_id
+
+
+def load_model(model_name: str) -> Optional[Dict]:
+    """
+    Serving-side artifact for `model_name`, or None when it has never been trained.
+
+    The process keeps the loaded artifact and reloads only when the promoted
+    version (Redis, falling back to the registry) differs from the loaded one.
+    """
+    import joblib
+
+    version = frappe.cache().hget(VERSION_KEY, model_name)
+    if version is None:
+        version = frappe.db.get_value("AI Model Registry", model_name, "active_version") or ""
+        frappe.cache().hset(VERSION_KEY, model_name, version)
+    if not version:
+        return None
+
+    loaded = _loaded.get(model_name)
+    if loaded and loaded["version"] == version:
+        return loaded["artifact"]
+
+    path = os.path.join(_artifact_dir(model_name), f"{version}.joblib")
+    if not os.path.exists(path):
+        return loaded["artifact"] if loaded else None
+    artifact = joblib.load(path)
+    _loaded[model_name] = {"version": version, "artifact": artifact}
+    return artifact
+
+
+def predict(model_name: str, input_data: Dict) -> Optional[Dict]:
+    """Predict from the promoted artifact; None when the model has no artifact."""
+    artifact = load_model(model_name)
+    if not artifact:
+        return None
+    row = np.array(
+        [[np.nan if input_data.get(f) in (None, "") else float(input_data[f]) for f in artifact["features"]]],
+        dtype=np.float32,
+    )
+    estimator = artifact["estimator"]
+    if artifact["task"] == "classification":
+        proba = estimator.predict_proba(row)[0]
+        return {"prediction": int(np.argmax(proba)), "confidence": float(np.max(proba)), "probability": float(proba[-1])}
+    return {"prediction": float(estimator.predict(row)[0]), "confidence": max(0.0, min(1.0, artifact["metrics"].get("r2", 0.0)))}
@@ -10,6 +10,7 @@ from tems.tems_ai.services.insights_engine import generate_insight
 from frappe.utils import today, add_days
 from tems.tems_ai.services.insights_engine import get_recent_insights
 from tems.tems_ai.services.alert_engine import get_active_alerts
+from tems.tems_main.scheduler import tems_job
 
 
 def generate_daily_insights():
@@ -36,11 +37,11 @@ def generate_daily_insights():
                     frappe.logger().info(f"Generating {insight_mode} insight for {domain}")
                     generate_insight(domain=domain, mode=insight_mode)
                 except Exception as e:
-                    frappe.log_error(f"Failed to generate {insight_mode} for {domain}: {str(e)}", 
+                    frappe.log_error(f"Failed to generate {insight_mode} for {domain}: {e!s}", 
                                    "AI Daily Insights")
         
         except Exception as e:
-            frappe.log_error(f"Failed to process domain {domain}: {str(e)}", 
+            frappe.log_error(f"Failed to process domain {domain}: {e!s}", 
                            "AI Daily Insights")
     
     frappe.db.commit()
@@ -59,7 +60,39 @@ def evaluate_alerts_hourly():
         frappe.db.commit()
         frappe.logger().info("Completed hourly alert evaluation")
     except Exception as e:
-        frappe.log_error(f"Alert evaluation failed: {str(e)}", "AI Alert Evaluation")
+        frappe.log_error(f"Alert evaluation failed: {e!s}", "AI Alert Evaluation")
+
+
+def drain_alert_queue():
+    """
+    Fallback drain of queued alerts (normally drained right after commit).
+    Run every minute.
+    """
+    try:
+        from tems.tems_ai.services.alert_engine import drain_alert_queue as drain
+        
+        recorded = drain()
+        if recorded:
+            frappe.logger().info(f"Recorded {recorded} queued AI alerts")
+    except Exception as e:
+        frappe.log_error(f"Alert queue drain failed: {e!s}", "AI Alert Evaluation")
+
+
+@tems_job(base_interval=60, max_interval=300, idle_backoff=False)
+def deliver_insight_webhooks():
+    """
+    Send due AI insight webhooks, including scheduled retries
+    (normally delivered right after commit).
+    Run every minute.
+    """
+    try:
+        from tems.tems_ai.integrations.webhooks import deliver_pending
+        
+        outcome = deliver_pending()
+        if outcome.get("delivered") or outcome.get("dead"):
+            frappe.logger().info(f"AI insight webhooks: {outcome}")
+    except Exception as e:
+        frappe.log_error(f"Webhook delivery failed: {e!s}", "AI Webhook")
 
 
 def cleanup_old_insights():
@@ -70,16 +103,19 @@ def cleanup_old_insights():
     frappe.logger().info("Starting AI insights cleanup")
     
     try:
-        # Delete insights older than 90 days
-        frappe.db.sql("""
-            DELETE FROM `tabAI Insight Log`
-            WHERE DATE(creation) < DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-        """)
+        from tems.tems_ai.services.insight_store import archive_insights
         
+        # Archive insights older than the retention window (90 days by default), chunk by chunk
+        archived = archive_insights()
+        
+        from tems.tems_ai.integrations.webhooks import purge_delivered
+        
+        purge_delivered()
         frappe.db.commit()
-        frappe.logger().info("Completed AI insights cleanup")
+        
+        frappe.logger().info(f"Completed AI insights cleanup: {archived} insights archived")
     except Exception as e:
-        frappe.log_error(f"Insights cleanup failed: {str(e)}", "AI Cleanup")
+        frappe.log_error(f"Insights cleanup failed: {e!s}", "AI Cleanup")
 
 
 def update_model_performance_metrics():
@@ -90,35 +126,37 @@ def update_model_performance_metrics():
     frappe.logger().info("Starting model performance metrics update")
     
     try:
-        from tems.tems_ai.utils.metrics import evaluate_model_performance
+        from tems.tems_ai.services.model_metrics import lifetime_totals
         
-        # Get all enabled models
+        totals = lifetime_totals()
         models = frappe.get_all(
             "AI Model Registry",
             filters={"enabled": 1},
-            fields=["name"]
+            pluck="name"
         )
         
-        for model in models:
+        for model_name in models:
             try:
-                model_name = model.get("name")
-                metrics = evaluate_model_performance(model_name)
-                
-                # Update model doc with latest metrics
-                model_doc = frappe.get_doc("AI Model Registry", model_name)
-                model_doc.last_performance_check = frappe.utils.now()
-                model_doc.avg_confidence = metrics.get("avg_confidence", 0)
-                model_doc.total_predictions = metrics.get("total_predictions", 0)
-                model_doc.save(ignore_permissions=True)
+                metrics = totals.get(model_name, {})
+                frappe.db.set_value(
+                    "AI Model Registry",
+                    model_name,
+                    {
+                        "last_performance_check": frappe.utils.now(),
+                        "avg_confidence": metrics.get("avg_confidence", 0),
+                        "total_predictions": metrics.get("predictions", 0)
+                    },
+                    update_modified=False
+                )
                 
             except Exception as e:
-                frappe.log_error(f"Failed to update metrics for {model_name}: {str(e)}", 
+                frappe.log_error(f"Failed to update metrics for {model_name}: {e!s}", 
                                "AI Model Metrics")
         
         frappe.db.commit()
         frappe.logger().info("Completed model performance metrics update")
     except Exception as e:
-        frappe.log_error(f"Model metrics update failed: {str(e)}", "AI Model Metrics")
+        frappe.log_error(f"Model metrics update failed: {e!s}", "AI Model Metrics")
 
 
 def retrain_models_weekly():
@@ -137,21 +175,22 @@ def retrain_models_weekly():
                 "auto_retrain": 1,
                 "retrain_frequency": "weekly"
             },
-            fields=["name"]
+            fields=["name", "source", "domain"]
         )
         
+        from tems.tems_ai.services.training import TRAINING_SETS, queue_training
+        
         for model in models:
             model_name = model.get("name")
+            if model.get("source") != "Local" or model.get("domain") not in TRAINING_SETS:
+                continue
             frappe.logger().info(f"Queuing retraining for {model_name}")
-            
-            # In production, this would trigger actual model training
-            # For now, just log
-            frappe.log_error(f"Retrain queued for {model_name}", "AI Model Training")
+            queue_training(model_name)
         
         frappe.db.commit()
         frappe.logger().info("Completed weekly model retraining queue")
     except Exception as e:
-        frappe.log_error(f"Model retraining failed: {str(e)}", "AI Model Training")
+        frappe.log_error(f"Model retraining failed: {e!s}", "AI Model Training")
 
 
 def generate_fleet_maintenance_predictions():
@@ -196,113 +235,125 @@ def generate_fleet_maintenance_predictions():
                         )
                         
             except Exception as e:
-                frappe.log_error(f"Failed to predict maintenance for {vehicle_name}: {str(e)}", 
+                frappe.log_error(f"Failed to predict maintenance for {vehicle_name}: {e!s}", 
                                "Fleet AI Predictions")
         
         frappe.db.commit()
         frappe.logger().info(f"Completed fleet maintenance predictions: {predictions_generated} vehicles processed")
     except Exception as e:
-        frappe.log_error(f"Fleet predictions failed: {str(e)}", "Fleet AI Predictions")
+        frappe.log_error(f"Fleet predictions failed: {e!s}", "Fleet AI Predictions")
+
+
+def detect_fuel_anomalies():
+    """
+    Fleet-wide fuel anomaly sweep over the rolling per-vehicle statistics.
+    Run daily at 06:15 AM.
+    
+    Individual fill-ups are alerted on insert; this raises one alert per
+    vehicle whose baseline consumption is an outlier for its type.
+    """
+    frappe.logger().info("Starting fleet fuel anomaly sweep")
+    
+    try:
+        from tems.tems_ai.handlers.fleet_ai import detect_fleet_fuel_anomalies
+        from tems.tems_ai.services.alert_engine import trigger_alert
+        
+        result = detect_fleet_fuel_anomalies(since=frappe.utils.add_days(None, -1))
+        
+        for outlier in result["outliers"][:20]:
+            trigger_alert(
+                domain="fleet",
+                alert_type="fuel_efficiency_outlier",
+                severity=outlier["severity"],
+                message=f"{outlier['vehicle']} averages {outlier['average_efficiency']} L/100km, "
+                        f"well above comparable vehicles (z={outlier['z_score']})",
+                details=outlier
+            )
+        
+        frappe.logger().info(
+            f"Completed fuel anomaly sweep: {len(result['entries'])} anomalous fill-ups, "
+            f"{len(result['outliers'])} outlier vehicles"
+        )
+    except Exception as e:
+        frappe.log_error(f"Fuel anomaly sweep failed: {e!s}", "Fleet AI Predictions")
 
 
 def calculate_driver_risk_scores():
     """
-    Calculate risk scores for all active drivers.
+    Recompute the precomputed driver, vehicle and route risk components,
+    score today's Journey Plans and alert on high-risk drivers.
     Run daily at 05:00 AM.
     """
     frappe.logger().info("Starting driver risk score calculations")
     
     try:
-        from tems.tems_ai.handlers.safety_ai import predict_driver_risk_score
-        
-        # Get all active drivers
-        drivers = frappe.get_all(
-            "Employee",
-            filters={"designation": ["like", "%Driver%"], "status": "Active"},
-            fields=["name"],
-            limit=100
-        )
+        from tems.tems_ai.handlers.safety_ai import _risk_level, predict_journey_risks
+        from tems.tems_ai.services.alert_engine import queue_alert
+        from tems.tems_safety.journey_risk import high_risk_drivers, refresh_all
         
-        high_risk_count = 0
+        counts = refresh_all()
+        active = set(frappe.get_all("Employee", filters={"status": "Active"}, pluck="name"))
         
-        for driver in drivers:
-            try:
-                driver_name = driver.get("name")
-                result = predict_driver_risk_score(driver_name)
-                
-                risk_level = result.get("risk_level")
-                
-                # Alert on high risk drivers
-                if risk_level in ["high", "critical"]:
-                    high_risk_count += 1
-                    
-                    from tems.tems_ai.services.alert_engine import trigger_alert
-                    trigger_alert(
-                        domain="safety",
-                        alert_type="driver_risk",
-                        severity="high" if risk_level == "critical" else "medium",
-                        message=f"High risk driver detected: {driver_name}",
-                        details=result
-                    )
-                    
-            except Exception as e:
-                frappe.log_error(f"Failed to calculate risk for {driver_name}: {str(e)}", 
-                               "Safety AI Predictions")
+        high_risk = [row for row in high_risk_drivers() if row.driver in active]
+        for row in high_risk:
+            risk_level = _risk_level(row.score)
+            queue_alert(
+                domain="safety",
+                alert_type="driver_risk",
+                severity="high" if risk_level == "critical" else "medium",
+                message=f"High risk driver detected: {row.driver}",
+                details={
+                    "driver": row.driver,
+                    "risk_score": row.score,
+                    "breakdown": frappe.parse_json(row.detail)
+                },
+                value=row.score
+            )
         
+        journeys = predict_journey_risks()
         frappe.db.commit()
-        frappe.logger().info(f"Completed driver risk calculations: {high_risk_count} high-risk drivers identified")
+        frappe.logger().info(
+            f"Completed driver risk calculations: {counts}, {len(high_risk)} high-risk drivers identified, "
+            f"{len(journeys)} journeys scored"
+        )
     except Exception as e:
-        frappe.log_error(f"Driver risk calculation failed: {str(e)}", "Safety AI Predictions")
+        frappe.log_error(f"Driver risk calculation failed: {e!s}", "Safety AI Predictions")
 
 
 def forecast_financial_metrics():
     """
-    Generate financial forecasts for vehicles and operations.
+    Generate financial and demand forecasts for the whole fleet and cache them.
     Run daily at 07:00 AM.
     """
     frappe.logger().info("Starting financial forecasting")
     
     try:
-        from tems.tems_ai.handlers.finance_ai import predict_vehicle_profitability
+        from tems.tems_ai.services.alert_engine import trigger_alert
+        from tems.tems_ai.services.forecasting import CACHE_PREFIX, run_nightly_forecasts
         
-        # Get top revenue vehicles
-        vehicles = frappe.db.sql("""
-            SELECT vehicle, SUM(revenue_amount) as total_revenue
-            FROM `tabCost And Revenue Ledger`
-            WHERE transaction_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY vehicle
-            ORDER BY total_revenue DESC
-            LIMIT 20
-        """, as_dict=True)
+        counts = run_nightly_forecasts()
         
-        forecasts_generated = 0
+        # Alert on the vehicles with the worst negative profit outlook
+        week_profit = []
+        for vehicle, payload in frappe.cache().hgetall(f"{CACHE_PREFIX}:vehicle_finance").items():
+            week_profit.append((sum(payload["profit"]["mean"][:7]), frappe.safe_decode(vehicle), payload))
         
-        for vehicle_data in vehicles:
-            try:
-                vehicle = vehicle_data.get("vehicle")
-                if vehicle:
-                    result = predict_vehicle_profitability(vehicle, forecast_days=7)
-                    forecasts_generated += 1
-                    
-                    # Alert on negative profitability trend
-                    if result.get("profitability_trend") == "negative":
-                        from tems.tems_ai.services.alert_engine import trigger_alert
-                        trigger_alert(
-                            domain="finance",
-                            alert_type="profitability_warning",
-                            severity="medium",
-                            message=f"Negative profitability trend for {vehicle}",
-                            details=result
-                        )
-                        
-            except Exception as e:
-                frappe.log_error(f"Failed to forecast for {vehicle}: {str(e)}", 
-                               "Finance AI Predictions")
+        for total, vehicle, payload in sorted(week_profit, key=lambda row: row[0])[:20]:
+            if total >= 0:
+                break
+            trigger_alert(
+                domain="finance",
+                alert_type="profitability_warning",
+                severity="medium",
+                message=f"Negative profitability trend for {vehicle}",
+                details={"vehicle": vehicle, "predicted_7_day_profit": round(total, 2),
+                         "historical_avg": payload["historical_avg"]}
+            )
         
         frappe.db.commit()
-        frappe.logger().info(f"Completed financial forecasting: {forecasts_generated} vehicles processed")
+        frappe.logger().info(f"Completed financial forecasting: {counts}")
     except Exception as e:
-        frappe.log_error(f"Financial forecasting failed: {str(e)}", "Finance AI Predictions")
+        frappe.log_error(f"Financial forecasting failed: {e!s}", "Finance AI Predictions")
 
 
 def send_daily_ai_summary():
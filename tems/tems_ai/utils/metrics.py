@@ -120,62 +120,23 @@ def calculate_precision_recall(
     }
 
 
-def evaluate_model_performance(model_name: str, limit: int = 100) -> Dict:
+def evaluate_model_performance(model_name: str, window_days: int = 30) -> Dict:
     """
     Evaluate overall model performance based on logged predictions.
     
+    Reads the model's daily accumulator rows (services.model_metrics), so the
+    cost does not grow with the number of insights.
+    
     Args:
         model_name: Name of the model to evaluate
-        limit: Number of recent predictions to evaluate
+        window_days: Number of days to evaluate
     
     Returns:
         Performance metrics dict
     """
-    # Get recent insights from this model
-    insights = frappe.get_all(
-        "AI Insight Log",
-        filters={"model_used": model_name},
-        fields=["prediction_value", "confidence_score", "actual_value"],
-        order_by="creation desc",
-        limit=limit
-    )
-    
-    if not insights:
-        return {"error": "No insights found for this model"}
-    
-    # Calculate average confidence
-    avg_confidence = sum(i.get("confidence_score", 0) for i in insights) / len(insights)
-    
-    # Count predictions by confidence bracket
-    high_confidence = sum(1 for i in insights if i.get("confidence_score", 0) > 0.8)
-    medium_confidence = sum(1 for i in insights if 0.5 < i.get("confidence_score", 0) <= 0.8)
-    low_confidence = sum(1 for i in insights if i.get("confidence_score", 0) <= 0.5)
-    
-    metrics = {
-        "model_name": model_name,
-        "total_predictions": len(insights),
-        "avg_confidence": round(avg_confidence, 3),
-        "high_confidence_count": high_confidence,
-        "medium_confidence_count": medium_confidence,
-        "low_confidence_count": low_confidence,
-        "confidence_distribution": {
-            "high": round(high_confidence / len(insights) * 100, 1),
-            "medium": round(medium_confidence / len(insights) * 100, 1),
-            "low": round(low_confidence / len(insights) * 100, 1)
-        }
-    }
-    
-    # If actual values are available, calculate accuracy
-    insights_with_actuals = [i for i in insights if i.get("actual_value")]
-    
-    if insights_with_actuals:
-        predictions = [i.get("prediction_value") for i in insights_with_actuals]
-        actuals = [i.get("actual_value") for i in insights_with_actuals]
-        
-        metrics["accuracy"] = calculate_accuracy(predictions, actuals)
-        metrics["validated_predictions"] = len(insights_with_actuals)
-    
-    return metrics
+    from tems.tems_ai.services.model_metrics import summarize
+
+    return summarize(model_name, window_days)
 
 
 def track_model_drift(model_name: str, window_days: int = 30) -> Dict:
@@ -187,43 +148,9 @@ def track_model_drift(model_name: str, window_days: int = 30) -> Dict:
         window_days: Time window to analyze
     
     Returns:
-        Drift analysis dict
+        Drift analysis dict: confidence trend, daily data and the PSI of the
+        last week's confidence distribution against the rest of the window
     """
-    # Get insights from the time window
-    insights = frappe.db.sql("""
-        SELECT 
-            DATE(creation) as prediction_date,
-            AVG(confidence_score) as avg_confidence,
-            COUNT(*) as prediction_count
-        FROM `tabAI Insight Log`
-        WHERE model_used = %s
-        AND DATE(creation) >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        GROUP BY DATE(creation)
-        ORDER BY prediction_date
-    """, (model_name, window_days), as_dict=True)
-    
-    if not insights or len(insights) < 2:
-        return {"error": "Insufficient data for drift analysis"}
-    
-    # Calculate trend
-    confidences = [i["avg_confidence"] for i in insights]
-    trend = "stable"
-    
-    if len(confidences) >= 5:
-        recent_avg = sum(confidences[-5:]) / 5
-        earlier_avg = sum(confidences[:-5]) / (len(confidences) - 5) if len(confidences) > 5 else confidences[0]
-        
-        if recent_avg < earlier_avg - 0.1:
-            trend = "declining"
-        elif recent_avg > earlier_avg + 0.1:
-            trend = "improving"
-    
-    return {
-        "model_name": model_name,
-        "window_days": window_days,
-        "data_points": len(insights),
-        "confidence_trend": trend,
-        "latest_confidence": confidences[-1] if confidences else 0,
-        "earliest_confidence": confidences[0] if confidences else 0,
-        "daily_data": insights
-    }
+    from tems.tems_ai.services.model_metrics import drift
+
+    return drift(model_name, window_days)
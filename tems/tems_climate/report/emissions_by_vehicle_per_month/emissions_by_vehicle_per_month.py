@@ -3,12 +3,27 @@
 
 import frappe
 
+from tems.tems_insights.facts import VEHICLE_DAILY, fact_tables_ready
+
 def execute(filters=None):
     columns = [
         {"label": "Vehicle", "fieldname": "vehicle", "fieldtype": "Link", "options": "Vehicle"},
         {"label": "Month", "fieldname": "month", "fieldtype": "Data"},
         {"label": "CO2e (kg)", "fieldname": "co2e_kg", "fieldtype": "Float"},
     ]
+    if fact_tables_ready():
+        rows = frappe.db.sql(
+            f"""
+            select vehicle, date_format(operating_date, '%Y-%m') as month, sum(co2e_kg) as co2e_kg
+            from `{VEHICLE_DAILY}`
+            where co2e_kg > 0
+            group by vehicle, date_format(operating_date, '%Y-%m')
+            order by month desc
+            """,
+            as_dict=True,
+        )
+        return columns, rows
+
     rows = frappe.db.sql(
         """
         select vehicle, date_format(coalesce(modified, now()), '%Y-%m') as month, sum(coalesce(co2e_kg,0)) as co2e_kg
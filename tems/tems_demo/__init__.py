@@ -8,9 +8,9 @@ Each domain seeder exposes a `seed(context)` function that receives a
 mutable dict collecting created record name lists for cross-linking.
 """
 
-from .orchestrator import run_all, run_minimal
+from .orchestrator import run_all, run_minimal, run_scale
 
-__all__ = ["run_all", "run_minimal"]
+__all__ = ["run_all", "run_minimal", "run_scale"]
 """TEMS Demo Data Package
 
 Provides utilities to seed rich, inter‑linked demo data for Transport
@@ -346,6 +346,38 @@ def run_minimal():
     return context
 
 
+def run_scale(profile: str = "scale", parallel: int = 1, domains: list[str] | None = None):
+    """Build a performance dataset from `settings.SCALE_PROFILES[profile]`.
+
+    Masters are created in-process; fact domains are either queued as parallel
+    background jobs (parallel=1, default) or generated sequentially here.
+
+    Example:
+        bench --site tems.local execute "tems.tems_demo.orchestrator.run_scale" --kwargs '{"profile": "scale_smoke", "parallel": 0}'
+    """
+    from . import seed_scale
+
+    context: dict[str, object] = {}
+    _ensure_company(context)
+    started = now_datetime()
+    summary: dict[str, object] = {"profile": profile, "started_at": str(started)}
+    summary["masters"] = seed_scale.seed_scale_masters(profile)
+    if int(parallel):
+        summary["queued_jobs"] = seed_scale.enqueue_fact_domains(profile, domains)
+    else:
+        cfg = demo_settings.get_scale_profile(profile) if demo_settings else {"shards": 1}
+        facts: dict[str, int] = {}
+        for domain in domains or seed_scale.FACT_DOMAINS:
+            for shard in range(cfg["shards"]):
+                for dt, n in seed_scale.seed_domain_shard(profile, domain, shard).items():
+                    facts[dt] = facts.get(dt, 0) + n
+        summary["facts"] = facts
+    summary["elapsed_seconds"] = round((now_datetime() - started).total_seconds(), 1)
+    write_debug_json(f"demo_scale_{profile}.json", summary)
+    frappe.logger().info(f"[TEMS SCALE] {summary}")
+    return summary
+
+
 def _write_summary(context, filename: str = "demo_data_summary.md"):
     lines = ["# TEMS Demo Data Summary", "", f"Generated: {now_datetime()}", ""]
     for k, v in sorted(context.items()):
@@ -96,3 +96,52 @@ def dump_recent_errors(limit: int = 50):  # bench execute entrypoint if needed
             lines = [l.strip() for l in fh.readlines() if l.startswith('- ')]
             out = lines[-limit:]
     return {"recent": out}
+
+
+_STANDARD_COLUMNS = ("name", "creation", "modified", "owner", "modified_by", "docstatus", "idx")
+
+
+def bulk_insert_rows(doctype: str, rows: Iterable[dict], *, batch_size: int = 5000) -> int:
+    """Insert plain row dicts straight into the DocType table in batches.
+
+    Bypasses controllers and doc_events on purpose: used by the scale profile
+    where millions of rows must land in minutes. Standard columns (creation,
+    owner, docstatus ...) are filled in; `name` is taken from the row. Rows of
+    autoincrement DocTypes may omit it, but then re-runs insert new rows instead
+    of being ignored as duplicates. Commits once per batch.
+    """
+    from frappe.utils import now_datetime
+
+    meta = frappe.get_meta(doctype)
+    autoincrement = meta.autoname == "autoincrement"
+    # Columns missing on this install (optional custom fields) are dropped silently
+    valid_columns = set(meta.get_valid_columns())
+    stamp = now_datetime()
+    user = frappe.session.user or "Administrator"
+    fields: list[str] | None = None
+    named = True
+    batch: list[tuple] = []
+    inserted = 0
+
+    def _flush():
+        nonlocal inserted
+        if not batch:
+            return
+        frappe.db.bulk_insert(doctype, fields, batch, ignore_duplicates=True)
+        frappe.db.commit()
+        inserted += len(batch)
+        batch.clear()
+
+    for row in rows:
+        if fields is None:
+            named = not autoincrement or "name" in row
+            data_fields = [f for f in row if f not in _STANDARD_COLUMNS and f in valid_columns]
+            fields = (["name"] if named else []) + list(_STANDARD_COLUMNS[1:]) + data_fields
+        values = [row["name"]] if named else []
+        values += [row.get("creation") or stamp, stamp, user, user, row.get("docstatus", 0), 0]
+        values += [row.get(f) for f in fields[len(values):]]
+        batch.append(tuple(values))
+        if len(batch) >= batch_size:
+            _flush()
+    _flush()
+    return inserted
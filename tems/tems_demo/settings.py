@@ -51,6 +51,50 @@ REBALANCE_BEHAVIOR = {
 
 BACKUP_DIR = "demo_backups"  # folder under site for JSON backups before destructive actions
 
+# Scale profile used by `orchestrator.run_scale` to build performance datasets.
+# Row counts are absolute targets; facts are spread over the `history_days`
+# before `history_end` (a fixed date, so re-runs produce the same rows) and split
+# into `shards` per domain so they can be generated by parallel background jobs.
+SCALE_PROFILES = {
+    "scale": {
+        "seed": 20251019,
+        "history_end": "2025-10-19",
+        "history_days": 180,
+        "shards": 8,
+        "batch_size": 5000,
+        "targets": {
+            "Employee": 6000,
+            "Vehicle": 5000,
+            "Tyre": 30000,
+            "Movement Log": 2_000_000,
+            "Tyre Sensor Data": 3_000_000,
+            "Fuel Log": 250_000,
+            "Cost And Revenue Ledger": 1_000_000,
+            "Incident Report": 25_000,
+            "SOS Event": 5_000,
+        },
+    },
+    # Same shape, small enough to build on a laptop in under a minute
+    "scale_smoke": {
+        "seed": 20251019,
+        "history_end": "2025-10-19",
+        "history_days": 14,
+        "shards": 2,
+        "batch_size": 1000,
+        "targets": {
+            "Employee": 60,
+            "Vehicle": 50,
+            "Tyre": 300,
+            "Movement Log": 5_000,
+            "Tyre Sensor Data": 5_000,
+            "Fuel Log": 500,
+            "Cost And Revenue Ledger": 2_000,
+            "Incident Report": 100,
+            "SOS Event": 20,
+        },
+    },
+}
+
 DASHBOARD_MD = "demo_dashboard.md"
 DASHBOARD_HTML = "demo_dashboard.html"
 
@@ -59,3 +103,8 @@ def get_target(doctype: str, default: int = 0) -> int:
 
 def get_ceiling(doctype: str, default: int | None = None):
     return CEILINGS.get(doctype, default)
+
+def get_scale_profile(profile: str = "scale") -> dict:
+    if profile not in SCALE_PROFILES:
+        raise ValueError(f"Unknown scale profile: {profile}")
+    return SCALE_PROFILES[profile]
@@ -0,0 +1,248 @@
+"""Streaming cost anomaly detection on `Cost And Revenue Ledger` inserts.
+
+Cost rows are grouped by (vehicle, cost type), the cost type being the
+ledger's reference doctype (Fuel Log, Maintenance Work Order, ...). Each
+group has one row in ``tems_cost_stats`` holding:
+
+- lifetime running count, mean and M2 (Welford) for reporting, and
+- the last RING_SIZE amounts as a float32 ring buffer (RING_SIZE * 4 bytes),
+  written at position ``samples % RING_SIZE``.
+
+A new cost is scored before it enters the ring with the modified z-score
+``(x - median) / (1.4826 * MAD)`` over the ring, which one earlier spike
+cannot inflate the way it inflates a mean/stddev. Only upward spikes are
+flagged. Anomalies go out through `alert_engine.queue_alert`, so they are
+recorded and notified within a minute of the commit in batches, and nothing
+scans the ledger on a schedule.
+"""
+from __future__ import annotations
+
+from array import array
+
+import frappe
+import numpy as np
+from frappe.utils import flt, getdate, now_datetime
+
+STATS_TABLE = "tems_cost_stats"
+RING_SIZE = 64
+MIN_SAMPLES = 8
+Z_THRESHOLD = 3.5
+MAD_SCALE = 1.4826
+# Relative floor on the spread: a vehicle billed the same amount every time
+# must not flag a 2% price change
+MIN_REL_SPREAD = 0.05
+DEFAULT_COST_TYPE = "Other"
+
+
+def ensure_stats_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{STATS_TABLE}` (
+            vehicle varchar(140) not null,
+            cost_type varchar(140) not null,
+            samples int unsigned not null default 0,
+            mean double not null default 0,
+            m2 double not null default 0,
+            ring varbinary({RING_SIZE * 4}) not null default '',
+            last_amount double,
+            last_z double,
+            last_date date,
+            last_entry varchar(140),
+            modified datetime(6),
+            primary key (vehicle, cost_type)
+        ) engine=InnoDB
+        """
+    )
+
+
+def cost_type_of(doc) -> str:
+    return doc.get("reference_doctype") or DEFAULT_COST_TYPE
+
+
+def unpack(ring: bytes | None) -> np.ndarray:
+    values = array("f")
+    values.frombytes(bytes(ring or b""))
+    return np.asarray(values, dtype=float)
+
+
+def push(ring: bytes | None, samples: int, amount: float) -> bytes:
+    """Ring with `amount` written over the oldest slot once full."""
+    values = array("f")
+    values.frombytes(bytes(ring or b""))
+    if len(values) < RING_SIZE:
+        values.append(amount)
+    else:
+        values[samples % RING_SIZE] = amount
+    return values.tobytes()
+
+
+def robust_score(window: np.ndarray, amount: float) -> float | None:
+    """Modified z-score of `amount` against the window; None while it is too short."""
+    if len(window) < MIN_SAMPLES:
+        return None
+    median = float(np.median(window))
+    spread = max(MAD_SCALE * float(np.median(np.abs(window - median))), MIN_REL_SPREAD * abs(median))
+    return (amount - median) / spread if spread > 0 else None
+
+
+def severity(z: float) -> str:
+    return "high" if z >= 2 * Z_THRESHOLD else "medium" if z >= Z_THRESHOLD else "low"
+
+
+def assess(window: np.ndarray, amount: float) -> dict:
+    """Anomaly verdict for `amount` against the window."""
+    z = robust_score(window, amount)
+    if z is None:
+        return {"anomaly": False, "z_score": None, "reason": "Insufficient historical data"}
+    return {
+        "anomaly": z > Z_THRESHOLD,
+        "z_score": round(z, 2),
+        "median_cost": round(float(np.median(window)), 2),
+        "severity": severity(z),
+    }
+
+
+def fold(stats: dict, amount: float) -> dict:
+    """Welford update of the lifetime count/mean/M2 plus the ring write."""
+    samples = (stats.get("samples") or 0) + 1
+    mean = flt(stats.get("mean"))
+    delta = amount - mean
+    mean += delta / samples
+    return {
+        "samples": samples,
+        "mean": mean,
+        "m2": flt(stats.get("m2")) + delta * (amount - mean),
+        "ring": push(stats.get("ring"), samples - 1, amount),
+    }
+
+
+def _locked_stats(vehicle: str, cost_type: str) -> dict:
+    frappe.db.sql(
+        f"insert ignore into `{STATS_TABLE}` (vehicle, cost_type) values (%s, %s)", (vehicle, cost_type)
+    )
+    return frappe.db.sql(
+        f"select * from `{STATS_TABLE}` where vehicle = %s and cost_type = %s for update",
+        (vehicle, cost_type),
+        as_dict=True,
+    )[0]
+
+
+def get_stats(vehicle: str, cost_type: str) -> dict | None:
+    rows = frappe.db.sql(
+        f"select * from `{STATS_TABLE}` where vehicle = %s and cost_type = %s",
+        (vehicle, cost_type),
+        as_dict=True,
+    )
+    return rows[0] if rows else None
+
+
+def record(vehicle: str, cost_type: str, amount, entry_date=None, entry: str | None = None) -> dict:
+    """Score one cost against its (vehicle, cost type) window and fold it in."""
+    amount = flt(amount)
+    stats = _locked_stats(vehicle, cost_type)
+    window = unpack(stats.get("ring"))
+    z = robust_score(window, amount)
+    values = {
+        **fold(stats, amount),
+        "vehicle": vehicle,
+        "cost_type": cost_type,
+        "last_amount": amount,
+        "last_z": z,
+        "last_date": getdate(entry_date),
+        "last_entry": entry,
+        "modified": now_datetime(),
+    }
+    frappe.db.sql(
+        f"""
+        update `{STATS_TABLE}`
+        set samples = %(samples)s, mean = %(mean)s, m2 = %(m2)s, ring = %(ring)s,
+            last_amount = %(last_amount)s, last_z = %(last_z)s, last_date = %(last_date)s,
+            last_entry = %(last_entry)s, modified = %(modified)s
+        where vehicle = %(vehicle)s and cost_type = %(cost_type)s
+        """,
+        values,
+    )
+    return {"vehicle": vehicle, "cost_type": cost_type, "amount": amount, **assess(window, amount)}
+
+
+def on_ledger_insert(doc, method=None):
+    """Cost And Revenue Ledger after_insert: score the cost and queue an alert on a spike."""
+    if doc.type != "Cost" or not doc.vehicle or flt(doc.amount) <= 0:
+        return
+    result = record(doc.vehicle, cost_type_of(doc), doc.amount, doc.date, doc.name)
+    if not result["anomaly"]:
+        return
+
+    from tems.tems_ai.services.alert_engine import queue_alert
+
+    queue_alert(
+        domain="finance",
+        alert_type="cost_anomaly",
+        severity=result["severity"],
+        message=f"{result['cost_type']} cost of {result['amount']:,.2f} on {doc.vehicle} "
+        f"vs median {result['median_cost']:,.2f} (z={result['z_score']})",
+        details={**result, "ledger_entry": doc.name, "reference_name": doc.get("reference_name")},
+        value=result["amount"],
+    )
+
+
+def recent_anomalies(since=None, vehicle: str | None = None, limit: int = 50) -> list[dict]:
+    """Groups whose latest cost was a spike, largest excess over the lifetime mean first."""
+    condition = "and vehicle = %(vehicle)s" if vehicle else ""
+    return frappe.db.sql(
+        f"""
+        select vehicle, cost_type, last_amount, last_z, last_date, last_entry, mean,
+            last_amount - mean as excess
+        from `{STATS_TABLE}`
+        where last_z > %(threshold)s and last_date >= %(since)s {condition}
+        order by excess desc
+        limit %(limit)s
+        """,
+        {
+            "threshold": Z_THRESHOLD,
+            "since": getdate(since) if since else "1900-01-01",
+            "vehicle": vehicle,
+            "limit": int(limit),
+        },
+        as_dict=True,
+    )
+
+
+def rebuild(vehicle: str | None = None) -> int:
+    """Recompute the stats rows from ledger history (backfill / repair)."""
+    ensure_stats_table()
+    condition = "and vehicle = %(vehicle)s" if vehicle else ""
+    entries = frappe.db.sql(
+        f"""
+        select name, vehicle, coalesce(nullif(reference_doctype, ''), %(default)s) as cost_type, amount, date
+        from `tabCost And Revenue Ledger`
+        where type = 'Cost' and vehicle is not null and amount > 0 {condition}
+        order by vehicle, cost_type, date, creation
+        """,
+        {"vehicle": vehicle, "default": DEFAULT_COST_TYPE},
+        as_dict=True,
+    )
+    rows: dict[tuple, dict] = {}
+    for entry in entries:
+        key = (entry.vehicle, entry.cost_type)
+        stats = rows.setdefault(key, {"vehicle": entry.vehicle, "cost_type": entry.cost_type})
+        amount = flt(entry.amount)
+        z = robust_score(unpack(stats.get("ring")), amount)
+        stats.update(
+            fold(stats, amount), last_amount=amount, last_z=z, last_date=entry.date, last_entry=entry.name
+        )
+
+    scope = "where vehicle = %(vehicle)s" if vehicle else ""
+    frappe.db.sql(f"delete from `{STATS_TABLE}` {scope}", {"vehicle": vehicle})
+    columns = [
+        "vehicle", "cost_type", "samples", "mean", "m2", "ring",
+        "last_amount", "last_z", "last_date", "last_entry", "modified",
+    ]
+    now = now_datetime()
+    batch = list(rows.values())
+    for start in range(0, len(batch), 500):
+        chunk = batch[start : start + 500]
+        placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(chunk))
+        values = [row.get(c) if c != "modified" else now for row in chunk for c in columns]
+        frappe.db.sql(f"insert into `{STATS_TABLE}` ({', '.join(columns)}) values {placeholders}", values)
+    return len(rows)
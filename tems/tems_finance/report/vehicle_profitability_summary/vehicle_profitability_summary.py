@@ -1,6 +1,8 @@
 from __future__ import annotations
 import frappe
 
+from tems.tems_insights.facts import VEHICLE_DAILY, fact_tables_ready
+
 
 def _safe_float(val):
     try:
@@ -19,14 +21,30 @@ def execute(filters=None):
         {"label": "Net Profit", "fieldname": "net", "fieldtype": "Currency", "width": 120},
     ]
     vehicles = frappe.get_all("Vehicle", pluck="name")
+    totals = _ledger_totals()
+    fleet_costs = {}
+    if frappe.db.table_exists("Fleet Costs"):
+        fleet_costs = dict(frappe.db.sql("select vehicle, sum(amount) from `tabFleet Costs` group by vehicle"))
     data = []
     for v in vehicles:
-        rev_raw = frappe.db.get_value("Cost And Revenue Ledger", {"vehicle": v, "type": "Revenue"}, "sum(amount)") or 0
-        cost_raw = frappe.db.get_value("Cost And Revenue Ledger", {"vehicle": v, "type": "Cost"}, "sum(amount)") or 0
+        rev_raw, cost_raw = totals.get(v, (0, 0))
         rev = _safe_float(rev_raw)
-        cost = _safe_float(cost_raw)
-        if frappe.db.table_exists("tabFleet Costs"):
-            fc_raw = frappe.db.get_value("Fleet Costs", {"vehicle": v}, "sum(amount)") or 0
-            cost += _safe_float(fc_raw)
+        cost = _safe_float(cost_raw) + _safe_float(fleet_costs.get(v))
         data.append({"vehicle": v, "revenues": rev, "costs": cost, "net": (rev - cost)})
     return columns, data
+
+
+def _ledger_totals() -> dict:
+    """Revenue/cost per vehicle, from the daily fact table when it has been built."""
+    if fact_tables_ready():
+        rows = frappe.db.sql(f"select vehicle, sum(revenue), sum(cost) from `{VEHICLE_DAILY}` group by vehicle")
+    else:
+        rows = frappe.db.sql(
+            """
+            select vehicle,
+                sum(case when type = 'Revenue' then amount else 0 end),
+                sum(case when type = 'Cost' then amount else 0 end)
+            from `tabCost And Revenue Ledger` group by vehicle
+            """
+        )
+    return {r[0]: (r[1], r[2]) for r in rows}
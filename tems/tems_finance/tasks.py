@@ -4,6 +4,7 @@ from __future__ import annotations
 import frappe
 from frappe.utils import nowdate
 from .handlers import compute_profitability_for_all
+from tems.tems_main.scheduler import tems_job
 
 
 def _log(msg: str) -> None:
@@ -13,6 +14,7 @@ def _log(msg: str) -> None:
         print(f"[TEMS][Finance] {msg}")
 
 
+@tems_job(base_interval=240, max_interval=3600)
 def update_vehicle_profitability() -> None:
     compute_profitability_for_all()
     _log("Vehicle profitability recomputed")
@@ -0,0 +1,316 @@
+"""Rolling per-vehicle fuel-efficiency statistics and anomaly scoring.
+
+Every `Fuel Log` is a fill-up: the liters put in cover the distance driven
+since the vehicle's previous fill-up, so each log after the first yields one
+L/100km sample. ``tems_vehicle_fuel_stats`` keeps one row per vehicle with the
+running mean and variance of those samples, updated on insert with Welford's
+recurrence in its weighted form:
+
+    a = 1 / min(samples, WINDOW)
+    mean += a * delta
+    var = (1 - a) * (var + a * delta^2)
+
+Up to WINDOW samples this is exact Welford (population variance); after that
+it becomes an exponentially weighted window, so the baseline follows a
+vehicle through seasons and repairs. An anomalous sample is scored against the
+baseline before the update and only enters it clipped to Z_CLIP standard
+deviations, so a leak or theft does not teach the model that it is normal.
+
+Logs that go backwards on the odometer (backdated entries, or the correction
+after a mistyped high reading) or jump more than MAX_GAP_KM (missed fill-ups,
+mistyped readings) are not scored and become the new distance reference, so
+one bad reading cannot block every later fill-up.
+
+`fleet_sweep` scores the whole fleet from the stats table in one query:
+vehicles whose latest fill-up was anomalous, and vehicles whose baseline is
+itself an outlier among vehicles of the same type (median/MAD robust z).
+"""
+from __future__ import annotations
+
+import frappe
+import numpy as np
+from frappe.utils import flt, getdate, now_datetime
+
+STATS_TABLE = "tems_vehicle_fuel_stats"
+WINDOW = 30
+MIN_SAMPLES = 5
+Z_THRESHOLD = 2.5
+Z_CLIP = 3.0
+# Relative floor on the standard deviation: a very regular vehicle must not
+# turn every 1% wobble into a multi-sigma event
+MIN_REL_STD = 0.05
+MAX_GAP_KM = 5000
+MAX_L_PER_100KM = 200.0
+
+
+def ensure_stats_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{STATS_TABLE}` (
+            vehicle varchar(140) not null primary key,
+            samples int unsigned not null default 0,
+            mean double not null default 0,
+            var double not null default 0,
+            last_odometer double,
+            last_date date,
+            last_log varchar(140),
+            last_efficiency double,
+            last_z double,
+            modified datetime(6)
+        ) engine=InnoDB
+        """
+    )
+
+
+def efficiency(liters, distance_km) -> float | None:
+    """L/100km of one fill-up, or None when the pair cannot be a sample."""
+    liters, distance_km = flt(liters), flt(distance_km)
+    if liters <= 0 or distance_km <= 0 or distance_km > MAX_GAP_KM:
+        return None
+    value = liters / distance_km * 100.0
+    return value if value <= MAX_L_PER_100KM else None
+
+
+def std_of(mean: float, var: float) -> float:
+    std = max(var, 0.0) ** 0.5
+    return max(std, MIN_REL_STD * mean) if mean > 0 else std
+
+
+def score(stats: dict | None, value: float) -> float | None:
+    """z-score of `value` against a stats row; None while the baseline is too short."""
+    if not stats or (stats.get("samples") or 0) < MIN_SAMPLES:
+        return None
+    std = std_of(stats["mean"], stats["var"])
+    return (value - stats["mean"]) / std if std > 0 else None
+
+
+def update(stats: dict, value: float, z: float | None) -> dict:
+    """Fold one sample into a stats row (returns the new samples/mean/var)."""
+    samples = (stats.get("samples") or 0) + 1
+    mean, var = flt(stats.get("mean")), flt(stats.get("var"))
+    if z is not None and abs(z) > Z_CLIP:
+        value = mean + (Z_CLIP if z > 0 else -Z_CLIP) * std_of(mean, var)
+    a = 1.0 / min(samples, WINDOW)
+    delta = value - mean
+    return {
+        "samples": samples,
+        "mean": mean + a * delta,
+        "var": (1 - a) * (var + a * delta * delta),
+    }
+
+
+def severity(z: float) -> str:
+    z = abs(z)
+    return "high" if z > 3 else "medium" if z > 2 else "low"
+
+
+def _locked_stats(vehicle: str) -> dict:
+    frappe.db.sql(f"insert ignore into `{STATS_TABLE}` (vehicle) values (%s)", (vehicle,))
+    return frappe.db.sql(
+        f"select * from `{STATS_TABLE}` where vehicle = %s for update", (vehicle,), as_dict=True
+    )[0]
+
+
+def record(vehicle: str, odometer, liters, log_date=None, log_name: str | None = None) -> dict:
+    """Score one fill-up against the vehicle's baseline and fold it in.
+
+    Returns the scoring result ("anomaly", "z_score", "efficiency", ...).
+    """
+    stats = _locked_stats(vehicle)
+    odometer = flt(odometer)
+    result = {"vehicle": vehicle, "anomaly": False, "z_score": None, "efficiency": None}
+    if not odometer:
+        return {**result, "reason": "No odometer reading"}
+
+    last_odometer = stats.get("last_odometer")
+    value = efficiency(liters, odometer - last_odometer) if last_odometer is not None else None
+    values = {
+        "vehicle": vehicle,
+        "last_odometer": odometer,
+        "last_date": getdate(log_date),
+        "last_log": log_name,
+        "modified": now_datetime(),
+    }
+    if value is None:
+        frappe.db.sql(
+            f"""
+            update `{STATS_TABLE}`
+            set last_odometer = %(last_odometer)s, last_date = %(last_date)s,
+                last_log = %(last_log)s, modified = %(modified)s
+            where vehicle = %(vehicle)s
+            """,
+            values,
+        )
+        if last_odometer is not None and odometer <= last_odometer:
+            return {**result, "reason": "Odometer not beyond the previous fill-up; baseline reference reset"}
+        return {**result, "reason": "First fill-up or distance gap; baseline reference reset"}
+
+    z = score(stats, value)
+    values.update(update(stats, value, z), last_efficiency=value, last_z=z)
+    frappe.db.sql(
+        f"""
+        update `{STATS_TABLE}`
+        set samples = %(samples)s, mean = %(mean)s, var = %(var)s,
+            last_odometer = %(last_odometer)s, last_date = %(last_date)s, last_log = %(last_log)s,
+            last_efficiency = %(last_efficiency)s, last_z = %(last_z)s, modified = %(modified)s
+        where vehicle = %(vehicle)s
+        """,
+        values,
+    )
+    result.update(
+        efficiency=round(value, 2), average_efficiency=round(stats["mean"], 2), samples=stats["samples"]
+    )
+    if z is None:
+        return {**result, "reason": "Insufficient historical data"}
+    return {**result, "anomaly": abs(z) > Z_THRESHOLD, "z_score": round(z, 2), "severity": severity(z)}
+
+
+def on_fuel_log_insert(doc, method=None):
+    """Fuel Log after_insert: score the fill-up and update the vehicle's baseline."""
+    if not doc.vehicle:
+        return
+    result = record(doc.vehicle, doc.odometer, doc.liters, doc.date, doc.name)
+    doc.flags.fuel_anomaly = result
+    if not result["anomaly"]:
+        return
+
+    from tems.tems_ai.services.alert_engine import queue_alert
+
+    queue_alert(
+        domain="fleet",
+        alert_type="fuel_anomaly",
+        severity=result["severity"],
+        message=f"Fuel consumption of {doc.vehicle} at {result['efficiency']} L/100km "
+        f"vs {result['average_efficiency']} L/100km baseline (z={result['z_score']})",
+        details={**result, "fuel_log": doc.name},
+        value=result["efficiency"],
+    )
+
+
+def get_stats(vehicle: str) -> dict | None:
+    rows = frappe.db.sql(f"select * from `{STATS_TABLE}` where vehicle = %s", (vehicle,), as_dict=True)
+    return rows[0] if rows else None
+
+
+def rebuild(vehicle: str | None = None) -> int:
+    """Recompute the stats rows from Fuel Log history (backfill / repair).
+
+    Streams the logs once in (vehicle, date, odometer) order; returns the
+    number of vehicles written.
+    """
+    ensure_stats_table()
+    condition = "and vehicle = %(vehicle)s" if vehicle else ""
+    logs = frappe.db.sql(
+        f"""
+        select name, vehicle, odometer, liters, date
+        from `tabFuel Log`
+        where vehicle is not null and odometer > 0 {condition}
+        order by vehicle, date, odometer, creation
+        """,
+        {"vehicle": vehicle},
+        as_dict=True,
+    )
+    rows: dict[str, dict] = {}
+    for log in logs:
+        stats = rows.setdefault(log.vehicle, {"vehicle": log.vehicle, "samples": 0, "mean": 0.0, "var": 0.0,
+                                              "last_odometer": None, "last_efficiency": None, "last_z": None})
+        last_odometer = stats["last_odometer"]
+        value = efficiency(log.liters, log.odometer - last_odometer) if last_odometer is not None else None
+        if value is not None:
+            z = score(stats, value)
+            stats.update(update(stats, value, z), last_efficiency=value, last_z=z)
+        stats.update(last_odometer=log.odometer, last_date=log.date, last_log=log.name)
+
+    scope = "where vehicle = %(vehicle)s" if vehicle else ""
+    frappe.db.sql(f"delete from `{STATS_TABLE}` {scope}", {"vehicle": vehicle})
+    columns = [
+        "vehicle", "samples", "mean", "var", "last_odometer",
+        "last_date", "last_log", "last_efficiency", "last_z", "modified",
+    ]
+    now = now_datetime()
+    batch = list(rows.values())
+    for start in range(0, len(batch), 500):
+        chunk = batch[start : start + 500]
+        placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(chunk))
+        values = [row.get(c) if c != "modified" else now for row in chunk for c in columns]
+        frappe.db.sql(f"insert into `{STATS_TABLE}` ({', '.join(columns)}) values {placeholders}", values)
+    return len(rows)
+
+
+def robust_z(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Median/MAD z-score of each value within its group (NaN where undefined)."""
+    out = np.full(values.shape, np.nan)
+    keys, inverse = np.unique(groups, return_inverse=True)
+    for g in range(len(keys)):
+        mask = inverse == g
+        if mask.sum() < MIN_SAMPLES:
+            continue
+        group = values[mask]
+        median = np.median(group)
+        mad = np.median(np.abs(group - median))
+        scale = max(1.4826 * mad, MIN_REL_STD * median)
+        if scale > 0:
+            out[mask] = (group - median) / scale
+    return out
+
+
+def fleet_sweep(since=None, z_threshold: float = Z_THRESHOLD) -> dict:
+    """Fleet-wide fuel anomaly scan from the stats table (one query).
+
+    Args:
+        since: only report latest-fill-up anomalies logged on/after this date
+        z_threshold: z-score above which a vehicle is reported
+
+    Returns:
+        {"entries": [...], "outliers": [...]} sorted by |z| descending
+    """
+    rows = frappe.db.sql(
+        f"""
+        select s.vehicle, s.samples, s.mean, s.var, s.last_efficiency, s.last_z, s.last_date, s.last_log,
+            ifnull(v.vehicle_type, '') as vehicle_type
+        from `{STATS_TABLE}` s
+        left join `tabVehicle` v on v.name = s.vehicle
+        where s.samples >= %(min_samples)s
+        """,
+        {"min_samples": MIN_SAMPLES},
+        as_dict=True,
+    )
+    if not rows:
+        return {"entries": [], "outliers": []}
+
+    mean = np.array([r.mean for r in rows], dtype=float)
+    last_z = np.array([np.nan if r.last_z is None else r.last_z for r in rows], dtype=float)
+    types = np.array([r.vehicle_type for r in rows], dtype=object)
+    fleet_z = robust_z(mean, types)
+    since = getdate(since) if since else None
+
+    def _entry(i):
+        r = rows[i]
+        return {
+            "vehicle": r.vehicle,
+            "fuel_log": r.last_log,
+            "date": r.last_date,
+            "efficiency": round(r.last_efficiency, 2),
+            "average_efficiency": round(r.mean, 2),
+            "z_score": round(float(last_z[i]), 2),
+            "severity": severity(last_z[i]),
+        }
+
+    def _outlier(i):
+        r = rows[i]
+        return {
+            "vehicle": r.vehicle,
+            "vehicle_type": r.vehicle_type or None,
+            "average_efficiency": round(r.mean, 2),
+            "z_score": round(float(fleet_z[i]), 2),
+            "severity": severity(fleet_z[i]),
+        }
+
+    flagged = np.flatnonzero(np.abs(np.nan_to_num(last_z)) > z_threshold)
+    entries = [_entry(i) for i in flagged[np.argsort(-np.abs(last_z[flagged]))]]
+    if since:
+        entries = [e for e in entries if e["date"] and getdate(e["date"]) >= since]
+    # Only high consumption makes a vehicle a fleet outlier worth acting on
+    high = np.flatnonzero(np.nan_to_num(fleet_z) > z_threshold)
+    outliers = [_outlier(i) for i in high[np.argsort(-fleet_z[high])]]
+    return {"entries": entries, "outliers": outliers}
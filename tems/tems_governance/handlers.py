@@ -1,28 +1,24 @@
 import frappe
 
+from tems.tems_main import realtime
+
+GOVERNANCE_TOPICS = realtime.role_topics(*realtime.LEADERSHIP_ROLES, "Safety Manager")
+
 
 def on_spot_check(doc, method=None):
-    # Broadcast governance log for leadership oversight
-    frappe.publish_realtime(
-        event="governance_event",
-        message={
-            "type": "spot_check",
-            "name": getattr(doc, "name", None),
-            "inspector": getattr(doc, "inspector", None),
-            "status": getattr(doc, "status", None),
-        },
+    # Governance delta for leadership oversight
+    realtime.publish(
+        "governance_event",
+        {"type": "spot_check", **realtime.doc_delta(doc, ("inspector", "status"))},
+        GOVERNANCE_TOPICS,
     )
 
 
 def on_compliance_audit(doc, method=None):
-    frappe.publish_realtime(
-        event="governance_event",
-        message={
-            "type": "compliance_audit",
-            "name": getattr(doc, "name", None),
-            "severity": getattr(doc, "severity", None),
-            "status": getattr(doc, "status", None),
-        },
+    realtime.publish(
+        "governance_event",
+        {"type": "compliance_audit", **realtime.doc_delta(doc, ("severity", "status"))},
+        GOVERNANCE_TOPICS,
     )
 
 
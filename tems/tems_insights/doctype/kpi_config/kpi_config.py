@@ -1,5 +1,22 @@
+import json
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
 
+
 class KPIConfig(Document):
-    pass
+    def validate(self):
+        if self.filter_json:
+            try:
+                json.loads(self.filter_json)
+            except ValueError:
+                frappe.throw(_("Filters (JSON) is not valid JSON"))
+        if not self.reference_doctype:
+            return
+        meta = frappe.get_meta(self.reference_doctype)
+        valid = set(meta.get_valid_columns())
+        if self.aggregation in ("Sum", "Avg") and self.metric_field not in valid:
+            frappe.throw(_("Metric Field {0} is not a column of {1}").format(self.metric_field, self.reference_doctype))
+        if self.date_field and self.date_field not in valid:
+            frappe.throw(_("Date Field {0} is not a column of {1}").format(self.date_field, self.reference_doctype))
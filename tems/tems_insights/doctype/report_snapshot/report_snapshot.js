@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Tevc Concepts Limited and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Report Snapshot", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,9 @@
+# Copyright (c) 2025, Tevc Concepts Limited and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestReportSnapshot(FrappeTestCase):
+	pass
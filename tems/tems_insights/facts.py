@@ -0,0 +1,382 @@
+"""Daily operational fact tables for Insights KPIs and reports.
+
+Tables (plain SQL tables, not DocTypes, created by `ensure_fact_tables`):
+
+- ``ins_ops_vehicle_daily``: one row per vehicle and operating date
+- ``ins_ops_driver_daily``: one row per driver (Operation Plan driver) and date
+- ``ins_ops_route_daily``: one row per route (Operation Plan route_reference) and date
+- ``ins_etl_state``: high-water mark (max ``modified`` processed) per source DocType
+
+`build_daily_facts` finds the dates touched by source rows modified since the
+last high-water mark and rebuilds only those dates. Movement minutes and
+distance come from consecutive Movement Log events per vehicle: a segment
+starting in a transit state counts as transit time, distance is the haversine
+between the two positions, and `available_minutes` is the span between the
+first and last event of the day. Deleted source rows are not detected; use
+`rebuild_range` after bulk deletes.
+"""
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_days, get_datetime, getdate, now_datetime
+
+VEHICLE_DAILY = "ins_ops_vehicle_daily"
+DRIVER_DAILY = "ins_ops_driver_daily"
+ROUTE_DAILY = "ins_ops_route_daily"
+ETL_STATE = "ins_etl_state"
+
+TRANSIT_STATES = ("In Transit", "Diversion", "Out Transit")
+# Gaps longer than this between two events are treated as missing data, not transit
+MAX_SEGMENT_MINUTES = 240
+INSERT_CHUNK = 1000
+
+# Source DocType -> SQL expression giving the operating date of a row
+SOURCES = {
+    "Movement Log": "date(event_time)",
+    "Fuel Log": "`date`",
+    "Cost And Revenue Ledger": "`date`",
+    "Incident Report": "incident_date",
+    "Emissions Log": "date(creation)",
+}
+
+_VEHICLE_COLUMNS = (
+    "vehicle",
+    "operating_date",
+    "transit_minutes",
+    "available_minutes",
+    "distance_km",
+    "movement_events",
+    "trips",
+    "fuel_liters",
+    "fuel_cost",
+    "revenue",
+    "cost",
+    "incidents",
+    "co2e_kg",
+    "active_flag",
+    "updated_at",
+)
+_DRIVER_COLUMNS = ("driver", "operating_date", "trips", "vehicles", "transit_minutes", "distance_km", "movement_events", "updated_at")
+_ROUTE_COLUMNS = ("route", "operating_date", "trips", "vehicles", "transit_minutes", "distance_km", "movement_events", "updated_at")
+
+
+def ensure_fact_tables() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{VEHICLE_DAILY}` (
+            vehicle varchar(140) not null,
+            operating_date date not null,
+            transit_minutes double not null default 0,
+            available_minutes double not null default 0,
+            distance_km double not null default 0,
+            movement_events int not null default 0,
+            trips int not null default 0,
+            fuel_liters double not null default 0,
+            fuel_cost double not null default 0,
+            revenue double not null default 0,
+            cost double not null default 0,
+            incidents int not null default 0,
+            co2e_kg double not null default 0,
+            active_flag tinyint not null default 0,
+            updated_at datetime(6),
+            primary key (vehicle, operating_date),
+            index idx_operating_date (operating_date)
+        ) engine=InnoDB
+        """
+    )
+    for table, key in ((DRIVER_DAILY, "driver"), (ROUTE_DAILY, "route")):
+        frappe.db.sql_ddl(
+            f"""
+            create table if not exists `{table}` (
+                {key} varchar(140) not null,
+                operating_date date not null,
+                trips int not null default 0,
+                vehicles int not null default 0,
+                transit_minutes double not null default 0,
+                distance_km double not null default 0,
+                movement_events int not null default 0,
+                updated_at datetime(6),
+                primary key ({key}, operating_date),
+                index idx_operating_date (operating_date)
+            ) engine=InnoDB
+            """
+        )
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{ETL_STATE}` (
+            source varchar(140) not null primary key,
+            high_water datetime(6),
+            updated_at datetime(6)
+        ) engine=InnoDB
+        """
+    )
+
+
+def fact_tables_ready() -> bool:
+    """True once the vehicle-day table exists and has been populated."""
+    if not frappe.db.sql("show tables like %s", VEHICLE_DAILY):
+        return False
+    return bool(frappe.db.sql(f"select 1 from `{VEHICLE_DAILY}` limit 1"))
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _has_position(event) -> bool:
+    return bool(event.get("location_lat") or event.get("location_lng"))
+
+
+def _plan_bucket(agg: dict, plan: str) -> dict:
+    return agg["plans"].setdefault(plan, {"transit_minutes": 0.0, "distance_km": 0.0, "movement_events": 0})
+
+
+def movement_segments(events: list[dict]) -> dict[str, dict]:
+    """Aggregate one day of Movement Log events (ordered by vehicle, event_time) per vehicle.
+
+    Returns {vehicle: {transit_minutes, available_minutes, distance_km, movement_events,
+    plans: {operation_plan: {transit_minutes, distance_km, movement_events}}}}.
+    """
+    per_vehicle: dict[str, dict] = {}
+    previous = None
+    for event in events:
+        vehicle = event["vehicle"]
+        agg = per_vehicle.get(vehicle)
+        if agg is None:
+            agg = per_vehicle[vehicle] = {
+                "transit_minutes": 0.0,
+                "distance_km": 0.0,
+                "movement_events": 0,
+                "first": event["event_time"],
+                "last": event["event_time"],
+                "plans": {},
+            }
+            previous = None
+        agg["movement_events"] += 1
+        agg["last"] = event["event_time"]
+        if event.get("operation_plan"):
+            _plan_bucket(agg, event["operation_plan"])["movement_events"] += 1
+        if previous is not None:
+            minutes = (get_datetime(event["event_time"]) - get_datetime(previous["event_time"])).total_seconds() / 60
+            if 0 < minutes <= MAX_SEGMENT_MINUTES:
+                plan = previous.get("operation_plan")
+                if previous.get("state") in TRANSIT_STATES:
+                    agg["transit_minutes"] += minutes
+                    if plan:
+                        _plan_bucket(agg, plan)["transit_minutes"] += minutes
+                if _has_position(previous) and _has_position(event):
+                    km = haversine_km(
+                        previous["location_lat"], previous["location_lng"], event["location_lat"], event["location_lng"]
+                    )
+                    agg["distance_km"] += km
+                    if plan:
+                        _plan_bucket(agg, plan)["distance_km"] += km
+        previous = event
+
+    for agg in per_vehicle.values():
+        agg["available_minutes"] = (get_datetime(agg.pop("last")) - get_datetime(agg.pop("first"))).total_seconds() / 60
+    return per_vehicle
+
+
+def _high_waters() -> dict[str, object]:
+    return dict(frappe.db.sql(f"select source, high_water from `{ETL_STATE}`"))
+
+
+def _set_high_water(source: str, value) -> None:
+    frappe.db.sql(
+        f"""
+        insert into `{ETL_STATE}` (source, high_water, updated_at) values (%s, %s, %s)
+        on duplicate key update high_water = values(high_water), updated_at = values(updated_at)
+        """,
+        (source, value, now_datetime()),
+    )
+
+
+def dirty_dates() -> tuple[set, dict]:
+    """Dates touched by source rows modified after each source's high-water mark."""
+    marks = _high_waters()
+    dates: set = set()
+    new_marks: dict[str, object] = {}
+    for source, date_expr in SOURCES.items():
+        if not frappe.db.table_exists(source):
+            continue
+        # Cap at the current max so rows written while we run are picked up next time
+        latest = frappe.db.sql(f"select max(modified) from `tab{source}`")[0][0]
+        if not latest:
+            continue
+        mark = marks.get(source)
+        condition = "modified > %(mark)s and modified <= %(latest)s" if mark else "modified <= %(latest)s"
+        rows = frappe.db.sql(
+            f"select distinct {date_expr} from `tab{source}` where {condition}",
+            {"mark": mark, "latest": latest},
+        )
+        dates.update(getdate(r[0]) for r in rows if r[0])
+        new_marks[source] = latest
+    return dates, new_marks
+
+
+def _grouped(query: str, day) -> dict[str, tuple]:
+    return {r[0]: r[1:] for r in frappe.db.sql(query, {"day": day}) if r[0]}
+
+
+def build_day(day) -> dict[str, int]:
+    """Recompute all fact rows for one operating date."""
+    day = getdate(day)
+    start, end = get_datetime(day), get_datetime(add_days(day, 1))
+    events = frappe.db.sql(
+        """
+        select vehicle, operation_plan, state, event_time, location_lat, location_lng
+        from `tabMovement Log`
+        where event_time >= %(start)s and event_time < %(end)s and ifnull(vehicle, '') != ''
+        order by vehicle, event_time
+        """,
+        {"start": start, "end": end},
+        as_dict=True,
+    )
+    movement = movement_segments(events)
+
+    plan_names = {plan for agg in movement.values() for plan in agg["plans"]}
+    plans = {
+        p.name: p
+        for p in (
+            frappe.get_all(
+                "Operation Plan",
+                filters={"name": ["in", list(plan_names)]},
+                fields=["name", "driver", "route_reference"],
+            )
+            if plan_names
+            else []
+        )
+    }
+
+    fuel = _grouped(
+        "select vehicle, sum(liters), sum(total_cost) from `tabFuel Log` where `date` = %(day)s group by vehicle", day
+    )
+    ledger = _grouped(
+        """
+        select vehicle,
+            sum(case when type = 'Revenue' then amount else 0 end),
+            sum(case when type = 'Cost' then amount else 0 end)
+        from `tabCost And Revenue Ledger` where `date` = %(day)s group by vehicle
+        """,
+        day,
+    )
+    incidents = _grouped(
+        "select vehicle, count(*) from `tabIncident Report` where incident_date = %(day)s group by vehicle", day
+    )
+    emissions = _grouped(
+        """
+        select vehicle, sum(co2e_kg) from `tabEmissions Log`
+        where creation >= %(day)s and creation < date_add(%(day)s, interval 1 day) group by vehicle
+        """,
+        day,
+    )
+
+    stamp = now_datetime()
+    vehicle_rows = []
+    for vehicle in set(movement) | set(fuel) | set(ledger) | set(incidents) | set(emissions):
+        agg = movement.get(vehicle, {})
+        liters, fuel_cost = fuel.get(vehicle, (0, 0))
+        revenue, cost = ledger.get(vehicle, (0, 0))
+        vehicle_rows.append(
+            (
+                vehicle,
+                day,
+                round(agg.get("transit_minutes", 0), 2),
+                round(agg.get("available_minutes", 0), 2),
+                round(agg.get("distance_km", 0), 3),
+                agg.get("movement_events", 0),
+                len(agg.get("plans", ())),
+                liters or 0,
+                fuel_cost or 0,
+                revenue or 0,
+                cost or 0,
+                incidents.get(vehicle, (0,))[0],
+                emissions.get(vehicle, (0,))[0] or 0,
+                1 if agg.get("movement_events") else 0,
+                stamp,
+            )
+        )
+
+    def _bucket():
+        return {"trips": 0, "vehicles": set(), "transit_minutes": 0.0, "distance_km": 0.0, "movement_events": 0}
+
+    by_driver: dict[str, dict] = defaultdict(_bucket)
+    by_route: dict[str, dict] = defaultdict(_bucket)
+    for vehicle, agg in movement.items():
+        for plan_name, seg in agg["plans"].items():
+            plan = plans.get(plan_name)
+            if not plan:
+                continue
+            for key, target in ((plan.driver, by_driver), (plan.route_reference, by_route)):
+                if not key:
+                    continue
+                bucket = target[key]
+                bucket["trips"] += 1
+                bucket["vehicles"].add(vehicle)
+                bucket["transit_minutes"] += seg["transit_minutes"]
+                bucket["distance_km"] += seg["distance_km"]
+                bucket["movement_events"] += seg["movement_events"]
+
+    def _dimension_rows(buckets):
+        return [
+            (
+                key,
+                day,
+                b["trips"],
+                len(b["vehicles"]),
+                round(b["transit_minutes"], 2),
+                round(b["distance_km"], 3),
+                b["movement_events"],
+                stamp,
+            )
+            for key, b in buckets.items()
+        ]
+
+    _replace_day(VEHICLE_DAILY, _VEHICLE_COLUMNS, day, vehicle_rows)
+    _replace_day(DRIVER_DAILY, _DRIVER_COLUMNS, day, _dimension_rows(by_driver))
+    _replace_day(ROUTE_DAILY, _ROUTE_COLUMNS, day, _dimension_rows(by_route))
+    return {"vehicles": len(vehicle_rows), "drivers": len(by_driver), "routes": len(by_route)}
+
+
+def _replace_day(table: str, columns: tuple, day, rows: list[tuple]) -> None:
+    frappe.db.sql(f"delete from `{table}` where operating_date = %s", (day,))
+    column_sql = ", ".join(f"`{c}`" for c in columns)
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start : start + INSERT_CHUNK]
+        frappe.db.sql(
+            f"insert into `{table}` ({column_sql}) values {', '.join([placeholder] * len(chunk))}",
+            [value for row in chunk for value in row],
+        )
+
+
+def build_daily_facts() -> dict:
+    """Rebuild fact rows for every date whose source rows changed since the last run."""
+    ensure_fact_tables()
+    dates, new_marks = dirty_dates()
+    for day in sorted(dates):
+        build_day(day)
+        # Commit per day so a long backfill makes progress and releases locks
+        frappe.db.commit()
+    for source, mark in new_marks.items():
+        _set_high_water(source, mark)
+    frappe.db.commit()
+    return {"days": len(dates)}
+
+
+def rebuild_range(from_date, to_date) -> dict:
+    """Force a rebuild of a date range (after deletes or definition changes)."""
+    ensure_fact_tables()
+    day, end, days = getdate(from_date), getdate(to_date), 0
+    while day <= end:
+        build_day(day)
+        frappe.db.commit()
+        day = add_days(day, 1)
+        days += 1
+    return {"days": days}
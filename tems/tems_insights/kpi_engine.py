@@ -0,0 +1,309 @@
+"""KPI materialization engine.
+
+Two kinds of KPI are compiled into one aggregate query each:
+
+- definitions from ``insights/kpis.json`` (raw SQL with ``%(from_date)s`` style
+  window parameters);
+- ``KPI Config`` documents (``aggregation(metric_field)`` over
+  ``reference_doctype`` with ``filter_json`` and an optional ``date_field``
+  restricting rows to the refresh window).
+
+``refresh_kpis`` evaluates only KPIs whose stored value is older than the TTL
+of their window and writes the result to ``KPI Value`` (one row per KPI and
+window) and to a Redis hash. Readers (Number Cards, PWAs, dashboards) call
+``get_kpi_value(s)`` and never run the aggregate themselves.
+
+A KPI returning several rows (e.g. one per vehicle) stores the rows in
+``breakdown`` and their mean in ``value``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import frappe
+from frappe.utils import (
+    add_days,
+    add_to_date,
+    get_datetime,
+    get_first_day,
+    get_first_day_of_week,
+    getdate,
+    now_datetime,
+)
+
+CACHE_KEY = "tems:kpi_values"
+MAX_BREAKDOWN_ROWS = 200
+
+# Seconds a materialized value stays fresh, per aggregation window
+WINDOW_TTL = {
+    "real_time": 60,
+    "5_min": 300,
+    "hour": 900,
+    "day": 3600,
+    "week": 6 * 3600,
+    "rolling_7d": 6 * 3600,
+    "month": 12 * 3600,
+    "rolling_90d": 24 * 3600,
+}
+
+_AGGREGATES = {"Count": "count(*)", "Sum": "sum(`{field}`)", "Avg": "avg(`{field}`)"}
+_definitions_cache: dict = {"mtime": None, "items": []}
+
+
+def window_bounds(window: str, now=None) -> dict:
+    """Query parameters for a window: from/to dates, month bounds and datetimes."""
+    now = get_datetime(now or now_datetime())
+    today = getdate(now)
+    if window in ("real_time", "5_min", "hour"):
+        start = add_to_date(now, hours=-1) if window == "hour" else add_to_date(now, minutes=-5)
+    elif window == "day":
+        start = get_datetime(today)
+    elif window == "week":
+        start = get_datetime(get_first_day_of_week(today))
+    elif window == "month":
+        start = get_datetime(get_first_day(today))
+    elif window == "rolling_7d":
+        start = get_datetime(add_days(today, -7))
+    elif window == "rolling_90d":
+        start = get_datetime(add_days(today, -90))
+    else:
+        frappe.throw(f"Unknown KPI window {window}")
+    return {
+        "from_date": getdate(start),
+        "to_date": today,
+        "from_month": get_first_day(getdate(start)),
+        "to_month": today,
+        "from_datetime": start,
+        "to_datetime": now,
+    }
+
+
+def _definitions_path() -> str:
+    return os.path.abspath(os.path.join(frappe.get_app_path("tems"), "..", "insights", "kpis.json"))
+
+
+def load_definitions() -> list[dict]:
+    """KPIs from insights/kpis.json, compiled to {key, name, window, source, query}."""
+    path = _definitions_path()
+    if not os.path.exists(path):
+        return []
+    mtime = os.path.getmtime(path)
+    if _definitions_cache["mtime"] != mtime:
+        with open(path) as fh:
+            raw = json.load(fh)
+        _definitions_cache["items"] = [
+            {
+                "key": item["id"],
+                "name": item["name"],
+                "window": item.get("aggregation_window") or "day",
+                "source": "KPI Definition",
+                "query": item["query"],
+            }
+            for item in raw
+            if item.get("query")
+        ]
+        _definitions_cache["mtime"] = mtime
+    return _definitions_cache["items"]
+
+
+def compile_kpi_config(cfg) -> dict:
+    """Compile a KPI Config row into a get_all based evaluator definition."""
+    filters = json.loads(cfg.filter_json) if cfg.get("filter_json") else {}
+    expression = _AGGREGATES.get(cfg.get("aggregation") or "Count", _AGGREGATES["Count"])
+    return {
+        "key": f"CFG-{cfg.name}",
+        "name": cfg.title,
+        "window": cfg.get("refresh_window") or "hour",
+        "source": "KPI Config",
+        "doctype": cfg.reference_doctype,
+        "expression": expression.format(field=cfg.get("metric_field")),
+        "filters": filters,
+        "date_field": cfg.get("date_field"),
+    }
+
+
+def load_configs() -> list[dict]:
+    rows = frappe.get_all(
+        "KPI Config",
+        filters={"reference_doctype": ["is", "set"]},
+        fields=["name", "title", "reference_doctype", "metric_field", "aggregation", "filter_json", "refresh_window", "date_field"],
+    )
+    compiled = []
+    for row in rows:
+        try:
+            compiled.append(compile_kpi_config(row))
+        except ValueError:
+            frappe.log_error(title=f"KPI Config {row.name}: invalid filter_json")
+    return compiled
+
+
+def _evaluate(kpi: dict, params: dict) -> list[dict]:
+    if kpi["source"] == "KPI Definition":
+        return frappe.db.sql(kpi["query"], params, as_dict=True)
+
+    filters = kpi["filters"]
+    if kpi.get("date_field"):
+        window_filter = [kpi["date_field"], "between", [params["from_datetime"], params["to_datetime"]]]
+        if isinstance(filters, dict):
+            filters = [[k, *(v if isinstance(v, (list, tuple)) else ["=", v])] for k, v in filters.items()]
+        filters = [*filters, window_filter]
+    return frappe.get_all(kpi["doctype"], filters=filters, fields=[f"{kpi['expression']} as value"])
+
+
+def summarize_rows(rows: list[dict]) -> float | None:
+    """Scalar for a KPI result: the metric (last column) of one row, or the mean across rows."""
+    if not rows:
+        return None
+    metric = list(rows[0].keys())[-1]
+    values = [float(r[metric]) for r in rows if r.get(metric) is not None]
+    if not values:
+        return None
+    return values[0] if len(rows) == 1 else sum(values) / len(values)
+
+
+def _value_key(kpi: dict) -> str:
+    return f"{kpi['key']}::{kpi['window']}"
+
+
+def _stored_state() -> dict[str, dict]:
+    return {
+        row.name: row
+        for row in frappe.get_all("KPI Value", fields=["name", "computed_at", "kpi_window"])
+    }
+
+
+def is_stale(computed_at, window: str, now=None) -> bool:
+    if not computed_at:
+        return True
+    age = (get_datetime(now or now_datetime()) - get_datetime(computed_at)).total_seconds()
+    return age >= WINDOW_TTL.get(window, 3600)
+
+
+def _store(kpi: dict, params: dict, result: dict, exists: bool) -> None:
+    key = _value_key(kpi)
+    values = {
+        "kpi_key": kpi["key"],
+        "kpi_name": kpi["name"],
+        "source": kpi["source"],
+        "kpi_window": kpi["window"],
+        "period_from": params["from_datetime"],
+        "period_to": params["to_datetime"],
+        **result,
+    }
+    if exists:
+        frappe.db.set_value("KPI Value", key, values, update_modified=False)
+    else:
+        frappe.get_doc({"doctype": "KPI Value", "value_key": key, **values}).insert(ignore_permissions=True)
+    cached = {
+        k: (str(v) if hasattr(v, "isoformat") else v) for k, v in values.items() if k != "breakdown"
+    }
+    frappe.cache().hset(CACHE_KEY, key, cached)
+
+
+def refresh_kpis(force: bool = False, keys: list[str] | None = None) -> dict:
+    """Materialize stale KPI values. Returns counts of refreshed/skipped/failed KPIs."""
+    now = now_datetime()
+    stored = _stored_state()
+    summary = {"refreshed": 0, "skipped": 0, "failed": 0}
+    bounds: dict[str, dict] = {}
+
+    for kpi in load_definitions() + load_configs():
+        if keys and kpi["key"] not in keys:
+            continue
+        key = _value_key(kpi)
+        state = stored.get(key)
+        if not force and state and not is_stale(state.computed_at, kpi["window"], now):
+            summary["skipped"] += 1
+            continue
+        params = bounds.setdefault(kpi["window"], window_bounds(kpi["window"], now))
+        start = time.perf_counter()
+        try:
+            rows = _evaluate(kpi, params)
+            result = {
+                "status": "OK",
+                "error": None,
+                "value": summarize_rows(rows),
+                "row_count": len(rows),
+                "breakdown": json.dumps(rows[:MAX_BREAKDOWN_ROWS], default=str),
+            }
+            summary["refreshed"] += 1
+        except Exception as exc:
+            # Broken definitions are recorded and retried after their TTL, not every tick
+            result = {"status": "Error", "error": str(exc)[:1000], "value": None, "row_count": 0, "breakdown": None}
+            summary["failed"] += 1
+        result["computed_at"] = now
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        _store(kpi, params, result, exists=bool(state))
+
+    frappe.db.commit()
+    return summary
+
+
+def _read(value_key: str) -> dict | None:
+    cached = frappe.cache().hget(CACHE_KEY, value_key)
+    if cached:
+        return cached
+    row = frappe.db.get_value(
+        "KPI Value",
+        value_key,
+        ["kpi_key", "kpi_name", "kpi_window", "status", "value", "row_count", "computed_at", "period_from", "period_to"],
+        as_dict=True,
+    )
+    return row
+
+
+@frappe.whitelist()
+def get_kpi_value(kpi: str, window: str | None = None, with_breakdown: int = 0) -> dict | None:
+    """Precomputed value for one KPI (id from kpis.json, or CFG-<KPI Config name>)."""
+    if window:
+        value_key = f"{kpi}::{window}"
+    else:
+        value_key = frappe.db.get_value("KPI Value", {"kpi_key": kpi}, "name", order_by="computed_at desc")
+        if not value_key:
+            return None
+    result = _read(value_key)
+    if result and int(with_breakdown):
+        breakdown = frappe.db.get_value("KPI Value", value_key, "breakdown")
+        result = {**result, "breakdown": json.loads(breakdown) if breakdown else []}
+    return result
+
+
+@frappe.whitelist()
+def get_kpi_values(kpis: str | list | None = None) -> list[dict]:
+    """Precomputed values for several KPIs in one call (all when `kpis` is empty)."""
+    if isinstance(kpis, str):
+        kpis = json.loads(kpis) if kpis.startswith("[") else [k.strip() for k in kpis.split(",") if k.strip()]
+    cached = frappe.cache().hgetall(CACHE_KEY) or {}
+    if not cached:
+        cached = {
+            row.name: row
+            for row in frappe.get_all(
+                "KPI Value",
+                fields=["name", "kpi_key", "kpi_name", "kpi_window", "status", "value", "row_count", "computed_at"],
+            )
+        }
+    values = []
+    for key, row in cached.items():
+        key = key.decode() if isinstance(key, bytes) else key
+        if not kpis or row.get("kpi_key") in kpis:
+            values.append(row)
+    return values
+
+
+def kpi_value_map(kpis: tuple[str, ...] | list[str]) -> dict:
+    """{kpi id: value} for server-side consumers such as the PWA statistics endpoints."""
+    return {row.get("kpi_key"): row.get("value") for row in get_kpi_values(list(kpis))}
+
+
+@frappe.whitelist()
+def get_number_card_value(filters=None):
+    """Method for "Custom" Number Cards; filters carry {"kpi": ..., "window": ...}."""
+    if isinstance(filters, str):
+        filters = json.loads(filters or "{}")
+    filters = filters or {}
+    if isinstance(filters, list):
+        filters = {f[1]: f[3] for f in filters if len(f) >= 4}
+    result = get_kpi_value(filters.get("kpi"), filters.get("window"))
+    return {"value": (result or {}).get("value") or 0, "fieldtype": "Float"}
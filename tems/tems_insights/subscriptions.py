@@ -0,0 +1,233 @@
+"""Report Subscription delivery with shared, compressed snapshots.
+
+For every (report, frequency window) that has at least one active subscriber
+not yet served in that window, the report is executed once and stored as a
+`Report Snapshot` with three private attachments: gzip CSV, XLSX and gzip
+JSON. All subscribers of the window share one queued email (Frappe delivers
+it to each recipient individually) carrying the XLSX, or only a link to the
+snapshot when the file is large.
+`get_latest_snapshot` lets the desk and PWAs render the stored result
+without re-running the report.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import re
+import time
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import get_url_to_form, getdate, now_datetime
+
+# Attach the XLSX to the email below this size, otherwise send a link
+MAX_ATTACHMENT_BYTES = 5 * 1024 * 1024
+
+
+def window_key(frequency: str, day=None) -> str:
+    day = getdate(day)
+    if frequency == "Daily":
+        return day.isoformat()
+    if frequency == "Monthly":
+        return day.strftime("%Y-%m")
+    year, week, _weekday = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def parse_recipients(value: str | None) -> list[str]:
+    return [e.strip() for e in re.split(r"[,;\n]+", value or "") if e.strip()]
+
+
+def _column_labels(columns: list) -> tuple[list[str], list[str]]:
+    fieldnames, labels = [], []
+    for col in columns:
+        if isinstance(col, dict):
+            fieldnames.append(col.get("fieldname") or col.get("label"))
+            labels.append(col.get("label") or col.get("fieldname"))
+        else:
+            # "Label:Fieldtype/Options:Width" string columns
+            label = str(col).split(":")[0]
+            fieldnames.append(frappe.scrub(label))
+            labels.append(label)
+    return fieldnames, labels
+
+
+def _table(columns: list, result: list) -> tuple[list[str], list[list]]:
+    fieldnames, labels = _column_labels(columns)
+    rows = []
+    for row in result:
+        if isinstance(row, dict):
+            rows.append([row.get(f) for f in fieldnames])
+        elif isinstance(row, (list, tuple)):
+            rows.append(list(row))
+    return labels, rows
+
+
+def _csv_gz(labels: list[str], rows: list[list]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(labels)
+    writer.writerows(rows)
+    return gzip.compress(buffer.getvalue().encode("utf-8"))
+
+
+def _attach(snapshot, filename: str, content: bytes) -> str:
+    file_doc = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": filename,
+            "content": content,
+            "is_private": 1,
+            "attached_to_doctype": "Report Snapshot",
+            "attached_to_name": snapshot.name,
+        }
+    )
+    file_doc.save(ignore_permissions=True)
+    return file_doc.file_url
+
+
+def build_snapshot(report_name: str, frequency: str, key: str):
+    """Execute `report_name` once and store it as a Report Snapshot for window `key`."""
+    from frappe.desk.query_report import run
+    from frappe.utils.xlsxutils import make_xlsx
+
+    snapshot = frappe.get_doc(
+        {"doctype": "Report Snapshot", "report_name": report_name, "frequency": frequency, "window_key": key}
+    )
+    start = time.perf_counter()
+    try:
+        data = run(report_name, filters={}, ignore_prepared_report=True)
+        labels, rows = _table(data.get("columns") or [], data.get("result") or [])
+    except Exception as exc:
+        snapshot.update({"status": "Failed", "error": str(exc)[:1000], "generated_at": now_datetime()})
+        snapshot.insert(ignore_permissions=True)
+        frappe.log_error(title=f"Report snapshot failed: {report_name}")
+        return snapshot
+
+    snapshot.update(
+        {
+            "status": "Ready",
+            "generated_at": now_datetime(),
+            "row_count": len(rows),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+    )
+    snapshot.insert(ignore_permissions=True)
+    base = f"{frappe.scrub(report_name)}-{key}"
+    xlsx = make_xlsx([labels, *rows], report_name[:31]).getvalue()
+    payload = json.dumps({"columns": data.get("columns"), "result": data.get("result")}, default=str)
+    snapshot.db_set(
+        {
+            "csv_file": _attach(snapshot, f"{base}.csv.gz", _csv_gz(labels, rows)),
+            "xlsx_file": _attach(snapshot, f"{base}.xlsx", xlsx),
+            "json_file": _attach(snapshot, f"{base}.json.gz", gzip.compress(payload.encode("utf-8"))),
+        }
+    )
+    return snapshot
+
+
+def _existing_snapshots(keys: set[tuple[str, str]]) -> dict[tuple[str, str], object]:
+    if not keys:
+        return {}
+    rows = frappe.get_all(
+        "Report Snapshot",
+        filters={
+            "report_name": ["in", list({report for report, _key in keys})],
+            "window_key": ["in", list({key for _report, key in keys})],
+            "status": "Ready",
+        },
+        fields=["name", "report_name", "window_key", "xlsx_file"],
+    )
+    return {(r.report_name, r.window_key): r for r in rows}
+
+
+def _send(report_name: str, key: str, snapshot, recipients: list[str]) -> None:
+    link = get_url_to_form("Report Snapshot", snapshot.name)
+    attachments = []
+    if snapshot.xlsx_file:
+        file_doc = frappe.get_doc("File", {"file_url": snapshot.xlsx_file})
+        if (file_doc.file_size or 0) <= MAX_ATTACHMENT_BYTES:
+            attachments.append({"fid": file_doc.name})
+    frappe.sendmail(
+        recipients=recipients,
+        subject=f"{report_name} ({key})",
+        message=(
+            f"<p>The {report_name} report for {key} is ready.</p>"
+            f'<p><a href="{link}">Open the snapshot</a> to download CSV, XLSX or JSON.</p>'
+        ),
+        attachments=attachments,
+        reference_doctype="Report Snapshot",
+        reference_name=snapshot.name,
+    )
+
+
+def deliver_subscriptions(day=None) -> dict:
+    """Serve every active subscription whose current window has not been sent yet."""
+    subscriptions = frappe.get_all(
+        "Report Subscription",
+        filters={"active": 1},
+        fields=["name", "report_name", "frequency", "recipient_emails", "last_sent_window"],
+    )
+    reports = set(
+        frappe.get_all("Report", filters={"name": ["in", list({s.report_name for s in subscriptions})]}, pluck="name")
+        if subscriptions
+        else []
+    )
+    groups: dict[tuple[str, str], dict] = defaultdict(lambda: {"recipients": set(), "subscriptions": [], "frequency": None})
+    for sub in subscriptions:
+        key = window_key(sub.frequency or "Weekly", day)
+        if sub.last_sent_window == key or sub.report_name not in reports:
+            continue
+        group = groups[(sub.report_name, key)]
+        group["frequency"] = sub.frequency or "Weekly"
+        group["recipients"].update(parse_recipients(sub.recipient_emails))
+        group["subscriptions"].append(sub.name)
+
+    existing = _existing_snapshots(set(groups))
+    summary = {"executed": 0, "reused": 0, "sent": 0}
+    for (report_name, key), group in groups.items():
+        snapshot = existing.get((report_name, key))
+        if snapshot:
+            summary["reused"] += 1
+        else:
+            snapshot = build_snapshot(report_name, group["frequency"], key)
+            summary["executed"] += 1
+            if snapshot.status != "Ready":
+                continue
+        if group["recipients"]:
+            _send(report_name, key, snapshot, sorted(group["recipients"]))
+            summary["sent"] += len(group["recipients"])
+        frappe.db.set_value(
+            "Report Subscription", {"name": ["in", group["subscriptions"]]}, "last_sent_window", key
+        )
+        frappe.db.commit()
+    return summary
+
+
+@frappe.whitelist()
+def get_latest_snapshot(report_name: str) -> dict | None:
+    """Latest ready snapshot of a report (columns + result), without running it."""
+    if not frappe.has_permission("Report Snapshot", "read"):
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    snapshot = frappe.get_all(
+        "Report Snapshot",
+        filters={"report_name": report_name, "status": "Ready"},
+        fields=["name", "window_key", "generated_at", "row_count", "json_file"],
+        order_by="generated_at desc",
+        limit=1,
+    )
+    if not snapshot or not snapshot[0].json_file:
+        return None
+    snapshot = snapshot[0]
+    content = frappe.get_doc("File", {"file_url": snapshot.json_file}).get_content()
+    data = json.loads(gzip.decompress(content))
+    return {
+        "snapshot": snapshot.name,
+        "window_key": snapshot.window_key,
+        "generated_at": snapshot.generated_at,
+        "row_count": snapshot.row_count,
+        **data,
+    }
@@ -0,0 +1,43 @@
+"""Scheduled tasks for TEMS Insights."""
+from __future__ import annotations
+
+import frappe
+
+from tems.tems_main.scheduler import tems_job
+
+
+def _log(msg: str) -> None:
+    try:
+        frappe.logger("tems").info(msg)
+    except Exception:
+        print(f"[TEMS][Insights] {msg}")
+
+
+@tems_job(base_interval=240, max_interval=600)
+def refresh_kpi_cache(force: bool = False) -> int:
+    """Materialize KPI values whose window is stale (see kpi_engine.WINDOW_TTL)."""
+    from tems.tems_insights.kpi_engine import refresh_kpis
+
+    summary = refresh_kpis(force=force)
+    _log(f"insights.refresh_kpi_cache {summary}")
+    return summary["refreshed"] + summary["failed"]
+
+
+@tems_job(base_interval=900, max_interval=3600)
+def build_daily_facts() -> int:
+    """Incrementally rebuild ins_ops_* daily fact rows for dates with changed sources."""
+    from tems.tems_insights.facts import build_daily_facts as _build
+
+    summary = _build()
+    _log(f"insights.build_daily_facts {summary}")
+    return summary["days"]
+
+
+@tems_job(base_interval=86400, max_interval=86400)
+def deliver_report_subscriptions() -> int:
+    """Execute each subscribed report once per frequency window and mail all subscribers."""
+    from tems.tems_insights.subscriptions import deliver_subscriptions
+
+    summary = deliver_subscriptions()
+    _log(f"insights.deliver_report_subscriptions {summary}")
+    return summary["executed"] + summary["reused"]
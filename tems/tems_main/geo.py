@@ -0,0 +1,149 @@
+"""Geohash encoding and covering helpers (no external dependency).
+
+Geohashes are stored on Movement Log, Fuel Log, SOS Event and the vehicle
+position table. Proximity queries turn a circle or bounding box into a small
+set of geohash prefixes, fetch candidates with indexed ``LIKE 'prefix%'``
+range scans and then filter exactly with haversine / box checks.
+"""
+from __future__ import annotations
+
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_PRECISION = 9
+# Max cells used to cover a bounding box before dropping to a coarser precision
+MAX_COVER_CELLS = 32
+
+
+def encode(lat: float, lng: float, precision: int = DEFAULT_PRECISION) -> str:
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def decode(geohash: str) -> tuple[float, float]:
+    min_lat, min_lng, max_lat, max_lng = decode_bbox(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def cell_size_deg(precision: int) -> tuple[float, float]:
+    """(lat_degrees, lng_degrees) spanned by a cell of the given precision."""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2**lat_bits), 360.0 / (2**lng_bits)
+
+
+def neighbors(geohash: str) -> list[str]:
+    """The 8 surrounding cells (same precision), computed from the cell centre."""
+    min_lat, min_lng, max_lat, max_lng = decode_bbox(geohash)
+    dlat, dlng = max_lat - min_lat, max_lng - min_lng
+    lat, lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    cells = []
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if di == dj == 0:
+                continue
+            nlat = lat + di * dlat
+            if not -90 < nlat < 90:
+                continue
+            nlng = (lng + dj * dlng + 180) % 360 - 180
+            cells.append(encode(nlat, nlng, len(geohash)))
+    return cells
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def precision_for_radius(radius_km: float, lat: float = 0.0) -> int:
+    """Finest precision whose cells are at least `radius_km` wide at this latitude.
+
+    With cells that large, the centre cell plus its 8 neighbours always contain
+    the whole circle.
+    """
+    km_per_deg_lat = 111.32
+    km_per_deg_lng = 111.32 * max(math.cos(math.radians(lat)), 0.01)
+    for precision in range(DEFAULT_PRECISION, 0, -1):
+        dlat, dlng = cell_size_deg(precision)
+        if dlat * km_per_deg_lat >= radius_km and dlng * km_per_deg_lng >= radius_km:
+            return precision
+    return 1
+
+
+def cover_circle(lat: float, lng: float, radius_km: float) -> list[str]:
+    """Geohash prefixes whose union contains the circle."""
+    center = encode(lat, lng, precision_for_radius(radius_km, lat))
+    return [center, *neighbors(center)]
+
+
+def cover_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[str]:
+    """Geohash prefixes (at most MAX_COVER_CELLS per side of the antimeridian) whose union contains the box.
+
+    A box with min_lng > max_lng crosses the antimeridian and is covered as two
+    boxes; a box with min_lat > max_lat is empty.
+    """
+    if min_lat > max_lat:
+        return []
+    if min_lng > max_lng:
+        east = cover_bbox(min_lat, min_lng, max_lat, 180.0)
+        west = cover_bbox(min_lat, -180.0, max_lat, max_lng)
+        return sorted(set(east) | set(west))
+    for precision in range(DEFAULT_PRECISION, 0, -1):
+        dlat, dlng = cell_size_deg(precision)
+        rows = int((max_lat - min_lat) / dlat) + 2
+        cols = int((max_lng - min_lng) / dlng) + 2
+        if rows * cols > MAX_COVER_CELLS and precision > 1:
+            continue
+        cells = set()
+        for i in range(rows):
+            lat = min(min_lat + i * dlat, max_lat)
+            for j in range(cols):
+                lng = min(min_lng + j * dlng, max_lng)
+                cells.add(encode(lat, lng, precision))
+        return sorted(cells)
+    return [""]
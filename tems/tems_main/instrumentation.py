@@ -0,0 +1,174 @@
+"""Query-count instrumentation for TEMS PWA endpoints and scheduler jobs.
+
+Wired through `before_request`/`after_request` and `before_job`/`after_job` in
+hooks.py. Only whitelisted `tems.api.pwa.*` methods and `tems.*` scheduled jobs
+are recorded; everything else passes through untouched.
+
+Each call appends a compact sample (wall time, query count, DB time, repeated
+query shapes) to a capped Redis list per method. `get_instrumentation_summary`
+folds those samples into a rolling summary with p50/p95 latency and suspected
+N+1 patterns: a query shape repeated at least `N_PLUS_ONE_THRESHOLD` times in a
+single call is almost always a per-row `get_value`/`get_doc`/`count` in a loop.
+
+Site config:
+    tems_query_instrumentation: 0 to disable (default enabled)
+    tems_n_plus_one_threshold: repeat count that flags a shape (default 10)
+"""
+from __future__ import annotations
+
+import json
+import time
+
+import frappe
+from frappe.utils import now_datetime
+
+from tems.tems_main.profiling import QueryRecorder, percentile
+
+CACHE_PREFIX = "tems:instrumentation"
+KEYS_SET = f"{CACHE_PREFIX}:keys"
+MAX_SAMPLES = 200
+N_PLUS_ONE_THRESHOLD = 10
+PWA_PREFIX = "tems.api.pwa."
+SCHEDULED_JOB_RUNNER = "frappe.core.doctype.scheduled_job_type.scheduled_job_type.run_scheduled_job"
+
+
+def _enabled() -> bool:
+    return bool(frappe.conf.get("tems_query_instrumentation", 1))
+
+
+def _threshold() -> int:
+    return int(frappe.conf.get("tems_n_plus_one_threshold") or N_PLUS_ONE_THRESHOLD)
+
+
+def _start(kind: str, method: str) -> None:
+    recorder = QueryRecorder().__enter__()
+    frappe.local.tems_instrumentation = {
+        "kind": kind,
+        "method": method,
+        "recorder": recorder,
+        "started": time.perf_counter(),
+    }
+
+
+def _finish() -> None:
+    state = getattr(frappe.local, "tems_instrumentation", None)
+    if not state:
+        return
+    frappe.local.tems_instrumentation = None
+    recorder: QueryRecorder = state["recorder"]
+    recorder.__exit__(None, None, None)
+    wall_ms = (time.perf_counter() - state["started"]) * 1000
+
+    threshold = _threshold()
+    suspects = [s for s in recorder.top_shapes(5) if s["count"] >= threshold]
+    sample = {
+        "ts": str(now_datetime()),
+        "wall_ms": round(wall_ms, 2),
+        "queries": recorder.count,
+        "db_ms": round(recorder.db_time * 1000, 2),
+        "n_plus_one": suspects,
+    }
+    key = f"{state['kind']}:{state['method']}"
+    try:
+        cache = frappe.cache()
+        list_key = f"{CACHE_PREFIX}:{key}"
+        cache.lpush(list_key, json.dumps(sample))
+        cache.ltrim(list_key, 0, MAX_SAMPLES - 1)
+        cache.sadd(KEYS_SET, key)
+    except Exception:
+        # Instrumentation must never break the request or job it observes
+        return
+    if suspects:
+        frappe.logger("tems").warning(
+            f"Suspected N+1 in {key}: {suspects[0]['count']}x {suspects[0]['shape'][:160]}"
+        )
+
+
+def _request_method() -> str | None:
+    request = getattr(frappe.local, "request", None)
+    path = getattr(request, "path", "") or ""
+    if "/method/" not in path:
+        return None
+    method = path.split("/method/", 1)[1].strip("/")
+    return method if method.startswith(PWA_PREFIX) else None
+
+
+def before_request() -> None:
+    if not _enabled():
+        return
+    method = _request_method()
+    if method:
+        _start("request", method)
+
+
+def after_request(response=None, request=None) -> None:
+    _finish()
+
+
+def before_job(method: str | None = None, kwargs: dict | None = None, **_) -> None:
+    if not _enabled():
+        return
+    job = method
+    if method == SCHEDULED_JOB_RUNNER:
+        job = (kwargs or {}).get("job_type")
+    if job and str(job).startswith("tems."):
+        _start("job", str(job))
+
+
+def after_job(method: str | None = None, kwargs: dict | None = None, result=None, **_) -> None:
+    _finish()
+
+
+def summarize(samples: list[dict]) -> dict:
+    """Fold raw samples (newest first) into a rolling summary."""
+    walls = [s["wall_ms"] for s in samples]
+    queries = [s["queries"] for s in samples]
+    shapes: dict[str, int] = {}
+    flagged = 0
+    for s in samples:
+        if s.get("n_plus_one"):
+            flagged += 1
+        for suspect in s.get("n_plus_one") or []:
+            shapes[suspect["shape"]] = max(shapes.get(suspect["shape"], 0), suspect["count"])
+    return {
+        "calls": len(samples),
+        "last_seen": samples[0]["ts"] if samples else None,
+        "wall_ms_p50": round(percentile(walls, 50), 2),
+        "wall_ms_p95": round(percentile(walls, 95), 2),
+        "queries_avg": round(sum(queries) / len(queries), 1) if queries else 0,
+        "queries_max": max(queries) if queries else 0,
+        "db_ms_avg": round(sum(s["db_ms"] for s in samples) / len(samples), 2) if samples else 0,
+        "n_plus_one_calls": flagged,
+        "n_plus_one_shapes": [
+            {"shape": shape, "max_repeats": count}
+            for shape, count in sorted(shapes.items(), key=lambda kv: kv[1], reverse=True)[:5]
+        ],
+    }
+
+
+@frappe.whitelist()
+def get_instrumentation_summary(kind: str | None = None) -> list[dict]:
+    """Rolling per-method summary, worst p95 first. `kind` filters to "request" or "job"."""
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    rows = []
+    for raw_key in cache.smembers(KEYS_SET) or []:
+        key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+        entry_kind, _, method = key.partition(":")
+        if kind and entry_kind != kind:
+            continue
+        samples = [json.loads(s) for s in cache.lrange(f"{CACHE_PREFIX}:{key}", 0, -1) or []]
+        if samples:
+            rows.append({"kind": entry_kind, "method": method, **summarize(samples)})
+    rows.sort(key=lambda r: r["wall_ms_p95"], reverse=True)
+    return rows
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_instrumentation() -> None:
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    for raw_key in cache.smembers(KEYS_SET) or []:
+        key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+        cache.delete_value(f"{CACHE_PREFIX}:{key}")
+    cache.delete_value(KEYS_SET)
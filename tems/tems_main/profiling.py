@@ -0,0 +1,94 @@
+"""Lightweight query profiling helpers shared by benchmarks and instrumentation.
+
+`QueryRecorder` temporarily wraps `frappe.db.sql` (every ORM call such as
+`get_value`, `get_all` or `count` ends up there) and records how many queries
+ran, how long they spent in the database and which query *shapes* repeated.
+A shape is the SQL text with literals and IN-lists collapsed, so the same
+`get_value` issued for 500 different vehicles counts as one shape seen 500 times.
+"""
+from __future__ import annotations
+
+import re
+import time
+from collections import Counter
+
+import frappe
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bin\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_PARAM = re.compile(r"%\((\w+)\)s|%s")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0..100) of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def query_shape(query: str) -> str:
+    """Normalise a SQL statement to its shape (literals and parameters replaced by `?`)."""
+    shape = _STRING_LITERAL.sub("?", str(query))
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("in (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()[:500]
+
+
+class QueryRecorder:
+    """Context manager counting queries issued through `frappe.db.sql`.
+
+    Example:
+        with QueryRecorder() as rec:
+            get_operations_dashboard()
+        rec.count, rec.db_time, rec.top_shapes(5)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.shape_time: Counter[str] = Counter()
+        self._db = None
+        self._had_attr = False
+        self._previous = None
+
+    def __enter__(self) -> QueryRecorder:
+        self._db = frappe.db
+        self._had_attr = "sql" in vars(self._db)
+        self._previous = vars(self._db).get("sql")
+        original = self._db.sql
+
+        def recorded_sql(query, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(query, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                shape = query_shape(query)
+                self.count += 1
+                self.db_time += elapsed
+                self.shapes[shape] += 1
+                self.shape_time[shape] += elapsed
+
+        self._db.sql = recorded_sql
+        return self
+
+    def __exit__(self, *exc):
+        if self._had_attr:
+            self._db.sql = self._previous
+        else:
+            del self._db.sql
+        return False
+
+    def top_shapes(self, n: int = 5) -> list[dict]:
+        return [
+            {"shape": shape, "count": count, "db_time_ms": round(self.shape_time[shape] * 1000, 2)}
+            for shape, count in self.shapes.most_common(n)
+        ]
@@ -0,0 +1,167 @@
+"""Topic-based realtime channels with compact, coalesced delta payloads.
+
+Topics map onto rooms the Frappe socket server already knows how to join and
+permission-check, so no custom socket handler is needed:
+
+- ``vehicle:<Vehicle>``          -> the Vehicle's document room
+- ``area:<Operating Area>``      -> the Operating Area's document room;
+  vehicle events also go to the area linked by the vehicle's ``operating_area``
+- ``role:<Role>``                -> the user rooms of enabled users with the role
+
+Clients connect with `get_socket_config` and subscribe to vehicle/area topics
+with ``doc_subscribe`` (see `get_topic_rooms`); role topics arrive on the
+user's own room.
+
+`publish` does not emit immediately: deltas are buffered per transaction,
+merged per (topic, event, entity) so a burst of updates to one record becomes
+one delta carrying its latest fields, and flushed once after commit as a
+single message per topic: ``{"topic", "event", "deltas": [...], "ts"}``.
+Rolled back transactions publish nothing.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+ROLE_USERS_KEY = "tems:realtime:role_users"
+ROLE_USERS_TTL = 300
+
+OPERATIONS_ROLES = ("Operations Manager", "Operations Officer")
+SAFETY_ROLES = ("Safety Manager", "Safety Officer")
+LEADERSHIP_ROLES = ("TEMS Executive",)
+
+_TOPIC_DOCTYPES = {"vehicle": "Vehicle", "area": "Operating Area"}
+# Vehicle Link field to its Operating Area
+VEHICLE_AREA_FIELD = "operating_area"
+
+
+def vehicle_topic(vehicle: str | None) -> list[str]:
+    return [f"vehicle:{vehicle}"] if vehicle else []
+
+
+def area_topic(area: str | None) -> list[str]:
+    return [f"area:{area}"] if area else []
+
+
+def vehicle_area_topic(vehicle: str | None) -> list[str]:
+    """Area topic of the vehicle's Operating Area, if it has one."""
+    if not vehicle or not has_area_link():
+        return []
+    return area_topic(frappe.get_cached_value("Vehicle", vehicle, VEHICLE_AREA_FIELD))
+
+
+def has_area_link() -> bool:
+    field = frappe.get_meta("Vehicle").get_field(VEHICLE_AREA_FIELD)
+    return bool(field and field.fieldtype == "Link" and field.options == _TOPIC_DOCTYPES["area"])
+
+
+def vehicle_topics(vehicle: str | None) -> list[str]:
+    """Vehicle topic plus its Operating Area's topic."""
+    return vehicle_topic(vehicle) + vehicle_area_topic(vehicle)
+
+
+def role_topics(*roles: str) -> list[str]:
+    return [f"role:{role}" for role in roles]
+
+
+def doc_delta(doc, fields: tuple[str, ...]) -> dict:
+    """Identity plus the listed fields that changed in this save (all of them on insert)."""
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    delta = {"doctype": doc.doctype, "name": doc.name}
+    for field in fields:
+        value = doc.get(field)
+        if before is None or before.get(field) != value:
+            delta[field] = value
+    return delta
+
+
+def publish(event: str, delta: dict, topics: list[str], key: str | None = None) -> None:
+    """Buffer `delta` for every topic; flushed after the current transaction commits."""
+    if not topics:
+        return
+    buffer = getattr(frappe.local, "tems_realtime_buffer", None)
+    if buffer is None:
+        buffer = frappe.local.tems_realtime_buffer = defaultdict(dict)
+        frappe.db.after_commit.add(flush)
+        frappe.db.after_rollback.add(_discard)
+    key = key or f"{delta.get('doctype')}:{delta.get('name')}"
+    for topic in topics:
+        pending = buffer[(topic, event)]
+        pending[key] = {**pending.get(key, {}), **delta}
+
+
+def _discard() -> None:
+    frappe.local.tems_realtime_buffer = None
+
+
+def role_users(role: str) -> list[str]:
+    cache = frappe.cache()
+    users = cache.hget(ROLE_USERS_KEY, role)
+    if users is None:
+        users = frappe.get_all(
+            "Has Role",
+            filters={"role": role, "parenttype": "User"},
+            pluck="parent",
+            distinct=True,
+        )
+        enabled = set(frappe.get_all("User", filters={"name": ["in", users], "enabled": 1}, pluck="name")) if users else set()
+        users = sorted(u for u in users if u in enabled)
+        cache.hset(ROLE_USERS_KEY, role, users)
+        cache.expire(cache.make_key(ROLE_USERS_KEY), ROLE_USERS_TTL)
+    return users
+
+
+def flush() -> int:
+    """Emit buffered deltas, one message per (topic, event); returns messages sent."""
+    buffer = getattr(frappe.local, "tems_realtime_buffer", None)
+    frappe.local.tems_realtime_buffer = None
+    if not buffer:
+        return 0
+    sent = 0
+    ts = str(now_datetime())
+    for (topic, event), deltas in buffer.items():
+        message = {"topic": topic, "event": event, "deltas": list(deltas.values()), "ts": ts}
+        kind, _sep, target = topic.partition(":")
+        try:
+            if kind in _TOPIC_DOCTYPES:
+                frappe.publish_realtime(event, message, doctype=_TOPIC_DOCTYPES[kind], docname=target)
+                sent += 1
+            elif kind == "role":
+                for user in role_users(target):
+                    frappe.publish_realtime(event, message, user=user)
+                    sent += 1
+        except Exception:
+            frappe.log_error(title=f"Realtime publish failed: {topic}")
+    return sent
+
+
+@frappe.whitelist()
+def get_topic_rooms(topics: str | list) -> list[dict]:
+    """How a client joins each topic: {"topic", "doctype", "name"} for doc_subscribe,
+    or {"topic", "user_room": 1} for role topics the user already receives."""
+    if isinstance(topics, str):
+        topics = frappe.parse_json(topics) if topics.startswith("[") else [t.strip() for t in topics.split(",")]
+    user_roles = set(frappe.get_roles())
+    rooms = []
+    for topic in topics:
+        kind, _sep, target = topic.partition(":")
+        if (
+            kind in _TOPIC_DOCTYPES
+            and target
+            and frappe.db.exists(_TOPIC_DOCTYPES[kind], target)
+            and frappe.has_permission(_TOPIC_DOCTYPES[kind], "read", target)
+        ):
+            rooms.append({"topic": topic, "doctype": _TOPIC_DOCTYPES[kind], "name": target})
+        elif kind == "role" and target in user_roles:
+            rooms.append({"topic": topic, "user_room": 1})
+    return rooms
+
+
+@frappe.whitelist()
+def get_socket_config() -> dict:
+    """Socket.io namespace of this site; `port` is set in developer mode, where the
+    socket server is not proxied behind the web server."""
+    port = cint(frappe.conf.socketio_port or 9000) if frappe.conf.developer_mode else None
+    return {"namespace": f"/{frappe.local.site}", "port": port}
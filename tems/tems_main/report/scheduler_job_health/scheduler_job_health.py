@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from tems.tems_main import scheduler
+from tems.tems_main.profiling import percentile
+
+
+def execute(filters=None):
+    rows = []
+    for job in scheduler.known_jobs():
+        runs = [h for h in scheduler.history(job) if h.get("status") in ("ok", "error")]
+        durations = [h["duration_ms"] for h in runs if h.get("duration_ms") is not None]
+        skips = scheduler.skip_counts(job)
+        state = scheduler._state(job)
+        rows.append(
+            {
+                "job": job,
+                "runs": len(runs),
+                "errors": sum(1 for h in runs if h["status"] == "error"),
+                "last_run": runs[0]["ts"] if runs else None,
+                "p50_ms": round(percentile(durations, 50), 2),
+                "p95_ms": round(percentile(durations, 95), 2),
+                "max_ms": max(durations) if durations else 0,
+                "effective_interval": state.get("interval"),
+                "skipped_interval": skips["interval"],
+                "skipped_locked": skips["locked"],
+            }
+        )
+    rows.sort(key=lambda r: r["p95_ms"], reverse=True)
+
+    columns = [
+        {"label": "Job", "fieldname": "job", "fieldtype": "Data", "width": 360},
+        {"label": "Runs", "fieldname": "runs", "fieldtype": "Int", "width": 80},
+        {"label": "Errors", "fieldname": "errors", "fieldtype": "Int", "width": 80},
+        {"label": "Last Run", "fieldname": "last_run", "fieldtype": "Datetime", "width": 160},
+        {"label": "p50 (ms)", "fieldname": "p50_ms", "fieldtype": "Float", "width": 100},
+        {"label": "p95 (ms)", "fieldname": "p95_ms", "fieldtype": "Float", "width": 100},
+        {"label": "Max (ms)", "fieldname": "max_ms", "fieldtype": "Float", "width": 100},
+        {"label": "Effective Interval (s)", "fieldname": "effective_interval", "fieldtype": "Int", "width": 150},
+        {"label": "Skipped (Interval)", "fieldname": "skipped_interval", "fieldtype": "Int", "width": 130},
+        {"label": "Skipped (Overlap)", "fieldname": "skipped_locked", "fieldtype": "Int", "width": 130},
+    ]
+    return columns, rows
@@ -0,0 +1,183 @@
+"""Execution wrapper for TEMS scheduled jobs.
+
+`tems_job` decorates a task referenced from `scheduler_events` and, when the
+task runs inside a background worker, adds:
+
+- a Redis lock so a job never overlaps itself (a slow `all` tier run makes the
+  next tick skip instead of stacking up in the queue);
+- runtime history (capped list of recent runs and skips per job);
+- an adaptive effective interval: the job runs at most every
+  `max(base_interval, RUNTIME_FACTOR * p95 runtime)` seconds, and backs off
+  further while it keeps reporting no work (returns 0/False), unless the job
+  opts out of idle backoff because it must pick up new work within a tick.
+
+Direct calls (console, tests, benchmarks) bypass the guards and just run.
+History is read by the "Scheduler Job Health" report.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import time
+import uuid
+
+import frappe
+from frappe.utils import now_datetime
+
+from tems.tems_main.profiling import percentile
+
+CACHE_PREFIX = "tems:scheduler"
+JOBS_SET = f"{CACHE_PREFIX}:jobs"
+MAX_HISTORY = 100
+RUNTIME_FACTOR = 2.0
+SKIP_REASONS = ("interval", "locked")
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _in_worker() -> bool:
+    return bool(getattr(frappe.local, "job", None))
+
+
+def _key(job: str, suffix: str) -> str:
+    return f"{CACHE_PREFIX}:{suffix}:{job}"
+
+
+def acquire_lock(name: str, ttl: int) -> str | None:
+    """Take a site-scoped Redis lock; returns a token to release with, or None if held."""
+    cache = frappe.cache()
+    token = uuid.uuid4().hex
+    if cache.set(cache.make_key(_key(name, "lock")), token, nx=True, ex=max(int(ttl), 1)):
+        return token
+    return None
+
+
+def release_lock(name: str, token: str) -> None:
+    cache = frappe.cache()
+    cache.eval(_RELEASE_SCRIPT, 1, cache.make_key(_key(name, "lock")), token)
+
+
+def _state(job: str) -> dict:
+    return frappe.cache().get_value(_key(job, "state")) or {}
+
+
+def _set_state(job: str, state: dict) -> None:
+    frappe.cache().set_value(_key(job, "state"), state)
+
+
+def _record(job: str, status: str, duration_ms: float | None = None, reason: str | None = None) -> None:
+    cache = frappe.cache()
+    entry = {"ts": str(now_datetime()), "status": status, "duration_ms": duration_ms, "reason": reason}
+    cache.lpush(_key(job, "history"), json.dumps(entry))
+    cache.ltrim(_key(job, "history"), 0, MAX_HISTORY - 1)
+    cache.sadd(JOBS_SET, job)
+
+
+def _count_skip(job: str, reason: str) -> None:
+    cache = frappe.cache()
+    cache.incr(cache.make_key(_key(job, f"skips:{reason}")))
+    cache.sadd(JOBS_SET, job)
+
+
+def history(job: str) -> list[dict]:
+    return [json.loads(e) for e in frappe.cache().lrange(_key(job, "history"), 0, -1) or []]
+
+
+def skip_counts(job: str) -> dict[str, int]:
+    cache = frappe.cache()
+    return {
+        reason: int(cache.get(cache.make_key(_key(job, f"skips:{reason}"))) or 0)
+        for reason in SKIP_REASONS
+    }
+
+
+def known_jobs() -> list[str]:
+    return sorted(j.decode() if isinstance(j, bytes) else j for j in frappe.cache().smembers(JOBS_SET) or [])
+
+
+def next_interval(durations_ms: list[float], base_interval: int, max_interval: int, idle_streak: int) -> int:
+    """Effective interval in seconds for the next run."""
+    runtime_floor = RUNTIME_FACTOR * percentile(durations_ms, 95) / 1000.0
+    interval = max(base_interval, runtime_floor)
+    if idle_streak:
+        interval *= 2 ** min(idle_streak, 6)
+    return int(min(interval, max_interval))
+
+
+def tems_job(
+    *,
+    base_interval: int = 240,
+    max_interval: int = 3600,
+    lock_ttl: int | None = None,
+    idle_backoff: bool = True,
+):
+    """Guard a scheduled task. See module docstring.
+
+    Args:
+        base_interval: nominal interval of the scheduler tier, in seconds.
+        max_interval: cap for the adaptive interval.
+        lock_ttl: lock expiry in seconds (defaults to max_interval) so a crashed
+            worker cannot hold the lock forever.
+        idle_backoff: back off while the task reports no work; disable for
+            queue drains that must react to new items within one tick.
+    """
+
+    def decorator(fn):
+        job = f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _in_worker():
+                return fn(*args, **kwargs)
+            state = _state(job)
+            if time.time() < state.get("next_run_at", 0):
+                _count_skip(job, "interval")
+                return None
+
+            token = acquire_lock(job, lock_ttl or max_interval)
+            if not token:
+                _count_skip(job, "locked")
+                _record(job, "skipped", reason="locked")
+                return None
+
+            started_at = time.time()
+            start = time.perf_counter()
+            status = "error"
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                try:
+                    _record(job, status, duration_ms)
+                    idle = idle_backoff and status == "ok" and result is not None and not result
+                    idle_streak = state.get("idle_streak", 0) + 1 if idle else 0
+                    durations = [h["duration_ms"] for h in history(job) if h.get("duration_ms") is not None]
+                    interval = next_interval(durations[:20], base_interval, max_interval, idle_streak)
+                    # Half a tick of slack so scheduler jitter does not skip a due run
+                    _set_state(
+                        job,
+                        {
+                            "next_run_at": started_at + interval - base_interval / 2,
+                            "interval": interval,
+                            "idle_streak": idle_streak,
+                        },
+                    )
+                finally:
+                    release_lock(job, token)
+
+        wrapper.tems_job = {
+            "base_interval": base_interval,
+            "max_interval": max_interval,
+            "idle_backoff": idle_backoff,
+        }
+        return wrapper
+
+    return decorator
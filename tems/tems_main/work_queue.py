@@ -0,0 +1,77 @@
+"""Claim-then-acknowledge consumption of Redis list queues.
+
+Producers `lpush` JSON-encoded lists of items onto a queue key. A single
+consumer (holding a lock from `tems_main.scheduler.acquire_lock`) claims
+batches by moving them atomically into a processing list with RPOPLPUSH, so a
+claimed batch stays in Redis until the consumer acknowledges it after its
+database commit:
+
+    items = work_queue.claim(QUEUE_KEY, limit)
+    try:
+        process(items)
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        work_queue.fail(QUEUE_KEY)
+        raise
+    work_queue.ack(QUEUE_KEY)
+
+Batches left in the processing list by a crashed or failed run are claimed
+again first. Delivery is at-least-once: a crash between commit and `ack`
+processes the claimed batches twice. A claim that keeps failing is moved to a
+dead-letter list after MAX_ATTEMPTS, so one bad batch cannot block the queue.
+"""
+from __future__ import annotations
+
+import json
+
+import frappe
+
+MAX_ATTEMPTS = 3
+MAX_DEAD_BATCHES = 1000
+
+
+def _processing(queue: str) -> str:
+    return f"{queue}:processing"
+
+
+def _attempts(queue: str) -> str:
+    return f"{queue}:attempts"
+
+
+def dead_letter_key(queue: str) -> str:
+    return f"{queue}:dead"
+
+
+def claim(queue: str, limit: int) -> list:
+    """Items of the pending claim plus newly claimed batches, until `limit` items are reached."""
+    cache = frappe.cache()
+    # The processing list holds the oldest claimed batch last
+    pending = reversed(cache.lrange(_processing(queue), 0, -1) or [])
+    items = [item for raw in pending for item in json.loads(raw)]
+    source, target = cache.make_key(queue), cache.make_key(_processing(queue))
+    while len(items) < limit:
+        raw = cache.rpoplpush(source, target)
+        if raw is None:
+            break
+        items.extend(json.loads(raw))
+    return items
+
+
+def ack(queue: str) -> None:
+    """Drop the claimed batches once their work is committed."""
+    cache = frappe.cache()
+    cache.delete(cache.make_key(_processing(queue)), cache.make_key(_attempts(queue)))
+
+
+def fail(queue: str) -> bool:
+    """Keep the claim for the next run; dead-letter it after MAX_ATTEMPTS. Returns True if dead-lettered."""
+    cache = frappe.cache()
+    if cache.incr(cache.make_key(_attempts(queue))) < MAX_ATTEMPTS:
+        return False
+    dead = dead_letter_key(queue)
+    for raw in reversed(cache.lrange(_processing(queue), 0, -1) or []):
+        cache.lpush(dead, raw)
+    cache.ltrim(dead, 0, MAX_DEAD_BATCHES - 1)
+    ack(queue)
+    return True
@@ -0,0 +1,319 @@
+"""Shared, short-TTL snapshots for the control-room dashboards.
+
+Every control-room screen polls `get_operations_dashboard` and
+`get_operations_statistics`. Instead of running their queries per poll, the
+payload is computed once per SNAPSHOT_TTL seconds per scope (depot, period)
+and stored in Redis together with a content ETag and a version number that
+only increments when the payload changes.
+
+Recomputation is single-flight: one caller takes a short Redis lock and
+rebuilds, concurrent callers keep serving the previous snapshot (or wait
+briefly for the first one). Pollers send back the ETag they hold and get a
+304-style "not modified" answer when nothing changed.
+
+Snapshots are read with raw SQL, so permissions are applied to the cache
+key instead. Each dashboard section is only built for users with read
+permission on its doctype, and the readable sections are part of the key.
+Users restricted by User Permissions also have their visible vehicles in the
+key, and every section is scoped to those vehicles.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, getdate, now_datetime, nowdate
+
+from tems.tems_insights.kpi_engine import kpi_value_map
+from tems.tems_main.scheduler import acquire_lock, release_lock
+from tems.tems_operations.spatial import POSITION_TABLE
+
+CACHE_PREFIX = "tems:dashboard"
+SNAPSHOT_TTL = 5
+# Stale snapshots stay servable while one caller recomputes
+STALE_TTL = 300
+LOCK_TTL = 30
+WAIT_SECONDS = 2.0
+ACTIVE_STATES = ("Active", "Available")
+FLEET_STATES = ("Active", "Available", "Maintenance")
+SECTION_DOCTYPES = {
+    "active_operations": "Operation Plan",
+    "vehicle_positions": "Vehicle",
+    "exceptions": "Control Exception",
+    "sos_events": "SOS Event",
+    "fleet_summary": "Vehicle",
+}
+STATISTICS_DOCTYPE = "Operation Plan"
+# Utilization, availability, in-transit vehicles, maintenance backlog
+OPERATIONS_KPIS = ("KPI-001", "KPI-002", "KPI-005", "KPI-009")
+
+
+def _ttl() -> float:
+    return float(frappe.conf.get("tems_dashboard_ttl") or SNAPSHOT_TTL)
+
+
+def _etag(payload: dict) -> str:
+    content = {k: v for k, v in payload.items() if k != "timestamp"}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _store(key: str, payload, previous: dict | None) -> dict:
+    etag = _etag(payload)
+    version = (previous or {}).get("version", 0)
+    if not previous or previous.get("etag") != etag:
+        version += 1
+    snapshot = {"payload": payload, "etag": etag, "version": version, "computed_at": time.time()}
+    frappe.cache().set_value(key, snapshot, expires_in_sec=STALE_TTL)
+    return snapshot
+
+
+def cached_snapshot(name: str, builder, ttl: float | None = None) -> dict:
+    """{"payload", "etag", "version", "computed_at"} for `name`, rebuilt at most once per ttl."""
+    ttl = _ttl() if ttl is None else ttl
+    cache = frappe.cache()
+    key = f"{CACHE_PREFIX}:{name}"
+    snapshot = cache.get_value(key)
+    if snapshot and time.time() - snapshot["computed_at"] < ttl:
+        return snapshot
+
+    token = acquire_lock(key, LOCK_TTL)
+    if token:
+        try:
+            return _store(key, builder(), snapshot)
+        finally:
+            release_lock(key, token)
+    if snapshot:
+        return snapshot
+
+    # First build is in flight elsewhere: wait briefly instead of piling on
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        snapshot = cache.get_value(key)
+        if snapshot:
+            return snapshot
+    return _store(key, builder(), None)
+
+
+def respond(snapshot: dict, etag: str | None = None):
+    """Payload plus etag/version, or a not-modified marker (HTTP 304 when If-None-Match matches)."""
+    request = getattr(frappe.local, "request", None)
+    if_none_match = request.headers.get("If-None-Match") if request else None
+    headers = getattr(frappe.local, "response_headers", None)
+    if headers is not None:
+        headers.set("ETag", f'"{snapshot["etag"]}"')
+    if if_none_match and if_none_match.strip('"') == snapshot["etag"]:
+        frappe.local.response["http_status_code"] = 304
+        return None
+    if etag and etag == snapshot["etag"]:
+        return {"not_modified": True, "etag": snapshot["etag"], "version": snapshot["version"]}
+    return {**snapshot["payload"], "etag": snapshot["etag"], "version": snapshot["version"]}
+
+
+def readable_sections(user: str | None = None) -> tuple[str, ...]:
+    """Dashboard sections whose doctype the user may read; raises if none."""
+    sections = tuple(
+        section
+        for section, doctype in SECTION_DOCTYPES.items()
+        if frappe.has_permission(doctype, "read", user=user)
+    )
+    if not sections:
+        frappe.throw(_("Not permitted to view the operations dashboard"), frappe.PermissionError)
+    return sections
+
+
+def visible_vehicles(user: str | None = None) -> tuple[str, ...] | None:
+    """Vehicles the user may see when User Permissions restrict them; None when unrestricted."""
+    from frappe.permissions import get_user_permissions
+
+    if not get_user_permissions(user or frappe.session.user):
+        return None
+    return tuple(sorted(frappe.get_list("Vehicle", pluck="name", user=user)))
+
+
+def _scope_key(sections: tuple[str, ...], vehicles: tuple[str, ...] | None) -> str:
+    if vehicles is None:
+        return ",".join(sections)
+    digest = hashlib.sha1("\n".join(vehicles).encode()).hexdigest()[:12]
+    return f"{','.join(sections)}:v{digest}"
+
+
+def _has_depot_column() -> bool:
+    return frappe.db.has_column("Vehicle", "location")
+
+
+def _vehicle_scope(
+    depot: str | None, alias: str, vehicles: tuple[str, ...] | None = None, column: str = "vehicle"
+) -> tuple[str, dict]:
+    """SQL condition restricting `alias`.`column` to the depot's (and the visible) vehicles."""
+    condition, params = "", {}
+    if depot and _has_depot_column():
+        condition += f" and {alias}.{column} in (select name from `tabVehicle` where location = %(depot)s)"
+        params["depot"] = depot
+    if vehicles is not None:
+        # An empty tuple would be invalid SQL; match nothing instead
+        condition += f" and {alias}.{column} in %(vehicles)s"
+        params["vehicles"] = vehicles or ("",)
+    return condition, params
+
+
+def build_dashboard(
+    depot: str | None = None,
+    sections: tuple[str, ...] = tuple(SECTION_DOCTYPES),
+    vehicles: tuple[str, ...] | None = None,
+) -> dict:
+    """Dashboard payload with only `sections`, restricted to `vehicles` when given."""
+    today = getdate()
+    since = add_days(today, -1)
+    scope_op, params = _vehicle_scope(depot, "op", vehicles)
+    scope_ce = _vehicle_scope(depot, "ce", vehicles)[0]
+    scope_sos = _vehicle_scope(depot, "sos", vehicles)[0]
+    scope_pos = _vehicle_scope(depot, "p", vehicles)[0]
+    scope_vehicle = _vehicle_scope(depot, "v", vehicles, column="name")[0]
+    params.update({"today": today, "since": since, "active_states": ACTIVE_STATES})
+    payload = {}
+
+    if "active_operations" in sections or "fleet_summary" in sections:
+        active_operations = frappe.db.sql(
+            f"""
+            select op.name, op.title, op.vehicle, op.driver, op.operation_mode, op.start_time, op.status
+            from `tabOperation Plan` op
+            where op.status in ('Assigned', 'Active') and op.start_time >= %(today)s {scope_op}
+            order by op.start_time asc
+            """,
+            params,
+            as_dict=True,
+        )
+        if "active_operations" in sections:
+            payload["active_operations"] = active_operations
+    if "vehicle_positions" in sections:
+        payload["vehicle_positions"] = frappe.db.sql(
+            f"""
+            select p.vehicle, p.state, p.event_time, p.lat as location_lat, p.lng as location_lng,
+                p.geohash, v.license_plate
+            from `{POSITION_TABLE}` p
+            inner join `tabVehicle` v on v.name = p.vehicle
+            where p.event_time >= %(since)s {scope_pos}
+            order by p.event_time desc
+            """,
+            params,
+            as_dict=True,
+        )
+    if "exceptions" in sections:
+        payload["exceptions"] = frappe.db.sql(
+            f"""
+            select ce.name, ce.type, ce.severity, ce.occurred_at, ce.vehicle, ce.status
+            from `tabControl Exception` ce
+            where ce.status in ('Open', 'Acknowledged') and ce.occurred_at >= %(since)s {scope_ce}
+            order by ce.occurred_at desc
+            limit 20
+            """,
+            params,
+            as_dict=True,
+        )
+    if "sos_events" in sections:
+        payload["sos_events"] = frappe.db.sql(
+            f"""
+            select sos.name, sos.created_at, sos.reporter_employee, sos.vehicle, sos.lat, sos.lng, sos.status
+            from `tabSOS Event` sos
+            where sos.status in ('Open', 'Acknowledged') and sos.created_at >= %(since)s {scope_sos}
+            order by sos.created_at desc
+            """,
+            params,
+            as_dict=True,
+        )
+    if "fleet_summary" in sections:
+        total_vehicles = frappe.db.sql(
+            f"""
+            select count(*) from `tabVehicle` v
+            where v.custom_vehicle_state in %(active_states)s {scope_vehicle}
+            """,
+            params,
+        )[0][0]
+        # Operations of vehicles outside the user's scope are already filtered out above
+        active_vehicles = len({op.vehicle for op in active_operations if op.vehicle})
+        payload["fleet_summary"] = {
+            "total_vehicles": total_vehicles,
+            "active_vehicles": active_vehicles,
+            "utilization_rate": (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0,
+        }
+    payload["timestamp"] = str(now_datetime())
+    return payload
+
+
+def period_start(period: str):
+    return {"week": add_days(nowdate(), -7), "month": add_days(nowdate(), -30)}.get(period, nowdate())
+
+
+def build_statistics(period: str = "today", vehicles: tuple[str, ...] | None = None) -> dict:
+    """All statistics counters in one aggregate query, restricted to `vehicles` when given."""
+    op, params = _vehicle_scope(None, "op", vehicles)
+    ce = _vehicle_scope(None, "ce", vehicles)[0]
+    v = _vehicle_scope(None, "v", vehicles, column="name")[0]
+    params.update({"start": period_start(period), "today": nowdate(), "fleet_states": FLEET_STATES})
+    row = frappe.db.sql(
+        f"""
+        select
+            (select count(*) from `tabOperation Plan` op
+                where op.start_time >= %(start)s {op}) as total_operations,
+            (select count(*) from `tabOperation Plan` op
+                where op.start_time >= %(start)s and op.status = 'Completed' {op}) as completed_operations,
+            (select count(*) from `tabOperation Plan` op
+                where op.status = 'Active' {op}) as active_operations,
+            (select count(*) from `tabOperation Plan` op
+                where op.status in ('Scheduled', 'Pending') and op.start_time >= %(today)s {op})
+                as pending_operations,
+            (select count(*) from `tabVehicle` v
+                where v.custom_vehicle_state in %(fleet_states)s {v}) as total_vehicles,
+            (select count(distinct op.vehicle) from `tabOperation Plan` op
+                where op.status = 'Active' and op.vehicle is not null {op}) as active_vehicles,
+            (select count(*) from `tabControl Exception` ce
+                where ce.status in ('Open', 'Acknowledged') and ce.occurred_at >= %(start)s {ce})
+                as open_exceptions
+        """,
+        params,
+        as_dict=True,
+    )[0]
+    total, completed = row.total_operations or 0, row.completed_operations or 0
+    total_vehicles, active_vehicles = row.total_vehicles or 0, row.active_vehicles or 0
+    return {
+        "total_operations": total,
+        "completed_operations": completed,
+        "active_operations": row.active_operations or 0,
+        "pending_operations": row.pending_operations or 0,
+        "completion_rate": (completed / total * 100) if total > 0 else 0,
+        "fleet": {
+            "total_vehicles": total_vehicles,
+            "active_vehicles": active_vehicles,
+            "utilization_rate": (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0,
+        },
+        "alerts": {"open_exceptions": row.open_exceptions or 0},
+        # Fleet-wide KPIs are only shown to users who see the whole fleet
+        "kpis": kpi_value_map(OPERATIONS_KPIS) if vehicles is None else {},
+        "period": period,
+    }
+
+
+def dashboard_snapshot(depot: str | None = None, user: str | None = None) -> dict:
+    """Snapshot for `user` (default: session user), shared with users of the same permission scope."""
+    sections = readable_sections(user)
+    vehicles = visible_vehicles(user)
+    return cached_snapshot(
+        f"ops:{depot or 'all'}:{_scope_key(sections, vehicles)}",
+        lambda: build_dashboard(depot, sections, vehicles),
+    )
+
+
+def statistics_snapshot(period: str = "today", user: str | None = None) -> dict:
+    if not frappe.has_permission(STATISTICS_DOCTYPE, "read", user=user):
+        frappe.throw(_("Not permitted to view operations statistics"), frappe.PermissionError)
+    if period not in ("today", "week", "month"):
+        period = "today"
+    vehicles = visible_vehicles(user)
+    return cached_snapshot(
+        f"stats:{period}:{_scope_key((STATISTICS_DOCTYPE,), vehicles)}",
+        lambda: build_statistics(period, vehicles),
+    )
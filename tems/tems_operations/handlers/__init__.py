@@ -5,7 +5,9 @@ Event handlers for Operations module
 from __future__ import annotations
 
 import frappe
-from frappe.utils import now, get_datetime
+from frappe.utils import get_datetime, now
+
+from tems.tems_main import realtime
 
 
 def ensure_vehicle_available(doc, method=None):
@@ -93,56 +95,75 @@ def ensure_driver_vehicle_valid(doc, method=None):
         frappe.throw(f"Driver {driver} is not active/qualified.")
 
 
+OPERATIONS_EVENT_FIELDS = ("journey_plan", "event_time", "event_type", "vehicle")
+SOS_EVENT_FIELDS = ("status", "vehicle", "lat", "lng")
+MOVEMENT_FIELDS = ("state", "event_time", "location_lat", "location_lng", "operation_plan")
+VEHICLE_FIELDS = ("status", "custom_vehicle_state", "location", realtime.VEHICLE_AREA_FIELD)
+
+
 def publish_operations_event(doc, method=None):
-    """Realtime publish for Operations Event creation/update."""
-    try:
-        frappe.publish_realtime(
-            event="operations_event",
-            message={
-                "name": doc.name,
-                "journey_plan": getattr(doc, "journey_plan", None),
-                "event_time": getattr(doc, "event_time", None),
-                "event_type": getattr(doc, "event_type", None),
-                "vehicle": getattr(doc, "vehicle", None),
-            },
-            user="",
-        )
-    except Exception:
-        pass
+    """Realtime delta for Operations Event creation/update (vehicle, area + operations role topics)."""
+    vehicle = getattr(doc, "vehicle", None)
+    realtime.publish(
+        "operations_event",
+        realtime.doc_delta(doc, OPERATIONS_EVENT_FIELDS),
+        realtime.vehicle_topics(vehicle) + realtime.role_topics(*realtime.OPERATIONS_ROLES),
+    )
 
 
 def publish_sos_event(doc, method=None):
-    """Realtime publish for SOS events and notify Safety team immediately."""
+    """Realtime delta for SOS events and notify Safety team immediately."""
+    realtime.publish(
+        "sos_event",
+        realtime.doc_delta(doc, SOS_EVENT_FIELDS),
+        realtime.vehicle_topics(getattr(doc, "vehicle", None))
+        + realtime.role_topics(*realtime.SAFETY_ROLES, "Operations Manager"),
+    )
+    if method != "after_insert":
+        return
+
+    # Notify Safety Manager and Operations Manager roles
     try:
-        frappe.publish_realtime(
-            event="sos_event",
-            message={
-                "name": doc.name,
-                "status": getattr(doc, "status", None),
-                "vehicle": getattr(doc, "vehicle", None),
-                "location": {
-                    "lat": getattr(doc, "lat", None),
-                    "lng": getattr(doc, "lng", None),
-                },
-            },
-            user="",
-        )
-        
-        # Notify Safety Manager and Operations Manager roles
-        try:
-            recipients = [u.name for u in frappe.get_all("User", filters={"roles.role": ["in", ["Safety Manager", "Operations Manager"]]}, fields=["name"])]
-            if recipients:
-                frappe.sendmail(
-                    recipients=recipients,
-                    subject=f"SOS Event: {doc.name}",
-                    content=f"SOS raised for vehicle {getattr(doc, 'vehicle', '')} at {getattr(doc, 'creation', '')}",
-                )
-        except Exception:
-            pass
+        recipients = [u.name for u in frappe.get_all("User", filters={"roles.role": ["in", ["Safety Manager", "Operations Manager"]]}, fields=["name"])]
+        if recipients:
+            frappe.sendmail(
+                recipients=recipients,
+                subject=f"SOS Event: {doc.name}",
+                content=f"SOS raised for vehicle {getattr(doc, 'vehicle', '')} at {getattr(doc, 'creation', '')}",
+            )
     except Exception:
         pass
 
 
+def publish_vehicle_state(doc, method=None):
+    """Movement Log on_update: vehicle state/position delta keyed by vehicle (latest wins)."""
+    vehicle = getattr(doc, "vehicle", None)
+    if not vehicle:
+        return
+    delta = {"doctype": "Vehicle", "name": vehicle, **{f: doc.get(f) for f in MOVEMENT_FIELDS}}
+    realtime.publish(
+        "vehicle_state",
+        delta,
+        realtime.vehicle_topics(vehicle) + realtime.role_topics(*realtime.OPERATIONS_ROLES),
+        key=vehicle,
+    )
+
+
+def publish_vehicle_update(doc, method=None):
+    """Vehicle on_update: status/depot delta on the vehicle and area topics (old and new area)."""
+    delta = realtime.doc_delta(doc, VEHICLE_FIELDS)
+    if delta.keys() <= {"doctype", "name"}:
+        return
+    before = doc.get_doc_before_save()
+    topics = realtime.vehicle_topic(doc.name) + realtime.area_topic(doc.get(realtime.VEHICLE_AREA_FIELD))
+    if before and before.get(realtime.VEHICLE_AREA_FIELD) != doc.get(realtime.VEHICLE_AREA_FIELD):
+        # Let the previous area drop the vehicle
+        topics += realtime.area_topic(before.get(realtime.VEHICLE_AREA_FIELD))
+    realtime.publish(
+        "vehicle_state", delta, topics + realtime.role_topics(*realtime.OPERATIONS_ROLES), key=doc.name
+    )
+
+
 def validate_operation_plan(doc, method=None):
     """Ensure Operation Plan.operation_mode matches Vehicle.vehicle_type and auto-sync it."""
     veh = getattr(doc, "vehicle", None)
@@ -0,0 +1,331 @@
+"""Compiled route geometry and batched route-deviation detection.
+
+A Route Planning is compiled once into a polyline of waypoint coordinates
+(Way Points latitude/longitude, fetched from their Location) plus a segment
+index: segment start points, direction vectors, squared lengths and
+cumulative distance, all in a local equirectangular projection (km). The
+compiled form is stored in Redis and memoised per process, keyed by the
+route's `modified`, so checking a position never queries the database.
+
+Movement Log updates push located pings of planned operations onto a Redis
+queue. `check_route_deviations` drains it every minute, groups the pings by
+route and computes point-to-polyline distances for the whole group in one
+numpy broadcast. A plan that stays outside the corridor for
+MIN_OFF_ROUTE_PINGS consecutive pings gets one open "Route Deviation"
+Control Exception.
+"""
+from __future__ import annotations
+
+import json
+import math
+from collections import defaultdict
+
+import frappe
+import numpy as np
+from frappe.utils import get_datetime, now_datetime
+
+GEOMETRY_KEY = "tems:route_geometry"
+PLAN_ROUTE_KEY = "tems:plan_route"
+OFF_ROUTE_KEY = "tems:route_off_streak"
+QUEUE_KEY = "tems:route_check_queue"
+
+DEFAULT_CORRIDOR_KM = 1.0
+MIN_OFF_ROUTE_PINGS = 2
+# A single ping this many corridors away is a deviation on its own
+SEVERE_FACTOR = 3.0
+MAX_QUEUE = 50000
+BATCH_SIZE = 5000
+# Upper bound on positions x segments evaluated in one broadcast
+MAX_PAIRS = 2_000_000
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+# route -> (version, RouteGeometry), per worker process
+_local: dict[str, tuple[str, RouteGeometry | None]] = {}
+
+
+class RouteGeometry:
+    """Polyline with a precomputed segment index in a local km projection."""
+
+    def __init__(self, route: str, points: list[tuple[float, float]], version: str = ""):
+        self.route = route
+        self.version = version
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.lat0 = float(self.points[:, 0].mean()) if len(self.points) else 0.0
+        self.kx = KM_PER_DEG_LNG * math.cos(math.radians(self.lat0))
+        xy = self.project(self.points[:, 0], self.points[:, 1])
+        self.starts = xy[:-1]
+        self.vectors = xy[1:] - xy[:-1]
+        self.length_sq = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        lengths = np.sqrt(self.length_sq)
+        self.cumulative_km = np.concatenate([[0.0], np.cumsum(lengths)])
+        self.length_km = float(self.cumulative_km[-1])
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.starts)
+
+    def project(self, lats, lngs) -> np.ndarray:
+        lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+        return np.stack([(lngs - self.points[0, 1]) * self.kx, (lats - self.points[0, 0]) * KM_PER_DEG_LAT], axis=-1)
+
+    def distances(self, lats, lngs) -> tuple[np.ndarray, np.ndarray]:
+        """Distance (km) from each position to the polyline and the distance along it (km)."""
+        xy = self.project(lats, lngs).reshape(-1, 2)
+        if self.segment_count == 0:
+            return np.hypot(xy[:, 0], xy[:, 1]), np.zeros(len(xy))
+        distance = np.empty(len(xy))
+        along = np.empty(len(xy))
+        step = max(1, MAX_PAIRS // self.segment_count)
+        safe_length_sq = np.where(self.length_sq > 0, self.length_sq, 1.0)
+        for start in range(0, len(xy), step):
+            chunk = xy[start : start + step]
+            rel = chunk[:, None, :] - self.starts[None, :, :]  # (n, s, 2)
+            t = np.einsum("nsk,sk->ns", rel, self.vectors) / safe_length_sq
+            t = np.clip(np.where(self.length_sq > 0, t, 0.0), 0.0, 1.0)
+            offset = rel - t[:, :, None] * self.vectors[None, :, :]
+            dist_sq = np.einsum("nsk,nsk->ns", offset, offset)
+            nearest = dist_sq.argmin(axis=1)
+            rows = np.arange(len(chunk))
+            distance[start : start + len(chunk)] = np.sqrt(dist_sq[rows, nearest])
+            along[start : start + len(chunk)] = (
+                self.cumulative_km[nearest] + t[rows, nearest] * np.sqrt(self.length_sq[nearest])
+            )
+        return distance, along
+
+    def to_dict(self) -> dict:
+        return {"route": self.route, "version": self.version, "points": self.points.tolist()}
+
+
+def corridor_km() -> float:
+    return float(frappe.conf.get("tems_route_corridor_km") or DEFAULT_CORRIDOR_KM)
+
+
+def route_points(route: str) -> list[tuple[float, float]]:
+    """Ordered (lat, lng) of a route's located waypoints."""
+    rows = frappe.get_all(
+        "Way Points",
+        filters={"parent": route, "parenttype": "Route Planning", "parentfield": "waypoints"},
+        fields=["location", "latitude", "longitude"],
+        order_by="idx asc",
+    )
+    missing = [r.location for r in rows if r.location and (not r.latitude or not r.longitude)]
+    located = {}
+    if missing:
+        located = {
+            loc.name: (loc.latitude, loc.longitude)
+            for loc in frappe.get_all(
+                "Location", filters={"name": ["in", missing]}, fields=["name", "latitude", "longitude"]
+            )
+        }
+    points = []
+    for row in rows:
+        lat, lng = (row.latitude, row.longitude) if row.latitude and row.longitude else located.get(row.location, (None, None))
+        if lat and lng:
+            points.append((float(lat), float(lng)))
+    return points
+
+
+def compile_route(route: str) -> RouteGeometry | None:
+    """Compile and publish a route's geometry; None when it has fewer than two located stops."""
+    version = str(frappe.db.get_value("Route Planning", route, "modified") or "")
+    points = route_points(route)
+    geometry = RouteGeometry(route, points, version) if len(points) >= 2 else None
+    frappe.cache().hset(GEOMETRY_KEY, route, geometry.to_dict() if geometry else {"version": version, "points": []})
+    _local[route] = (version, geometry)
+    return geometry
+
+
+def get_geometry(route: str) -> RouteGeometry | None:
+    """Compiled geometry from process memory, then Redis, compiling on first use."""
+    if not route:
+        return None
+    cached = frappe.cache().hget(GEOMETRY_KEY, route)
+    if cached is None:
+        return compile_route(route)
+    local = _local.get(route)
+    if local and local[0] == cached.get("version"):
+        return local[1]
+    points = cached.get("points") or []
+    geometry = RouteGeometry(route, points, cached.get("version")) if len(points) >= 2 else None
+    _local[route] = (cached.get("version"), geometry)
+    return geometry
+
+
+def on_route_update(doc, method=None):
+    """Route Planning on_update: recompile the geometry."""
+    compile_route(doc.name)
+
+
+def on_route_trash(doc, method=None):
+    frappe.cache().hdel(GEOMETRY_KEY, doc.name)
+    _local.pop(doc.name, None)
+
+
+def cache_plan_route(doc, method=None):
+    """Operation Plan on_update: remember which route the plan follows."""
+    frappe.cache().hset(PLAN_ROUTE_KEY, doc.name, doc.get("route_reference") or "")
+
+
+def _plan_routes(plans: set[str]) -> dict[str, str]:
+    cache = frappe.cache()
+    routes, missing = {}, []
+    for plan in plans:
+        route = cache.hget(PLAN_ROUTE_KEY, plan)
+        if route is None:
+            missing.append(plan)
+        else:
+            routes[plan] = route
+    if missing:
+        found = dict(
+            frappe.get_all(
+                "Operation Plan", filters={"name": ["in", missing]}, fields=["name", "route_reference"], as_list=True
+            )
+        )
+        for plan in missing:
+            routes[plan] = found.get(plan) or ""
+            cache.hset(PLAN_ROUTE_KEY, plan, routes[plan])
+    return routes
+
+
+def queue_movement_ping(doc, method=None):
+    """Movement Log on_update: queue located pings of planned operations for the batch check."""
+    if not doc.get("operation_plan") or doc.get("location_lat") is None or doc.get("location_lng") is None:
+        return
+    ping = {
+        "plan": doc.operation_plan,
+        "vehicle": doc.vehicle,
+        "lat": doc.location_lat,
+        "lng": doc.location_lng,
+        "event_time": str(doc.event_time or now_datetime()),
+    }
+    cache = frappe.cache()
+    cache.lpush(QUEUE_KEY, json.dumps(ping))
+    cache.ltrim(QUEUE_KEY, 0, MAX_QUEUE - 1)
+
+
+def drain_queue(limit: int = BATCH_SIZE) -> list[dict]:
+    """Oldest `limit` queued pings (single consumer: the scheduled job holds a lock)."""
+    cache = frappe.cache()
+    raw = cache.lrange(QUEUE_KEY, -limit, -1)
+    if not raw:
+        return []
+    cache.ltrim(QUEUE_KEY, 0, -len(raw) - 1)
+    return [json.loads(item) for item in reversed(raw)]
+
+
+def check_positions(pings: list[dict]) -> list[dict]:
+    """Distance to the planned route for each ping ({plan, vehicle, lat, lng, event_time}).
+
+    Pings are grouped by route and evaluated in one vectorized call per route.
+    Pings without a compiled route are skipped.
+    """
+    routes = _plan_routes({p["plan"] for p in pings if p.get("plan")})
+    by_route: dict[str, list[dict]] = defaultdict(list)
+    for ping in pings:
+        route = routes.get(ping.get("plan"))
+        if route and ping.get("lat") is not None and ping.get("lng") is not None:
+            by_route[route].append(ping)
+
+    corridor = corridor_km()
+    results = []
+    for route, group in by_route.items():
+        geometry = get_geometry(route)
+        if not geometry:
+            continue
+        distance, along = geometry.distances([p["lat"] for p in group], [p["lng"] for p in group])
+        for ping, dist, progress in zip(group, distance, along, strict=True):
+            results.append(
+                {
+                    **ping,
+                    "route": route,
+                    "distance_km": round(float(dist), 3),
+                    "progress_km": round(float(progress), 3),
+                    "off_route": bool(dist > corridor),
+                }
+            )
+    return results
+
+
+def _open_deviations(plans: list[str]) -> set[str]:
+    if not plans:
+        return set()
+    return set(
+        frappe.get_all(
+            "Control Exception",
+            filters={
+                "type": "Route Deviation",
+                "journey_reference": ["in", plans],
+                "status": ["in", ["Open", "Acknowledged"]],
+            },
+            pluck="journey_reference",
+        )
+    )
+
+
+def raise_deviations(results: list[dict]) -> int:
+    """Update off-route streaks and raise Control Exceptions; returns exceptions created."""
+    cache = frappe.cache()
+    corridor = corridor_km()
+    results = sorted(results, key=lambda r: get_datetime(r["event_time"]))
+    streaks = {}
+    worst: dict[str, dict] = {}
+    for result in results:
+        plan = result["plan"]
+        if plan not in streaks:
+            streaks[plan] = cache.hget(OFF_ROUTE_KEY, plan) or 0
+        if not result["off_route"]:
+            # Back on route: the streak restarts, a deviation already confirmed in this batch stands
+            streaks[plan] = 0
+            continue
+        streaks[plan] += 1
+        severe = result["distance_km"] >= SEVERE_FACTOR * corridor
+        if streaks[plan] >= MIN_OFF_ROUTE_PINGS or severe:
+            if plan not in worst or result["distance_km"] > worst[plan]["distance_km"]:
+                worst[plan] = result
+
+    for plan, streak in streaks.items():
+        if streak:
+            cache.hset(OFF_ROUTE_KEY, plan, streak)
+        else:
+            cache.hdel(OFF_ROUTE_KEY, plan)
+
+    already_open = _open_deviations(list(worst))
+    created = 0
+    for plan, result in worst.items():
+        if plan in already_open:
+            continue
+        frappe.get_doc(
+            {
+                "doctype": "Control Exception",
+                "type": "Route Deviation",
+                "severity": "High" if result["distance_km"] >= SEVERE_FACTOR * corridor else "Medium",
+                "occurred_at": result["event_time"],
+                "vehicle": result.get("vehicle"),
+                "journey_reference": plan,
+                "status": "Open",
+                "description": (
+                    f"Vehicle {result.get('vehicle')} is {result['distance_km']} km off route {result['route']} "
+                    f"(corridor {corridor} km, {result['progress_km']} km along the route) "
+                    f"at {result['lat']}, {result['lng']}."
+                ),
+            }
+        ).insert(ignore_permissions=True)
+        created += 1
+    return created
+
+
+def process_queue(max_batches: int = 20) -> dict:
+    """Drain queued pings in batches; returns counts of pings checked and exceptions raised."""
+    summary = {"pings": 0, "checked": 0, "exceptions": 0}
+    for _ in range(max_batches):
+        pings = drain_queue()
+        if not pings:
+            break
+        results = check_positions(pings)
+        summary["pings"] += len(pings)
+        summary["checked"] += len(results)
+        summary["exceptions"] += raise_deviations(results)
+        frappe.db.commit()
+    return summary
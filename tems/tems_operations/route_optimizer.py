@@ -0,0 +1,453 @@
+"""Offline multi-drop route optimization (capacitated VRP with time windows).
+
+No external map service is used: travel distance is haversine distance times
+a road circuity factor, travel time is distance over an average speed. The
+distance matrix for a set of stops is cached in Redis per operating area.
+
+The solver builds routes by nearest (cheapest feasible) insertion, evaluated
+for every unrouted stop and every insertion position at once with numpy, and
+then improves them with 2-opt (within a route) and or-opt (moving chains of
+1-3 stops within or between routes) until no move improves or the time limit
+is reached. Capacity (cargo weight) and time windows are hard constraints;
+stops that cannot be served are returned as unassigned.
+
+`plan_routes` resolves stops from Locations, Way Points of a Route Planning
+and Cargo Consignments (weight as demand) and returns a dispatch plan.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from datetime import timedelta
+from itertools import pairwise
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import get_datetime, now_datetime
+
+DEFAULT_SPEED_KMH = 35.0
+DEFAULT_CIRCUITY = 1.3
+DEFAULT_SERVICE_MINUTES = 10.0
+DEFAULT_SHIFT_MINUTES = 12 * 60
+# Distance-equivalent (km) of putting one more vehicle on the road
+DEFAULT_VEHICLE_COST_KM = 50.0
+DEFAULT_TIME_LIMIT = 5.0
+MATRIX_TTL = 6 * 3600
+MAX_OR_OPT_CHAIN = 3
+EARTH_RADIUS_KM = 6371.0
+EPS = 1e-9
+
+
+def distance_matrix(coords, circuity: float = DEFAULT_CIRCUITY) -> np.ndarray:
+    """Road distance estimate (km) between every pair of (lat, lng)."""
+    pts = np.radians(np.asarray(coords, dtype=float).reshape(-1, 2))
+    lat, lng = pts[:, 0][:, None], pts[:, 1][:, None]
+    a = np.sin((lat.T - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lng.T - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * circuity
+
+
+def cached_distance_matrix(coords, operating_area: str | None = None) -> np.ndarray:
+    """`distance_matrix` cached per operating area and stop set."""
+    circuity = float(frappe.conf.get("tems_vrp_circuity") or DEFAULT_CIRCUITY)
+    digest = hashlib.sha1(
+        repr((circuity, [(round(lat, 6), round(lng, 6)) for lat, lng in coords])).encode()
+    ).hexdigest()
+    key = f"tems:vrp_matrix:{operating_area or 'default'}:{digest}"
+    cache = frappe.cache()
+    matrix = cache.get_value(key)
+    if matrix is None:
+        matrix = distance_matrix(coords, circuity)
+        cache.set_value(key, matrix, expires_in_sec=MATRIX_TTL)
+    return matrix
+
+
+class RoutingProblem:
+    """Node 0 is the start depot, nodes 1..n the stops, node n+1 the end depot.
+
+    Times are minutes from the planning start.
+    """
+
+    def __init__(
+        self,
+        dist,
+        demand,
+        early,
+        late,
+        service,
+        capacities,
+        shift_end,
+        speed_kmh: float = DEFAULT_SPEED_KMH,
+        vehicle_cost: float = DEFAULT_VEHICLE_COST_KM,
+    ):
+        self.dist = np.asarray(dist, dtype=float)
+        self.travel = self.dist / speed_kmh * 60.0
+        self.demand = np.asarray(demand, dtype=float)
+        self.early = np.asarray(early, dtype=float)
+        self.late = np.asarray(late, dtype=float)
+        self.service = np.asarray(service, dtype=float)
+        self.capacities = [float(c) for c in capacities]
+        self.shift_end = [float(s) for s in shift_end]
+        self.vehicle_cost = float(vehicle_cost)
+        self.end = len(self.dist) - 1
+        self.stops = list(range(1, self.end))
+        # Plain-list copies: scalar indexing in the local search is much cheaper than on ndarrays
+        self.dist_rows = self.dist.tolist()
+        self._travel = self.travel.tolist()
+        self._service = self.service.tolist()
+        self._early = self.early.tolist()
+        self._late = self.late.tolist()
+        self._demand = self.demand.tolist()
+
+    def schedule(self, route: list[int], vehicle: int) -> list[float] | None:
+        """Service start time per stop, or None when a window, capacity or shift is violated."""
+        if sum(self._demand[node] for node in route) > self.capacities[vehicle] + EPS:
+            return None
+        travel, service, early, late = self._travel, self._service, self._early, self._late
+        begin, t, prev = [], 0.0, 0
+        for node in route:
+            t = max(t + service[prev] + travel[prev][node], early[node])
+            if t > late[node] + EPS:
+                return None
+            begin.append(t)
+            prev = node
+        if t + service[prev] + travel[prev][self.end] > self.shift_end[vehicle] + EPS:
+            return None
+        return begin
+
+    def latest(self, route: list[int], vehicle: int) -> list[float]:
+        """Latest feasible service start per position, the end depot last."""
+        latest = [self.shift_end[vehicle]]
+        nxt = self.end
+        for node in reversed(route):
+            latest.append(min(self._late[node], latest[-1] - self._travel[node][nxt] - self._service[node]))
+            nxt = node
+        return latest[::-1]
+
+    def route_distance(self, route: list[int]) -> float:
+        path = [0, *route, self.end]
+        return float(sum(self.dist_rows[a][b] for a, b in pairwise(path)))
+
+    def cost(self, routes: list[list[int]]) -> float:
+        return sum(self.route_distance(r) + self.vehicle_cost for r in routes if r)
+
+
+def _positions(problem: RoutingProblem, routes: list[list[int]]) -> dict[str, np.ndarray]:
+    """Every insertion slot of the current solution as parallel arrays."""
+    cols = {k: [] for k in ("route", "index", "prev", "next", "depart", "latest", "room", "opening")}
+    for v, route in enumerate(routes):
+        begin = problem.schedule(route, v) or []
+        latest = problem.latest(route, v)
+        room = problem.capacities[v] - sum(problem.demand[n] for n in route)
+        path = [0, *route, problem.end]
+        for p in range(len(route) + 1):
+            prev = path[p]
+            cols["route"].append(v)
+            cols["index"].append(p)
+            cols["prev"].append(prev)
+            cols["next"].append(path[p + 1])
+            cols["depart"].append((begin[p - 1] if p else 0.0) + problem.service[prev])
+            cols["latest"].append(latest[p])
+            cols["room"].append(room)
+            cols["opening"].append(0.0 if route else problem.vehicle_cost)
+    return {k: np.asarray(v) for k, v in cols.items()}
+
+
+def construct(problem: RoutingProblem, vehicles: int) -> tuple[list[list[int]], list[int]]:
+    """Nearest insertion: repeatedly insert the stop with the cheapest feasible slot."""
+    routes: list[list[int]] = [[] for _ in range(vehicles)]
+    pending = np.asarray(problem.stops, dtype=int)
+    while len(pending):
+        pos = _positions(problem, routes)
+        u = pending[:, None]
+        arrive = pos["depart"][None, :] + problem.travel[pos["prev"][None, :], u]
+        begin = np.maximum(arrive, problem.early[u])
+        arrive_next = begin + problem.service[u] + problem.travel[u, pos["next"][None, :]]
+        begin_next = np.maximum(arrive_next, problem.early[pos["next"]][None, :])
+        feasible = (
+            (begin <= problem.late[u] + EPS)
+            & (begin_next <= pos["latest"][None, :] + EPS)
+            & (problem.demand[u] <= pos["room"][None, :] + EPS)
+        )
+        cost = (
+            problem.dist[pos["prev"][None, :], u]
+            + problem.dist[u, pos["next"][None, :]]
+            - problem.dist[pos["prev"], pos["next"]][None, :]
+            + pos["opening"][None, :]
+        )
+        cost = np.where(feasible, cost, np.inf)
+        best = np.unravel_index(np.argmin(cost), cost.shape)
+        if not np.isfinite(cost[best]):
+            break
+        stop, slot = int(pending[best[0]]), best[1]
+        routes[int(pos["route"][slot])].insert(int(pos["index"][slot]), stop)
+        pending = np.delete(pending, best[0])
+    return routes, [int(s) for s in pending]
+
+
+def _two_opt(problem: RoutingProblem, routes: list[list[int]], deadline: float) -> bool:
+    improved = False
+    d = problem.dist_rows
+    for v, route in enumerate(routes):
+        path = [0, *route, problem.end]
+        for i in range(1, len(path) - 2):
+            for j in range(i + 1, len(path) - 1):
+                delta = d[path[i - 1]][path[j]] + d[path[i]][path[j + 1]] - d[path[i - 1]][path[i]] - d[path[j]][path[j + 1]]
+                if delta < -EPS:
+                    candidate = path[1:i] + path[i : j + 1][::-1] + path[j + 1 : -1]
+                    if problem.schedule(candidate, v) is not None:
+                        routes[v] = route = candidate
+                        path = [0, *route, problem.end]
+                        improved = True
+            if time.monotonic() > deadline:
+                return improved
+    return improved
+
+
+def _or_opt_from(problem: RoutingProblem, routes: list[list[int]], src: int) -> bool:
+    """Apply the first improving move of a chain out of route `src`."""
+    d = problem.dist_rows
+    route = routes[src]
+    for length in range(1, MAX_OR_OPT_CHAIN + 1):
+        for i in range(len(route) - length + 1):
+            chain = route[i : i + length]
+            head, tail = chain[0], chain[-1]
+            before = route[i - 1] if i else 0
+            after = route[i + length] if i + length < len(route) else problem.end
+            removed = route[:i] + route[i + length :]
+            gain = d[before][head] + d[tail][after] - d[before][after]
+            if not removed:
+                gain += problem.vehicle_cost
+            for dst, target in enumerate(routes):
+                base = removed if dst == src else target
+                if dst == src and not removed:
+                    continue
+                opening = problem.vehicle_cost if not base else 0.0
+                path = [0, *base, problem.end]
+                for p in range(len(path) - 1):
+                    if dst == src and p == i:
+                        continue
+                    a, b = path[p], path[p + 1]
+                    if d[a][head] + d[tail][b] - d[a][b] + opening - gain >= -EPS:
+                        continue
+                    candidate = base[:p] + chain + base[p:]
+                    if problem.schedule(candidate, dst) is None:
+                        continue
+                    if dst != src and problem.schedule(removed, src) is None:
+                        continue
+                    routes[dst] = candidate
+                    if dst != src:
+                        routes[src] = removed
+                    return True
+    return False
+
+
+def _or_opt(problem: RoutingProblem, routes: list[list[int]], deadline: float) -> bool:
+    improved = False
+    for src in range(len(routes)):
+        while routes[src] and _or_opt_from(problem, routes, src):
+            improved = True
+            if time.monotonic() > deadline:
+                return improved
+    return improved
+
+
+def solve(problem: RoutingProblem, time_limit: float = DEFAULT_TIME_LIMIT) -> dict:
+    """Construct and improve routes; returns {"routes", "unassigned", "cost"}."""
+    deadline = time.monotonic() + time_limit
+    routes, unassigned = construct(problem, len(problem.capacities))
+    while time.monotonic() < deadline:
+        if not (_two_opt(problem, routes, deadline) | _or_opt(problem, routes, deadline)):
+            break
+    return {"routes": routes, "unassigned": unassigned, "cost": problem.cost(routes)}
+
+
+def _parse_point(value) -> tuple[float, float] | None:
+    if isinstance(value, list | tuple) and len(value) == 2:
+        return float(value[0]), float(value[1])
+    if isinstance(value, dict) and value.get("lat") is not None and value.get("lng") is not None:
+        return float(value["lat"]), float(value["lng"])
+    if isinstance(value, str) and "," in value:
+        lat, lng = value.split(",", 1)
+        try:
+            return float(lat), float(lng)
+        except ValueError:
+            return None
+    return None
+
+
+def _location_coords(names: list[str]) -> dict[str, tuple[float, float]]:
+    names = [n for n in set(names) if n]
+    if not names or not frappe.db.exists("DocType", "Location"):
+        return {}
+    return {
+        row.name: (float(row.latitude), float(row.longitude))
+        for row in frappe.get_all(
+            "Location", filters={"name": ["in", names]}, fields=["name", "latitude", "longitude"]
+        )
+        if row.latitude and row.longitude
+    }
+
+
+def _minutes(value, start) -> float | None:
+    if value in (None, ""):
+        return None
+    if isinstance(value, int | float):
+        return float(value)
+    return (get_datetime(value) - start).total_seconds() / 60.0
+
+
+def _route_stops(route: str) -> list[dict]:
+    rows = frappe.get_all(
+        "Way Points",
+        filters={"parent": route, "parenttype": "Route Planning", "parentfield": "waypoints"},
+        fields=["stop_name", "location", "latitude", "longitude", "arrival_time", "departure_time"],
+        order_by="idx asc",
+    )
+    return [
+        {
+            "name": row.stop_name or row.location,
+            "location": row.location,
+            "lat": row.latitude or None,
+            "lng": row.longitude or None,
+            "window_start": row.arrival_time,
+            "window_end": row.departure_time,
+        }
+        for row in rows
+    ]
+
+
+def _consignment_stops(consignments: list[str]) -> list[dict]:
+    rows = frappe.get_all(
+        "Cargo Consignment",
+        filters={"name": ["in", consignments]},
+        fields=["name", "destination", "cargo_weight"],
+    )
+    return [
+        {"name": row.name, "consignment": row.name, "location": row.destination, "demand": row.cargo_weight or 0}
+        for row in rows
+    ]
+
+
+def _vehicle_capacities(vehicles: list[str], default: float | None) -> list[float]:
+    capacities = {}
+    if vehicles and frappe.db.has_column("Vehicle", "payload_capacity_kg"):
+        capacities = dict(
+            frappe.get_all(
+                "Vehicle", filters={"name": ["in", vehicles]}, fields=["name", "payload_capacity_kg"], as_list=True
+            )
+        )
+    fallback = float(default) if default else float("inf")
+    return [float(capacities.get(v) or fallback) for v in vehicles]
+
+
+def plan_routes(
+    origin,
+    destination=None,
+    stops: list | None = None,
+    route: str | None = None,
+    consignments: list[str] | None = None,
+    vehicles: list[str] | None = None,
+    capacity: float | None = None,
+    operating_area: str | None = None,
+    depart_at=None,
+    shift_minutes: float = DEFAULT_SHIFT_MINUTES,
+    time_limit: float = DEFAULT_TIME_LIMIT,
+) -> dict:
+    """Optimize a multi-drop day from `origin` (Location name or "lat,lng").
+
+    Stops come from `stops` (Location names or dicts with location/lat/lng,
+    demand, window_start, window_end, service_minutes), the Way Points of
+    `route` and the destinations of `consignments` (cargo weight as demand).
+    Without `vehicles` one vehicle with `capacity` is planned.
+    """
+    start = get_datetime(depart_at) if depart_at else now_datetime()
+    items = [s if isinstance(s, dict) else {"name": s, "location": s} for s in (stops or [])]
+    if route:
+        items += _route_stops(route)
+    if consignments:
+        items += _consignment_stops(consignments)
+
+    origin_point = _parse_point(origin)
+    destination_point = _parse_point(destination) if destination else None
+    lookup = _location_coords(
+        [i.get("location") for i in items]
+        + ([origin] if origin_point is None else [])
+        + ([destination] if destination and destination_point is None else [])
+    )
+    origin_point = origin_point or lookup.get(origin)
+    if not origin_point:
+        frappe.throw(_("Origin {0} has no coordinates").format(origin))
+    destination_point = destination_point or lookup.get(destination) or origin_point
+
+    located, unlocated = [], []
+    for item in items:
+        point = _parse_point(item) or lookup.get(item.get("location"))
+        (located if point else unlocated).append((item, point))
+
+    vehicle_names = list(vehicles or []) or ["Vehicle 1"]
+    if vehicles:
+        capacities = _vehicle_capacities(list(vehicles), capacity)
+    else:
+        capacities = [float(capacity) if capacity else float("inf")]
+    coords = [origin_point, *[p for _i, p in located], destination_point]
+    early = [0.0] + [_minutes(i.get("window_start"), start) or 0.0 for i, _p in located] + [0.0]
+    late = [float(shift_minutes)] + [
+        _minutes(i.get("window_end"), start) if i.get("window_end") else float(shift_minutes) for i, _p in located
+    ] + [float(shift_minutes)]
+    service = [0.0] + [float(i.get("service_minutes") or DEFAULT_SERVICE_MINUTES) for i, _p in located] + [0.0]
+    demand = [0.0] + [float(i.get("demand") or 0) for i, _p in located] + [0.0]
+
+    problem = RoutingProblem(
+        cached_distance_matrix(coords, operating_area),
+        demand,
+        early,
+        late,
+        service,
+        capacities,
+        [float(shift_minutes)] * len(capacities),
+        speed_kmh=float(frappe.conf.get("tems_vrp_speed_kmh") or DEFAULT_SPEED_KMH),
+        vehicle_cost=float(frappe.conf.get("tems_vrp_vehicle_cost_km") or DEFAULT_VEHICLE_COST_KM),
+    )
+    started = time.perf_counter()
+    solution = solve(problem, float(time_limit))
+
+    plans = []
+    for v, stops_in_route in enumerate(solution["routes"]):
+        if not stops_in_route:
+            continue
+        begin = problem.schedule(stops_in_route, v)
+        last = stops_in_route[-1]
+        finish = begin[-1] + problem.service[last] + problem.travel[last, problem.end]
+        plans.append(
+            {
+                "vehicle": vehicle_names[v],
+                "capacity": None if capacities[v] == float("inf") else capacities[v],
+                "load": round(float(sum(problem.demand[n] for n in stops_in_route)), 3),
+                "distance_km": round(problem.route_distance(stops_in_route), 2),
+                "duration_minutes": round(float(finish), 1),
+                "stops": [
+                    {
+                        "name": located[node - 1][0].get("name") or located[node - 1][0].get("location"),
+                        "location": located[node - 1][0].get("location"),
+                        "consignment": located[node - 1][0].get("consignment"),
+                        "lat": coords[node][0],
+                        "lng": coords[node][1],
+                        "demand": float(problem.demand[node]),
+                        "arrival": start + timedelta(minutes=float(at)),
+                    }
+                    for node, at in zip(stops_in_route, begin, strict=True)
+                ],
+            }
+        )
+    return {
+        "routes": plans,
+        "unassigned": [located[n - 1][0] for n in solution["unassigned"]],
+        "unlocated": [item for item, _p in unlocated],
+        "total_distance_km": round(sum(p["distance_km"] for p in plans), 2),
+        "direct_distance_km": round(float(problem.dist_rows[0][problem.end]), 2),
+        "origin_point": origin_point,
+        "destination_point": destination_point,
+        "vehicles_used": len(plans),
+        "solve_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,193 @@
+"""Spatial index and proximity queries over vehicle positions.
+
+``tems_vehicle_position`` keeps one row per vehicle (latest known position,
+geohash, movement state and derived availability). It is maintained from
+Movement Log updates, so "where is everything now" questions never scan the
+Movement Log history. Radius, nearest-vehicle and viewport queries expand to a
+handful of geohash prefixes (see tems.tems_main.geo) and run as indexed
+``geohash LIKE 'prefix%'`` range scans before an exact distance/box filter.
+"""
+from __future__ import annotations
+
+import frappe
+from frappe.utils import now_datetime
+
+from tems.tems_main import geo
+
+POSITION_TABLE = "tems_vehicle_position"
+AVAILABLE_STATES = ("Check-In", "Delivered", "Delivery Confirmation")
+NEAREST_RADII_KM = (2, 5, 10, 25, 50, 100, 250)
+
+# DocType -> (lat field, lng field) for geohash maintenance on validate
+_COORD_FIELDS = {
+    "Movement Log": ("location_lat", "location_lng"),
+    "SOS Event": ("lat", "lng"),
+}
+
+
+def ensure_position_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{POSITION_TABLE}` (
+            vehicle varchar(140) not null primary key,
+            lat double not null,
+            lng double not null,
+            geohash varchar(12) not null,
+            state varchar(40),
+            available tinyint not null default 0,
+            event_time datetime(6),
+            updated_at datetime(6),
+            index idx_geohash (geohash),
+            index idx_available_geohash (available, geohash)
+        ) engine=InnoDB
+        """
+    )
+
+
+def _has_coords(lat, lng) -> bool:
+    return lat is not None and lng is not None and not (lat == 0 and lng == 0)
+
+
+def set_geohash(doc, method=None):
+    """validate hook: keep `geohash` in sync with the document's coordinates."""
+    lat_field, lng_field = _COORD_FIELDS.get(doc.doctype, ("lat", "lng"))
+    lat, lng = doc.get(lat_field), doc.get(lng_field)
+    if _has_coords(lat, lng):
+        doc.geohash = geo.encode(float(lat), float(lng))
+
+
+def upsert_positions(rows: list[dict]) -> None:
+    """Insert/refresh latest positions; older events never overwrite newer ones.
+
+    Each row: vehicle, lat, lng, state, event_time (geohash is derived).
+    """
+    values = []
+    stamp = now_datetime()
+    for row in rows:
+        if not row.get("vehicle") or not _has_coords(row.get("lat"), row.get("lng")):
+            continue
+        lat, lng = float(row["lat"]), float(row["lng"])
+        values.extend(
+            [
+                row["vehicle"],
+                lat,
+                lng,
+                row.get("geohash") or geo.encode(lat, lng),
+                row.get("state"),
+                1 if row.get("state") in AVAILABLE_STATES else 0,
+                row.get("event_time") or stamp,
+                stamp,
+            ]
+        )
+    if not values:
+        return
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * (len(values) // 8))
+    newer = "values(event_time) >= event_time"
+    frappe.db.sql(
+        f"""
+        insert into `{POSITION_TABLE}` (vehicle, lat, lng, geohash, state, available, event_time, updated_at)
+        values {placeholders}
+        on duplicate key update
+            lat = if({newer}, values(lat), lat),
+            lng = if({newer}, values(lng), lng),
+            geohash = if({newer}, values(geohash), geohash),
+            state = if({newer}, values(state), state),
+            available = if({newer}, values(available), available),
+            updated_at = values(updated_at),
+            event_time = greatest(event_time, values(event_time))
+        """,
+        values,
+    )
+
+
+def record_movement_position(doc, method=None):
+    """Movement Log on_update: refresh the vehicle's latest position."""
+    upsert_positions(
+        [
+            {
+                "vehicle": doc.vehicle,
+                "lat": doc.location_lat,
+                "lng": doc.location_lng,
+                "geohash": doc.get("geohash"),
+                "state": doc.state,
+                "event_time": doc.event_time,
+            }
+        ]
+    )
+
+
+def _prefix_query(prefixes: list[str], available_only: bool = False) -> list[dict]:
+    if not prefixes:
+        return []
+    clauses = " or ".join(["p.geohash like %s"] * len(prefixes))
+    params = [f"{prefix}%" for prefix in prefixes]
+    availability = "p.available = 1 and" if available_only else ""
+    return frappe.db.sql(
+        f"""
+        select p.vehicle, p.lat, p.lng, p.geohash, p.state, p.available, p.event_time
+        from `{POSITION_TABLE}` p
+        where {availability} ({clauses})
+        """,
+        params,
+        as_dict=True,
+    )
+
+
+def vehicles_within(lat: float, lng: float, radius_km: float, available_only: bool = False) -> list[dict]:
+    """Vehicles whose latest position is within `radius_km` of the point, nearest first."""
+    lat, lng, radius_km = float(lat), float(lng), float(radius_km)
+    result = []
+    for row in _prefix_query(geo.cover_circle(lat, lng, radius_km), available_only):
+        distance = geo.haversine_km(lat, lng, row.lat, row.lng)
+        if distance <= radius_km:
+            row["distance_km"] = round(distance, 3)
+            result.append(row)
+    result.sort(key=lambda r: r["distance_km"])
+    return result
+
+
+def nearest_available(lat: float, lng: float, k: int = 5, max_radius_km: float = NEAREST_RADII_KM[-1]) -> list[dict]:
+    """k nearest available vehicles, widening the search ring until enough are found."""
+    for radius in NEAREST_RADII_KM:
+        if radius > max_radius_km:
+            break
+        found = vehicles_within(lat, lng, radius, available_only=True)
+        if len(found) >= k:
+            return found[:k]
+    return vehicles_within(lat, lng, max_radius_km, available_only=True)[:k]
+
+
+    """Vehicles whose latest position is in the viewport; min_lng > max_lng crosses the antimeridian."""
+    """Vehicles whose latest position falls inside the viewport (min_lng > max_lng crosses 180°)."""
+    min_lat, min_lng, max_lat, max_lng = map(float, (min_lat, min_lng, max_lat, max_lng))
+    crosses = min_lng > max_lng
+    return [
+        row
+        for row in _prefix_query(geo.cover_bbox(min_lat, min_lng, max_lat, max_lng))
+        if min_lat <= row.lat <= max_lat
+        and ((row.lng >= min_lng or row.lng <= max_lng) if crosses else min_lng <= row.lng <= max_lng)
+    ]
+
+
+def rebuild_positions(vehicles: list[str] | None = None) -> int:
+    """Backfill the position table from the latest located Movement Log per vehicle."""
+    ensure_position_table()
+    vehicle_filter = "and vehicle in %(vehicles)s" if vehicles else ""
+    rows = frappe.db.sql(
+        f"""
+        select ml.vehicle, ml.location_lat as lat, ml.location_lng as lng, ml.geohash, ml.state, ml.event_time
+        from `tabMovement Log` ml
+        join (
+            select vehicle, max(event_time) as event_time
+            from `tabMovement Log`
+            where location_lat is not null and location_lng is not null and ifnull(vehicle, '') != ''
+            {vehicle_filter}
+            group by vehicle
+        ) latest on latest.vehicle = ml.vehicle and latest.event_time = ml.event_time
+        """,
+        {"vehicles": tuple(vehicles or ())},
+        as_dict=True,
+    )
+    for start in range(0, len(rows), 1000):
+        upsert_positions(rows[start : start + 1000])
+    return len(rows)
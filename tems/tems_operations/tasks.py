@@ -5,6 +5,8 @@ from __future__ import annotations
 
 import frappe
 
+from tems.tems_main.scheduler import tems_job
+
 
 def _log(msg: str) -> None:
     try:
@@ -62,3 +64,33 @@ def weekly_sync_checkpoint() -> None:
 
 def monthly_sync_checkpoint() -> None:
     _log("operations.monthly_sync_checkpoint noop")
+
+
+@tems_job(base_interval=60, max_interval=300, idle_backoff=False)
+def check_route_deviations() -> int:
+    """Check queued Movement Log pings against compiled route geometry."""
+    from tems.tems_operations.route_geometry import process_queue
+
+    summary = process_queue()
+    _log(f"operations.check_route_deviations {summary}")
+    return summary["pings"]
+
+
+@tems_job(base_interval=60, max_interval=300, idle_backoff=False)
+def drain_telematics_queue() -> int:
+    """Fallback drain of queued telematics pings (normally drained right after ingestion)."""
+    from tems.tems_operations.telematics import process_queue
+
+    summary = process_queue()
+    _log(f"operations.drain_telematics_queue {summary}")
+    return summary["pings"]
+
+
+@tems_job(base_interval=86400, max_interval=86400)
+def purge_telematics_pings() -> int:
+    """Delete telematics pings older than the retention window."""
+    from tems.tems_operations.telematics import purge_pings
+
+    deleted = purge_pings()
+    _log(f"operations.purge_telematics_pings deleted={deleted}")
+    return deleted
@@ -0,0 +1,256 @@
+"""Queue-backed telematics ingestion.
+
+Devices post batches of GPS pings to `tems.api.telematics.ingest`, which only
+validates them and pushes the batch onto a Redis list (one push per request).
+`process_queue` claims batches from the list (see tems_main.work_queue; a
+batch is only removed after its commit) and, per batch:
+
+- appends every ping to ``tems_telematics_ping`` (compact, append-only, one
+  multi-row insert; no documents, no hooks);
+- refreshes each vehicle's latest position once (tems_vehicle_position);
+- checks the pings of vehicles on an active Operation Plan against the route
+  geometry (route_geometry.check_positions);
+- inserts a `Movement Log` only when a vehicle's movement state changes, so the
+  regular Movement Log hooks (vehicle status, position, route queue) run once
+  per transition instead of once per ping.
+
+The drain runs as a deduplicated short-queue job right after ingestion and
+from the scheduler every minute as a fallback.
+"""
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_days, get_datetime, now_datetime
+
+from tems.tems_main import geo, work_queue
+from tems.tems_main.scheduler import acquire_lock, release_lock
+from tems.tems_operations import route_geometry, spatial
+
+PING_TABLE = "tems_telematics_ping"
+QUEUE_KEY = "tems:telematics_queue"
+DRAIN_JOB_ID = "tems-telematics-drain"
+LOCK_NAME = "tems.telematics.drain"
+LOCK_TTL = 300
+MAX_BATCH_PINGS = 5000
+MAX_QUEUED_BATCHES = 20000
+INSERT_CHUNK = 1000
+MOVING_SPEED_KMH = 5.0
+RETENTION_DAYS = 90
+
+MOVEMENT_STATES = (
+    "Check-In",
+    "Check-Out",
+    "In Transit",
+    "Diversion",
+    "Out Transit",
+    "Delivery Confirmation",
+    "Delivered",
+)
+
+
+def ensure_ping_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{PING_TABLE}` (
+            id bigint unsigned not null auto_increment primary key,
+            vehicle varchar(140) not null,
+            recorded_at datetime(3) not null,
+            lat double not null,
+            lng double not null,
+            speed_kmh float,
+            heading smallint,
+            geohash char(9),
+            received_at datetime not null,
+            index idx_vehicle_time (vehicle, recorded_at),
+            index idx_recorded_at (recorded_at)
+        ) engine=InnoDB
+        """
+    )
+
+
+def normalize_ping(raw: dict) -> dict | None:
+    """Validated ping dict, or None when the ping cannot be used."""
+    try:
+        vehicle = raw.get("vehicle")
+        lat, lng = float(raw["lat"]), float(raw["lng"])
+        recorded_at = get_datetime(raw.get("recorded_at") or raw.get("ts"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not vehicle or not recorded_at or not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    speed = raw.get("speed_kmh", raw.get("speed"))
+    state = raw.get("state")
+    return {
+        "vehicle": vehicle,
+        "recorded_at": str(recorded_at),
+        "lat": lat,
+        "lng": lng,
+        "speed_kmh": float(speed) if speed not in (None, "") else None,
+        "heading": int(raw["heading"]) if raw.get("heading") not in (None, "") else None,
+        "state": state if state in MOVEMENT_STATES else None,
+    }
+
+
+def enqueue_pings(pings: list[dict]) -> None:
+    """Push one batch onto the queue and make sure a drain job is pending."""
+    cache = frappe.cache()
+    cache.lpush(QUEUE_KEY, json.dumps(pings))
+    cache.ltrim(QUEUE_KEY, 0, MAX_QUEUED_BATCHES - 1)
+    frappe.enqueue(
+        "tems.tems_operations.telematics.process_queue",
+        queue="short",
+        job_id=DRAIN_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def _insert_pings(pings: list[dict]) -> None:
+    received = now_datetime()
+    for start in range(0, len(pings), INSERT_CHUNK):
+        chunk = pings[start : start + INSERT_CHUNK]
+        values = []
+        for p in chunk:
+            values.extend(
+                [
+                    p["vehicle"],
+                    p["recorded_at"],
+                    p["lat"],
+                    p["lng"],
+                    p["speed_kmh"],
+                    p["heading"],
+                    geo.encode(p["lat"], p["lng"]),
+                    received,
+                ]
+            )
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))
+        frappe.db.sql(
+            f"""
+            insert into `{PING_TABLE}`
+                (vehicle, recorded_at, lat, lng, speed_kmh, heading, geohash, received_at)
+            values {placeholders}
+            """,
+            values,
+        )
+
+
+def derive_state(ping: dict, current: str | None) -> str | None:
+    """Movement state implied by a ping; None keeps the current state."""
+    if ping.get("state"):
+        return ping["state"]
+    speed = ping.get("speed_kmh")
+    if speed is not None and speed >= MOVING_SPEED_KMH and current not in ("In Transit", "Diversion", "Out Transit"):
+        return "In Transit"
+    return None
+
+
+def _current_states(vehicles: list[str]) -> dict[str, str | None]:
+    rows = frappe.db.sql(
+        f"select vehicle, state from `{spatial.POSITION_TABLE}` where vehicle in %(vehicles)s",
+        {"vehicles": tuple(vehicles)},
+    )
+    return dict(rows)
+
+
+def _active_plans(vehicles: list[str]) -> dict[str, str]:
+    return {
+        row.vehicle: row.name
+        for row in frappe.get_all(
+            "Operation Plan",
+            filters={"vehicle": ["in", vehicles], "status": "Active", "docstatus": ["<", 2]},
+            fields=["name", "vehicle"],
+            order_by="start_time asc",
+        )
+    }
+
+
+def process_batch(pings: list[dict]) -> dict:
+    """Persist one batch of normalized pings; see module docstring."""
+    pings = sorted(pings, key=lambda p: p["recorded_at"])
+    _insert_pings(pings)
+
+    by_vehicle: dict[str, list[dict]] = defaultdict(list)
+    for ping in pings:
+        by_vehicle[ping["vehicle"]].append(ping)
+    vehicles = list(by_vehicle)
+    states = _current_states(vehicles)
+    plans = _active_plans(vehicles)
+
+    transitions, latest = [], []
+    for vehicle, rows in by_vehicle.items():
+        state = states.get(vehicle)
+        for ping in rows:
+            new_state = derive_state(ping, state)
+            if new_state and new_state != state:
+                transitions.append({**ping, "state": new_state})
+                state = new_state
+        last = rows[-1]
+        latest.append({**last, "state": state, "event_time": last["recorded_at"]})
+
+    spatial.upsert_positions(latest)
+    for change in transitions:
+        frappe.get_doc(
+            {
+                "doctype": "Movement Log",
+                "vehicle": change["vehicle"],
+                "operation_plan": plans.get(change["vehicle"]),
+                "state": change["state"],
+                "event_time": change["recorded_at"],
+                "location_lat": change["lat"],
+                "location_lng": change["lng"],
+                "notes": "Telematics state change",
+            }
+        ).insert(ignore_permissions=True)
+
+    exceptions = 0
+    if plans:
+        planned = [
+            {"plan": plans[p["vehicle"]], "vehicle": p["vehicle"], "lat": p["lat"], "lng": p["lng"], "event_time": p["recorded_at"]}
+            for p in pings
+            if p["vehicle"] in plans
+        ]
+        exceptions = route_geometry.raise_deviations(route_geometry.check_positions(planned))
+    return {"pings": len(pings), "vehicles": len(vehicles), "transitions": len(transitions), "exceptions": exceptions}
+
+
+def process_queue(max_batches: int = 50) -> dict:
+    """Drain the ingestion queue (single consumer)."""
+    summary = {"pings": 0, "vehicles": 0, "transitions": 0, "exceptions": 0}
+    token = acquire_lock(LOCK_NAME, LOCK_TTL)
+    if not token:
+        return summary
+    try:
+        for _ in range(max_batches):
+            pings = work_queue.claim(QUEUE_KEY, MAX_BATCH_PINGS)
+            if not pings:
+                break
+            try:
+                result = process_batch(pings)
+                frappe.db.commit()
+            except Exception:
+                frappe.db.rollback()
+                work_queue.fail(QUEUE_KEY)
+                raise
+            work_queue.ack(QUEUE_KEY)
+            for key, value in result.items():
+                summary[key] += value
+    finally:
+        release_lock(LOCK_NAME, token)
+    return summary
+
+
+def purge_pings(days: int | None = None, chunk: int = 10000) -> int:
+    """Delete pings older than the retention window in bounded chunks."""
+    days = int(days or frappe.conf.get("tems_telematics_retention_days") or RETENTION_DAYS)
+    cutoff = add_days(now_datetime(), -days)
+    deleted = 0
+    while True:
+        frappe.db.sql(f"delete from `{PING_TABLE}` where recorded_at < %s limit {int(chunk)}", (cutoff,))
+        count = frappe.db.sql("select row_count()")[0][0]
+        frappe.db.commit()
+        deleted += count
+        if count < chunk:
+            return deleted
@@ -0,0 +1,235 @@
+"""Cached per-driver launch view for the driver PWA.
+
+On launch the app needs the dashboard (today's journey and operation plans,
+pending spot checks, recent incidents, qualification), the assigned vehicles,
+messages and unread notifications. `get_view` assembles all of it once and
+keeps it in Redis per driver, so a launch is one round trip and repeat
+launches cost one cache read.
+
+The user -> Employee resolution every driver endpoint needs is cached in a
+Redis hash as well.
+
+Views are dropped by `invalidate_for_doc`, hooked on the documents that feed
+them (the driver's plans, checks, incidents, qualification, messages and
+notifications, and the fuel/maintenance records of vehicles the driver is
+planned on). Keys are dropped immediately and again after commit, so a view
+rebuilt from uncommitted state by a concurrent request never outlives the
+transaction. VIEW_TTL bounds staleness for anything not hooked.
+"""
+from __future__ import annotations
+
+from functools import partial
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime
+
+EMPLOYEE_KEY = "tems:driver_employee"
+VIEW_PREFIX = "tems:driver_view"
+VIEW_TTL = 900
+MAX_VEHICLES = 3
+
+# doctype -> field holding the driver's Employee
+_DRIVER_FIELDS = {
+    "Journey Plan": "driver",
+    "Operation Plan": "driver",
+    "Spot Check": "driver",
+    "Driver Qualification": "employee",
+}
+# doctypes whose changes reach drivers through the vehicle they are planned on
+_VEHICLE_DOCTYPES = ("Fuel Log", "Maintenance Work Order", "Vehicle")
+
+
+def employee_for_user(user: str | None = None) -> str | None:
+    """Employee linked to `user` (default: session user), cached."""
+    user = user or frappe.session.user
+    cache = frappe.cache()
+    employee = cache.hget(EMPLOYEE_KEY, user)
+    if employee is None:
+        employee = frappe.db.get_value("Employee", {"user_id": user}, "name") or ""
+        cache.hset(EMPLOYEE_KEY, user, employee)
+    return employee or None
+
+
+def _view_key(employee: str) -> str:
+    return f"{VIEW_PREFIX}:{employee}"
+
+
+def build_dashboard(employee: str) -> dict:
+    today = getdate()
+    journey_plans = frappe.get_all(
+        "Journey Plan",
+        filters={"driver": employee, "start_time": [">=", today]},
+        fields=["name", "route", "vehicle", "start_time", "end_time", "risk_score", "sos_contact"],
+        order_by="start_time asc",
+    )
+    operation_plans = frappe.get_all(
+        "Operation Plan",
+        filters={"driver": employee, "status": ["in", ["Assigned", "Active"]], "start_time": [">=", today]},
+        fields=["name", "title", "vehicle", "operation_mode", "start_time", "status"],
+        order_by="start_time asc",
+    )
+    pending_checks = frappe.get_all(
+        "Spot Check",
+        filters={"driver": employee, "date": today, "docstatus": 0},
+        fields=["name", "vehicle", "location"],
+        limit=5,
+    )
+    recent_incidents = frappe.db.sql(
+        """
+        select distinct si.name, si.title, si.incident_date, si.severity, si.status
+        from `tabSafety Incident` si
+        inner join `tabIncident Participant` ip
+            on ip.parent = si.name and ip.parenttype = 'Safety Incident'
+        where ip.employee = %(employee)s and si.incident_date >= %(since)s
+        order by si.incident_date desc
+        limit 5
+        """,
+        {"employee": employee, "since": add_days(today, -7)},
+        as_dict=True,
+    )
+    qualification = frappe.db.get_value(
+        "Driver Qualification",
+        {"employee": employee, "status": "Active"},
+        ["license_no", "expiry_date", "status"],
+        as_dict=True,
+    )
+    return {
+        "employee": employee,
+        "journey_plans": journey_plans,
+        "operation_plans": operation_plans,
+        "pending_checks": pending_checks,
+        "recent_incidents": recent_incidents,
+        "qualification": qualification,
+        "timestamp": now_datetime(),
+    }
+
+
+def build_vehicle_info(vehicle_name: str) -> dict:
+    vehicle = frappe.get_doc("Vehicle", vehicle_name)
+    last_fuel = frappe.get_all(
+        "Fuel Log",
+        filters={"vehicle": vehicle_name},
+        fields=["*"],
+        order_by="creation desc",
+        limit=1,
+    )
+    pending_maintenance = frappe.get_all(
+        "Maintenance Work Order",
+        filters={"vehicle": vehicle_name, "status": ["in", ["Open", "In Progress"]]},
+        fields=["name", "status", "planned_date", "cost"],
+    )
+    return {
+        "vehicle": vehicle.as_dict(),
+        "last_fuel": last_fuel[0] if last_fuel else None,
+        "pending_maintenance": pending_maintenance,
+    }
+
+
+def build_messages(employee: str) -> list[dict]:
+    return frappe.get_all(
+        "Communication",
+        filters={
+            "reference_doctype": "Employee",
+            "reference_name": employee,
+            "communication_type": ["in", ["Communication", "Chat"]],
+        },
+        fields=["name", "subject", "content", "sender", "creation", "sent_or_received"],
+        order_by="creation desc",
+        limit=50,
+    )
+
+
+def build_notifications(user: str) -> list[dict]:
+    return frappe.get_all(
+        "Notification Log",
+        filters={"for_user": user, "read": 0},
+        fields=["name", "subject", "email_content", "document_type", "document_name", "creation"],
+        order_by="creation desc",
+        limit=20,
+    )
+
+
+def build_view(employee: str, user: str) -> dict:
+    dashboard = build_dashboard(employee)
+    vehicles = []
+    for plan in dashboard["journey_plans"] + dashboard["operation_plans"]:
+        if plan.vehicle and plan.vehicle not in vehicles:
+            vehicles.append(plan.vehicle)
+    return {
+        "employee": employee,
+        "dashboard": dashboard,
+        "vehicles": {name: build_vehicle_info(name) for name in vehicles[:MAX_VEHICLES]},
+        "messages": build_messages(employee),
+        "notifications": build_notifications(user),
+        "date": str(getdate()),
+    }
+
+
+def get_view(user: str | None = None) -> dict | None:
+    """Cached launch view for `user` (default: session user); None when not a driver."""
+    user = user or frappe.session.user
+    employee = employee_for_user(user)
+    if not employee:
+        return None
+    cache = frappe.cache()
+    key = _view_key(employee)
+    view = cache.get_value(key)
+    # Dashboards are "today" scoped: a view from yesterday is stale
+    if not view or view.get("user") != user or view.get("date") != str(getdate()):
+        view = {**build_view(employee, user), "user": user}
+        cache.set_value(key, view, expires_in_sec=VIEW_TTL)
+    return view
+
+
+def invalidate(employees) -> None:
+    keys = [_view_key(e) for e in set(filter(None, employees))]
+    if not keys:
+        return
+    cache = frappe.cache()
+    cache.delete_value(keys)
+    frappe.db.after_commit.add(partial(cache.delete_value, keys))
+
+
+def _drivers_on_vehicle(vehicle: str | None) -> list[str]:
+    if not vehicle:
+        return []
+    today = getdate()
+    drivers = frappe.get_all(
+        "Journey Plan", filters={"vehicle": vehicle, "start_time": [">=", today]}, pluck="driver"
+    )
+    drivers += frappe.get_all(
+        "Operation Plan",
+        filters={"vehicle": vehicle, "status": ["in", ["Assigned", "Active"]], "start_time": [">=", today]},
+        pluck="driver",
+    )
+    return drivers
+
+
+def _affected_employees(doc) -> list[str]:
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    doctype = doc.doctype
+    if doctype in _DRIVER_FIELDS:
+        field = _DRIVER_FIELDS[doctype]
+        return [doc.get(field), before.get(field) if before else None]
+    if doctype == "Safety Incident":
+        return [row.employee for row in doc.get("participants") or []]
+    if doctype == "Communication":
+        return [doc.reference_name] if doc.reference_doctype == "Employee" else []
+    if doctype == "Notification Log":
+        return [employee_for_user(doc.for_user)] if doc.for_user else []
+    if doctype == "Employee":
+        users = {doc.get("user_id"), before.get("user_id") if before else None} - {None, ""}
+        for user in users:
+            frappe.cache().hdel(EMPLOYEE_KEY, user)
+        return [doc.name]
+    if doctype in _VEHICLE_DOCTYPES:
+        return _drivers_on_vehicle(doc.name if doctype == "Vehicle" else doc.get("vehicle"))
+    return []
+
+
+def invalidate_for_doc(doc, method=None):
+    """doc_events hook: drop the cached views of the drivers `doc` feeds into."""
+    try:
+        invalidate(_affected_employees(doc))
+    except Exception:
+        frappe.log_error(title=f"Driver view invalidation failed: {doc.doctype} {doc.name}")
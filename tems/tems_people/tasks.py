@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import frappe
-from frappe.utils import nowdate, add_days, getdate
+from frappe.utils import nowdate, add_days, getdate, now_datetime
 
 
 def _log(msg: str) -> None:
@@ -12,73 +12,103 @@ def _log(msg: str) -> None:
         print(f"[TEMS][People] {msg}")
 
 
-def remind_expiring_driver_docs(days_ahead: int = 30) -> None:
-    """Notify HR / Operations of driver qualifications or medical clearance expiring within N days.
-    Idempotent: only logs or creates a Notification Log if not already created for the day per driver.
+REMINDER_CHUNK = 1000
+
+
+def _insert_rows(doctype: str, fields: list[str], rows: list[dict]) -> int:
+    """Bulk insert plain rows (hash names, standard columns filled) in chunks."""
+    if not rows:
+        return 0
+    stamp = now_datetime()
+    user = frappe.session.user or "Administrator"
+    columns = ["name", "creation", "modified", "owner", "modified_by", *fields]
+    for start in range(0, len(rows), REMINDER_CHUNK):
+        values = [
+            (frappe.generate_hash(length=10), stamp, stamp, user, user, *(r.get(f) for f in fields))
+            for r in rows[start : start + REMINDER_CHUNK]
+        ]
+        frappe.db.bulk_insert(doctype, columns, values)
+    return len(rows)
+
+
+def _remind_expiring(doctype: str, prefix: str, days_ahead: int) -> int:
+    """Create one Notification Communication per expiring `doctype` row per day.
+
+    Idempotent and set-based: today's already-sent subjects are loaded in one
+    query and only the missing reminders are bulk inserted.
     """
-    today = getdate()
-    cutoff = add_days(today, days_ahead)
+    today = nowdate()
     expiring = frappe.get_all(
-        "Driver Qualification",
-        filters={"expiry_date": ["between", [nowdate(), cutoff]]},
+        doctype,
+        filters={"expiry_date": ["between", [today, add_days(getdate(), days_ahead)]]},
         fields=["name", "employee", "expiry_date"],
     )
     if not expiring:
-        _log("No driver qualifications expiring soon")
-        return
+        return 0
+    sent = set(
+        frappe.get_all(
+            "Communication",
+            filters={
+                "reference_doctype": doctype,
+                "communication_type": "Notification",
+                "creation": [">=", today],
+                "subject": ["like", f"{prefix}-%-{today}"],
+            },
+            pluck="subject",
+        )
+    )
+    rows = []
     for row in expiring:
-        key = f"DQ-EXP-{row.name}-{nowdate()}"
-        exists = frappe.db.exists("Communication", {"reference_doctype": "Driver Qualification", "reference_name": row.name, "subject": key})
-        if exists:
+        key = f"{prefix}-{row.name}-{today}"
+        if key in sent:
             continue
-        try:
-            frappe.get_doc(
-                {
-                    "doctype": "Communication",
-                    "communication_type": "Notification",
-                    "subject": key,
-                    "content": f"Driver Qualification {row.name} for Employee {row.employee} expiring on {row.expiry_date}",
-                    "reference_doctype": "Driver Qualification",
-                    "reference_name": row.name,
-                }
-            ).insert(ignore_permissions=True)
-        except Exception:
-            _log(f"Failed to create reminder for {row.name}")
-    _log(f"Created/verified reminders for {len(expiring)} expiring driver qualifications")
-
-def remind_expiring_medical_clearances(days_ahead: int = 30) -> None:
+        rows.append(
+            {
+                "communication_type": "Notification",
+                "communication_medium": "Other",
+                "sent_or_received": "Sent",
+                "communication_date": now_datetime(),
+                "subject": key,
+                "content": f"{doctype} {row.name} for Employee {row.employee} expiring on {row.expiry_date}",
+                "reference_doctype": doctype,
+                "reference_name": row.name,
+            }
+        )
+    created = _insert_rows(
+        "Communication",
+        [
+            "communication_type",
+            "communication_medium",
+            "sent_or_received",
+            "communication_date",
+            "subject",
+            "content",
+            "reference_doctype",
+            "reference_name",
+        ],
+        rows,
+    )
+    frappe.db.commit()
+    return created
+
+
+def remind_expiring_driver_docs(days_ahead: int = 30) -> int:
+    """Notify HR / Operations of driver qualifications expiring within N days.
+    Idempotent: at most one reminder per qualification per day.
+    """
+    created = _remind_expiring("Driver Qualification", "DQ-EXP", days_ahead)
+    _log(f"Created {created} reminders for expiring driver qualifications")
+    return created
+
+
+def remind_expiring_medical_clearances(days_ahead: int = 30) -> int:
     """Notify HR / Operations of medical clearances expiring within N days.
-    Idempotent: only logs or creates a Notification Log if not already created for the day per clearance.
+    Idempotent: at most one reminder per clearance per day.
     """
-    today = getdate()
-    cutoff = add_days(today, days_ahead)
-    expiring = frappe.get_all(
-        "Medical Clearance",
-        filters={"expiry_date": ["between", [nowdate(), cutoff]]},
-        fields=["name", "employee", "expiry_date"],
-    )
-    if not expiring:
-        _log("No medical clearances expiring soon")
-        return
-    for row in expiring:
-        key = f"MC-EXP-{row.name}-{nowdate()}"
-        exists = frappe.db.exists("Communication", {"reference_doctype": "Medical Clearance", "reference_name": row.name, "subject": key})
-        if exists:
-            continue
-        try:
-            frappe.get_doc(
-                {
-                    "doctype": "Communication",
-                    "communication_type": "Notification",
-                    "subject": key,
-                    "content": f"Medical Clearance {row.name} for Employee {row.employee} expiring on {row.expiry_date}",
-                    "reference_doctype": "Medical Clearance",
-                    "reference_name": row.name,
-                }
-            ).insert(ignore_permissions=True)
-        except Exception:
-            _log(f"Failed to create reminder for {row.name}")
-    _log(f"Created/verified reminders for {len(expiring)} expiring medical clearances") 
+    created = _remind_expiring("Medical Clearance", "MC-EXP", days_ahead)
+    _log(f"Created {created} reminders for expiring medical clearances")
+    return created
+
 
 def driver_qualification_audit() -> None:
     """Audit driver qualifications for all drivers to ensure compliance."""
@@ -90,27 +120,55 @@ def driver_qualification_audit() -> None:
 
 
 # Auto-deactivate Driver when license expired
-def auto_deactivate_drivers() -> None:
-    """Automatically deactivate drivers whose licenses have expired.""" 
-    today = nowdate()
+def auto_deactivate_drivers() -> int:
+    """Deactivate qualifications (and their Drivers) whose licence has expired.
 
-    drivers = frappe.get_all(
+    Status changes are applied with one UPDATE per chunk; each change gets an
+    Info comment on the record, bulk inserted, instead of a full Version diff.
+    """
+    today = nowdate()
+    expired = frappe.get_all(
         "Driver Qualification",
-        filters={"license_expiry_date": ["<", today],
-                 "status": "Active"},
-        fields=["name", "driver"]
+        filters={"expiry_date": ["<", today], "status": "Active"},
+        fields=["name", "driver"],
+    )
+    if not expired:
+        return 0
+
+    names = [q.name for q in expired]
+    drivers = sorted({q.driver for q in expired if q.driver})
+    active_drivers = (
+        frappe.get_all("Driver", filters={"name": ["in", drivers], "status": "Active"}, pluck="name")
+        if drivers
+        else []
     )
 
-    for q in drivers:
-        doc = frappe.get_doc("Driver Qualification", q.name)
-        doc.status = "Inactive"
-        doc.reason_for_status = "License expired"
-        doc.save(ignore_permissions=True)
-
-        # Also update Driver doctype if needed
-        driver = frappe.get_doc("Driver", q.driver)
-        driver.status = "Inactive"
-        driver.save(ignore_permissions=True)
+    audit = []
+    for start in range(0, len(names), REMINDER_CHUNK):
+        chunk = names[start : start + REMINDER_CHUNK]
+        frappe.db.set_value(
+            "Driver Qualification",
+            {"name": ["in", chunk]},
+            {"status": "Inactive", "reason_for_status": "License expired"},
+        )
+    audit += [
+        {"reference_doctype": "Driver Qualification", "reference_name": n, "content": "Status set to Inactive: License expired"}
+        for n in names
+    ]
+    for start in range(0, len(active_drivers), REMINDER_CHUNK):
+        chunk = active_drivers[start : start + REMINDER_CHUNK]
+        frappe.db.set_value("Driver", {"name": ["in", chunk]}, "status", "Suspended")
+    audit += [
+        {"reference_doctype": "Driver", "reference_name": d, "content": "Status set to Suspended: License expired"}
+        for d in active_drivers
+    ]
+
+    for row in audit:
+        row["comment_type"] = "Info"
+    _insert_rows("Comment", ["comment_type", "reference_doctype", "reference_name", "content"], audit)
+    frappe.db.commit()
+    _log(f"Deactivated {len(names)} driver qualifications and {len(active_drivers)} drivers")
+    return len(names)
 
 # Daily Risk score audit task for driver qualifications
 def driver_risk_score_audit() -> None:
@@ -47,8 +47,8 @@ def validate_journey_plan(doc, method):
     """
     Validate journey plan using AI risk assessment.
     """
-    # Get AI risk prediction
-    risk_assessment = predict_journey_risk(doc.name)
+    # Get AI risk prediction (scored from the document, which may not be saved yet)
+    risk_assessment = predict_journey_risk(doc)
     
     # Store risk score
     doc.risk_score = risk_assessment.get("overall_risk_score", 0)
@@ -0,0 +1,584 @@
+"""Incident hotspot surface over geolocated incidents and SOS events.
+
+Every Safety Incident, Incident Report and SOS Event becomes one row of
+``tems_incident_point`` with a position, a severity weight and a route.
+SOS events carry coordinates. Incidents use their `location` ("lat,lng" or a
+Location record) and otherwise the vehicle's telematics ping nearest to the
+incident time.
+
+Risk decays with a half-life of HALF_LIFE_DAYS. The sums are kept against a
+fixed EPOCH: an incident at time t adds ``weight * 2^((t - EPOCH) / half-life)``
+and the risk at time T is ``sum * 2^(-(T - EPOCH) / half-life)``. An insert,
+edit or delete is therefore one add or subtract per cell, and nothing is
+rescanned to age the surface.
+
+- ``tems_hotspot_cell``: decayed sum and incident count per geohash cell at
+  CELL_PRECISION (about 1.2 x 0.6 km).
+- ``tems_route_risk``: decayed sum per Route Planning, split into SEGMENT_KM
+  segments along the compiled route geometry. It covers incidents inside the
+  route corridor plus incidents linked to the route.
+
+Changes mark the affected routes dirty and enqueue one deduplicated `refresh`
+after commit. The refresh recomputes the dirty routes, clusters the cells with
+grid DBSCAN and caches the ranked clusters. A core cell has at least CORE_RISK
+of current risk, core cells connect through their 8 neighbours, and border
+cells join an adjacent cluster. A nightly run re-derives the clusters as risk
+decays.
+"""
+from __future__ import annotations
+
+import math
+import re
+from datetime import datetime
+
+import frappe
+import numpy as np
+from frappe.utils import get_datetime, now_datetime
+
+from tems.tems_main import geo
+
+POINT_TABLE = "tems_incident_point"
+CELL_TABLE = "tems_hotspot_cell"
+ROUTE_TABLE = "tems_route_risk"
+SNAPSHOT_KEY = "tems:incident_hotspots"
+DIRTY_ROUTES_KEY = "tems:hotspot_dirty_routes"
+SAVEPOINT = "tems_hotspot_record"
+REFRESH_JOB_ID = "tems-hotspot-refresh"
+REFRESH_LOCK = "hotspot_refresh"
+REFRESH_LOCK_TTL = 600
+
+EPOCH = datetime(2020, 1, 1)
+HALF_LIFE_DAYS = 90
+CELL_PRECISION = 6
+CORE_RISK = 2.0
+# Cells below this current risk are left out of clustering entirely
+MIN_CELL_RISK = 0.1
+SEGMENT_KM = 5.0
+PING_WINDOW_MIN = 30
+MAX_CLUSTERS = 50
+
+SEVERITY_WEIGHTS = {"near miss": 0.5, "minor": 1.0, "major": 2.0, "critical": 3.0}
+SOURCE_WEIGHTS = {"Incident Report": 1.0, "SOS Event": 1.5}
+SOURCE_FIELDS = {
+    "Safety Incident": [
+        "name", "docstatus", "creation", "incident_date", "severity", "vehicle", "route", "location",
+    ],
+    "Incident Report": ["name", "creation", "incident_date", "reported_date", "vehicle"],
+    "SOS Event": ["name", "creation", "created_at", "lat", "lng", "vehicle", "journey_reference"],
+}
+POINT_COLUMNS = [
+    "source_doctype", "source_name", "lat", "lng", "cell", "route", "occurred_at", "weight", "contribution",
+]
+_LAT_LNG = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def ensure_tables() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{POINT_TABLE}` (
+            source_doctype varchar(64) not null,
+            source_name varchar(140) not null,
+            lat double,
+            lng double,
+            cell char({CELL_PRECISION}),
+            route varchar(140),
+            occurred_at datetime not null,
+            weight double not null,
+            contribution double not null,
+            primary key (source_doctype, source_name),
+            index idx_lat_lng (lat, lng),
+            index idx_route (route)
+        ) engine=InnoDB
+        """
+    )
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{CELL_TABLE}` (
+            cell char({CELL_PRECISION}) not null primary key,
+            decayed_sum double not null default 0,
+            incidents int not null default 0,
+            last_at datetime,
+            index idx_decayed_sum (decayed_sum)
+        ) engine=InnoDB
+        """
+    )
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{ROUTE_TABLE}` (
+            route varchar(140) not null primary key,
+            decayed_sum double not null default 0,
+            incidents int not null default 0,
+            segments longtext,
+            min_lat double,
+            min_lng double,
+            max_lat double,
+            max_lng double,
+            computed_at datetime
+        ) engine=InnoDB
+        """
+    )
+
+
+def contribution(weight: float, occurred_at) -> float:
+    """Epoch-scaled decayed weight of one incident."""
+    days = (get_datetime(occurred_at) - EPOCH).total_seconds() / 86400
+    return weight * 2 ** (days / HALF_LIFE_DAYS)
+
+
+def decay_factor(at=None) -> float:
+    """Multiplier turning epoch-scaled sums into risk at `at` (default now)."""
+    days = (get_datetime(at or now_datetime()) - EPOCH).total_seconds() / 86400
+    return 2 ** (-days / HALF_LIFE_DAYS)
+
+
+def _parse_location(value) -> tuple[float, float] | None:
+    if not value:
+        return None
+    match = _LAT_LNG.match(str(value))
+    if match:
+        lat, lng = float(match.group(1)), float(match.group(2))
+        return (lat, lng) if -90 <= lat <= 90 and -180 <= lng <= 180 else None
+    located = frappe.db.get_value("Location", value, ["latitude", "longitude"])
+    if located and located[0] and located[1]:
+        return float(located[0]), float(located[1])
+    return None
+
+
+def _vehicle_position_at(vehicle: str | None, at) -> tuple[float, float] | None:
+    """The vehicle's telematics position closest to `at` within PING_WINDOW_MIN."""
+    if not vehicle or not at:
+        return None
+    from tems.tems_operations.telematics import PING_TABLE
+
+    rows = frappe.db.sql(
+        f"""
+        select lat, lng from `{PING_TABLE}`
+        where vehicle = %(vehicle)s
+            and recorded_at between %(at)s - interval {PING_WINDOW_MIN} minute
+                and %(at)s + interval {PING_WINDOW_MIN} minute
+        order by abs(timestampdiff(second, recorded_at, %(at)s))
+        limit 1
+        """,
+        {"vehicle": vehicle, "at": get_datetime(at)},
+    )
+    return (float(rows[0][0]), float(rows[0][1])) if rows else None
+
+
+def point_for_doc(doc) -> dict | None:
+    """Position, time, weight and route of an incident-like document; None if it can't be placed."""
+    if doc.get("docstatus") == 2:
+        return None
+    if doc.doctype == "SOS Event":
+        at = doc.get("created_at") or doc.creation
+        position = (float(doc.lat), float(doc.lng)) if doc.get("lat") and doc.get("lng") else None
+        position = position or _vehicle_position_at(doc.get("vehicle"), at)
+        weight = SOURCE_WEIGHTS["SOS Event"]
+        reference = doc.get("journey_reference")
+        route = frappe.db.get_value("Journey Plan", reference, "route") if reference else None
+    elif doc.doctype == "Safety Incident":
+        at = doc.get("incident_date") or doc.creation
+        position = _parse_location(doc.get("location")) or _vehicle_position_at(doc.get("vehicle"), at)
+        weight = SEVERITY_WEIGHTS.get((doc.get("severity") or "").lower(), 1.0)
+        route = doc.get("route")
+    elif doc.doctype == "Incident Report":
+        at = doc.get("incident_date") or doc.get("reported_date") or doc.creation
+        position = _vehicle_position_at(doc.get("vehicle"), at)
+        weight = SOURCE_WEIGHTS["Incident Report"]
+        route = None
+    else:
+        return None
+    if not position and not route:
+        return None
+    lat, lng = position or (None, None)
+    return {
+        "lat": lat,
+        "lng": lng,
+        "cell": geo.encode(lat, lng, CELL_PRECISION) if position else None,
+        "route": route or None,
+        "occurred_at": get_datetime(at),
+        "weight": weight,
+        "contribution": contribution(weight, at),
+    }
+
+
+def _unchanged(old: dict, new: dict) -> bool:
+    return (old.lat, old.lng, old.route, old.weight) == (
+        new["lat"], new["lng"], new["route"], new["weight"]
+    ) and math.isclose(old.contribution, new["contribution"], rel_tol=1e-6)
+
+
+def _add_to_cell(cell: str | None, amount: float, incidents: int, at) -> None:
+    if not cell:
+        return
+    frappe.db.sql(
+        f"""
+        insert into `{CELL_TABLE}` (cell, decayed_sum, incidents, last_at) values (%s, %s, %s, %s)
+        on duplicate key update decayed_sum = greatest(decayed_sum + values(decayed_sum), 0),
+            incidents = greatest(incidents + values(incidents), 0),
+            last_at = greatest(ifnull(last_at, values(last_at)), values(last_at))
+        """,
+        (cell, amount, incidents, at),
+    )
+
+
+def _corridor_pad(lat: float) -> tuple[float, float]:
+    """Corridor width in degrees of latitude and longitude around `lat`."""
+    from tems.tems_operations.route_geometry import KM_PER_DEG_LAT, KM_PER_DEG_LNG, corridor_km
+
+    km = corridor_km()
+    return km / KM_PER_DEG_LAT, km / (KM_PER_DEG_LNG * max(math.cos(math.radians(lat)), 0.01))
+
+
+def _routes_near(lat: float | None, lng: float | None) -> list[str]:
+    """Routes whose padded bounding box contains the position."""
+    if lat is None or lng is None:
+        return []
+    pad_lat, pad_lng = _corridor_pad(lat)
+    return frappe.db.sql_list(
+        f"""
+        select route from `{ROUTE_TABLE}`
+        where %(lat)s between min_lat - %(pad_lat)s and max_lat + %(pad_lat)s
+            and %(lng)s between min_lng - %(pad_lng)s and max_lng + %(pad_lng)s
+        """,
+        {"lat": lat, "lng": lng, "pad_lat": pad_lat, "pad_lng": pad_lng},
+    )
+
+
+def queue_refresh(routes=()) -> None:
+    """Mark routes dirty and enqueue one refresh after commit."""
+    cache = frappe.cache()
+    for route in set(filter(None, routes)):
+        cache.sadd(DIRTY_ROUTES_KEY, route)
+    frappe.enqueue(
+        "tems.tems_safety.hotspots.refresh",
+        queue="short",
+        job_id=REFRESH_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def record(doc, removed: bool = False) -> bool:
+    """Replace the document's point and move its contribution between cells; True if anything changed."""
+    old = frappe.db.sql(
+        f"select * from `{POINT_TABLE}` where source_doctype = %s and source_name = %s for update",
+        (doc.doctype, doc.name),
+        as_dict=True,
+    )
+    old = old[0] if old else None
+    new = None if removed else point_for_doc(doc)
+    if (not old and not new) or (old and new and _unchanged(old, new)):
+        return False
+
+    dirty: list[str] = []
+    if old:
+        _add_to_cell(old.cell, -old.contribution, -1, old.occurred_at)
+        dirty += [old.route, *_routes_near(old.lat, old.lng)]
+        frappe.db.sql(
+            f"delete from `{POINT_TABLE}` where source_doctype = %s and source_name = %s",
+            (doc.doctype, doc.name),
+        )
+    if new:
+        frappe.db.sql(
+            f"""
+            insert into `{POINT_TABLE}` ({", ".join(POINT_COLUMNS)})
+            values (%(source_doctype)s, %(source_name)s, %(lat)s, %(lng)s, %(cell)s, %(route)s,
+                %(occurred_at)s, %(weight)s, %(contribution)s)
+            """,
+            {**new, "source_doctype": doc.doctype, "source_name": doc.name},
+        )
+        _add_to_cell(new["cell"], new["contribution"], 1, new["occurred_at"])
+        dirty += [new["route"], *_routes_near(new["lat"], new["lng"])]
+    queue_refresh(dirty)
+    return True
+
+
+def on_incident_change(doc, method=None):
+    """doc_events hook for Safety Incident, Incident Report and SOS Event.
+
+    A failed update is rolled back to a savepoint, so the point and cell rows
+    stay consistent and the incident itself still saves; `rebuild` repairs the
+    missed contribution.
+    """
+    frappe.db.savepoint(SAVEPOINT)
+    try:
+        record(doc, removed=method in ("on_cancel", "on_trash"))
+    except Exception:
+        frappe.db.rollback(save_point=SAVEPOINT)
+        frappe.log_error(title=f"Hotspot update failed for {doc.doctype} {doc.name}")
+    else:
+        frappe.db.release_savepoint(SAVEPOINT)
+
+
+def on_route_change(doc, method=None):
+    """Route Planning on_update / on_trash: recompute or drop the route's risk."""
+    if method == "on_trash":
+        frappe.db.sql(f"delete from `{ROUTE_TABLE}` where route = %s", (doc.name,))
+        return
+    queue_refresh([doc.name])
+
+
+def segment_sums(along_km, weights, length_km: float) -> np.ndarray:
+    """Weights binned into SEGMENT_KM segments by their distance along the route."""
+    count = max(1, math.ceil(length_km / SEGMENT_KM))
+    sums = np.zeros(count)
+    index = np.clip((np.asarray(along_km, dtype=float) / SEGMENT_KM).astype(int), 0, count - 1)
+    np.add.at(sums, index, np.asarray(weights, dtype=float))
+    return sums
+
+
+def compute_route(route: str) -> dict | None:
+    """Recompute one route's risk from the incident points along its corridor."""
+    from tems.tems_operations.route_geometry import corridor_km, get_geometry
+
+    if not frappe.db.exists("Route Planning", route):
+        frappe.db.sql(f"delete from `{ROUTE_TABLE}` where route = %s", (route,))
+        return None
+
+    geometry = get_geometry(route)
+    bbox = (None, None, None, None)
+    condition, params = "route = %(route)s", {"route": route}
+    if geometry is not None:
+        lats, lngs = geometry.points[:, 0], geometry.points[:, 1]
+        bbox = (float(lats.min()), float(lngs.min()), float(lats.max()), float(lngs.max()))
+        pad_lat, pad_lng = _corridor_pad(geometry.lat0)
+        condition += (
+            " or (lat between %(min_lat)s and %(max_lat)s and lng between %(min_lng)s and %(max_lng)s)"
+        )
+        params.update(
+            min_lat=bbox[0] - pad_lat,
+            max_lat=bbox[2] + pad_lat,
+            min_lng=bbox[1] - pad_lng,
+            max_lng=bbox[3] + pad_lng,
+        )
+    points = frappe.db.sql(
+        f"select lat, lng, route, contribution from `{POINT_TABLE}` where {condition}", params, as_dict=True
+    )
+
+    segments = []
+    if geometry is None:
+        total, incidents = sum(p.contribution for p in points), len(points)
+    else:
+        # Linked incidents count wherever they are, the others only inside the corridor
+        weights = np.array([p.contribution for p in points], dtype=float)
+        linked = np.array([p.route == route for p in points], dtype=bool)
+        located = np.array([p.lat is not None and p.lng is not None for p in points], dtype=bool)
+        distance, along = np.full(len(points), np.inf), np.zeros(len(points))
+        if located.any():
+            distance[located], along[located] = geometry.distances(
+                [p.lat for p in points if p.lat is not None and p.lng is not None],
+                [p.lng for p in points if p.lat is not None and p.lng is not None],
+            )
+        counted = linked | (distance <= corridor_km())
+        total, incidents = float(weights[counted].sum()), int(counted.sum())
+        placed = counted & located
+        sums = segment_sums(along[placed], weights[placed], geometry.length_km)
+        segments = [
+            {
+                "start_km": round(i * SEGMENT_KM, 1),
+                "end_km": round(min((i + 1) * SEGMENT_KM, geometry.length_km), 1),
+                "decayed_sum": float(value),
+            }
+            for i, value in enumerate(sums)
+        ]
+
+    frappe.db.sql(
+        f"""
+        insert into `{ROUTE_TABLE}`
+            (route, decayed_sum, incidents, segments, min_lat, min_lng, max_lat, max_lng, computed_at)
+        values (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        on duplicate key update decayed_sum = values(decayed_sum), incidents = values(incidents),
+            segments = values(segments), min_lat = values(min_lat), min_lng = values(min_lng),
+            max_lat = values(max_lat), max_lng = values(max_lng), computed_at = values(computed_at)
+        """,
+        (route, total, incidents, frappe.as_json(segments, indent=None), *bbox, now_datetime()),
+    )
+    return {"route": route, "decayed_sum": total, "incidents": incidents, "segments": segments}
+
+
+def route_risk(route: str, at=None) -> dict | None:
+    """Current decayed risk of a route and its segments (one primary-key read)."""
+    rows = frappe.db.sql(
+        f"select decayed_sum, incidents, segments, computed_at from `{ROUTE_TABLE}` where route = %s",
+        (route,),
+        as_dict=True,
+    )
+    if not rows:
+        return None
+    factor = decay_factor(at)
+    segments = frappe.parse_json(rows[0].segments or "[]")
+    for segment in segments:
+        segment["risk"] = round(segment.pop("decayed_sum") * factor, 3)
+    return {
+        "route": route,
+        "risk": round(rows[0].decayed_sum * factor, 3),
+        "incidents": rows[0].incidents,
+        "segments": segments,
+        "computed_at": rows[0].computed_at,
+    }
+
+
+def point_risk(points, at=None) -> float:
+    """Current decayed risk of the cells containing `points` ((lat, lng) pairs), each cell counted once."""
+    cells = sorted({geo.encode(lat, lng, CELL_PRECISION) for lat, lng in points})
+    if not cells:
+        return 0.0
+    rows = frappe.db.sql(f"select sum(decayed_sum) from `{CELL_TABLE}` where cell in %s", (tuple(cells),))
+    return round((rows[0][0] or 0) * decay_factor(at), 3)
+
+
+def top_routes(limit: int = 10, at=None) -> list[dict]:
+    """Routes with the highest current risk, each with its riskiest segment."""
+    rows = frappe.db.sql(
+        f"""
+        select route from `{ROUTE_TABLE}`
+        where decayed_sum > 0
+        order by decayed_sum desc
+        limit %s
+        """,
+        (int(limit),),
+    )
+    ranked = []
+    for (route,) in rows:
+        risk = route_risk(route, at)
+        worst = max(risk["segments"], key=lambda s: s["risk"], default=None)
+        ranked.append({**{k: risk[k] for k in ("route", "risk", "incidents")}, "worst_segment": worst})
+    return ranked
+
+
+def cluster_cells(cells: dict[str, float], core_risk: float = CORE_RISK) -> list[dict]:
+    """Grid DBSCAN over geohash cells.
+
+    Core cells (risk >= core_risk) are expanded through their 8 neighbours;
+    a non-core neighbour joins the first cluster that reaches it but does not
+    expand further. Cells reached by no core cell are noise.
+
+    Returns clusters as {"cells", "core_cells", "risk"}, highest risk first.
+    """
+    core = {cell for cell, risk in cells.items() if risk >= core_risk}
+    assigned: set[str] = set()
+    clusters: list[dict] = []
+    for seed in sorted(core, key=lambda c: (-cells[c], c)):
+        if seed in assigned:
+            continue
+        cluster = {"cells": [], "core_cells": [], "risk": 0.0}
+        assigned.add(seed)
+        stack = [seed]
+        while stack:
+            cell = stack.pop()
+            cluster["cells"].append(cell)
+            cluster["risk"] += cells[cell]
+            if cell not in core:
+                continue
+            cluster["core_cells"].append(cell)
+            for neighbour in geo.neighbors(cell):
+                if neighbour in cells and neighbour not in assigned:
+                    assigned.add(neighbour)
+                    stack.append(neighbour)
+        clusters.append(cluster)
+    clusters.sort(key=lambda c: -c["risk"])
+    return clusters
+
+
+def build_snapshot(at=None) -> dict:
+    """Cluster the current cell surface into ranked hotspots."""
+    at = get_datetime(at or now_datetime())
+    factor = decay_factor(at)
+    rows = frappe.db.sql(
+        f"select cell, decayed_sum, incidents, last_at from `{CELL_TABLE}` where decayed_sum >= %s",
+        (MIN_CELL_RISK / factor,),
+        as_dict=True,
+    )
+    by_cell = {row.cell: row for row in rows}
+    risks = {row.cell: row.decayed_sum * factor for row in rows}
+    hotspots = []
+    for cluster in cluster_cells(risks)[:MAX_CLUSTERS]:
+        centres = {cell: geo.decode(cell) for cell in cluster["cells"]}
+        risk = cluster["risk"]
+        last = [by_cell[cell].last_at for cell in cluster["cells"] if by_cell[cell].last_at]
+        hotspots.append(
+            {
+                "lat": round(sum(centres[c][0] * risks[c] for c in centres) / risk, 5),
+                "lng": round(sum(centres[c][1] * risks[c] for c in centres) / risk, 5),
+                "risk": round(risk, 3),
+                "incidents": sum(by_cell[cell].incidents for cell in cluster["cells"]),
+                "last_incident": str(max(last)) if last else None,
+                "cells": sorted(cluster["cells"]),
+                "core_cells": sorted(cluster["core_cells"]),
+            }
+        )
+    return {"computed_at": str(at), "cells_considered": len(rows), "hotspots": hotspots}
+
+
+def get_snapshot() -> dict:
+    """Cached hotspot clusters, built on a cold cache."""
+    snapshot = frappe.cache().get_value(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = build_snapshot()
+        frappe.cache().set_value(SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+
+def refresh() -> dict | None:
+    """Recompute dirty routes and re-cluster the surface (deduplicated background job)."""
+    from tems.tems_main.scheduler import acquire_lock, release_lock
+
+    token = acquire_lock(REFRESH_LOCK, REFRESH_LOCK_TTL)
+    if not token:
+        return None
+    try:
+        cache = frappe.cache()
+        routes = [r.decode() if isinstance(r, bytes) else r for r in cache.smembers(DIRTY_ROUTES_KEY) or []]
+        if routes:
+            cache.srem(DIRTY_ROUTES_KEY, *routes)
+        for route in routes:
+            compute_route(route)
+        if routes:
+            from tems.tems_safety.journey_risk import refresh as refresh_components
+
+            refresh_components("route", routes)
+        frappe.db.sql(f"delete from `{CELL_TABLE}` where incidents <= 0")
+        frappe.db.commit()
+        snapshot = build_snapshot()
+        cache.set_value(SNAPSHOT_KEY, snapshot)
+        return {"routes": len(routes), "hotspots": len(snapshot["hotspots"])}
+    finally:
+        release_lock(REFRESH_LOCK, token)
+
+
+def rebuild() -> dict:
+    """Recompute points, cells and route risk from the source doctypes (backfill / repair)."""
+    ensure_tables()
+    points = []
+    for doctype, fields in SOURCE_FIELDS.items():
+        for row in frappe.get_all(doctype, fields=fields):
+            row.doctype = doctype
+            point = point_for_doc(row)
+            if point:
+                points.append({**point, "source_doctype": doctype, "source_name": row.name})
+
+    frappe.db.sql(f"delete from `{POINT_TABLE}`")
+    frappe.db.sql(f"delete from `{CELL_TABLE}`")
+    for start in range(0, len(points), 500):
+        chunk = points[start : start + 500]
+        placeholders = ", ".join(["(" + ", ".join(["%s"] * len(POINT_COLUMNS)) + ")"] * len(chunk))
+        values = [point[c] for point in chunk for c in POINT_COLUMNS]
+        frappe.db.sql(
+            f"insert into `{POINT_TABLE}` ({', '.join(POINT_COLUMNS)}) values {placeholders}", values
+        )
+    frappe.db.sql(
+        f"""
+        insert into `{CELL_TABLE}` (cell, decayed_sum, incidents, last_at)
+        select cell, sum(contribution), count(*), max(occurred_at)
+        from `{POINT_TABLE}`
+        where cell is not null
+        group by cell
+        """
+    )
+
+    routes = frappe.get_all("Route Planning", pluck="name")
+    frappe.db.sql(f"delete from `{ROUTE_TABLE}`")
+    for route in routes:
+        compute_route(route)
+    frappe.cache().set_value(SNAPSHOT_KEY, build_snapshot())
+    return {"points": len(points), "routes": len(routes)}
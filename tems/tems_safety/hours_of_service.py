@@ -0,0 +1,513 @@
+"""Driver hours-of-service engine.
+
+Each driver's duty timeline lives in ``tems_duty_interval`` as intervals of
+three kinds:
+
+- ``driving``: actual driving, opened by a Movement Log leaving the yard
+  (Check-Out, or the first in-transit state) and closed by the vehicle's next
+  Check-In / delivery. The driver comes from the Movement Log's Operation Plan.
+- ``planned``: an Operation Plan's start/end window. It counts as driving
+  unless actual driving was recorded against the same plan, so future trips
+  and plans without movement events are both covered.
+- ``duty``: non-driving work from Duty Assignments (DUTY_ASSIGNMENT_HOURS from
+  the schedule slot) and Shift Plan team membership (the Shift Type's hours).
+
+Doc event hooks rewrite only the intervals of the changed source document and
+refresh the touched drivers' row in ``tems_driver_hos`` (rolling 24h/7d
+driving, rest in the last 24h, continuous driving, duty spread and status),
+so reads never rebuild timelines.
+
+`check_trip` answers "can this driver take this trip" from one indexed range
+query: the candidate trip is added as driving and the rules are evaluated at
+its end. `fleet_scan` evaluates every driver from one query over the last
+week and rewrites the summary table.
+
+Limits follow the EU drivers' hours rules and can be overridden in site
+config (``tems_hos_limits``).
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import frappe
+from frappe.utils import get_datetime, getdate, now_datetime
+
+INTERVAL_TABLE = "tems_duty_interval"
+SUMMARY_TABLE = "tems_driver_hos"
+
+DEFAULT_LIMITS = {
+    "max_driving_24h": 9 * 60,
+    "max_driving_7d": 56 * 60,
+    "min_daily_rest": 11 * 60,
+    "max_continuous_driving": 4.5 * 60,
+    "min_break": 45,
+}
+WARNING_SHARE = 0.8
+DUTY_ASSIGNMENT_HOURS = 8
+DEFAULT_SHIFT = ("06:00:00", "14:00:00")
+# An open driving interval without a Check-In is capped here (missed event)
+MAX_OPEN_DRIVING_HOURS = 12
+WEEK = timedelta(days=7)
+DAY = timedelta(hours=24)
+
+DRIVING_START_STATES = ("Check-Out", "In Transit", "Diversion", "Out Transit")
+DRIVING_END_STATES = ("Check-In", "Delivered", "Delivery Confirmation")
+PLAN_STATUSES = ("Assigned", "Active", "Completed")
+
+
+def ensure_tables() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{INTERVAL_TABLE}` (
+            id bigint unsigned not null auto_increment primary key,
+            driver varchar(140) not null,
+            kind varchar(16) not null,
+            start_at datetime not null,
+            end_at datetime,
+            vehicle varchar(140),
+            operation_plan varchar(140),
+            source_doctype varchar(64) not null,
+            source_name varchar(140) not null,
+            index idx_driver_start (driver, start_at),
+            index idx_source (source_doctype, source_name),
+            index idx_open_vehicle (vehicle, end_at)
+        ) engine=InnoDB
+        """
+    )
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{SUMMARY_TABLE}` (
+            driver varchar(140) not null primary key,
+            driving_24h double not null default 0,
+            driving_7d double not null default 0,
+            rest_24h double not null default 0,
+            longest_rest_24h double not null default 0,
+            continuous_driving double not null default 0,
+            duty_spread double not null default 0,
+            status varchar(16) not null default 'ok',
+            violations text,
+            computed_at datetime
+        ) engine=InnoDB
+        """
+    )
+
+
+def limits() -> dict:
+    return {**DEFAULT_LIMITS, **(frappe.conf.get("tems_hos_limits") or {})}
+
+
+# ---------------------------------------------------------------------------
+# Timeline evaluation (pure)
+# ---------------------------------------------------------------------------
+
+
+def _merge(spans: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
+    merged: list[list[datetime]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _clip(spans, lo: datetime, hi: datetime) -> list[tuple[datetime, datetime]]:
+    return [(max(s, lo), min(e, hi)) for s, e in spans if e > lo and s < hi]
+
+
+def _minutes(spans) -> float:
+    return sum((e - s).total_seconds() for s, e in spans) / 60
+
+
+def resolve(intervals: list[dict], now: datetime) -> tuple[list, list]:
+    """Driving and busy (driving + duty) spans with open intervals closed."""
+    actual_plans = {i.get("operation_plan") for i in intervals if i["kind"] == "driving"} - {None}
+    driving, busy = [], []
+    for i in intervals:
+        if i["kind"] == "planned" and i.get("operation_plan") in actual_plans:
+            continue
+        start, end = get_datetime(i["start"]), i.get("end")
+        if end is None:
+            cap = start + timedelta(hours=MAX_OPEN_DRIVING_HOURS)
+            plan_end = i.get("plan_end")
+            end = min(now, cap) if not plan_end or now <= get_datetime(plan_end) else get_datetime(plan_end)
+        end = get_datetime(end)
+        if end <= start:
+            continue
+        busy.append((start, end))
+        if i["kind"] in ("driving", "planned"):
+            driving.append((start, end))
+    return _merge(driving), _merge(busy)
+
+
+def evaluate(intervals: list[dict], at: datetime | None = None, now: datetime | None = None) -> dict:
+    """Rolling totals (minutes) and rule violations of a timeline at `at`."""
+    at = get_datetime(at) if at else now_datetime()
+    now = get_datetime(now) if now else max(at, now_datetime())
+    rules = limits()
+    driving, busy = resolve(intervals, now)
+
+    day_start = at - DAY
+    driving_24h = _minutes(_clip(driving, day_start, at))
+    driving_7d = _minutes(_clip(driving, at - WEEK, at))
+    busy_24h = _clip(busy, day_start, at)
+    rest_24h = 24 * 60 - _minutes(busy_24h)
+    edges = [day_start] + [t for span in busy_24h for t in span] + [at]
+    gaps = ((edges[k + 1] - edges[k]).total_seconds() / 60 for k in range(0, len(edges), 2))
+    longest_rest = max(gaps, default=0)
+
+    # Duty spread: time from the end of the last daily rest to the end of the
+    # latest work. Taking the daily rest within 24h means it may not exceed
+    # 24h minus the daily rest. History before the week window counts as rest.
+    spread = 0.0
+    rest_end = at - WEEK
+    busy_week = _clip(busy, at - WEEK, at)
+    previous_end = at - WEEK
+    for start, end in busy_week:
+        if (start - previous_end).total_seconds() / 60 >= rules["min_daily_rest"]:
+            rest_end = start
+        previous_end = end
+    if busy_week and (at - busy_week[-1][1]).total_seconds() / 60 < rules["min_daily_rest"]:
+        spread = (busy_week[-1][1] - rest_end).total_seconds() / 60
+
+    # Driving since the last break of at least min_break minutes
+    continuous = 0.0
+    cursor = at
+    for start, end in reversed([span for span in driving if span[0] < at]):
+        end = min(end, at)
+        if (cursor - end).total_seconds() / 60 >= rules["min_break"]:
+            break
+        continuous += (end - start).total_seconds() / 60
+        cursor = start
+
+    checks = (
+        ("daily_driving", driving_24h, rules["max_driving_24h"]),
+        ("weekly_driving", driving_7d, rules["max_driving_7d"]),
+        ("continuous_driving", continuous, rules["max_continuous_driving"]),
+        ("daily_rest", spread, 24 * 60 - rules["min_daily_rest"]),
+    )
+    violations = [
+        {"rule": rule, "value": round(value, 1), "limit": limit}
+        for rule, value, limit in checks
+        if value > limit
+    ]
+    near_limit = any(value > limit * WARNING_SHARE for _, value, limit in checks)
+    return {
+        "driving_24h": round(driving_24h, 1),
+        "driving_7d": round(driving_7d, 1),
+        "rest_24h": round(rest_24h, 1),
+        "longest_rest_24h": round(longest_rest, 1),
+        "continuous_driving": round(continuous, 1),
+        "duty_spread": round(spread, 1),
+        "remaining_driving_24h": round(max(rules["max_driving_24h"] - driving_24h, 0), 1),
+        "status": "violation" if violations else "warning" if near_limit else "ok",
+        "violations": violations,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+_INTERVAL_SELECT = f"""
+    select i.driver, i.kind, i.start_at as start, i.end_at as end, i.operation_plan, p.end_time as plan_end
+    from `{INTERVAL_TABLE}` i
+    left join `tabOperation Plan` p on p.name = i.operation_plan
+"""
+
+
+def load_intervals(
+    driver: str, since: datetime, until: datetime, exclude_plan: str | None = None
+) -> list[dict]:
+    return frappe.db.sql(
+        f"""
+        {_INTERVAL_SELECT}
+        where i.driver = %(driver)s and i.start_at < %(until)s
+            and (i.end_at is null or i.end_at > %(since)s)
+            and not (i.kind = 'planned' and i.operation_plan <=> %(exclude)s)
+        order by i.start_at
+        """,
+        {"driver": driver, "since": since, "until": until, "exclude": exclude_plan},
+        as_dict=True,
+    )
+
+
+def check_trip(driver: str, start_time, end_time, exclude_plan: str | None = None) -> dict:
+    """Whether `driver` can drive from `start_time` to `end_time` within the limits.
+
+    `exclude_plan` leaves out the booked window of an Operation Plan being
+    rescheduled. Returns the evaluation at the trip's end with "allowed" set.
+    """
+    start, end = get_datetime(start_time), get_datetime(end_time)
+    if not start or not end or end <= start:
+        frappe.throw("Trip end must be after its start")
+    intervals = load_intervals(driver, start - WEEK, end, exclude_plan)
+    # Spans are merged, so a trip that is already booked is not counted twice
+    intervals.append({"kind": "driving", "start": start, "end": end, "operation_plan": None})
+    result = evaluate(intervals, at=end, now=max(now_datetime(), end))
+    return {"driver": driver, "allowed": not result["violations"], **result}
+
+
+def get_summary(driver: str) -> dict | None:
+    rows = frappe.db.sql(f"select * from `{SUMMARY_TABLE}` where driver = %s", (driver,), as_dict=True)
+    return rows[0] if rows else None
+
+
+def get_summaries(drivers: list[str]) -> dict[str, dict]:
+    if not drivers:
+        return {}
+    rows = frappe.db.sql(
+        f"select * from `{SUMMARY_TABLE}` where driver in %(drivers)s",
+        {"drivers": tuple(drivers)},
+        as_dict=True,
+    )
+    return {row.driver: row for row in rows}
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------------------------
+
+
+def _write_summaries(results: dict[str, dict], computed_at: datetime) -> None:
+    if not results:
+        return
+    columns = [
+        "driver", "driving_24h", "driving_7d", "rest_24h", "longest_rest_24h",
+        "continuous_driving", "duty_spread", "status", "violations", "computed_at",
+    ]
+    values = []
+    for driver, r in results.items():
+        values.extend([
+            driver, r["driving_24h"], r["driving_7d"], r["rest_24h"], r["longest_rest_24h"],
+            r["continuous_driving"], r["duty_spread"], r["status"], frappe.as_json(r["violations"]),
+            computed_at,
+        ])
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(results))
+    updates = ", ".join(f"{c} = values({c})" for c in columns[1:])
+    frappe.db.sql(
+        f"""
+        insert into `{SUMMARY_TABLE}` ({', '.join(columns)}) values {placeholders}
+        on duplicate key update {updates}
+        """,
+        values,
+    )
+
+
+def refresh(drivers) -> None:
+    """Recompute the summary rows of `drivers` at the current time."""
+    now = now_datetime()
+    results = {
+        driver: evaluate(load_intervals(driver, now - WEEK, now), at=now, now=now)
+        for driver in set(filter(None, drivers))
+    }
+    _write_summaries(results, now)
+
+
+def _drivers_of_source(doctype: str, name: str) -> list[str]:
+    return frappe.db.sql_list(
+        f"select distinct driver from `{INTERVAL_TABLE}` where source_doctype = %s and source_name = %s",
+        (doctype, name),
+    )
+
+
+def _replace_source(doctype: str, name: str, rows: list[dict]) -> set[str]:
+    """Swap the intervals of one source document; returns the drivers touched."""
+    touched = set(_drivers_of_source(doctype, name))
+    frappe.db.sql(
+        f"delete from `{INTERVAL_TABLE}` where source_doctype = %s and source_name = %s", (doctype, name)
+    )
+    for row in rows:
+        _insert_interval({**row, "source_doctype": doctype, "source_name": name})
+        touched.add(row["driver"])
+    return touched
+
+
+def _insert_interval(row: dict) -> None:
+    frappe.db.sql(
+        f"""
+        insert into `{INTERVAL_TABLE}`
+            (driver, kind, start_at, end_at, vehicle, operation_plan, source_doctype, source_name)
+        values (%(driver)s, %(kind)s, %(start_at)s, %(end_at)s, %(vehicle)s, %(operation_plan)s,
+            %(source_doctype)s, %(source_name)s)
+        """,
+        {"end_at": None, "vehicle": None, "operation_plan": None, **row},
+    )
+
+
+def _shift_window(doc) -> tuple[datetime, datetime]:
+    start, end = DEFAULT_SHIFT
+    if doc.get("shift_type") and frappe.db.table_exists("Shift Type"):
+        hours = frappe.db.get_value("Shift Type", doc.shift_type, ["start_time", "end_time"])
+        start, end = hours or DEFAULT_SHIFT
+    day = getdate(doc.date)
+    start_at, end_at = get_datetime(f"{day} {start}"), get_datetime(f"{day} {end}")
+    if end_at <= start_at:  # overnight shift
+        end_at += DAY
+    return start_at, end_at
+
+
+def intervals_for_doc(doc) -> list[dict]:
+    """Timeline intervals contributed by an Operation Plan, Duty Assignment or Shift Plan."""
+    if doc.doctype == "Operation Plan":
+        if not (doc.driver and doc.start_time and doc.end_time) or doc.status not in PLAN_STATUSES:
+            return []
+        return [{
+            "driver": doc.driver, "kind": "planned", "start_at": get_datetime(doc.start_time),
+            "end_at": get_datetime(doc.end_time), "vehicle": doc.vehicle, "operation_plan": doc.name,
+        }]
+    if doc.doctype == "Duty Assignment":
+        if not (doc.driver and doc.schedule_slot) or doc.status == "Cancelled":
+            return []
+        start = get_datetime(doc.schedule_slot)
+        end = start + timedelta(hours=DUTY_ASSIGNMENT_HOURS)
+        return [
+            {"driver": employee, "kind": "duty", "start_at": start, "end_at": end}
+            for employee in {doc.driver, doc.get("assistant")} - {None, ""}
+        ]
+    if doc.doctype == "Shift Plan":
+        if not doc.date:
+            return []
+        start, end = _shift_window(doc)
+        return [
+            {"driver": employee, "kind": "duty", "start_at": start, "end_at": end}
+            for employee in {row.employee for row in doc.get("team") or []} - {None, ""}
+        ]
+    return []
+
+
+def _plan_driver(doc) -> str | None:
+    if doc.operation_plan:
+        return frappe.db.get_value("Operation Plan", doc.operation_plan, "driver")
+    # No plan on the event: the driver of the vehicle's plan covering the event
+    plan = frappe.db.sql(
+        """
+        select driver from `tabOperation Plan`
+        where vehicle = %(vehicle)s and driver is not null and status in ('Assigned', 'Active')
+            and start_time <= %(at)s and (end_time is null or end_time >= %(at)s)
+        order by start_time desc limit 1
+        """,
+        {"vehicle": doc.vehicle, "at": doc.event_time},
+    )
+    return plan[0][0] if plan else None
+
+
+def record_movement(doc) -> set[str]:
+    """Open or close the vehicle's driving interval for one Movement Log event."""
+    if not doc.vehicle or not doc.event_time or doc.state not in DRIVING_START_STATES + DRIVING_END_STATES:
+        return set()
+    event_time = get_datetime(doc.event_time)
+    open_rows = frappe.db.sql(
+        f"""
+        select id, driver from `{INTERVAL_TABLE}`
+        where vehicle = %s and kind = 'driving' and end_at is null and start_at <= %s
+        for update
+        """,
+        (doc.vehicle, event_time),
+        as_dict=True,
+    )
+    if doc.state in DRIVING_END_STATES:
+        if open_rows:
+            frappe.db.sql(
+                f"update `{INTERVAL_TABLE}` set end_at = %s where id in %s",
+                (event_time, tuple(r.id for r in open_rows)),
+            )
+        return {r.driver for r in open_rows}
+    if open_rows:
+        return set()
+    driver = _plan_driver(doc)
+    if not driver:
+        return set()
+    _insert_interval({
+        "driver": driver, "kind": "driving", "start_at": event_time, "vehicle": doc.vehicle,
+        "operation_plan": doc.operation_plan, "source_doctype": "Movement Log", "source_name": doc.name,
+    })
+    return {driver}
+
+
+def validate_plan_hours(doc, method=None):
+    """Operation Plan validate: check the driver's hours for upcoming plans.
+
+    Warns by default; blocks when ``tems_hos_enforce`` is set in site config.
+    """
+    if not (doc.driver and doc.start_time and doc.end_time) or doc.status not in ("Assigned", "Active"):
+        return
+    if get_datetime(doc.end_time) <= now_datetime():
+        return
+    before = doc.get_doc_before_save()
+    if before and all(before.get(f) == doc.get(f) for f in ("driver", "start_time", "end_time")):
+        return
+    result = check_trip(doc.driver, doc.start_time, doc.end_time, exclude_plan=doc.name)
+    if result["allowed"]:
+        return
+    rules = ", ".join(
+        f"{v['rule'].replace('_', ' ')} {v['value']:.0f} min (limit {v['limit']:.0f})"
+        for v in result["violations"]
+    )
+    message = f"Driver {doc.driver} would exceed hours-of-service limits: {rules}"
+    if frappe.conf.get("tems_hos_enforce"):
+        frappe.throw(message)
+    frappe.msgprint(message, alert=True, indicator="orange")
+
+
+def on_doc_change(doc, method=None):
+    """doc_events hook keeping the duty timeline and the touched drivers' totals current."""
+    try:
+        if doc.doctype == "Movement Log":
+            touched = record_movement(doc)
+        elif method in ("on_trash", "on_cancel"):
+            touched = _replace_source(doc.doctype, doc.name, [])
+        else:
+            touched = _replace_source(doc.doctype, doc.name, intervals_for_doc(doc))
+        refresh(touched)
+    except Exception:
+        frappe.log_error(title=f"Hours of service update failed: {doc.doctype} {doc.name}")
+
+
+def fleet_scan(at=None) -> list[dict]:
+    """Evaluate every driver with activity in the last week in one pass.
+
+    Rewrites the summary table and returns the per-driver results, violations first.
+    """
+    at = get_datetime(at) if at else now_datetime()
+    rows = frappe.db.sql(
+        f"""
+        {_INTERVAL_SELECT}
+        where i.start_at < %(at)s and (i.end_at is null or i.end_at > %(since)s)
+        order by i.driver, i.start_at
+        """,
+        {"at": at, "since": at - WEEK},
+        as_dict=True,
+    )
+    now = max(at, now_datetime())
+    results = {
+        driver: evaluate(list(group), at=at, now=now)
+        for driver, group in groupby(rows, key=lambda r: r.driver)
+    }
+    _write_summaries(results, at)
+    order = {"violation": 0, "warning": 1, "ok": 2}
+    return sorted(
+        ({"driver": driver, **result} for driver, result in results.items()),
+        key=lambda r: (order[r["status"]], -r["driving_24h"]),
+    )
+
+
+def rebuild(days: int = 8) -> int:
+    """Rebuild the timeline of the last `days` days from source documents (backfill / repair)."""
+    ensure_tables()
+    since = now_datetime() - timedelta(days=days)
+    frappe.db.sql(f"delete from `{INTERVAL_TABLE}`")
+    sources = (
+        ("Operation Plan", "start_time", since),
+        ("Duty Assignment", "schedule_slot", since),
+        ("Shift Plan", "date", getdate(since)),
+    )
+    for doctype, date_field, start in sources:
+        for name in frappe.get_all(doctype, filters={date_field: [">=", start]}, pluck="name"):
+            _replace_source(doctype, name, intervals_for_doc(frappe.get_doc(doctype, name)))
+    for name in frappe.get_all(
+        "Movement Log", filters={"event_time": [">=", since]}, order_by="event_time asc", pluck="name"
+    ):
+        record_movement(frappe.get_doc("Movement Log", name))
+    return len(fleet_scan())
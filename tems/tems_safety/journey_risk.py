@@ -0,0 +1,361 @@
+"""Precomputed driver, vehicle and route risk components for journey scoring.
+
+Journey risk is a weighting of three components. Each one is kept per
+entity in ``tems_risk_component``, so scoring a journey is one indexed read
+plus arithmetic:
+
+- ``driver``: incident history from Safety Incident participants (count,
+  severity and incidents in the last RECENT_DAYS).
+- ``vehicle``: open Maintenance Work Orders.
+- ``route``: the time-decayed incident risk of the route from
+  `tems_safety.hotspots`.
+
+Doc event hooks recompute the components an incident, work order or driver
+record touches. The hotspot refresh recomputes the routes it recomputes. A
+component that depends on time carries ``valid_until``: the moment an incident
+leaves the recent window, or (for routes) a day of decay. Lookups recompute expired or missing
+components in one batch before returning them.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import get_datetime, getdate, now_datetime
+
+COMPONENT_TABLE = "tems_risk_component"
+MAX_DRIVER_INCIDENTS = 50
+RECENT_DAYS = 90
+SEVERITY_CLASS = {"critical": "high", "major": "high", "minor": "medium", "near miss": "low"}
+SEVERITY_POINTS = {"high": 20, "medium": 10, "low": 5}
+OPEN_WORK_ORDER_STATUSES = ("Open", "In Progress")
+ROUTE_VALIDITY = timedelta(days=1)
+WEIGHTS = {"driver": 0.4, "vehicle": 0.3, "route": 0.2, "weather": 0.1}
+DEFAULT_WEATHER_RISK = 10
+
+
+def ensure_table() -> None:
+    frappe.db.sql_ddl(
+        f"""
+        create table if not exists `{COMPONENT_TABLE}` (
+            entity_type varchar(16) not null,
+            entity varchar(140) not null,
+            score double not null default 0,
+            detail longtext,
+            valid_until datetime,
+            computed_at datetime not null,
+            primary key (entity_type, entity)
+        ) engine=InnoDB
+        """
+    )
+
+
+# ---------------------------------------------------------------------------
+# Component scores
+# ---------------------------------------------------------------------------
+
+
+def driver_score(incidents: list[tuple], now) -> tuple[float, dict, object]:
+    """Driver risk (0-100) from (severity, incident_date) pairs, newest first.
+
+    Returns the score, its breakdown and when it next changes with time.
+    """
+    incidents = incidents[:MAX_DRIVER_INCIDENTS]
+    classes = [SEVERITY_CLASS.get((severity or "").lower(), "low") for severity, _ in incidents]
+    cutoff = now - timedelta(days=RECENT_DAYS)
+    recent = [get_datetime(at) for _, at in incidents if at and get_datetime(at) >= cutoff]
+
+    incident_risk = min(100, len(incidents) * 5)
+    severity_risk = sum(SEVERITY_POINTS[c] for c in classes)
+    recency_risk = len(recent) * 10
+    score = min(100, incident_risk * 0.4 + severity_risk * 0.4 + recency_risk * 0.2)
+    detail = {
+        "total_incidents": len(incidents),
+        "recent_incidents": len(recent),
+        "high_severity": classes.count("high"),
+        "medium_severity": classes.count("medium"),
+        "low_severity": classes.count("low"),
+    }
+    valid_until = min(recent) + timedelta(days=RECENT_DAYS) if recent else None
+    return round(score, 1), detail, valid_until
+
+
+def vehicle_score(open_work_orders: int) -> float:
+    return min(50, open_work_orders * 15)
+
+
+def route_score(decayed_risk: float) -> float:
+    return round(min(40, decayed_risk * 10), 1)
+
+
+def _driver_components(drivers: list[str], now) -> dict[str, tuple]:
+    params = {"drivers": tuple(drivers)}
+    incidents = frappe.db.sql(
+        """
+        select distinct ip.employee as driver, si.name, si.severity, si.incident_date
+        from `tabSafety Incident` si
+        inner join `tabIncident Participant` ip
+            on ip.parent = si.name and ip.parenttype = 'Safety Incident'
+        where ip.employee in %(drivers)s and si.docstatus < 2
+        order by ip.employee, si.incident_date desc
+        """,
+        params,
+        as_dict=True,
+    )
+    by_driver: dict[str, list[tuple]] = {}
+    for row in incidents:
+        by_driver.setdefault(row.driver, []).append((row.severity, row.incident_date))
+    return {driver: driver_score(by_driver.get(driver, []), now) for driver in drivers}
+
+
+def _vehicle_components(vehicles: list[str], now) -> dict[str, tuple]:
+    counts = dict(
+        frappe.db.sql(
+            """
+            select vehicle, count(*)
+            from `tabMaintenance Work Order`
+            where vehicle in %(vehicles)s and status in %(statuses)s
+            group by vehicle
+            """,
+            {"vehicles": tuple(vehicles), "statuses": OPEN_WORK_ORDER_STATUSES},
+        )
+    )
+    return {
+        vehicle: (vehicle_score(counts.get(vehicle, 0)), {"open_work_orders": counts.get(vehicle, 0)}, None)
+        for vehicle in vehicles
+    }
+
+
+def _route_components(routes: list[str], now) -> dict[str, tuple]:
+    from tems.tems_safety.hotspots import ROUTE_TABLE, decay_factor
+
+    factor = decay_factor(now)
+    rows = {
+        row.route: row
+        for row in frappe.db.sql(
+            f"select route, decayed_sum, incidents from `{ROUTE_TABLE}` where route in %(routes)s",
+            {"routes": tuple(routes)},
+            as_dict=True,
+        )
+    }
+    components = {}
+    for route in routes:
+        row = rows.get(route)
+        risk = row.decayed_sum * factor if row else 0.0
+        detail = {"decayed_risk": round(risk, 3), "incidents": row.incidents if row else 0}
+        components[route] = (route_score(risk), detail, now + ROUTE_VALIDITY)
+    return components
+
+
+_COMPUTE = {"driver": _driver_components, "vehicle": _vehicle_components, "route": _route_components}
+
+
+def refresh(entity_type: str, names) -> dict[str, dict]:
+    """Recompute and store the components of `names`; returns them by name."""
+    names = sorted(set(filter(None, names)))
+    if not names:
+        return {}
+    now = now_datetime()
+    computed = _COMPUTE[entity_type](names, now)
+    values = []
+    for name, (score, detail, valid_until) in computed.items():
+        values += [entity_type, name, score, frappe.as_json(detail, indent=None), valid_until, now]
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(computed))
+    frappe.db.sql(
+        f"""
+        insert into `{COMPONENT_TABLE}` (entity_type, entity, score, detail, valid_until, computed_at)
+        values {placeholders}
+        on duplicate key update score = values(score), detail = values(detail),
+            valid_until = values(valid_until), computed_at = values(computed_at)
+        """,
+        values,
+    )
+    return {
+        name: {"score": score, "detail": detail, "valid_until": valid_until}
+        for name, (score, detail, valid_until) in computed.items()
+    }
+
+
+def lookup(wanted: dict[str, set]) -> dict[str, dict]:
+    """Current components for {entity_type: names}, computing missing or expired ones.
+
+    Returns {entity_type: {name: {"score", "detail", "valid_until"}}}.
+    """
+    wanted = {t: set(filter(None, names)) for t, names in wanted.items()}
+    pairs = [(t, name) for t, names in wanted.items() for name in names]
+    found: dict[str, dict] = {t: {} for t in wanted}
+    if pairs:
+        now = now_datetime()
+        rows = frappe.db.sql(
+            f"""
+            select entity_type, entity, score, detail, valid_until
+            from `{COMPONENT_TABLE}`
+            where (entity_type, entity) in ({", ".join(["(%s, %s)"] * len(pairs))})
+            """,
+            [value for pair in pairs for value in pair],
+            as_dict=True,
+        )
+        for row in rows:
+            if row.valid_until is None or get_datetime(row.valid_until) > now:
+                found[row.entity_type][row.entity] = {
+                    "score": row.score,
+                    "detail": frappe.parse_json(row.detail or "{}"),
+                    "valid_until": row.valid_until,
+                }
+    for entity_type, names in wanted.items():
+        missing = names - set(found[entity_type])
+        if missing:
+            found[entity_type].update(refresh(entity_type, missing))
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Journey scoring
+# ---------------------------------------------------------------------------
+
+
+def weigh(driver_risk: float, vehicle_risk: float, route_risk: float, weather_risk: float) -> float:
+    return (
+        driver_risk * WEIGHTS["driver"]
+        + vehicle_risk * WEIGHTS["vehicle"]
+        + route_risk * WEIGHTS["route"]
+        + weather_risk * WEIGHTS["weather"]
+    )
+
+
+def assess(plans: list[dict]) -> list[dict]:
+    """Score journeys given as dicts with name, driver, vehicle and route, with one component lookup."""
+    found = lookup(
+        {
+            "driver": {p.get("driver") for p in plans},
+            "vehicle": {p.get("vehicle") for p in plans},
+            "route": {p.get("route") for p in plans},
+        }
+    )
+    results = []
+    for plan in plans:
+        risks = {
+            t: found[t][plan.get(t)]["score"] if plan.get(t) else 0 for t in ("driver", "vehicle", "route")
+        }
+        risks["weather"] = DEFAULT_WEATHER_RISK  # No weather feed yet
+        results.append(
+            {
+                "journey_plan": plan.get("name"),
+                "total": weigh(risks["driver"], risks["vehicle"], risks["route"], risks["weather"]),
+                "components": risks,
+                "driver_detail": found["driver"][plan["driver"]]["detail"] if plan.get("driver") else None,
+            }
+        )
+    return results
+
+
+def assess_plan(plan) -> dict:
+    """Score one Journey Plan, given as a document or a name."""
+    if isinstance(plan, str):
+        name = plan
+        plan = frappe.db.get_value("Journey Plan", name, ["name", "driver", "vehicle", "route"], as_dict=True)
+        if not plan:
+            frappe.throw(frappe._("Journey Plan {0} not found").format(name), frappe.DoesNotExistError)
+    return assess([{k: plan.get(k) for k in ("name", "driver", "vehicle", "route")}])[0]
+
+
+def assess_day(date=None, update: bool = True) -> list[dict]:
+    """Score every Journey Plan starting on `date` (default today) with one component lookup.
+
+    With `update`, changed `risk_score` values are written back to the plans.
+    """
+    start = get_datetime(getdate(date))
+    plans = frappe.get_all(
+        "Journey Plan",
+        filters={"start_time": ["between", [start, start + timedelta(days=1) - timedelta(seconds=1)]]},
+        fields=["name", "driver", "vehicle", "route", "risk_score"],
+        order_by="start_time asc",
+    )
+    results = assess(plans)
+    if update:
+        for plan, result in zip(plans, results, strict=True):
+            score = round(result["total"], 1)
+            if plan.risk_score != score:
+                frappe.db.set_value("Journey Plan", plan.name, "risk_score", score, update_modified=False)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Hooks and batch refresh
+# ---------------------------------------------------------------------------
+
+
+def _is_driver(employee) -> bool:
+    return "driver" in (employee.get("designation") or "").lower()
+
+
+def _touched(doc) -> tuple[str, set]:
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if doc.doctype == "Safety Incident":
+        rows = list(doc.get("participants") or []) + list(before.get("participants") or [] if before else [])
+        return "driver", {row.employee for row in rows}
+    if doc.doctype == "Maintenance Work Order":
+        return "vehicle", {doc.get("vehicle"), before.get("vehicle") if before else None}
+    if doc.doctype == "Employee":
+        # Only drivers (and employees who just stopped being one) have a driver component
+        if not (_is_driver(doc) or (before and _is_driver(before))):
+            return "", set()
+        return "driver", {doc.name}
+    return "", set()
+
+
+def invalidate(entity_type: str, names) -> None:
+    """Drop stored components; the next lookup recomputes them."""
+    names = tuple(set(filter(None, names)))
+    if names:
+        frappe.db.sql(
+            f"delete from `{COMPONENT_TABLE}` where entity_type = %s and entity in %s", (entity_type, names)
+        )
+
+
+def on_doc_change(doc, method=None):
+    """doc_events hook recomputing the components a document feeds into."""
+    try:
+        entity_type, names = _touched(doc)
+        if not entity_type:
+            return
+        # on_trash runs before the row is deleted, so recomputing now would still count it
+        if method == "on_trash":
+            invalidate(entity_type, names)
+        else:
+            refresh(entity_type, names)
+    except Exception:
+        frappe.log_error(title=f"Journey risk update failed: {doc.doctype} {doc.name}")
+
+
+def refresh_all() -> dict:
+    """Recompute every driver, vehicle and route component (nightly / backfill)."""
+    ensure_table()
+    entities = {
+        "driver": frappe.get_all("Employee", filters={"designation": ["like", "%Driver%"]}, pluck="name"),
+        "vehicle": frappe.get_all("Vehicle", pluck="name"),
+        "route": frappe.get_all("Route Planning", pluck="name"),
+    }
+    counts = {}
+    for entity_type, names in entities.items():
+        for start in range(0, len(names), 500):
+            refresh(entity_type, names[start : start + 500])
+        frappe.db.sql(
+            f"delete from `{COMPONENT_TABLE}` where entity_type = %s and entity not in %s",
+            (entity_type, tuple(names) or ("",)),
+        )
+        counts[entity_type] = len(names)
+    return counts
+
+
+def high_risk_drivers(threshold: float = 50) -> list[dict]:
+    return frappe.db.sql(
+        f"""
+        select entity as driver, score, detail
+        from `{COMPONENT_TABLE}`
+        where entity_type = 'driver' and score >= %s
+        order by score desc
+        """,
+        (threshold,),
+        as_dict=True,
+    )
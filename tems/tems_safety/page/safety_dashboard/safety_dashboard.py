@@ -1,6 +1,6 @@
 
 import frappe
-from tems.tems_ai.handlers.safety_ai import predict_driver_risk_score
+from tems.tems_ai.handlers.safety_ai import predict_driver_risk_scores
 
 @frappe.whitelist()
 def get_driver_performance_widget():
@@ -19,21 +19,24 @@ def get_driver_performance_widget():
     )
     
     driver_scores = []
+    try:
+        risk_scores = predict_driver_risk_scores([driver["name"] for driver in drivers])
+    except Exception:
+        # Drivers without a score are left out, as before the batched lookup
+        frappe.log_error(title="Driver risk scores unavailable")
+        risk_scores = {}
     
     for driver in drivers:
-        try:
-            # Get AI risk score
-            risk_data = predict_driver_risk_score(driver["name"])
-            
-            driver_scores.append({
-                "driver_id": driver["name"],
-                "driver_name": driver["employee_name"],
-                "safety_score": risk_data.get("safety_score", 0),
-                "risk_level": risk_data.get("risk_level", "unknown"),
-                "recent_incidents": risk_data.get("breakdown", {}).get("recent_incidents", 0)
-            })
-        except Exception as e:
-            frappe.log_error(f"Error getting score for {driver['name']}: {str(e)}")
+        risk_data = risk_scores.get(driver["name"])
+        if risk_data is None:
+            continue
+        driver_scores.append({
+            "driver_id": driver["name"],
+            "driver_name": driver["employee_name"],
+            "safety_score": risk_data.get("safety_score", 0),
+            "risk_level": risk_data.get("risk_level", "unknown"),
+            "recent_incidents": risk_data.get("breakdown", {}).get("recent_incidents", 0)
+        })
     
     # Sort by safety score (lowest first - needs attention)
     driver_scores.sort(key=lambda x: x["safety_score"])
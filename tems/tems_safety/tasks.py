@@ -18,6 +18,36 @@ def aggregate_emissions_daily() -> None:
 def aggregate_emissions_monthly() -> None:
     _log("safety.aggregate_emissions_monthly noop")
 
+def scan_driver_fatigue() -> int:
+    """Nightly fleet-wide hours-of-service scan; queues one alert per driver over the limits."""
+    from tems.tems_ai.services.alert_engine import queue_alert
+    from tems.tems_safety.hours_of_service import fleet_scan
+
+    results = fleet_scan()
+    violations = [r for r in results if r["status"] == "violation"]
+    for r in violations:
+        rules = ", ".join(v["rule"].replace("_", " ") for v in r["violations"])
+        queue_alert(
+            domain="safety",
+            alert_type="fatigue",
+            severity="high",
+            message=f"Driver {r['driver']} is over hours-of-service limits ({rules})",
+            details=r,
+            value=r["driving_24h"],
+        )
+    frappe.db.commit()
+    _log(f"safety.scan_driver_fatigue drivers={len(results)} violations={len(violations)}")
+    return len(violations)
+
+
+def refresh_incident_hotspots() -> None:
+    """Nightly re-clustering of the hotspot surface as incident risk decays."""
+    from tems.tems_safety.hotspots import refresh
+
+    result = refresh()
+    _log(f"safety.refresh_incident_hotspots {result}")
+
+
 # from tems_safety.doctype.journey_plan.journey_plan updated status to expired when end time is passed
 def update_journey_plan_status() -> None:
     from tems_safety.doctype.journey_plan.journey_plan import JourneyPlan
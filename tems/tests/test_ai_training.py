@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import os
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_ai.services import training
+
+
+class TestAITrainingPipeline(FrappeTestCase):
+    def test_regression_metrics_and_score(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(600, 4)).astype(np.float32)
+        X[::9, 2] = np.nan
+        y = (2 * X[:, 0] - X[:, 1] + rng.normal(0, 0.2, 600)).astype(np.float32)
+        _estimator, metrics = training.fit_estimator(training.TRAINING_SETS["operations"], X, y)
+        self.assertGreater(metrics["r2"], 0.8)
+        self.assertEqual(metrics["score"], metrics["r2"])
+
+    def test_artifact_is_content_hashed_and_hot_swapped(self):
+        model_name = "_Test Training Model"
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(300, 4)).astype(np.float32)
+        estimator, metrics = training.fit_estimator(training.TRAINING_SETS["safety"], X, (X[:, 0] > 0).astype(np.float32))
+        written = training.write_artifact(
+            model_name,
+            {"estimator": estimator, "features": training.TRAINING_SETS["safety"]["features"], "task": "classification", "metrics": metrics},
+        )
+        self.assertTrue(os.path.exists(written["path"]))
+        self.assertTrue(written["version"].endswith(written["hash"][:12]))
+
+        frappe.cache().hset(training.VERSION_KEY, model_name, written["version"])
+        result = training.predict(model_name, {"risk_score": 2.0, "start_hour": None})
+        self.assertIn(result["prediction"], (0, 1))
+        self.assertEqual(training._loaded[model_name]["version"], written["version"])
+
+        frappe.cache().hdel(training.VERSION_KEY, model_name)
+        os.remove(written["path"])
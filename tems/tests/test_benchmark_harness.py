@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.benchmarks.harness import compare, percentile
+from tems.tems_main.profiling import query_shape
+
+
+class TestBenchmarkHarness(FrappeTestCase):
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile([10.0], 95), 10.0)
+        self.assertAlmostEqual(percentile([1.0, 2.0, 3.0, 4.0], 50), 2.5)
+
+    def test_query_shape_collapses_literals(self):
+        a = query_shape("select name from `tabVehicle` where name = 'V-001' and odometer > 10")
+        b = query_shape("select  name from `tabVehicle` where name = %s and odometer > %s")
+        self.assertEqual(a, b)
+
+    def test_compare_flags_query_and_latency_regressions(self):
+        base = {"cases": {"x": {"queries": 5, "p95_ms": 10.0}}}
+        cand = {"cases": {"x": {"queries": 6, "p95_ms": 13.0}}}
+        metrics = {r["metric"] for r in compare(base, cand, tolerance=0.2)}
+        self.assertEqual(metrics, {"queries", "p95_ms"})
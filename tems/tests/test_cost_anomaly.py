@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_finance import cost_anomaly as ca
+
+
+class TestCostAnomalyStats(FrappeTestCase):
+    def _fold(self, amounts):
+        stats = {}
+        for amount in amounts:
+            stats.update(ca.fold(stats, amount))
+        return stats
+
+    def test_ring_keeps_last_window_in_place(self):
+        stats = self._fold([float(i) for i in range(ca.RING_SIZE + 3)])
+        window = ca.unpack(stats["ring"])
+        self.assertEqual(len(stats["ring"]), ca.RING_SIZE * 4)
+        self.assertEqual(sorted(window), [float(i) for i in range(3, ca.RING_SIZE + 3)])
+        self.assertEqual(window[:3].tolist(), [64.0, 65.0, 66.0])
+
+    def test_welford_matches_batch_statistics(self):
+        amounts = [120.0, 95.5, 130.0, 101.0, 99.0, 150.0]
+        stats = self._fold(amounts)
+        self.assertEqual(stats["samples"], len(amounts))
+        self.assertAlmostEqual(stats["mean"], np.mean(amounts))
+        self.assertAlmostEqual(stats["m2"] / len(amounts), np.var(amounts))
+
+    def test_spike_flagged_despite_earlier_spike(self):
+        window = np.array([100.0, 104.0, 98.0, 101.0, 97.0, 103.0, 99.0, 102.0, 2000.0])
+        verdict = ca.assess(window, 1500.0)
+        self.assertTrue(verdict["anomaly"])
+        self.assertEqual(verdict["severity"], "high")
+        self.assertFalse(ca.assess(window, 106.0)["anomaly"])
+
+    def test_short_window_is_not_scored(self):
+        verdict = ca.assess(np.array([100.0, 5000.0]), 9000.0)
+        self.assertIsNone(verdict["z_score"])
+        self.assertFalse(verdict["anomaly"])
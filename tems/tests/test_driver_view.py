@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_people import driver_view
+
+
+class TestDriverView(FrappeTestCase):
+    def test_plan_change_invalidates_old_and_new_driver(self):
+        doc = frappe.get_doc({"doctype": "Operation Plan", "name": "OP-T", "driver": "EMP-2"})
+        doc._doc_before_save = frappe.get_doc({"doctype": "Operation Plan", "name": "OP-T", "driver": "EMP-1"})
+        self.assertEqual(set(driver_view._affected_employees(doc)), {"EMP-1", "EMP-2"})
+
+    def test_only_employee_messages_invalidate(self):
+        chat = frappe.get_doc({"doctype": "Communication", "reference_doctype": "Employee", "reference_name": "EMP-1"})
+        other = frappe.get_doc({"doctype": "Communication", "reference_doctype": "Vehicle", "reference_name": "V-1"})
+        self.assertEqual(driver_view._affected_employees(chat), ["EMP-1"])
+        self.assertEqual(driver_view._affected_employees(other), [])
+
+    def test_invalidate_drops_cached_view(self):
+        key = driver_view._view_key("EMP-T")
+        frappe.cache().set_value(key, {"employee": "EMP-T"})
+        driver_view.invalidate(["EMP-T", None])
+        self.assertIsNone(frappe.cache().get_value(key))
+
+    def test_user_without_employee_has_no_view(self):
+        self.assertIsNone(driver_view.get_view("Guest"))
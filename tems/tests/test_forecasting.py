@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_ai.services.forecasting import daily_matrix, fit
+
+
+class TestForecastingEngine(FrappeTestCase):
+    def _series(self, n=200, days=150, horizon=28, seed=3):
+        rng = np.random.default_rng(seed)
+        t = np.arange(days + horizon)
+        base = rng.uniform(100, 1000, (n, 1))
+        noise = 0.1 * base
+        Y = base + 0.2 * base * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, (n, days + horizon)) * noise
+        return Y[:, :days], Y[:, days:], base, noise
+
+    def test_weekly_season_is_tracked(self):
+        history, actual, base, noise = self._series()
+        mean, _lower, _upper = fit(history).forecast(actual.shape[1])
+        # Error close to the noise floor, well below the seasonal amplitude
+        self.assertLess(np.abs(mean - actual).mean(), 1.5 * noise.mean())
+
+    def test_prediction_intervals_cover(self):
+        history, actual, _base, _noise = self._series(seed=11)
+        _mean, lower, upper = fit(history).forecast(actual.shape[1], level=0.95)
+        coverage = ((actual >= lower) & (actual <= upper)).mean()
+        self.assertGreater(coverage, 0.9)
+        self.assertTrue((upper[:, -1] - lower[:, -1] >= upper[:, 0] - lower[:, 0]).all())
+
+    def test_floor_and_short_history(self):
+        mean, lower, _upper = fit(np.array([[0.0, 1.0, 0.0, 2.0, 0.0]])).forecast(3, floor=0.0)
+        self.assertTrue((lower >= 0).all() and (mean >= 0).all())
+
+    def test_daily_matrix_pivots_and_drops_out_of_range(self):
+        keys, Y = daily_matrix(
+            [("V-1", "2026-01-02", 5), ("V-1", "2026-01-02", 2), ("V-2", "2026-01-04", 1), ("V-2", "2025-12-01", 9)],
+            "2026-01-01",
+            7,
+        )
+        self.assertEqual(keys, ["V-1", "V-2"])
+        self.assertEqual(Y[0, 1], 7)
+        self.assertEqual(Y[1].sum(), 1)
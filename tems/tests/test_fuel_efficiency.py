@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_fleet import fuel_efficiency as fe
+
+
+class TestFuelEfficiencyStats(FrappeTestCase):
+    def _fold(self, samples):
+        stats = {"samples": 0, "mean": 0.0, "var": 0.0}
+        for value in samples:
+            stats.update(fe.update(stats, value, fe.score(stats, value)))
+        return stats
+
+    def test_update_matches_batch_mean_and_variance_within_window(self):
+        samples = [30.0, 32.5, 29.0, 31.0, 33.0, 30.5, 31.5]
+        stats = self._fold(samples)
+        self.assertEqual(stats["samples"], len(samples))
+        self.assertAlmostEqual(stats["mean"], np.mean(samples))
+        self.assertAlmostEqual(stats["var"], np.var(samples))
+
+    def test_spike_is_scored_and_clipped_into_baseline(self):
+        stats = self._fold([30.0, 31.0, 29.0, 30.5, 29.5, 30.0])
+        z = fe.score(stats, 60.0)
+        self.assertGreater(z, fe.Z_THRESHOLD)
+        self.assertEqual(fe.severity(z), "high")
+
+        after = fe.update(stats, 60.0, z)
+        ceiling = stats["mean"] + fe.Z_CLIP * fe.std_of(stats["mean"], stats["var"])
+        self.assertAlmostEqual(after["mean"], fe.update(stats, ceiling, None)["mean"])
+
+    def test_short_history_is_not_scored(self):
+        stats = self._fold([30.0, 31.0])
+        self.assertIsNone(fe.score(stats, 90.0))
+
+    def test_efficiency_rejects_gaps_and_reversals(self):
+        self.assertAlmostEqual(fe.efficiency(60, 200), 30.0)
+        self.assertIsNone(fe.efficiency(60, 0))
+        self.assertIsNone(fe.efficiency(60, -10))
+        self.assertIsNone(fe.efficiency(60, fe.MAX_GAP_KM + 1))
+
+    def test_robust_z_is_per_vehicle_type(self):
+        cargo = [30.0, 31.0, 29.5, 30.5, 30.0, 45.0]
+        passenger = [12.0, 12.5, 11.5, 12.0, 12.2]
+        values = np.array(cargo + passenger)
+        groups = np.array(["Cargo"] * len(cargo) + ["Passenger"] * len(passenger), dtype=object)
+        z = fe.robust_z(values, groups)
+        self.assertGreater(z[5], fe.Z_THRESHOLD)
+        self.assertTrue(np.all(np.abs(np.delete(z, 5)) < fe.Z_THRESHOLD))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import math
+import random
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main import geo
+
+
+class TestGeohash(FrappeTestCase):
+    def test_encode_known_value(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        lat, lng = geo.decode("u4pruydqqvj")
+        self.assertAlmostEqual(lat, 57.64911, places=4)
+        self.assertAlmostEqual(lng, 10.40744, places=4)
+
+    def test_cover_circle_contains_points_in_radius(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            lat, lng = rng.uniform(-60, 60), rng.uniform(-170, 170)
+            radius = rng.choice([0.5, 2, 10, 50])
+            prefixes = geo.cover_circle(lat, lng, radius)
+            # A point on the circle in a random direction
+            bearing = rng.uniform(0, 360)
+            plat = lat + 0.99 * radius / 111.32 * math.cos(math.radians(bearing))
+            plng = lng + 0.99 * radius / (111.32 * math.cos(math.radians(lat))) * math.sin(math.radians(bearing))
+            point = geo.encode(plat, plng)
+            self.assertTrue(any(point.startswith(p) for p in prefixes))
+
+    def test_cover_bbox_is_bounded_and_complete(self):
+        prefixes = geo.cover_bbox(6.40, 3.30, 6.70, 3.60)
+        self.assertLessEqual(len(prefixes), geo.MAX_COVER_CELLS)
+        for lat, lng in ((6.40, 3.30), (6.70, 3.60), (6.55, 3.45), (6.40, 3.60)):
+            point = geo.encode(lat, lng)
+            self.assertTrue(any(point.startswith(p) for p in prefixes))
+
+    def test_cover_bbox_splits_at_antimeridian(self):
+        prefixes = geo.cover_bbox(-18.0, 178.0, -16.0, -179.0)
+        self.assertTrue(prefixes)
+        for lat, lng in ((-17.0, 179.5), (-17.0, -179.5), (-18.0, 178.0), (-16.0, -179.0)):
+            point = geo.encode(lat, lng)
+            self.assertTrue(any(point.startswith(p) for p in prefixes))
+        self.assertEqual(geo.cover_bbox(6.7, 3.3, 6.4, 3.6), [])
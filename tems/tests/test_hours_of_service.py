@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_safety import hours_of_service as hos
+
+DAY0 = datetime(2026, 10, 19)
+
+
+def span(kind, start_hour, hours, plan=None):
+    start = DAY0 + timedelta(hours=start_hour)
+    return {"kind": kind, "start": start, "end": start + timedelta(hours=hours), "operation_plan": plan}
+
+
+class TestHoursOfService(FrappeTestCase):
+    def test_rolling_totals_and_rest(self):
+        intervals = [span("driving", 6, 4), span("duty", 10, 1), span("driving", 11, 3)]
+        result = hos.evaluate(intervals, at=DAY0 + timedelta(hours=20), now=DAY0 + timedelta(hours=20))
+        self.assertEqual(result["driving_24h"], 7 * 60)
+        self.assertEqual(result["rest_24h"], 16 * 60)
+        self.assertEqual(result["longest_rest_24h"], 10 * 60)  # 20:00 the day before -> 06:00
+        self.assertEqual(result["continuous_driving"], 0)  # 6h since the last drive
+        self.assertEqual(result["duty_spread"], 8 * 60)
+        self.assertEqual(result["status"], "ok")
+
+    def test_short_night_rest_extends_duty_spread(self):
+        intervals = [span("driving", 6, 4), span("duty", 10, 4), span("driving", 24, 3)]
+        at = DAY0 + timedelta(hours=27)
+        result = hos.evaluate(intervals, at=at, now=at)
+        # 10h rest between 14:00 and 00:00 is not a daily rest: spread runs from 06:00
+        self.assertEqual(result["duty_spread"], 21 * 60)
+        self.assertEqual([v["rule"] for v in result["violations"]], ["daily_rest"])
+
+        intervals[-1] = span("driving", 25, 3)
+        at = DAY0 + timedelta(hours=28)
+        self.assertEqual(hos.evaluate(intervals, at=at, now=at)["duty_spread"], 3 * 60)
+
+    def test_continuous_driving_resets_after_break(self):
+        intervals = [span("driving", 6, 2), span("driving", 8.25, 2), span("driving", 11, 1)]
+        result = hos.evaluate(intervals, at=DAY0 + timedelta(hours=12), now=DAY0 + timedelta(hours=12))
+        # 15 min pause is not a break, the 45 min pause before 11:00 is
+        self.assertEqual(result["continuous_driving"], 60)
+
+    def test_planned_window_yields_to_actual_driving(self):
+        intervals = [span("planned", 6, 8, plan="OP-1"), span("driving", 7, 2, plan="OP-1")]
+        driving, _ = hos.resolve(intervals, DAY0 + timedelta(hours=20))
+        self.assertEqual(driving, [(DAY0 + timedelta(hours=7), DAY0 + timedelta(hours=9))])
+
+    def test_open_interval_is_capped(self):
+        start = DAY0 + timedelta(hours=1)
+        intervals = [{"kind": "driving", "start": start, "end": None, "operation_plan": None}]
+        driving, _ = hos.resolve(intervals, DAY0 + timedelta(days=2))
+        self.assertEqual(driving[0][1] - driving[0][0], timedelta(hours=hos.MAX_OPEN_DRIVING_HOURS))
+
+    def test_overlapping_records_are_not_double_counted(self):
+        intervals = [span("driving", 6, 4), span("planned", 6, 4, plan="OP-2")]
+        result = hos.evaluate(intervals, at=DAY0 + timedelta(hours=12), now=DAY0 + timedelta(hours=12))
+        self.assertEqual(result["driving_24h"], 4 * 60)
+        self.assertEqual(result["remaining_driving_24h"], 5 * 60)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main import geo
+from tems.tems_safety import hotspots
+
+
+class TestHotspotDecay(FrappeTestCase):
+    def test_epoch_scaled_sum_decays_by_half_life(self):
+        at = datetime(2025, 6, 1, 12, 0)
+        total = hotspots.contribution(2.0, at)
+        self.assertAlmostEqual(total * hotspots.decay_factor(at), 2.0)
+        later = at + timedelta(days=hotspots.HALF_LIFE_DAYS)
+        self.assertAlmostEqual(total * hotspots.decay_factor(later), 1.0)
+
+    def test_sums_stay_additive(self):
+        now = datetime(2025, 6, 1)
+        old = now - timedelta(days=2 * hotspots.HALF_LIFE_DAYS)
+        total = hotspots.contribution(1.0, now) + hotspots.contribution(4.0, old)
+        self.assertAlmostEqual(total * hotspots.decay_factor(now), 2.0)
+
+
+class TestHotspotClustering(FrappeTestCase):
+    def test_adjacent_core_cells_form_one_cluster_with_border(self):
+        core = geo.encode(-1.2921, 36.8219, hotspots.CELL_PRECISION)
+        east, far = geo.neighbors(core)[0], geo.encode(-4.0435, 39.6682, hotspots.CELL_PRECISION)
+        border = next(c for c in geo.neighbors(east) if c != core and c not in geo.neighbors(core))
+        cells = {core: 5.0, east: 3.0, border: 0.5, far: 0.5}
+
+        clusters = hotspots.cluster_cells(cells, core_risk=2.0)
+
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(set(clusters[0]["cells"]), {core, east, border})
+        self.assertEqual(set(clusters[0]["core_cells"]), {core, east})
+        self.assertAlmostEqual(clusters[0]["risk"], 8.5)
+
+    def test_border_cells_do_not_chain_clusters(self):
+        a = geo.encode(-1.2921, 36.8219, hotspots.CELL_PRECISION)
+        bridge = geo.neighbors(a)[0]
+        b = next(c for c in geo.neighbors(bridge) if c != a and c not in geo.neighbors(a))
+        clusters = hotspots.cluster_cells({a: 3.0, bridge: 1.0, b: 2.5}, core_risk=2.0)
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0]["core_cells"], [a])
+
+    def test_segment_sums_bin_by_distance_along(self):
+        sums = hotspots.segment_sums([0.5, 4.9, 5.1, 12.0], [1.0, 1.0, 2.0, 3.0], length_km=11.0)
+        self.assertEqual(list(sums), [2.0, 2.0, 3.0])
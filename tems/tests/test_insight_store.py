@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import os
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_ai.services import insight_store
+
+
+class TestInsightStore(FrappeTestCase):
+    bucket = "1999-01"
+
+    def tearDown(self):
+        path = os.path.join(insight_store.archive_dir(), f"{self.bucket}.jsonl.gz")
+        if os.path.exists(path):
+            os.remove(path)
+
+    def test_list_reads_skip_json_blobs(self):
+        self.assertNotIn("details", insight_store.LIST_FIELDS)
+        self.assertNotIn("context_data", insight_store.LIST_FIELDS)
+        self.assertNotIn("*", insight_store.LIST_FIELDS)
+
+    def test_archive_chunks_append_to_month_bucket(self):
+        insight_store._append(self.bucket, [{"name": "AIL-1", "domain": "Fleet"}])
+        insight_store._append(self.bucket, [{"name": "AIL-2", "domain": "Safety"}])
+
+        rows = list(insight_store.read_archive(self.bucket))
+        self.assertEqual([r["name"] for r in rows], ["AIL-1", "AIL-2"])
+        self.assertIn(self.bucket, [a["bucket"] for a in insight_store.list_archives()])
+
+    def test_missing_bucket_reads_empty(self):
+        self.assertEqual(list(insight_store.read_archive("1900-01")), [])
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_insights.facts import haversine_km, movement_segments
+
+
+class TestDailyFacts(FrappeTestCase):
+    def test_movement_segments_transit_and_distance(self):
+        events = [
+            {"vehicle": "V1", "operation_plan": "OP1", "state": "Check-Out", "event_time": "2025-03-01 08:00:00",
+             "location_lat": 6.50, "location_lng": 3.35},
+            {"vehicle": "V1", "operation_plan": "OP1", "state": "In Transit", "event_time": "2025-03-01 08:30:00",
+             "location_lat": 6.50, "location_lng": 3.35},
+            {"vehicle": "V1", "operation_plan": "OP1", "state": "Delivered", "event_time": "2025-03-01 09:30:00",
+             "location_lat": 6.60, "location_lng": 3.35},
+            {"vehicle": "V2", "operation_plan": None, "state": "In Transit", "event_time": "2025-03-01 07:00:00",
+             "location_lat": 0, "location_lng": 0},
+        ]
+        result = movement_segments(events)
+        v1 = result["V1"]
+        self.assertAlmostEqual(v1["transit_minutes"], 60.0)
+        self.assertAlmostEqual(v1["available_minutes"], 90.0)
+        self.assertAlmostEqual(v1["distance_km"], haversine_km(6.50, 3.35, 6.60, 3.35), places=6)
+        self.assertEqual(v1["plans"]["OP1"]["movement_events"], 3)
+        self.assertEqual(result["V2"]["movement_events"], 1)
+        self.assertEqual(result["V2"]["transit_minutes"], 0.0)
+
+    def test_long_gaps_are_not_transit(self):
+        events = [
+            {"vehicle": "V1", "state": "In Transit", "event_time": "2025-03-01 01:00:00"},
+            {"vehicle": "V1", "state": "In Transit", "event_time": "2025-03-01 09:00:00"},
+        ]
+        self.assertEqual(movement_segments(events)["V1"]["transit_minutes"], 0.0)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from tems.tems_insights.kpi_engine import compile_kpi_config, is_stale, summarize_rows, window_bounds
+
+
+class TestKPIEngine(FrappeTestCase):
+    def test_window_bounds(self):
+        now = get_datetime("2025-03-19 10:30:00")
+        month = window_bounds("month", now)
+        self.assertEqual(str(month["from_date"]), "2025-03-01")
+        self.assertEqual(str(month["to_date"]), "2025-03-19")
+        self.assertEqual(str(window_bounds("rolling_7d", now)["from_date"]), "2025-03-12")
+
+    def test_summarize_rows(self):
+        self.assertIsNone(summarize_rows([]))
+        self.assertEqual(summarize_rows([{"backlog": 4}]), 4.0)
+        self.assertEqual(summarize_rows([{"vehicle": "A", "pct": 80}, {"vehicle": "B", "pct": 60}]), 70.0)
+
+    def test_staleness_follows_window_ttl(self):
+        now = get_datetime("2025-03-19 10:30:00")
+        self.assertTrue(is_stale(None, "day", now))
+        self.assertFalse(is_stale(add_to_date(now, minutes=-10), "day", now))
+        self.assertTrue(is_stale(add_to_date(now, minutes=-10), "5_min", now))
+
+    def test_compile_kpi_config(self):
+        cfg = frappe._dict(
+            name="KPI-CFG-1",
+            title="Fuel Spend",
+            reference_doctype="Fuel Log",
+            metric_field="total_cost",
+            aggregation="Sum",
+            filter_json='{"vehicle": "V-1"}',
+            refresh_window="day",
+            date_field="date",
+        )
+        kpi = compile_kpi_config(cfg)
+        self.assertEqual(kpi["key"], "CFG-KPI-CFG-1")
+        self.assertEqual(kpi["expression"], "sum(`total_cost`)")
+        self.assertEqual(kpi["filters"], {"vehicle": "V-1"})
+
+
+class TestReportSubscriptionWindows(FrappeTestCase):
+    def test_window_keys(self):
+        from tems.tems_insights.subscriptions import parse_recipients, window_key
+
+        self.assertEqual(window_key("Daily", "2025-03-19"), "2025-03-19")
+        self.assertEqual(window_key("Weekly", "2025-03-19"), "2025-W12")
+        self.assertEqual(window_key("Monthly", "2025-03-19"), "2025-03")
+        self.assertEqual(parse_recipients("a@x.com, b@x.com\nc@x.com;"), ["a@x.com", "b@x.com", "c@x.com"])
@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems import install
+
+
+class TestInstall(FrappeTestCase):
+    def test_table_setup_resolves(self):
+        for method in install.TABLE_SETUP:
+            self.assertTrue(callable(frappe.get_attr(method)), method)
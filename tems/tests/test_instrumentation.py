@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main.instrumentation import summarize
+
+
+class TestInstrumentationSummary(FrappeTestCase):
+    def test_summarize_flags_n_plus_one(self):
+        samples = [
+            {"ts": "2025-01-02", "wall_ms": 40.0, "queries": 52, "db_ms": 30.0,
+             "n_plus_one": [{"shape": "select ? from `tabVehicle` where name = ?", "count": 50}]},
+            {"ts": "2025-01-01", "wall_ms": 10.0, "queries": 4, "db_ms": 5.0, "n_plus_one": []},
+        ]
+        summary = summarize(samples)
+        self.assertEqual(summary["calls"], 2)
+        self.assertEqual(summary["queries_max"], 52)
+        self.assertEqual(summary["n_plus_one_calls"], 1)
+        self.assertEqual(summary["n_plus_one_shapes"][0]["max_repeats"], 50)
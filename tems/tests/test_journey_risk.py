@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_safety import journey_risk as jr
+
+
+class TestJourneyRiskComponents(FrappeTestCase):
+    def test_driver_score_weights_count_severity_and_recency(self):
+        now = datetime(2025, 6, 1)
+        incidents = [("critical", now - timedelta(days=10)), ("minor", now - timedelta(days=200))]
+        score, detail, valid_until = jr.driver_score(incidents, now=now)
+        # count 2*5*0.4 + severity (20+10)*0.4 + recency 1*10*0.2
+        self.assertAlmostEqual(score, 4 + 12 + 2)
+        self.assertEqual(detail["high_severity"], 1)
+        self.assertEqual(detail["recent_incidents"], 1)
+        self.assertEqual(valid_until, now - timedelta(days=10) + timedelta(days=jr.RECENT_DAYS))
+
+    def test_driver_without_incidents_scores_zero(self):
+        score, _, valid_until = jr.driver_score([], now=datetime(2025, 6, 1))
+        self.assertEqual(score, 0)
+        self.assertIsNone(valid_until)
+
+    def test_employee_hook_skips_non_drivers(self):
+        clerk = frappe.get_doc({"doctype": "Employee", "name": "EMP-T", "designation": "Clerk"})
+        self.assertEqual(jr._touched(clerk), ("", set()))
+        driver = frappe.get_doc({"doctype": "Employee", "name": "EMP-T", "designation": "Truck Driver"})
+        self.assertEqual(jr._touched(driver), ("driver", {"EMP-T"}))
+
+    def test_vehicle_and_route_scores_are_capped(self):
+        self.assertEqual(jr.vehicle_score(2), 30)
+        self.assertEqual(jr.vehicle_score(10), 50)
+        self.assertEqual(jr.route_score(1.5), 15)
+        self.assertEqual(jr.route_score(12), 40)
+
+    def test_weighting(self):
+        self.assertAlmostEqual(jr.weigh(50, 30, 20, 10), 20 + 9 + 4 + 1)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_ai.services import model_metrics
+
+
+class TestModelMetricsAccumulators(FrappeTestCase):
+    def tearDown(self):
+        model_metrics._discard()
+
+    def test_confidence_bins_match_reporting_brackets(self):
+        self.assertEqual(model_metrics.confidence_bin(0), 0)
+        self.assertEqual(model_metrics.confidence_bin(0.5), 4)  # low is <= 0.5
+        self.assertEqual(model_metrics.confidence_bin(0.8), 7)  # medium is <= 0.8
+        self.assertEqual(model_metrics.confidence_bin(0.81), 8)
+        self.assertEqual(model_metrics.confidence_bin(1.2), 9)
+
+    def test_buffer_coalesces_per_model_and_day(self):
+        model_metrics.add_prediction("M-1", "2026-10-19 08:00:00", 0.9)
+        model_metrics.add_prediction("M-1", "2026-10-19 09:00:00", 0.4)
+        model_metrics.add_validation("M-1", "2026-10-19 08:00:00", "12.5", "10")
+        model_metrics.add_validation("M-1", "2026-10-19 09:00:00", "High", "high")
+
+        buffer = frappe.local.tems_model_metrics_buffer
+        self.assertEqual(list(buffer), [("M-1", "2026-10-19")])
+        row = buffer[("M-1", "2026-10-19")]
+        self.assertEqual((row["predictions"], row["b8"], row["b3"]), (2, 1, 1))
+        self.assertEqual((row["validated"], row["correct"], row["numeric_validated"]), (2, 1, 1))
+        self.assertAlmostEqual(row["abs_error_sum"], 2.5)
+        self.assertAlmostEqual(row["sq_error_sum"], 6.25)
+
+    def test_psi(self):
+        self.assertAlmostEqual(model_metrics.psi([10, 20, 30], [1, 2, 3]), 0.0)
+        self.assertGreater(model_metrics.psi([30, 20, 10], [5, 20, 35]), 0.25)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_operations import dashboard
+
+
+class TestOperationsDashboardSnapshot(FrappeTestCase):
+    def setUp(self):
+        frappe.cache().delete_value(f"{dashboard.CACHE_PREFIX}:test")
+        self.calls = 0
+
+    def _builder(self):
+        self.calls += 1
+        return {"fleet_summary": {"total_vehicles": 3}, "timestamp": str(self.calls)}
+
+    def test_builds_once_within_ttl(self):
+        first = dashboard.cached_snapshot("test", self._builder, ttl=60)
+        second = dashboard.cached_snapshot("test", self._builder, ttl=60)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first["etag"], second["etag"])
+
+    def test_version_only_moves_when_content_changes(self):
+        first = dashboard.cached_snapshot("test", self._builder, ttl=0)
+        second = dashboard.cached_snapshot("test", self._builder, ttl=0)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(first["etag"], second["etag"])
+        self.assertEqual(first["version"], second["version"])
+
+    def test_matching_etag_is_not_modified(self):
+        snapshot = dashboard.cached_snapshot("test", self._builder, ttl=60)
+        self.assertTrue(dashboard.respond(snapshot, snapshot["etag"])["not_modified"])
+        self.assertEqual(dashboard.respond(snapshot, "stale")["fleet_summary"], {"total_vehicles": 3})
+
+    def test_scope_key_separates_permission_sets(self):
+        full = dashboard._scope_key(tuple(dashboard.SECTION_DOCTYPES), None)
+        self.assertNotEqual(full, dashboard._scope_key(("exceptions",), None))
+        self.assertNotEqual(
+            dashboard._scope_key(("exceptions",), ("V-1",)), dashboard._scope_key(("exceptions",), ("V-2",))
+        )
+
+    def test_empty_vehicle_scope_matches_nothing(self):
+        condition, params = dashboard._vehicle_scope(None, "op", ())
+        self.assertIn("op.vehicle in %(vehicles)s", condition)
+        self.assertEqual(params["vehicles"], ("",))
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main import realtime
+
+
+class TestRealtimeTopics(FrappeTestCase):
+    def tearDown(self):
+        frappe.local.tems_realtime_buffer = None
+
+    def test_bursts_coalesce_per_topic_and_entity(self):
+        topics = realtime.vehicle_topic("V-1") + realtime.role_topics("Operations Manager")
+        realtime.publish("vehicle_state", {"name": "V-1", "state": "Check-Out", "location_lat": 6.5}, topics, key="V-1")
+        realtime.publish("vehicle_state", {"name": "V-1", "state": "In Transit"}, topics, key="V-1")
+        realtime.publish("vehicle_state", {"name": "V-2", "state": "Check-In"}, ["role:Operations Manager"], key="V-2")
+
+        buffer = frappe.local.tems_realtime_buffer
+        self.assertEqual(set(buffer), {("vehicle:V-1", "vehicle_state"), ("role:Operations Manager", "vehicle_state")})
+        self.assertEqual(
+            buffer[("vehicle:V-1", "vehicle_state")]["V-1"],
+            {"name": "V-1", "state": "In Transit", "location_lat": 6.5},
+        )
+        self.assertEqual(len(buffer[("role:Operations Manager", "vehicle_state")]), 2)
+
+    def test_doc_delta_carries_only_changed_fields(self):
+        doc = frappe.get_doc({"doctype": "SOS Event", "name": "SOS-T", "status": "Open", "vehicle": "V-1"})
+        before = frappe.get_doc({"doctype": "SOS Event", "name": "SOS-T", "status": "Open", "vehicle": "V-0"})
+        doc._doc_before_save = before
+        self.assertEqual(
+            realtime.doc_delta(doc, ("status", "vehicle")),
+            {"doctype": "SOS Event", "name": "SOS-T", "vehicle": "V-1"},
+        )
+
+    def test_vehicle_depot_change_reaches_both_areas(self):
+        from tems.tems_operations.handlers import publish_vehicle_update
+
+        doc = frappe.get_doc({"doctype": "Vehicle", "name": "V-1", "operating_area": "Kano", "status": "Available"})
+        doc._doc_before_save = frappe.get_doc(
+            {"doctype": "Vehicle", "name": "V-1", "operating_area": "Lagos", "status": "Available"}
+        )
+        publish_vehicle_update(doc)
+
+        buffer = frappe.local.tems_realtime_buffer
+        self.assertEqual(buffer[("area:Kano", "vehicle_state")]["V-1"]["operating_area"], "Kano")
+        self.assertIn(("area:Lagos", "vehicle_state"), buffer)
+        self.assertNotIn("status", buffer[("vehicle:V-1", "vehicle_state")]["V-1"])
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from itertools import pairwise
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_operations.route_geometry import RouteGeometry
+
+
+class TestRouteGeometry(FrappeTestCase):
+    def setUp(self):
+        # L-shaped route: north along lng 3.35, then east along lat 6.60
+        self.geometry = RouteGeometry("R1", [(6.50, 3.35), (6.60, 3.35), (6.60, 3.45)])
+
+    def test_points_on_route_have_zero_distance(self):
+        distance, along = self.geometry.distances([6.50, 6.55, 6.60, 6.60], [3.35, 3.35, 3.40, 3.45])
+        np.testing.assert_allclose(distance, 0, atol=1e-6)
+        self.assertAlmostEqual(along[-1], self.geometry.length_km, places=6)
+        self.assertTrue(np.all(np.diff(along) > 0))
+
+    def test_offset_distance_and_clamping(self):
+        # 0.01 deg east of the first leg, and 0.01 deg past the end of the route
+        distance, _along = self.geometry.distances([6.55, 6.60], [3.36, 3.46])
+        expected = 0.01 * self.geometry.kx
+        np.testing.assert_allclose(distance, [expected, expected], rtol=1e-6)
+
+    def test_batches_larger_than_a_chunk(self):
+        rng = np.random.default_rng(3)
+        lats, lngs = rng.uniform(6.4, 6.7, 5000), rng.uniform(3.3, 3.5, 5000)
+        distance, _along = self.geometry.distances(lats, lngs)
+        xy = self.geometry.project(lats, lngs)
+        pts = self.geometry.project(self.geometry.points[:, 0], self.geometry.points[:, 1])
+        brute = []
+        for p in xy[:200]:
+            best = np.inf
+            for a, b in pairwise(pts):
+                t = np.clip(np.dot(p - a, b - a) / np.dot(b - a, b - a), 0, 1)
+                best = min(best, np.linalg.norm(p - (a + t * (b - a))))
+            brute.append(best)
+        np.testing.assert_allclose(distance[:200], brute, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_operations.route_optimizer import RoutingProblem, distance_matrix, solve
+
+
+def _problem(n=60, vehicles=5, capacity=1500.0, seed=5, heavy=None):
+    rng = np.random.default_rng(seed)
+    coords = [(6.5, 3.35)] + [(6.5 + rng.normal(0, 0.08), 3.35 + rng.normal(0, 0.08)) for _ in range(n)] + [(6.5, 3.35)]
+    early = [0.0, *rng.uniform(0, 240, n), 0.0]
+    late = [720.0, *(e + 180 for e in early[1:-1]), 720.0]
+    demand = [0.0, *rng.uniform(50, 400, n), 0.0]
+    if heavy:
+        demand[heavy] = capacity * 2
+    service = [0.0] + [10.0] * n + [0.0]
+    return RoutingProblem(distance_matrix(coords), demand, early, late, service, [capacity] * vehicles, [720.0] * vehicles)
+
+
+class TestRouteOptimizer(FrappeTestCase):
+    def test_solution_respects_capacity_and_windows(self):
+        problem = _problem()
+        solution = solve(problem, time_limit=5)
+        served = sorted(n for route in solution["routes"] for n in route)
+        self.assertEqual(sorted(served + solution["unassigned"]), problem.stops)
+        for v, route in enumerate(solution["routes"]):
+            self.assertIsNotNone(problem.schedule(route, v))
+            self.assertLessEqual(sum(problem.demand[n] for n in route), problem.capacities[v] + 1e-6)
+
+    def test_local_search_does_not_worsen_construction(self):
+        from tems.tems_operations.route_optimizer import construct
+
+        problem = _problem(seed=9)
+        routes, _unassigned = construct(problem, len(problem.capacities))
+        self.assertLessEqual(solve(problem, time_limit=5)["cost"], problem.cost(routes) + 1e-6)
+
+    def test_overweight_stop_is_unassigned(self):
+        problem = _problem(n=10, vehicles=2, capacity=500.0, heavy=3)
+        self.assertIn(3, solve(problem, time_limit=2)["unassigned"])
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main.scheduler import next_interval
+
+
+class TestSchedulerInterval(FrappeTestCase):
+    def test_interval_follows_runtime_and_idle_backoff(self):
+        self.assertEqual(next_interval([1000.0], 240, 3600, 0), 240)
+        # A job taking ~5 minutes must not be re-run every 4 minutes
+        self.assertEqual(next_interval([300000.0], 240, 3600, 0), 600)
+        self.assertEqual(next_interval([1000.0], 240, 3600, 2), 960)
+        self.assertEqual(next_interval([1000.0], 240, 3600, 10), 3600)
@@ -16,3 +16,8 @@ class TestSchedulerSmoke(FrappeTestCase):
     def test_fx_rates_task_runs(self):
         from tems.tems_finance.tasks import update_fx_rates
         update_fx_rates()  # Should create placeholder FX Risk Log (idempotent)
+
+    def test_people_reminders_are_idempotent_per_day(self):
+        from tems.tems_people.tasks import remind_expiring_driver_docs
+        remind_expiring_driver_docs(30)
+        self.assertEqual(remind_expiring_driver_docs(30), 0)  # second run sends nothing new
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_operations.telematics import derive_state, normalize_ping
+
+
+class TestTelematics(FrappeTestCase):
+    def test_normalize_rejects_unusable_pings(self):
+        self.assertIsNone(normalize_ping({"vehicle": "V1", "lat": 0, "lng": 0, "ts": "2026-01-01 08:00:00"}))
+        self.assertIsNone(normalize_ping({"vehicle": "V1", "lat": 95, "lng": 3.3, "ts": "2026-01-01 08:00:00"}))
+        self.assertIsNone(normalize_ping({"lat": 6.5, "lng": 3.3, "ts": "2026-01-01 08:00:00"}))
+        ping = normalize_ping({"vehicle": "V1", "lat": "6.5", "lng": "3.3", "ts": "2026-01-01 08:00:00", "speed": 42})
+        self.assertEqual(ping["speed_kmh"], 42.0)
+        self.assertIsNone(ping["state"])
+
+    def test_state_changes_only_on_transitions(self):
+        moving = {"speed_kmh": 40.0, "state": None}
+        parked = {"speed_kmh": 0.0, "state": None}
+        self.assertEqual(derive_state(moving, "Check-Out"), "In Transit")
+        self.assertIsNone(derive_state(moving, "In Transit"))
+        self.assertIsNone(derive_state(parked, "In Transit"))
+        self.assertEqual(derive_state({"speed_kmh": 0.0, "state": "Delivered"}, "In Transit"), "Delivered")
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_ai.integrations import webhooks
+
+
+class _Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = "" if self.ok else "unavailable"
+
+
+class _Session:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.calls = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.calls.append({"url": url, "data": data, "headers": headers})
+        return _Response(self.status_code)
+
+
+class TestWebhookDelivery(FrappeTestCase):
+    def tearDown(self):
+        webhooks._session = None
+
+    def test_backoff_doubles_and_is_capped(self):
+        first = webhooks.backoff_seconds(1)
+        self.assertTrue(0.8 * webhooks.RETRY_BASE_SECONDS <= first <= 1.2 * webhooks.RETRY_BASE_SECONDS)
+        fourth = webhooks.backoff_seconds(4) / (8 * webhooks.RETRY_BASE_SECONDS)
+        self.assertTrue(0.8 <= fourth <= 1.2)
+        self.assertLessEqual(webhooks.backoff_seconds(30), 1.2 * webhooks.RETRY_MAX_SECONDS)
+
+    def test_only_transient_failures_are_retried(self):
+        self.assertTrue(webhooks.is_retryable(None))
+        self.assertTrue(webhooks.is_retryable(503))
+        self.assertTrue(webhooks.is_retryable(429))
+        self.assertFalse(webhooks.is_retryable(400))
+        self.assertFalse(webhooks.is_retryable(410))
+
+    def test_batch_body_keeps_single_event_shape(self):
+        payloads = [{"event": "ai_insight_generated", "insight": "A"}, {"event": "ai_insight_generated"}]
+        self.assertEqual(webhooks.batch_body(payloads[:1], 1), payloads[0])
+        body = webhooks.batch_body(payloads, 10)
+        self.assertEqual(body["event"], "ai_insights_generated")
+        self.assertEqual(body["count"], 2)
+
+    def test_post_signs_body_and_reports_failures(self):
+        settings = {"url": "https://example.invalid/hook", "secret": "s3cret", "batch_size": 1}
+        webhooks._session = _Session(200)
+        status_code, error = webhooks._post(settings, [7, 8], {"event": "x"})
+        self.assertEqual((status_code, error), (200, None))
+        call = webhooks._session.calls[0]
+        expected = hmac.new(b"s3cret", call["data"], hashlib.sha256).hexdigest()
+        self.assertEqual(call["headers"]["X-Webhook-Signature"], f"sha256={expected}")
+        self.assertEqual(call["headers"]["X-Webhook-Delivery"], "7,8")
+        self.assertEqual(json.loads(call["data"]), {"event": "x"})
+
+        webhooks._session = _Session(502)
+        status_code, error = webhooks._post(settings, [9], {"event": "x"})
+        self.assertEqual(status_code, 502)
+        self.assertIn("HTTP 502", error)
+
+    def test_rejected_batch_is_retried_item_by_item(self):
+        class _RejectingSession(_Session):
+            def post(self, url, data=None, headers=None, timeout=None):
+                self.calls.append({"url": url, "data": data, "headers": headers})
+                ids = headers["X-Webhook-Delivery"].split(",")
+                return _Response(400 if "2" in ids else 200)
+
+        marked = []
+        original_mark = webhooks._mark
+
+        def _mark(rows, status_code, error):
+            marked.append(([row.id for row in rows], status_code))
+            return "delivered" if error is None else "dead"
+
+        settings = {"url": "https://example.invalid/hook", "secret": "", "batch_size": 3}
+        rows = [frappe._dict(id=i, payload=json.dumps({"event": "x", "n": i})) for i in (1, 2, 3)]
+        outcome = {"delivered": 0, "retry": 0, "dead": 0}
+        webhooks._session = _RejectingSession(200)
+        webhooks._mark = _mark
+        try:
+            self.assertIsNone(webhooks._send(settings, rows, 3, outcome))
+        finally:
+            webhooks._mark = original_mark
+        self.assertEqual(marked, [([1], 200), ([2], 400), ([3], 200)])
+        self.assertEqual(outcome, {"delivered": 2, "retry": 0, "dead": 1})
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from tems.tems_main import work_queue
+
+QUEUE = "tems:test_work_queue"
+
+
+class TestWorkQueue(FrappeTestCase):
+    def setUp(self):
+        self.cache = frappe.cache()
+        for key in (QUEUE, f"{QUEUE}:processing", f"{QUEUE}:attempts", work_queue.dead_letter_key(QUEUE)):
+            self.cache.delete(self.cache.make_key(key))
+        for batch in ([1, 2], [3], [4, 5]):
+            self.cache.lpush(QUEUE, json.dumps(batch))
+
+    def test_claim_is_kept_until_ack(self):
+        self.assertEqual(work_queue.claim(QUEUE, 3), [1, 2, 3])
+        # A failed run leaves the claim in place; the next claim starts with it
+        self.assertEqual(work_queue.claim(QUEUE, 3), [1, 2, 3])
+        work_queue.ack(QUEUE)
+        self.assertEqual(work_queue.claim(QUEUE, 3), [4, 5])
+
+    def test_repeated_failures_dead_letter_the_claim(self):
+        work_queue.claim(QUEUE, 1)
+        for _ in range(work_queue.MAX_ATTEMPTS - 1):
+            self.assertFalse(work_queue.fail(QUEUE))
+        self.assertTrue(work_queue.fail(QUEUE))
+        self.assertEqual(self.cache.lrange(work_queue.dead_letter_key(QUEUE), 0, -1), [b"[1, 2]"])
+        self.assertEqual(work_queue.claim(QUEUE, 10), [3, 4, 5])